@@ -1,5 +1,8 @@
 import autolens as al
 import autolens.plot as aplt
+import numpy as np
+
+from tools.inversion import regularization_sweep
 
 # So, we can use an inversion to reconstruct an image. Furthermore, this reconstruction provides the 'best-fit'
 # solution. And, when we inspect the fit with the fitting module, we see residuals indicative of a good fit.
@@ -180,6 +183,30 @@ print(high_regularization_fit.evidence)
 # Great! As expected, the solution that we could see 'by-eye' was the best solution corresponds to
 # the highest evidence solution.
 
+# To find the regularization coefficient that maximizes the Bayesian evidence we could fit many coefficients, but every
+# fit above performs the whole inversion again. For a fixed lens model and pixelization, only the regularization
+# matrix changes with the coefficient, so the workspace's 'tools/inversion/regularization_sweep.py' decomposes the
+# inversion once, after which the Bayesian evidence of every coefficient is nearly free to compute.
+sweep = regularization_sweep.RegularizationSweep.from_masked_imaging_and_tracer(
+    masked_imaging=fit.masked_imaging, tracer=fit.tracer
+)
+
+coefficients = np.logspace(-2.0, 2.0, 41)
+
+evidences = sweep.evidences_from_coefficients(coefficients=coefficients)
+
+print("Bayesian Evidence of the sweep with Normal Regularization:")
+print(sweep.evidence_from_coefficient(coefficient=1.0))
+print("Regularization coefficient with the highest Bayesian Evidence:")
+print(coefficients[np.argmax(evidences)])
+print("Highest Bayesian Evidence:")
+print(np.max(evidences))
+
+# When the regularization coefficient is fitted by a phase (for example the inversion hyper phases you'll meet later in
+# this chapter, which fit the pixelization and regularization for a fixed lens model), the same decomposition is used
+# by passing the phase to 'regularization_sweep.regularization_sweep_phase', so that the evidence of every coefficient
+# the non-linear search tries for a pixelization it has already tried is nearly free.
+
 # Before we end, lets consider which aspects of an inversion are linear and which are non-linear.
 
 # The linear part of the linear inversion solves for the 'best-fit' solution. For a given regularizaton coefficient,
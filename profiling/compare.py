@@ -0,0 +1,212 @@
+import argparse
+import os
+import sys
+
+from profiling import profiling_util
+from profiling import store_util
+
+"""
+Compares the run-times of two runs of the profiling runner (see 'profiling/run.py'), flagging every stage (e.g. the
+traced grid, mapper, blurred mapping matrix, curvature matrix or reconstruction) whose run-time regressed by more
+than a threshold and by more than the noise of its timings.
+
+This is used to check whether upgrading autolens (or changing the workspace) slows down the likelihood evaluation,
+before it is used to model lenses on a cluster.
+
+Runs are looked up in the profiling results store (see 'profiling/store_util.py'), by default comparing the newest
+stored run against the run before it. A run can be described by its git commit (or a prefix of one), any other part of
+its key (e.g. 'autolens_0.40.0'), 'latest', 'previous' or the path of a .json file.
+
+Example usage (from the autolens_workspace folder):
+
+    python3 profiling/compare.py
+
+    python3 profiling/compare.py autolens_0.39.0 latest --threshold 0.05 --stages traced_grid mapper
+
+Scripts which failed or timed out in the current run are listed with their status instead of run-times, and their
+stages are not compared. The command exits with status 1 if any stage regressed or any script failed, so it can be
+used in scripts.
+"""
+
+
+def comparisons_to_str(comparisons):
+
+    lines = []
+
+    for comparison in comparisons:
+
+        name = comparison["script"]
+
+        if comparison["case"] is not None:
+            name += " [{}]".format(comparison["case"])
+
+        if comparison["current"] is None:
+            lines.append("{:<11} {}".format(comparison["status"], name))
+            continue
+
+        lines.append(
+            "{:<11} {} {}: {:.6f} -> {:.6f} ({:+.1f}%)".format(
+                comparison["status"],
+                name,
+                comparison["stage"],
+                comparison["baseline"],
+                comparison["current"],
+                100.0 * (comparison["ratio"] - 1.0),
+            )
+        )
+
+    return "\n".join(lines)
+
+
+def compare(
+    baseline="previous",
+    current="latest",
+    store_path=store_util.default_store_path,
+    threshold=0.1,
+    sigma=3.0,
+    stages=None,
+    output_file=None,
+):
+
+    current_path = store_util.find_run_path(run=current, store_path=store_path)
+    current_run = store_util.load_run(file_path=current_path)
+
+    machine_key = None
+
+    if "cpu_model" in current_run["info"]:
+        machine_key = store_util.machine_key_from_info(info=current_run["info"])
+
+    if baseline == "previous":
+        paths = [
+            path
+            for path in store_util.stored_run_paths(store_path=store_path)
+            if os.path.basename(path) < os.path.basename(current_path)
+            and (machine_key is None or machine_key in os.path.basename(path))
+        ]
+        if len(paths) == 0:
+            raise FileNotFoundError(
+                "The store {} contains no run before {}".format(
+                    store_path, current_path
+                )
+            )
+        baseline_path = paths[-1]
+    else:
+        baseline_path = store_util.find_run_path(run=baseline, store_path=store_path)
+
+    baseline_run = store_util.load_run(file_path=baseline_path)
+
+    print("Baseline = {}".format(baseline_path))
+    print("Current = {}".format(current_path))
+    print()
+
+    baseline_info = baseline_run["info"]
+    current_info = current_run["info"]
+
+    for key in ("cpu_model", "threads"):
+        if baseline_info.get(key) != current_info.get(key):
+            print(
+                "Warning: the runs have a different {} ({} and {}), so their run-times are not comparable".format(
+                    key, baseline_info.get(key), current_info.get(key)
+                )
+            )
+
+    comparisons = store_util.compare_runs(
+        baseline_run=baseline_run,
+        current_run=current_run,
+        threshold=threshold,
+        sigma=sigma,
+        stages=stages,
+    )
+
+    print(comparisons_to_str(comparisons=comparisons))
+
+    regressions = [
+        comparison for comparison in comparisons if comparison["status"] == "regression"
+    ]
+
+    failures = [
+        comparison
+        for comparison in comparisons
+        if comparison["status"] in ("failed", "timeout")
+    ]
+
+    print()
+    print(
+        "{} of {} stages regressed by more than {:.0f}%".format(
+            len(regressions), len(comparisons) - len(failures), 100.0 * threshold
+        )
+    )
+
+    if len(failures) > 0:
+        print("{} scripts failed or timed out".format(len(failures)))
+
+    if output_file is not None:
+        profiling_util.output_summaries_to_csv(
+            summaries=comparisons, file_path=output_file
+        )
+
+    return comparisons
+
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(
+        description="Compare the run-times of two runs of the PyAutoLens profiling suites."
+    )
+    parser.add_argument(
+        "baseline",
+        nargs="?",
+        default="previous",
+        help="The baseline run (default: the run before the current run).",
+    )
+    parser.add_argument(
+        "current",
+        nargs="?",
+        default="latest",
+        help="The current run (default: the newest stored run).",
+    )
+    parser.add_argument(
+        "--store_path",
+        default=store_util.default_store_path,
+        help="The folder of the profiling results store (default: output/profiling/store).",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="The fractional slow down above which a stage is flagged (default: 0.1).",
+    )
+    parser.add_argument(
+        "--sigma",
+        type=float,
+        default=3.0,
+        help="The number of standard deviations of timing noise a slow down must exceed (default: 3.0).",
+    )
+    parser.add_argument(
+        "--stages", nargs="*", default=None, help="Only compare these stages."
+    )
+    parser.add_argument(
+        "--output_file", default=None, help="Output the comparison to this .csv file."
+    )
+
+    args = parser.parse_args(args=args)
+
+    comparisons = compare(
+        baseline=args.baseline,
+        current=args.current,
+        store_path=args.store_path,
+        threshold=args.threshold,
+        sigma=args.sigma,
+        stages=args.stages,
+        output_file=args.output_file,
+    )
+
+    if any(
+        comparison["status"] in ("regression", "failed", "timeout")
+        for comparison in comparisons
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
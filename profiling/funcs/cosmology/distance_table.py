@@ -0,0 +1,126 @@
+import autolens as al
+
+from astropy import cosmology as cosmo
+
+import numpy as np
+
+from profiling import profiling_util
+from tools.cosmology import distance_table
+
+"""
+Profiles the cosmological calculations of tracers and mass profiles using astropy compared with the interpolated
+distance tables of 'tools/cosmology/distance_table.py', for a two-plane tracer and a multi-plane tracer with
+line-of-sight galaxies.
+
+The traced grids are of a few positions, such that the run time is dominated by the scaling factors between planes
+rather than the deflection angles.
+"""
+
+profiler = profiling_util.Profiler(name="funcs/cosmology/distance_table", repeats=10)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+lens_galaxy = al.Galaxy(
+    redshift=0.5,
+    mass=al.mp.EllipticalIsothermal(
+        centre=(0.0, 0.0), einstein_radius=1.6, axis_ratio=0.7, phi=45.0
+    ),
+)
+
+source_galaxy = al.Galaxy(
+    redshift=1.0,
+    light=al.lp.EllipticalSersic(
+        centre=(0.1, 0.1),
+        axis_ratio=0.8,
+        phi=60.0,
+        intensity=1.0,
+        effective_radius=1.0,
+        sersic_index=2.5,
+    ),
+)
+
+line_of_sight_galaxies = [
+    al.Galaxy(
+        redshift=redshift,
+        mass=al.mp.SphericalIsothermal(centre=(1.0, -1.0), einstein_radius=0.05),
+    )
+    for redshift in [0.1, 0.2, 0.3, 0.4, 0.6, 0.7, 0.8, 0.9]
+]
+
+galaxies_of_tracers = {
+    "two_planes": [lens_galaxy, source_galaxy],
+    "multi_plane": [lens_galaxy, source_galaxy] + line_of_sight_galaxies,
+}
+
+grid = al.grid_irregular.manual_1d(grid=[[1.0, 1.0], [-1.0, 0.5], [0.3, 0.2]])
+
+for _ in profiler.timed(stage="distance_table"):
+    distance_table.DistanceTable(cosmology=cosmo.Planck15)
+
+print(
+    "Maximum fractional difference of distance table from astropy = {:.2e}\n".format(
+        distance_table.DistanceTable(
+            cosmology=cosmo.Planck15
+        ).fractional_error_from_redshifts(redshifts=np.linspace(0.01, 10.0, 100))
+    )
+)
+
+results = {}
+
+for method in ["astropy", "distance_tables"]:
+
+    distance_table.use_distance_tables(use=method == "distance_tables")
+
+    for tracer_name, galaxies in galaxies_of_tracers.items():
+
+        profiler.case = method + "_" + tracer_name
+
+        for _ in profiler.timed(stage="tracer_from_galaxies"):
+            tracer = al.Tracer.from_galaxies(galaxies=galaxies)
+
+        for _ in profiler.timed(stage="traced_grids"):
+            traced_grids = tracer.traced_grids_of_planes_from_grid(grid=grid)
+
+        results[(method, tracer_name)] = traced_grids[-1]
+
+    profiler.case = method
+
+    for _ in profiler.timed(stage="critical_surface_density"):
+        critical_surface_density = tracer.critical_surface_density_between_planes_in_units(
+            i=0, j=-1, unit_length="arcsec", unit_mass="solMass"
+        )
+
+    for _ in profiler.timed(stage="mass_within_circle"):
+        mass = lens_galaxy.mass.mass_within_circle_in_units(
+            radius=al.dim.Length(1.0, "arcsec"),
+            unit_mass="solMass",
+            redshift_object=0.5,
+            redshift_source=1.0,
+        )
+
+    results[(method, "mass")] = mass
+
+distance_table.use_distance_tables(use=False)
+
+print(
+    "Maximum traced grid difference = {:.2e}".format(
+        max(
+            np.max(
+                np.abs(
+                    results[("astropy", tracer_name)]
+                    - results[("distance_tables", tracer_name)]
+                )
+            )
+            for tracer_name in galaxies_of_tracers
+        )
+    )
+)
+print(
+    "Fractional mass difference = {:.2e}\n".format(
+        results[("distance_tables", "mass")] / results[("astropy", "mass")] - 1.0
+    )
+)
+
+profiler.output()
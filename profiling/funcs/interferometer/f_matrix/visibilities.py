@@ -8,6 +8,9 @@ import numpy as np
 
 import pytest
 
+from profiling import profiling_util
+from tools.inversion import inversion_util
+
 
 @numba.jit(nopython=True, cache=False, parallel=True)
 def curvature_matrix_from_transformed_mapping_matrix(
@@ -133,9 +136,15 @@ source_galaxy = al.Galaxy(
 tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
 
 
-repeats = 1
+# The GFLOP/s of every curvature matrix calculation is reported, which can be disabled by setting the
+# PROFILING_GFLOPS environment variable to 0.
+
+profiler = profiling_util.Profiler(
+    name="funcs/interferometer/f_matrix/visibilities", repeats=1, report_gflops=True
+)
 
-print("Number of repeats = ", repeats)
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
 
 for total_visibilities in [
     100,
@@ -201,11 +210,39 @@ for total_visibilities in [
             real_curvature_matrix_edit, 1.0e-4
         )
 
-    start = time.time()
-    for i in range(repeats):
+    profiler.case = str(total_visibilities)
+
+    # Every kernel computes the symmetric curvature matrix, whose pixels * (pixels + 1) / 2 unique entries are each a
+    # sum of a multiply-add over every visibility.
+
+    flops = total_visibilities * mapper.pixels * (mapper.pixels + 1)
+
+    if total_visibilities <= 10000:
+
+        for _ in profiler.timed(stage="numba", flops=flops):
+            curvature_matrix_from_transformed_mapping_matrix(
+                transformed_mapping_matrix=transformed_mapping_matrices[0],
+                noise_map=masked_interferometer.noise_map[:, 0],
+            )
+
+        for _ in profiler.timed(stage="numba_edit", flops=flops):
+            curvature_matrix_from_transformed_mapping_matrix_edit(
+                transformed_mapping_matrix=transformed_mapping_matrices[0],
+                noise_map=masked_interferometer.noise_map[:, 0],
+            )
+
+    for _ in profiler.timed(stage="numpy_dot", flops=flops):
         real_curvature_matrix = curvature_matrix_from_transformed_mapping_matrix_updated(
             transformed_mapping_matrix=transformed_mapping_matrices[0],
             noise_map=masked_interferometer.noise_map[:, 0],
         )
-    diff = time.time() - start
-    print("Time to compute curvature matrix = {}".format(2.0 * diff / repeats))
+
+    for _ in profiler.timed(stage="blas_blocked", flops=flops):
+        real_curvature_matrix_blas = inversion_util.curvature_matrix_via_blocked_gram_from(
+            transformed_mapping_matrices=[transformed_mapping_matrices[0]],
+            noise_maps=[masked_interferometer.noise_map[:, 0]],
+        )
+
+    assert real_curvature_matrix == pytest.approx(real_curvature_matrix_blas, 1.0e-4)
+
+profiler.output()
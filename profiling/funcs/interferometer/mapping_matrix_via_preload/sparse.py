@@ -0,0 +1,145 @@
+import autolens as al
+
+import numpy as np
+
+from profiling import profiling_util
+from tools.interferometer import transformer
+
+"""
+Compares the run-time of the transformed mapping matrices computed from the dense mapping matrix of a mapper (with the
+autoarray *Transformer* and the *TransformerFused*) with those computed from the mapper's sub-pixel to source-pixel
+mappings in compressed sparse column form (see *TransformerFused.transformed_mapping_matrices_from_mapper*), for
+rectangular and Voronoi pixelizations of increasing numbers of source pixels.
+
+The dense mapping matrix is mostly zeros, so the sparse transform skips the (image_pixels x source_pixels) loop over
+its entries, and this saving grows with the number of source pixels.
+"""
+
+profiler = profiling_util.Profiler(
+    name="funcs/interferometer/mapping_matrix_via_preload/sparse", repeats=3
+)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+real_space_shape_2d = (151, 151)
+real_space_pixel_scales = 0.05
+real_space_sub_size = 2
+real_space_radius = 3.0
+
+real_space_mask = al.mask.circular(
+    shape_2d=real_space_shape_2d,
+    pixel_scales=real_space_pixel_scales,
+    radius=real_space_radius,
+    sub_size=real_space_sub_size,
+)
+
+print("Real space sub grid size = " + str(real_space_sub_size))
+print("Real space circular mask radius = " + str(real_space_radius) + "\n")
+
+lens_galaxy = al.Galaxy(
+    redshift=0.5,
+    mass=al.mp.EllipticalIsothermal(
+        centre=(0.0, 0.0), einstein_radius=1.6, axis_ratio=0.7, phi=45.0
+    ),
+)
+
+pixelizations = [
+    al.pix.Rectangular(shape=(20, 20)),
+    al.pix.Rectangular(shape=(40, 40)),
+    al.pix.Rectangular(shape=(60, 60)),
+    al.pix.VoronoiMagnification(shape=(20, 20)),
+    al.pix.VoronoiMagnification(shape=(30, 30)),
+    al.pix.VoronoiMagnification(shape=(40, 40)),
+]
+
+for total_visibilities in [1000, 5000]:
+
+    print()
+    print("########################")
+    print()
+    print("Number of visibilities = " + str(total_visibilities) + "\n")
+
+    uv_wavelengths = np.random.uniform(
+        low=-1.0e5, high=1.0e5, size=(total_visibilities, 2)
+    )
+
+    interferometer = al.interferometer(
+        visibilities=al.visibilities.ones(shape_1d=(total_visibilities,)),
+        noise_map=al.visibilities.ones(shape_1d=(total_visibilities,)),
+        uv_wavelengths=uv_wavelengths,
+    )
+
+    masked_interferometer = al.masked.interferometer(
+        interferometer=interferometer,
+        real_space_mask=real_space_mask,
+        visibilities_mask=np.full(fill_value=False, shape=(total_visibilities,)),
+    )
+
+    print("Number of points = " + str(masked_interferometer.grid.shape_1d) + "\n")
+
+    fused_transformer = transformer.TransformerFused(
+        uv_wavelengths=uv_wavelengths,
+        grid_radians=masked_interferometer.grid.in_radians,
+    )
+
+    for pixelization in pixelizations:
+
+        source_galaxy = al.Galaxy(
+            redshift=1.0,
+            pixelization=pixelization,
+            regularization=al.reg.Constant(coefficient=1.0),
+        )
+
+        tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
+
+        mapper = tracer.mappers_of_planes_from_grid(
+            grid=masked_interferometer.grid, inversion_uses_border=True
+        )[-1]
+
+        profiler.case = "{}_{}x{}_{}".format(
+            pixelization.__class__.__name__,
+            pixelization.shape[0],
+            pixelization.shape[1],
+            total_visibilities,
+        )
+
+        print(profiler.case + " (source pixels = " + str(mapper.pixels) + ")")
+
+        mapping_matrix = mapper.mapping_matrix
+
+        for _ in profiler.timed(stage="mapping_matrix"):
+            mapper.mapping_matrix
+
+        for _ in profiler.timed(stage="dense"):
+            masked_interferometer.transformer.transformed_mapping_matrices_from_mapping_matrix(
+                mapping_matrix=mapping_matrix
+            )
+
+        for _ in profiler.timed(stage="dense_fused"):
+            fused_transformer.transformed_mapping_matrices_from_mapping_matrix(
+                mapping_matrix=mapping_matrix
+            )
+
+        for _ in profiler.timed(stage="sparse_fused"):
+            sparse_transformed_mapping_matrices = fused_transformer.transformed_mapping_matrices_from_mapper(
+                mapper=mapper
+            )
+
+        dense_transformed_mapping_matrices = masked_interferometer.transformer.transformed_mapping_matrices_from_mapping_matrix(
+            mapping_matrix=mapping_matrix
+        )
+
+        assert np.allclose(
+            sparse_transformed_mapping_matrices[0],
+            dense_transformed_mapping_matrices[0],
+        )
+        assert np.allclose(
+            sparse_transformed_mapping_matrices[1],
+            dense_transformed_mapping_matrices[1],
+        )
+
+        print()
+
+profiler.output()
@@ -0,0 +1,93 @@
+import autolens as al
+
+import shutil
+import tempfile
+
+import numpy as np
+
+from profiling import profiling_util
+from tools.interferometer import transformer
+
+"""
+Profiles the *TransformerCached*, comparing the time to compute the preloaded transforms and store them in the cache
+(which happens once per dataset) with the time to open them from the cache (which happens in every later phase and
+process), and the time of the Fourier transform using the memory mapped transforms with the in-memory transforms.
+"""
+
+profiler = profiling_util.Profiler(
+    name="funcs/interferometer/transforms/visibilities_via_preload_cached", repeats=3
+)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+real_space_shape_2d = (151, 151)
+real_space_pixel_scales = 0.05
+real_space_radius = 3.0
+
+real_space_mask = al.mask.circular(
+    shape_2d=real_space_shape_2d,
+    pixel_scales=real_space_pixel_scales,
+    radius=real_space_radius,
+)
+
+real_space_grid = al.grid.from_mask(mask=real_space_mask)
+real_space_grid_radians = real_space_grid.in_radians
+
+print("Real space circular mask radius = " + str(real_space_radius) + "\n")
+print("Number of points = " + str(real_space_grid.sub_shape_1d) + "\n")
+
+image = al.masked.array.manual_1d(
+    array=np.random.uniform(size=real_space_grid.sub_shape_1d), mask=real_space_mask
+)
+
+cache_path = tempfile.mkdtemp()
+
+for total_visibilities in [100, 1000, 5000, 10000]:
+
+    print()
+    print("########################")
+    print()
+    print("Number of visibilities = " + str(total_visibilities) + "\n")
+
+    profiler.case = str(total_visibilities)
+
+    uv_wavelengths = np.random.uniform(
+        low=-1.0e5, high=1.0e5, size=(total_visibilities, 2)
+    )
+
+    for _ in profiler.timed(stage="preload"):
+        in_memory_transformer = al.transformer(
+            uv_wavelengths=uv_wavelengths, grid_radians=real_space_grid_radians
+        )
+
+    for _ in profiler.timed(stage="cache_store"):
+        shutil.rmtree(cache_path)
+        transformer.TransformerCached(
+            uv_wavelengths=uv_wavelengths,
+            grid_radians=real_space_grid_radians,
+            cache_path=cache_path,
+        )
+
+    for _ in profiler.timed(stage="cache_load"):
+        cached_transformer = transformer.TransformerCached(
+            uv_wavelengths=uv_wavelengths,
+            grid_radians=real_space_grid_radians,
+            cache_path=cache_path,
+        )
+
+    for _ in profiler.timed(stage="real_visibilities_preload"):
+        in_memory_transformer.real_visibilities_from_image(image=image)
+
+    for _ in profiler.timed(stage="real_visibilities_cached"):
+        cached_transformer.real_visibilities_from_image(image=image)
+
+    assert (
+        cached_transformer.real_visibilities_from_image(image=image)
+        == in_memory_transformer.real_visibilities_from_image(image=image)
+    ).all()
+
+shutil.rmtree(cache_path)
+
+profiler.output()
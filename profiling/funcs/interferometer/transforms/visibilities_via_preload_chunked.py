@@ -0,0 +1,128 @@
+import autolens as al
+
+import numpy as np
+
+from profiling import profiling_util
+from tools.interferometer import transformer
+
+"""
+Profiles the *TransformerChunked*, which preloads the real and imaginary transforms in chunks of visibilities up to
+a memory budget and computes the transforms of the remaining visibilities directly. This means datasets with many
+more visibilities than 'visibilities_via_preload.py' can be profiled, as the preloaded transforms of all visibilities
+do not need to fit in memory.
+"""
+
+profiler = profiling_util.Profiler(
+    name="funcs/interferometer/transforms/visibilities_via_preload_chunked", repeats=3
+)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+real_space_shape_2d = (151, 151)
+real_space_pixel_scales = 0.05
+real_space_sub_size = 1
+real_space_radius = 3.0
+
+memory_budget = 4.0
+
+real_space_mask = al.mask.circular(
+    shape_2d=real_space_shape_2d,
+    pixel_scales=real_space_pixel_scales,
+    radius=real_space_radius,
+)
+
+real_space_grid = al.grid.from_mask(mask=real_space_mask)
+real_space_grid_radians = real_space_grid.in_radians
+
+print("Real space sub grid size = " + str(real_space_sub_size))
+print("Real space circular mask radius = " + str(real_space_radius) + "\n")
+print("Number of points = " + str(real_space_grid.sub_shape_1d) + "\n")
+print("Memory budget (GB) = " + str(memory_budget) + "\n")
+
+lens_galaxy = al.Galaxy(
+    redshift=0.5,
+    mass=al.mp.EllipticalIsothermal(
+        centre=(0.0, 0.0), einstein_radius=1.6, axis_ratio=0.7, phi=45.0
+    ),
+)
+
+source_galaxy = al.Galaxy(
+    redshift=1.0,
+    light=al.lp.EllipticalSersic(
+        centre=(0.0, 0.0),
+        axis_ratio=0.8,
+        phi=60.0,
+        intensity=0.4,
+        effective_radius=0.5,
+        sersic_index=1.0,
+    ),
+)
+
+tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
+
+profile_image = tracer.profile_image_from_grid(grid=real_space_grid)
+
+for total_visibilities in [
+    100,
+    1000,
+    5000,
+    10000,
+    25000,
+    50000,
+    100000,
+    500000,
+    1000000,
+    2000000,
+]:
+
+    print()
+    print("########################")
+    print()
+    print("Number of visibilities = " + str(total_visibilities) + "\n")
+
+    profiler.case = str(total_visibilities)
+
+    uv_wavelengths = np.random.uniform(
+        low=-1.0e5, high=1.0e5, size=(total_visibilities, 2)
+    )
+
+    for _ in profiler.timed(stage="preload"):
+        chunked_transformer = transformer.TransformerChunked(
+            uv_wavelengths=uv_wavelengths,
+            grid_radians=real_space_grid_radians,
+            memory_budget=memory_budget,
+        )
+
+    print(
+        "Preloaded chunks = {} of {}".format(
+            chunked_transformer.total_preloaded_chunks, len(chunked_transformer.chunks)
+        )
+    )
+    print("PreLoad Memory Use (GB) = " + str(chunked_transformer.preload_memory))
+
+    for _ in profiler.timed(stage="real_visibilities"):
+        chunked_transformer.real_visibilities_from_image(image=profile_image)
+
+    for _ in profiler.timed(stage="imag_visibilities"):
+        chunked_transformer.imag_visibilities_from_image(image=profile_image)
+
+    if total_visibilities <= 10000:
+
+        preloaded_real_transforms = al.util.transformer.preload_real_transforms(
+            grid_radians=real_space_grid_radians.in_1d_binned,
+            uv_wavelengths=uv_wavelengths,
+        )
+
+        real_visibilities = al.util.transformer.real_visibilities_from_image_via_preload_jit(
+            image_1d=profile_image.in_1d_binned,
+            preloaded_reals=preloaded_real_transforms,
+        )
+
+        assert (
+            chunked_transformer.real_visibilities_from_image(image=profile_image)
+            == real_visibilities
+        ).all()
+
+profiler.output()
@@ -0,0 +1,125 @@
+import autolens as al
+
+import numpy as np
+
+from profiling import profiling_util
+from tools.interferometer import uv_util
+
+"""
+Profiles the reduction of an interferometer dataset with redundant uv-coverage (see 'tools/interferometer/uv_util.py'),
+comparing the time of the Fourier transforms and transformed mapping matrices of the original and reduced datasets.
+
+The simulated uv-coverage observes every baseline *observations_per_baseline* times, half of the times at its
+conjugate (-u,-v) coordinate, mimicking the redundancy of a real dataset.
+"""
+
+profiler = profiling_util.Profiler(
+    name="funcs/interferometer/transforms/visibilities_via_reduced_uv", repeats=3
+)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+real_space_shape_2d = (151, 151)
+real_space_pixel_scales = 0.05
+real_space_radius = 3.0
+source_pixels = 500
+
+observations_per_baseline = 4
+
+real_space_mask = al.mask.circular(
+    shape_2d=real_space_shape_2d,
+    pixel_scales=real_space_pixel_scales,
+    radius=real_space_radius,
+)
+
+real_space_grid = al.grid.from_mask(mask=real_space_mask)
+real_space_grid_radians = real_space_grid.in_radians
+
+print("Real space circular mask radius = " + str(real_space_radius) + "\n")
+print("Number of points = " + str(real_space_grid.sub_shape_1d) + "\n")
+print("Observations per baseline = " + str(observations_per_baseline) + "\n")
+
+image = al.masked.array.manual_1d(
+    array=np.random.uniform(size=real_space_grid.sub_shape_1d), mask=real_space_mask
+)
+
+mapping_matrix = np.zeros(shape=(real_space_grid.sub_shape_1d, source_pixels))
+mapping_matrix[
+    np.arange(real_space_grid.sub_shape_1d),
+    np.random.randint(source_pixels, size=real_space_grid.sub_shape_1d),
+] = 1.0
+
+for total_visibilities in [1000, 5000, 10000]:
+
+    print()
+    print("########################")
+    print()
+    print("Number of visibilities = " + str(total_visibilities) + "\n")
+
+    profiler.case = str(total_visibilities)
+
+    baselines = np.random.uniform(
+        low=-1.0e5,
+        high=1.0e5,
+        size=(total_visibilities // observations_per_baseline, 2),
+    )
+
+    uv_wavelengths = np.concatenate(
+        [
+            baselines if observation % 2 == 0 else -baselines
+            for observation in range(observations_per_baseline)
+        ]
+    )
+
+    interferometer = al.interferometer(
+        visibilities=al.visibilities.manual_1d(
+            visibilities=np.random.normal(size=uv_wavelengths.shape)
+        ),
+        noise_map=al.visibilities.manual_1d(
+            visibilities=np.ones(shape=uv_wavelengths.shape)
+        ),
+        uv_wavelengths=uv_wavelengths,
+    )
+
+    for _ in profiler.timed(stage="reduce"):
+        (
+            reduced_interferometer,
+            reduced_indexes,
+            conjugates,
+        ) = uv_util.reduced_interferometer_from(interferometer=interferometer)
+
+    print(
+        "Reduced visibilities = "
+        + str(reduced_interferometer.visibilities.shape[0])
+        + "\n"
+    )
+
+    original_transformer = al.transformer(
+        uv_wavelengths=interferometer.uv_wavelengths,
+        grid_radians=real_space_grid_radians,
+    )
+
+    reduced_transformer = al.transformer(
+        uv_wavelengths=reduced_interferometer.uv_wavelengths,
+        grid_radians=real_space_grid_radians,
+    )
+
+    for _ in profiler.timed(stage="visibilities_original"):
+        original_transformer.visibilities_from_image(image=image)
+
+    for _ in profiler.timed(stage="visibilities_reduced"):
+        reduced_transformer.visibilities_from_image(image=image)
+
+    for _ in profiler.timed(stage="transformed_mapping_matrices_original"):
+        original_transformer.transformed_mapping_matrices_from_mapping_matrix(
+            mapping_matrix=mapping_matrix
+        )
+
+    for _ in profiler.timed(stage="transformed_mapping_matrices_reduced"):
+        reduced_transformer.transformed_mapping_matrices_from_mapping_matrix(
+            mapping_matrix=mapping_matrix
+        )
+
+profiler.output()
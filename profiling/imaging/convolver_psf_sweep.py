@@ -0,0 +1,171 @@
+import autolens as al
+
+from profiling import profiling_util
+from profiling.imaging.simulator import simulate_util
+from tools.imaging import convolver
+
+import numpy as np
+
+"""
+Profiles the PSF convolution of a model image and a mapping matrix by the real-space autoarray *Convolver* compared
+with the separable and FFT convolvers in 'tools/imaging/convolver.py', for PSF sizes from 5x5 to 51x51, and reports
+which method the *ConvolverAuto* chooses for each.
+
+Every other imaging profiling script uses an 11x11 PSF, for which the real-space convolution is fast, whereas its run
+time increases with the square of the PSF width. Both a circular Gaussian PSF, which is exactly separable, and an
+elliptical Gaussian PSF, which is not, are profiled.
+"""
+
+profiler = profiling_util.Profiler(name="imaging/convolver_psf_sweep", repeats=10)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+sub_size = 2
+radius = 3.0
+psf_sizes = [5, 11, 21, 31, 41, 51]
+pixelization_shape_2d = (20, 20)
+
+print("sub grid size = " + str(sub_size))
+print("circular mask radius = " + str(radius) + "\n")
+print("psf sizes = " + str(psf_sizes) + "\n")
+print("pixelization shape = " + str(pixelization_shape_2d) + "\n")
+
+lens_galaxy = al.Galaxy(
+    redshift=0.5,
+    mass=al.mp.EllipticalIsothermal(
+        centre=(0.0, 0.0), einstein_radius=1.6, axis_ratio=0.7, phi=45.0
+    ),
+)
+
+source_galaxy = al.Galaxy(
+    redshift=1.0,
+    light=al.lp.EllipticalSersic(
+        centre=(0.1, 0.1),
+        axis_ratio=0.8,
+        phi=60.0,
+        intensity=0.3,
+        effective_radius=1.0,
+        sersic_index=2.5,
+    ),
+)
+
+tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
+
+pixelization = al.pix.Rectangular(shape=pixelization_shape_2d)
+
+for data_resolution in ["hst", "hst_up"]:
+
+    imaging = simulate_util.load_test_imaging(
+        data_type="lens_sie__source_smooth", data_resolution=data_resolution
+    )
+
+    mask = al.mask.circular(
+        shape_2d=imaging.shape_2d,
+        pixel_scales=imaging.pixel_scales,
+        sub_size=sub_size,
+        radius=radius,
+    )
+
+    masked_imaging = al.masked.imaging(imaging=imaging, mask=mask)
+
+    print("Convolver run times for image type " + data_resolution + "\n")
+    print("Number of image pixels = " + str(mask.pixels_in_mask) + "\n")
+
+    image = tracer.profile_image_from_grid(grid=masked_imaging.grid)
+
+    traced_grid = tracer.traced_grids_of_planes_from_grid(grid=masked_imaging.grid)[-1]
+
+    mapping_matrix = pixelization.mapper_from_grid_and_sparse_grid(
+        grid=traced_grid, inversion_uses_border=True
+    ).mapping_matrix
+
+    for psf_size in psf_sizes:
+
+        psfs = {
+            "gaussian": al.kernel.from_gaussian(
+                shape_2d=(psf_size, psf_size),
+                pixel_scales=imaging.pixel_scales,
+                sigma=psf_size * imaging.pixel_scales[0] / 6.0,
+            ),
+            "elliptical": al.kernel.from_gaussian(
+                shape_2d=(psf_size, psf_size),
+                pixel_scales=imaging.pixel_scales,
+                sigma=psf_size * imaging.pixel_scales[0] / 6.0,
+                axis_ratio=0.7,
+                phi=45.0,
+            ),
+        }
+
+        # The blurring image is the light outside the mask which is blurred into it, so depends on the PSF size.
+
+        blurring_image = tracer.profile_image_from_grid(
+            grid=masked_imaging.grid.blurring_grid_from_kernel_shape(
+                kernel_shape_2d=(psf_size, psf_size)
+            )
+        )
+
+        for psf_name, psf in psfs.items():
+
+            profiler.case = data_resolution + "_" + psf_name + "_" + str(psf_size)
+
+            real_space_convolver = convolver.ConvolverAuto(
+                mask=mask, kernel=psf, methods=("real_space",)
+            )
+
+            blurred_image = real_space_convolver.convolved_image_from_image_and_blurring_image(
+                image=image, blurring_image=blurring_image
+            )
+            blurred_mapping_matrix = real_space_convolver.convolve_mapping_matrix(
+                mapping_matrix=mapping_matrix
+            )
+
+            print(
+                "PSF "
+                + psf_name
+                + " "
+                + str(psf.shape_2d)
+                + ", separable ranks = "
+                + str(real_space_convolver.separable_ranks)
+            )
+
+            for method in ["real_space", "separable", "fft", "auto"]:
+
+                if method == "auto":
+                    method_convolver = convolver.ConvolverAuto(mask=mask, kernel=psf)
+                else:
+                    method_convolver = convolver.ConvolverAuto(
+                        mask=mask, kernel=psf, methods=(method,)
+                    )
+
+                for _ in profiler.timed(stage=method + "_image"):
+                    method_blurred_image = method_convolver.convolved_image_from_image_and_blurring_image(
+                        image=image, blurring_image=blurring_image
+                    )
+
+                for _ in profiler.timed(stage=method + "_mapping_matrix"):
+                    method_blurred_mapping_matrix = method_convolver.convolve_mapping_matrix(
+                        mapping_matrix=mapping_matrix
+                    )
+
+                print(
+                    "    "
+                    + method
+                    + ": image method = "
+                    + method_convolver.image_method
+                    + ", mapping matrix method = "
+                    + method_convolver.mapping_matrix_method
+                    + ", maximum image difference = {:.2e}, maximum mapping matrix difference = {:.2e}".format(
+                        np.max(np.abs(method_blurred_image - blurred_image)),
+                        np.max(
+                            np.abs(
+                                method_blurred_mapping_matrix - blurred_mapping_matrix
+                            )
+                        ),
+                    )
+                )
+
+            print()
+
+profiler.output()
@@ -0,0 +1,96 @@
+import autolens as al
+
+from profiling import profiling_util
+from profiling.imaging.simulator import simulate_util
+from tools.interpolation import deflection_interpolation
+
+"""
+Profiles the deflection angles of mass profiles whose deflection angles are numerical integrals, computed at every
+coordinate of a masked imaging dataset's sub-grid compared with interpolated from a *DeflectionInterpolator* (see
+'tools/interpolation/deflection_interpolation.py'), whose interpolation grid is chosen to meet a maximum deflection
+angle error.
+"""
+
+profiler = profiling_util.Profiler(name="imaging/deflection_interpolation", repeats=3)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+sub_size = 4
+radius = 3.0
+max_deflection_error = 1.0e-3
+
+print("sub grid size = " + str(sub_size))
+print("circular mask radius = " + str(radius) + "\n")
+print("maximum deflection angle error = " + str(max_deflection_error) + "\n")
+
+mass_profiles = {
+    "nfw": al.mp.EllipticalNFW(
+        centre=(0.0, 0.0), axis_ratio=0.8, phi=45.0, kappa_s=0.2, scale_radius=10.0
+    ),
+    "broken_power_law": al.mp.EllipticalBrokenPowerLaw(
+        centre=(0.0, 0.0),
+        axis_ratio=0.3,
+        phi=45.0,
+        einstein_radius=1.3,
+        inner_slope=1.5,
+        outer_slope=2.5,
+        break_radius=0.5,
+    ),
+    "sersic_mlr": al.mp.EllipticalSersic(
+        centre=(0.0, 0.0),
+        axis_ratio=0.7,
+        phi=60.0,
+        intensity=0.2,
+        effective_radius=0.8,
+        sersic_index=4.0,
+        mass_to_light_ratio=0.3,
+    ),
+}
+
+for data_resolution in ["lsst", "euclid", "hst"]:
+
+    imaging = simulate_util.load_test_imaging(
+        data_type="lens_sie__source_smooth", data_resolution=data_resolution
+    )
+
+    mask = al.mask.circular(
+        shape_2d=imaging.shape_2d,
+        pixel_scales=imaging.pixel_scales,
+        sub_size=sub_size,
+        radius=radius,
+    )
+
+    masked_imaging = al.masked.imaging(imaging=imaging, mask=mask)
+
+    print("Deflection interpolation run times for image type " + data_resolution + "\n")
+    print("Number of points = " + str(masked_imaging.grid.sub_shape_1d) + "\n")
+
+    profiler.case = data_resolution
+
+    for name, mass_profile in mass_profiles.items():
+
+        interpolator = deflection_interpolation.DeflectionInterpolator.from_mass_profile_and_grid(
+            mass_profile=mass_profile,
+            grid=masked_imaging.grid,
+            max_deflection_error=max_deflection_error,
+        )
+
+        print(
+            deflection_interpolation.summary_from_interpolator(
+                interpolator=interpolator, mass_profile=mass_profile
+            )
+            + "\n"
+        )
+
+        for _ in profiler.timed(stage=name + "_deflections"):
+            deflection_interpolation.exact_deflections_from_mass_profile_and_grid(
+                mass_profile=mass_profile, grid=masked_imaging.grid
+            )
+
+        if interpolator is not None:
+            for _ in profiler.timed(stage=name + "_interpolated_deflections"):
+                interpolator.deflections_from_mass_profile(mass_profile=mass_profile)
+
+profiler.output()
@@ -0,0 +1,100 @@
+import autolens as al
+
+from profiling import profiling_util
+from profiling.imaging.simulator import simulate_util
+from tools.inversion import regularization_sweep
+
+import numpy as np
+
+"""
+Profiles the evidence of a VoronoiMagnification inversion for many coefficients of its Constant regularization with a
+fixed lens model, comparing a fit for every coefficient with the *RegularizationSweep* (see
+'tools/inversion/regularization_sweep.py'), which decomposes the curvature and regularization matrices once.
+"""
+
+profiler = profiling_util.Profiler(
+    name="imaging/inversion_regularization_sweep", repeats=3
+)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+sub_size = 4
+radius = 3.6
+psf_shape_2d = (11, 11)
+pixelization_shape_2d = (30, 30)
+coefficients = np.logspace(-2.0, 2.0, 50)
+
+print("sub grid size = " + str(sub_size))
+print("circular mask radius = " + str(radius) + "\n")
+print("psf shape = " + str(psf_shape_2d) + "\n")
+print("pixelization shape = " + str(pixelization_shape_2d) + "\n")
+print("Number of coefficients = " + str(len(coefficients)) + "\n")
+
+lens_galaxy = al.Galaxy(
+    redshift=0.5,
+    mass=al.mp.EllipticalIsothermal(
+        centre=(0.0, 0.0), einstein_radius=1.6, axis_ratio=0.7, phi=45.0
+    ),
+)
+
+pixelization = al.pix.VoronoiMagnification(shape=pixelization_shape_2d)
+
+for data_resolution in ["lsst", "euclid", "hst"]:
+
+    imaging = simulate_util.load_test_imaging(
+        data_type="lens_sie__source_smooth",
+        data_resolution=data_resolution,
+        psf_shape_2d=psf_shape_2d,
+    )
+
+    mask = al.mask.circular(
+        shape_2d=imaging.shape_2d,
+        pixel_scales=imaging.pixel_scales,
+        sub_size=sub_size,
+        radius=radius,
+    )
+
+    masked_imaging = al.masked.imaging(imaging=imaging, mask=mask)
+
+    print("Regularization sweep run times for image type " + data_resolution + "\n")
+    print("Number of points = " + str(masked_imaging.grid.sub_shape_1d) + "\n")
+
+    profiler.case = data_resolution
+
+    tracers = [
+        al.Tracer.from_galaxies(
+            galaxies=[
+                lens_galaxy,
+                al.Galaxy(
+                    redshift=1.0,
+                    pixelization=pixelization,
+                    regularization=al.reg.Constant(coefficient=coefficient),
+                ),
+            ]
+        )
+        for coefficient in coefficients
+    ]
+
+    for _ in profiler.timed(stage="fits"):
+        evidences = [
+            al.fit(masked_dataset=masked_imaging, tracer=tracer).evidence
+            for tracer in tracers
+        ]
+
+    for _ in profiler.timed(stage="sweep_setup"):
+        sweep = regularization_sweep.RegularizationSweep.from_masked_imaging_and_tracer(
+            masked_imaging=masked_imaging, tracer=tracers[0]
+        )
+
+    for _ in profiler.timed(stage="sweep_evidences"):
+        sweep_evidences = sweep.evidences_from_coefficients(coefficients=coefficients)
+
+    print(
+        "Maximum evidence difference = "
+        + str(np.max(np.abs(sweep_evidences - np.asarray(evidences))))
+        + "\n"
+    )
+
+profiler.output()
@@ -0,0 +1,179 @@
+import autolens as al
+from autoarray.operators.inversion import inversions as inv
+
+from profiling import profiling_util
+from profiling.imaging.simulator import simulate_util
+from tools.inversion import inversion_util, inversions, sparse_util
+
+import numpy as np
+
+"""
+Profiles the dense and sparse solves of an imaging inversion, as the number of source pixels increases to beyond the
+'inversion_pixel_limit_overall' of the config (3000 pixels). The dense solve is the autoarray one, which solves for the
+reconstruction and computes the log determinants of F + H and H with dense O(pixels^3) factorizations. The sparse
+solve is the one of the *InversionImagingSparse* (see 'tools/inversion/sparse_util.py').
+"""
+
+profiler = profiling_util.Profiler(name="imaging/inversion_sparse_fit", repeats=3)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+sub_size = 2
+radius = 3.6
+psf_shape_2d = (11, 11)
+data_resolution = "hst"
+
+print("sub grid size = " + str(sub_size))
+print("circular mask radius = " + str(radius) + "\n")
+print("psf shape = " + str(psf_shape_2d) + "\n")
+
+imaging = simulate_util.load_test_imaging(
+    data_type="lens_sie__source_smooth",
+    data_resolution=data_resolution,
+    psf_shape_2d=psf_shape_2d,
+)
+
+mask = al.mask.circular(
+    shape_2d=imaging.shape_2d,
+    pixel_scales=imaging.pixel_scales,
+    sub_size=sub_size,
+    radius=radius,
+)
+
+masked_imaging = al.masked.imaging(imaging=imaging, mask=mask)
+
+print("Number of points = " + str(masked_imaging.grid.sub_shape_1d) + "\n")
+
+lens_galaxy = al.Galaxy(
+    redshift=0.5,
+    mass=al.mp.EllipticalIsothermal(
+        centre=(0.0, 0.0), einstein_radius=1.6, axis_ratio=0.7, phi=45.0
+    ),
+)
+
+(
+    w_tilde_pointers,
+    w_tilde_indexes,
+    w_tilde_values,
+) = inversion_util.w_tilde_curvature_from(
+    noise_map=masked_imaging.noise_map, convolver=masked_imaging.convolver
+)
+
+w_tilde = sparse_util.w_tilde_sparse_from(
+    w_tilde_pointers=w_tilde_pointers,
+    w_tilde_indexes=w_tilde_indexes,
+    w_tilde_values=w_tilde_values,
+)
+
+for pixelization_shape_2d in [(20, 20), (40, 40), (60, 60)]:
+
+    print()
+    print("########################")
+    print()
+    print("pixelization shape = " + str(pixelization_shape_2d) + "\n")
+
+    profiler.case = str(pixelization_shape_2d[0] * pixelization_shape_2d[1])
+
+    pixelization = al.pix.Rectangular(shape=pixelization_shape_2d)
+
+    regularization = al.reg.Constant(coefficient=1.0)
+
+    source_galaxy = al.Galaxy(
+        redshift=1.0, pixelization=pixelization, regularization=regularization
+    )
+
+    tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
+
+    mapper = tracer.mappers_of_planes_from_grid(
+        grid=masked_imaging.grid, inversion_uses_border=True
+    )[-1]
+
+    image_pointers, pixel_indexes, mapping_values = inversion_util.mapping_rows_from(
+        pixelization_1d_index_for_sub_mask_1d_index=mapper.pixelization_1d_index_for_sub_mask_1d_index,
+        mask_1d_index_for_sub_mask_1d_index=mapper._mask_1d_index_for_sub_mask_1d_index,
+        sub_fraction=mapper.grid.mask.sub_fraction,
+        pixels=mapper.pixels,
+        total_mask_pixels=mapper.grid.mask.pixels_in_mask,
+    )
+
+    data_vector = inversion_util.data_vector_via_w_tilde_data_from(
+        w_tilde_data=inversion_util.w_tilde_data_from(
+            image=np.asarray(masked_imaging.image),
+            noise_map=np.asarray(masked_imaging.noise_map),
+            image_frame_1d_indexes=masked_imaging.convolver.image_frame_1d_indexes,
+            image_frame_1d_kernels=masked_imaging.convolver.image_frame_1d_kernels,
+            image_frame_1d_lengths=masked_imaging.convolver.image_frame_1d_lengths,
+        ),
+        image_pointers=image_pointers,
+        pixel_indexes=pixel_indexes,
+        mapping_values=mapping_values,
+        pixels=mapper.pixels,
+    )
+
+    for _ in profiler.timed(stage="curvature_matrix_w_tilde"):
+        curvature_matrix = inversion_util.curvature_matrix_via_w_tilde_from(
+            w_tilde_pointers=w_tilde_pointers,
+            w_tilde_indexes=w_tilde_indexes,
+            w_tilde_values=w_tilde_values,
+            image_pointers=image_pointers,
+            pixel_indexes=pixel_indexes,
+            mapping_values=mapping_values,
+            pixels=mapper.pixels,
+        )
+
+    regularization_matrix = regularization.regularization_matrix_from_mapper(
+        mapper=mapper
+    )
+
+    curvature_reg_matrix = np.add(curvature_matrix, regularization_matrix)
+
+    for _ in profiler.timed(stage="solve_dense"):
+        np.linalg.solve(curvature_reg_matrix, data_vector)
+        inv.Inversion.log_determinant_of_matrix_cholesky(curvature_reg_matrix)
+        inv.Inversion.log_determinant_of_matrix_cholesky(regularization_matrix)
+
+    for _ in profiler.timed(stage="curvature_matrix_sparse"):
+        curvature_matrix_sparse = sparse_util.curvature_matrix_sparse_from(
+            w_tilde=w_tilde,
+            mapping_matrix=sparse_util.mapping_matrix_sparse_from(
+                image_pointers=image_pointers,
+                pixel_indexes=pixel_indexes,
+                mapping_values=mapping_values,
+                pixels=mapper.pixels,
+            ),
+        )
+
+    for _ in profiler.timed(stage="regularization_matrix_sparse"):
+        regularization_matrix_sparse = sparse_util.regularization_matrix_sparse_from_mapper(
+            regularization=regularization, mapper=mapper
+        )
+
+    print(
+        "Curvature regularization matrix fill = "
+        + str(
+            (curvature_matrix_sparse + regularization_matrix_sparse).nnz
+            / mapper.pixels ** 2
+        )
+        + "\n"
+    )
+
+    for _ in profiler.timed(stage="solve_sparse"):
+        curvature_reg_factor = sparse_util.SparseCholesky(
+            matrix=curvature_matrix_sparse + regularization_matrix_sparse
+        )
+        curvature_reg_factor.solve(data_vector)
+        sparse_util.SparseCholesky(matrix=regularization_matrix_sparse)
+
+    for _ in profiler.timed(stage="fit"):
+        al.fit(masked_dataset=masked_imaging, tracer=tracer)
+
+    inversions.use_inversions(inversion_imaging_class=inversions.InversionImagingSparse)
+
+    for _ in profiler.timed(stage="fit_sparse"):
+        al.fit(masked_dataset=masked_imaging, tracer=tracer)
+
+    inversions.use_inversions()
+
+profiler.output()
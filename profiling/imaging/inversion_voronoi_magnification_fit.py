@@ -1,14 +1,19 @@
-import time
-
 import autolens as al
+from autoarray.operators.inversion import inversions as inv
 
+from profiling import profiling_util
 from profiling.imaging.simulator import simulate_util
+from tools.inversion import inversion_util, inversions
+from tools.phase import fixed_mass
 
 import numpy as np
 
-repeats = 10
+profiler = profiling_util.Profiler(
+    name="imaging/inversion_voronoi_magnification_fit", repeats=10
+)
 
-print("Number of repeats = " + str(repeats))
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
 print()
 
 sub_size = 4
@@ -54,106 +59,223 @@ for data_resolution in ["lsst", "euclid", "hst", "hst_up"]:  # , 'ao']:
     masked_imaging = al.masked.imaging(imaging=imaging, mask=mask)
 
     print(
-        "Rectangular Inversion fit run times for image type " + data_resolution + "\n"
+        "VoronoiMagnification Inversion fit run times for image type "
+        + data_resolution
+        + "\n"
     )
     print("Number of points = " + str(masked_imaging.grid.sub_shape_1d) + "\n")
 
-    start_overall = time.time()
+    profiler.case = data_resolution
 
     tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
 
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="traced_grid"):
         traced_grid = tracer.traced_grids_of_planes_from_grid(grid=masked_imaging.grid)[
             -1
         ]
-    diff = time.time() - start
-    print("Time to Setup Traced Grid = {}".format(diff / repeats))
 
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="traced_sparse_grid"):
         traced_sparse_grid = tracer.traced_sparse_grids_of_planes_from_grid(
             grid=masked_imaging.grid
         )[-1]
 
-    diff = time.time() - start
-    print("Time to Setup Traced Sparse Grid = {}".format(diff / repeats))
-
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="mapper"):
         mapper = pixelization.mapper_from_grid_and_sparse_grid(
             grid=traced_grid, sparse_grid=traced_sparse_grid, inversion_uses_border=True
         )
-    diff = time.time() - start
-    print("Time to create mapper (Border Relocation) = {}".format(diff / repeats))
 
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="mapping_matrix"):
         mapping_matrix = mapper.mapping_matrix
-    diff = time.time() - start
-    print("Time to compute mapping matrix = {}".format(diff / repeats))
 
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="blurred_mapping_matrix"):
         blurred_mapping_matrix = masked_imaging.convolver.convolve_mapping_matrix(
             mapping_matrix=mapping_matrix
         )
-    diff = time.time() - start
-    print("Time to compute blurred mapping matrix = {}".format(diff / repeats))
 
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="data_vector"):
         data_vector = al.util.inversion.data_vector_from_blurred_mapping_matrix_and_data(
             blurred_mapping_matrix=blurred_mapping_matrix,
             image=masked_imaging.image,
             noise_map=masked_imaging.noise_map,
         )
-    diff = time.time() - start
-    print("Time to compute data vector = {}".format(diff / repeats))
 
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="curvature_matrix"):
         curvature_matrix = al.util.inversion.curvature_matrix_from_blurred_mapping_matrix(
             blurred_mapping_matrix=blurred_mapping_matrix,
             noise_map=masked_imaging.noise_map,
         )
-    diff = time.time() - start
-    print("Time to compute curvature matrix = {}".format(diff / repeats))
 
-    start = time.time()
-    for i in range(repeats):
+    # The w-tilde formulation computes the curvature matrix and data vector without the blurred mapping matrix, from
+    # the w-tilde matrix which is computed once per dataset (see 'tools/inversion/inversions.py').
+
+    for _ in profiler.timed(stage="w_tilde_preload"):
+        (
+            w_tilde_pointers,
+            w_tilde_indexes,
+            w_tilde_values,
+        ) = inversion_util.w_tilde_curvature_from(
+            noise_map=masked_imaging.noise_map, convolver=masked_imaging.convolver
+        )
+
+    for _ in profiler.timed(stage="mapping_rows"):
+        (
+            image_pointers,
+            pixel_indexes,
+            mapping_values,
+        ) = inversion_util.mapping_rows_from(
+            pixelization_1d_index_for_sub_mask_1d_index=mapper.pixelization_1d_index_for_sub_mask_1d_index,
+            mask_1d_index_for_sub_mask_1d_index=mapper._mask_1d_index_for_sub_mask_1d_index,
+            sub_fraction=mapper.grid.mask.sub_fraction,
+            pixels=mapper.pixels,
+            total_mask_pixels=mapper.grid.mask.pixels_in_mask,
+        )
+
+    for _ in profiler.timed(stage="data_vector_w_tilde"):
+        inversion_util.data_vector_via_w_tilde_data_from(
+            w_tilde_data=inversion_util.w_tilde_data_from(
+                image=np.asarray(masked_imaging.image),
+                noise_map=np.asarray(masked_imaging.noise_map),
+                image_frame_1d_indexes=masked_imaging.convolver.image_frame_1d_indexes,
+                image_frame_1d_kernels=masked_imaging.convolver.image_frame_1d_kernels,
+                image_frame_1d_lengths=masked_imaging.convolver.image_frame_1d_lengths,
+            ),
+            image_pointers=image_pointers,
+            pixel_indexes=pixel_indexes,
+            mapping_values=mapping_values,
+            pixels=mapper.pixels,
+        )
+
+    for _ in profiler.timed(stage="curvature_matrix_w_tilde"):
+        inversion_util.curvature_matrix_via_w_tilde_from(
+            w_tilde_pointers=w_tilde_pointers,
+            w_tilde_indexes=w_tilde_indexes,
+            w_tilde_values=w_tilde_values,
+            image_pointers=image_pointers,
+            pixel_indexes=pixel_indexes,
+            mapping_values=mapping_values,
+            pixels=mapper.pixels,
+        )
+
+    for _ in profiler.timed(stage="regularization_matrix"):
         regularization_matrix = al.util.regularization.constant_regularization_matrix_from_pixel_neighbors(
             coefficient=1.0,
             pixel_neighbors=mapper.pixelization_grid.pixel_neighbors,
             pixel_neighbors_size=mapper.pixelization_grid.pixel_neighbors_size,
         )
-    diff = time.time() - start
-    print("Time to compute reguarization matrix = {}".format(diff / repeats))
 
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="curvature_reg_matrix"):
         curvature_reg_matrix = np.add(curvature_matrix, regularization_matrix)
-    diff = time.time() - start
-    print("Time to compute curvature reguarization Matrix = {}".format(diff / repeats))
 
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="reconstruction"):
         reconstruction = np.linalg.solve(curvature_reg_matrix, data_vector)
-    diff = time.time() - start
-    print("Time to peform reconstruction = {}".format(diff / repeats))
 
-    start = time.time()
-    for i in range(repeats):
+    # The Bayesian evidence also needs the log determinants of F + H and H, which the autoarray inversion computes
+    # with a separate Cholesky factorization of each matrix, and the regularization term.
+
+    for _ in profiler.timed(stage="log_det_curvature_reg_matrix"):
+        inv.Inversion.log_determinant_of_matrix_cholesky(curvature_reg_matrix)
+
+    for _ in profiler.timed(stage="log_det_regularization_matrix"):
+        inv.Inversion.log_determinant_of_matrix_cholesky(regularization_matrix)
+
+    for _ in profiler.timed(stage="regularization_term"):
+        np.matmul(reconstruction.T, np.matmul(regularization_matrix, reconstruction))
+
+    # The inversions in 'tools/inversion/inversions.py' factorize F + H once for both the reconstruction and its log
+    # determinant, and cache the log determinant of H.
+
+    for _ in profiler.timed(stage="cholesky_factor"):
+        curvature_reg_factor = inversion_util.cholesky_factor_from(
+            matrix=curvature_reg_matrix
+        )
+
+    for _ in profiler.timed(stage="reconstruction_cholesky"):
+        inversion_util.solution_from_cholesky_factor(
+            cholesky_factor=curvature_reg_factor, vector=data_vector
+        )
+
+    for _ in profiler.timed(stage="log_det_curvature_reg_matrix_cholesky"):
+        inversion_util.log_determinant_from_cholesky_factor(
+            cholesky_factor=curvature_reg_factor
+        )
+
+    for _ in profiler.timed(stage="log_det_regularization_matrix_cached"):
+        inversions.regularization_log_determinant_from(
+            regularization=source_galaxy.regularization,
+            mapper=mapper,
+            regularization_matrix=regularization_matrix,
+        )
+
+    for _ in profiler.timed(stage="mapped_reconstruction"):
         al.util.inversion.mapped_reconstructed_data_from_mapping_matrix_and_reconstruction(
             mapping_matrix=blurred_mapping_matrix, reconstruction=reconstruction
         )
-    diff = time.time() - start
-    print("Time to compute mapped reconstruction = {}".format(diff / repeats))
 
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="fit"):
+        al.fit(masked_dataset=masked_imaging, tracer=tracer)
+
+    inversions.use_inversions(inversion_imaging_class=inversions.InversionImagingWTilde)
+
+    for _ in profiler.timed(stage="fit_w_tilde"):
         al.fit(masked_dataset=masked_imaging, tracer=tracer)
-    diff = time.time() - start
-    print("Time to perform complete fit = {}".format(diff / repeats))
+
+    inversions.use_inversions()
+
+    # A phase whose mass model is fixed reuses the traced grids and their border relocation of the previous likelihood
+    # evaluation (see 'tools/phase/fixed_mass.py').
+
+    traced_grid_cache = fixed_mass.TracedGridCache()
+
+    for _ in profiler.timed(stage="fit_fixed_mass"):
+        al.fit(
+            masked_dataset=masked_imaging,
+            tracer=traced_grid_cache.tracer_with_cache(
+                tracer=al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
+            ),
+        )
+
+    # The border relocation of the pixelized fits above must not change the traced grids stored by the cache, so a
+    # source with a light profile fitted after them with the same mass model gives the same figure of merit as al.fit.
+
+    source_light = al.lp.EllipticalSersic(
+        centre=(0.0, 0.0),
+        axis_ratio=0.8,
+        phi=60.0,
+        intensity=0.3,
+        effective_radius=1.0,
+        sersic_index=2.5,
+    )
+
+    for checked_source_galaxy in [
+        al.Galaxy(redshift=1.0, light=source_light),
+        al.Galaxy(
+            redshift=1.0,
+            light=source_light,
+            pixelization=pixelization,
+            regularization=al.reg.Constant(coefficient=1.0),
+        ),
+    ]:
+
+        fit_fixed_mass = al.fit(
+            masked_dataset=masked_imaging,
+            tracer=traced_grid_cache.tracer_with_cache(
+                tracer=al.Tracer.from_galaxies(
+                    galaxies=[lens_galaxy, checked_source_galaxy]
+                )
+            ),
+        )
+
+        fit = al.fit(
+            masked_dataset=masked_imaging,
+            tracer=al.Tracer.from_galaxies(
+                galaxies=[lens_galaxy, checked_source_galaxy]
+            ),
+        )
+
+        assert np.isclose(
+            fit_fixed_mass.figure_of_merit, fit.figure_of_merit, rtol=1.0e-10
+        )
 
     print()
+
+profiler.output()
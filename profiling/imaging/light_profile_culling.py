@@ -0,0 +1,170 @@
+import autolens as al
+
+from profiling import profiling_util
+from profiling.imaging.simulator import simulate_util
+from tools.phase import light_profile_culling
+
+import numpy as np
+
+"""
+Profiles the blurred light profile image of a tracer with a lens galaxy, a source galaxy and many compact intervening
+objects (as in 'simulators/imaging/lens_sie__source_sersic__intervening_objects.py'), computed by evaluating every
+light profile on the whole grid compared with culling them to their bounding radii (see
+'tools/phase/light_profile_culling.py'), for increasing numbers of intervening objects.
+
+The intervening objects are either round or elliptical (with an axis ratio of 0.3), as the bounding circle of an
+elliptical light profile extends to its major axis and so contains more coordinates than are inside its bounding
+radius.
+"""
+
+profiler = profiling_util.Profiler(name="imaging/light_profile_culling", repeats=3)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+sub_size = 4
+radius = 3.0
+flux_tolerance = 1.0e-4
+total_intervening_objects_list = [2, 10, 30, 100]
+
+print("sub grid size = " + str(sub_size))
+print("circular mask radius = " + str(radius) + "\n")
+print("flux tolerance = " + str(flux_tolerance) + "\n")
+print("numbers of intervening objects = " + str(total_intervening_objects_list) + "\n")
+
+lens_galaxy = al.Galaxy(
+    redshift=0.5,
+    light=al.lp.EllipticalSersic(
+        centre=(0.0, 0.0),
+        axis_ratio=0.9,
+        phi=45.0,
+        intensity=0.1,
+        effective_radius=0.8,
+        sersic_index=4.0,
+    ),
+    mass=al.mp.EllipticalIsothermal(
+        centre=(0.0, 0.0), einstein_radius=1.6, axis_ratio=0.7, phi=45.0
+    ),
+    shear=al.mp.ExternalShear(magnitude=0.05, phi=90.0),
+)
+
+source_galaxy = al.Galaxy(
+    redshift=1.0,
+    light=al.lp.EllipticalSersic(
+        centre=(0.1, 0.1),
+        axis_ratio=0.8,
+        phi=60.0,
+        intensity=0.3,
+        effective_radius=1.0,
+        sersic_index=2.5,
+    ),
+)
+
+
+def intervening_galaxy_from(total_intervening_objects, axis_ratio):
+    """A galaxy at the lens redshift with compact exponential light profiles at random positions and orientations
+    within the mask."""
+    random_state = np.random.RandomState(seed=1)
+
+    return al.Galaxy(
+        redshift=0.5,
+        **{
+            "intervene_"
+            + str(index): al.lp.EllipticalExponential(
+                centre=tuple(random_state.uniform(-radius, radius, 2)),
+                axis_ratio=axis_ratio,
+                phi=random_state.uniform(0.0, 180.0),
+                intensity=random_state.uniform(0.2, 1.0),
+                effective_radius=random_state.uniform(0.05, 0.3),
+            )
+            for index in range(total_intervening_objects)
+        }
+    )
+
+
+for data_resolution in ["euclid", "hst"]:
+
+    imaging = simulate_util.load_test_imaging(
+        data_type="lens_sie__source_smooth", data_resolution=data_resolution
+    )
+
+    mask = al.mask.circular(
+        shape_2d=imaging.shape_2d,
+        pixel_scales=imaging.pixel_scales,
+        sub_size=sub_size,
+        radius=radius,
+    )
+
+    masked_imaging = al.masked.imaging(imaging=imaging, mask=mask)
+
+    print("Light profile culling run times for image type " + data_resolution + "\n")
+    print("Number of points = " + str(masked_imaging.grid.sub_shape_1d) + "\n")
+
+    for total_intervening_objects in total_intervening_objects_list:
+
+        for objects_name, axis_ratio in [("round", 1.0), ("elliptical", 0.3)]:
+
+            profiler.case = (
+                data_resolution
+                + "_"
+                + str(total_intervening_objects)
+                + "_"
+                + objects_name
+                + "_objects"
+            )
+
+            galaxies = [
+                lens_galaxy,
+                intervening_galaxy_from(
+                    total_intervening_objects=total_intervening_objects,
+                    axis_ratio=axis_ratio,
+                ),
+                source_galaxy,
+            ]
+
+            tracer = al.Tracer.from_galaxies(galaxies=galaxies)
+
+            for _ in profiler.timed(stage="blurred_profile_image"):
+                blurred_profile_image = tracer.blurred_profile_image_from_grid_and_convolver(
+                    grid=masked_imaging.grid,
+                    convolver=masked_imaging.convolver,
+                    blurring_grid=masked_imaging.blurring_grid,
+                )
+
+            # The culling is shared by every tracer, as in a phase, so the grid indexes are only computed once.
+
+            culling = light_profile_culling.LightProfileCulling(
+                flux_tolerance=flux_tolerance
+            )
+
+            for _ in profiler.timed(stage="culled_blurred_profile_image"):
+                culled_tracer = light_profile_culling.tracer_with_light_profile_culling(
+                    tracer=al.Tracer.from_galaxies(galaxies=galaxies),
+                    light_profile_culling=culling,
+                )
+                culled_blurred_profile_image = culled_tracer.blurred_profile_image_from_grid_and_convolver(
+                    grid=masked_imaging.grid,
+                    convolver=masked_imaging.convolver,
+                    blurring_grid=masked_imaging.blurring_grid,
+                )
+
+            print(
+                str(total_intervening_objects)
+                + " "
+                + objects_name
+                + " intervening objects, fraction of coordinates evaluated = {:.3f}".format(
+                    culling.evaluated_fraction
+                )
+            )
+            print(
+                "Maximum image difference = {:.2e}, fractional flux difference = {:.2e}\n".format(
+                    np.max(
+                        np.abs(blurred_profile_image - culled_blurred_profile_image)
+                    ),
+                    np.sum(blurred_profile_image - culled_blurred_profile_image)
+                    / np.sum(blurred_profile_image),
+                )
+            )
+
+profiler.output()
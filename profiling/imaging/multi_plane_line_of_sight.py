@@ -0,0 +1,151 @@
+import autolens as al
+
+from profiling import profiling_util
+from profiling.imaging.simulator import simulate_util
+from tools.phase import multi_plane
+
+import numpy as np
+
+"""
+Profiles the multi-plane ray-tracing of a masked imaging dataset's grid by a tracer with a lens galaxy, a source
+galaxy and a population of line-of-sight halos, compared with vectorised ray-tracing (see
+'tools/phase/multi_plane.py'), for increasing numbers of halos.
+
+The halos are *SphericalIsothermal* and *SphericalNFW* mass profiles, whose redshifts are either all different (such
+that every halo is in its own plane) or rounded to redshift slices of width 0.05 (such that halos share planes).
+"""
+
+profiler = profiling_util.Profiler(name="imaging/multi_plane_line_of_sight", repeats=3)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+sub_size = 2
+radius = 3.0
+total_halos_list = [3, 10, 30, 100, 300]
+
+print("sub grid size = " + str(sub_size))
+print("circular mask radius = " + str(radius) + "\n")
+print("numbers of line-of-sight halos = " + str(total_halos_list) + "\n")
+
+lens_galaxy = al.Galaxy(
+    redshift=0.5,
+    mass=al.mp.EllipticalIsothermal(
+        centre=(0.0, 0.0), einstein_radius=1.6, axis_ratio=0.7, phi=45.0
+    ),
+    shear=al.mp.ExternalShear(magnitude=0.05, phi=90.0),
+)
+
+source_galaxy = al.Galaxy(
+    redshift=1.0,
+    light=al.lp.EllipticalSersic(
+        centre=(0.1, 0.1),
+        axis_ratio=0.8,
+        phi=60.0,
+        intensity=1.0,
+        effective_radius=1.0,
+        sersic_index=2.5,
+    ),
+)
+
+
+def halos_from(total_halos, redshift_slice_width=None):
+    """A population of line-of-sight halos between redshifts 0.05 and 1.5, at random positions within 6.0" of the
+    lens."""
+    random_state = np.random.RandomState(seed=1)
+
+    redshifts = random_state.uniform(0.05, 1.5, total_halos)
+
+    if redshift_slice_width is not None:
+        redshifts = np.round(redshifts / redshift_slice_width) * redshift_slice_width
+
+    halos = []
+
+    for index, redshift in enumerate(redshifts):
+
+        centre = tuple(random_state.uniform(-6.0, 6.0, 2))
+
+        if index % 2 == 0:
+            mass = al.mp.SphericalIsothermal(
+                centre=centre, einstein_radius=random_state.uniform(0.01, 0.05)
+            )
+        else:
+            mass = al.mp.SphericalNFW(
+                centre=centre,
+                kappa_s=random_state.uniform(0.005, 0.02),
+                scale_radius=random_state.uniform(1.0, 5.0),
+            )
+
+        halos.append(al.Galaxy(redshift=float(redshift), mass=mass))
+
+    return halos
+
+
+for data_resolution in ["euclid", "hst"]:
+
+    imaging = simulate_util.load_test_imaging(
+        data_type="lens_sie__source_smooth", data_resolution=data_resolution
+    )
+
+    mask = al.mask.circular(
+        shape_2d=imaging.shape_2d,
+        pixel_scales=imaging.pixel_scales,
+        sub_size=sub_size,
+        radius=radius,
+    )
+
+    masked_imaging = al.masked.imaging(imaging=imaging, mask=mask)
+
+    print("Multi-plane ray-tracing run times for image type " + data_resolution + "\n")
+    print("Number of points = " + str(masked_imaging.grid.sub_shape_1d) + "\n")
+
+    for total_halos in total_halos_list:
+
+        for halos_name, redshift_slice_width in [("planes", None), ("slices", 0.05)]:
+
+            tracer = al.Tracer.from_galaxies(
+                galaxies=[lens_galaxy, source_galaxy]
+                + halos_from(
+                    total_halos=total_halos, redshift_slice_width=redshift_slice_width
+                )
+            )
+
+            profiler.case = (
+                data_resolution + "_" + str(total_halos) + "_halos_" + halos_name
+            )
+
+            print(
+                str(total_halos)
+                + " halos in "
+                + str(len(tracer.planes))
+                + " planes ("
+                + halos_name
+                + ")"
+            )
+
+            for _ in profiler.timed(stage="traced_grids"):
+                traced_grids = tracer.traced_grids_of_planes_from_grid(
+                    grid=masked_imaging.grid
+                )
+
+            for _ in profiler.timed(stage="vectorised_ray_tracing_setup"):
+                vectorised_ray_tracing = multi_plane.VectorisedRayTracing(tracer=tracer)
+
+            for _ in profiler.timed(stage="vectorised_traced_grids"):
+                vectorised_traced_grids = vectorised_ray_tracing.traced_grids_of_planes_from_grid(
+                    grid=masked_imaging.grid
+                )
+
+            print(
+                "Maximum traced grid difference = {:.2e}\n".format(
+                    max(
+                        np.max(np.abs(traced_grid - vectorised_traced_grid))
+                        for traced_grid, vectorised_traced_grid in zip(
+                            traced_grids, vectorised_traced_grids
+                        )
+                    )
+                )
+            )
+
+profiler.output()
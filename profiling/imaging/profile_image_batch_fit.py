@@ -0,0 +1,106 @@
+import os
+
+import autofit as af
+import autolens as al
+
+from profiling import profiling_util
+from profiling.imaging.simulator import simulate_util
+from tools.phase import batch_fit
+
+import numpy as np
+
+"""
+Profiles the likelihoods of many samples of a parametric lens model (an *EllipticalIsothermal* lens and
+*EllipticalSersic* source, as in the 'lens_sie__source_sersic' data) fitted to imaging, comparing a fit for every
+sample (creating its model instance, tracer and fit as a non-linear search does) with a *BatchFitImaging* (see
+'tools/phase/batch_fit.py'), which computes the likelihoods of a batch of samples at once.
+"""
+
+workspace_path = "{}/../../".format(os.path.dirname(os.path.realpath(__file__)))
+
+af.conf.instance = af.conf.Config(
+    config_path=workspace_path + "config", output_path=workspace_path + "output"
+)
+
+profiler = profiling_util.Profiler(name="imaging/profile_image_batch_fit", repeats=3)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+sub_size = 4
+radius = 3.0
+psf_shape_2d = (21, 21)
+total_samples = 100
+batch_size = 10
+
+print("sub grid size = " + str(sub_size))
+print("circular mask radius = " + str(radius) + "\n")
+print("psf shape = " + str(psf_shape_2d) + "\n")
+print("Number of samples = " + str(total_samples) + "\n")
+print("Batch size = " + str(batch_size) + "\n")
+
+model = af.ModelMapper()
+
+model.galaxies = af.CollectionPriorModel(
+    lens=al.GalaxyModel(redshift=0.5, mass=al.mp.EllipticalIsothermal),
+    source=al.GalaxyModel(redshift=1.0, light=al.lp.EllipticalSersic),
+)
+
+np.random.seed(1)
+
+samples = np.asarray([model.random_vector_from_priors for _ in range(total_samples)])
+
+for data_resolution in ["lsst", "euclid", "hst", "hst_up"]:
+
+    imaging = simulate_util.load_test_imaging(
+        data_type="lens_sie__source_smooth",
+        data_resolution=data_resolution,
+        psf_shape_2d=psf_shape_2d,
+    )
+
+    mask = al.mask.circular(
+        shape_2d=imaging.shape_2d,
+        pixel_scales=imaging.pixel_scales,
+        sub_size=sub_size,
+        radius=radius,
+    )
+
+    masked_imaging = al.masked.imaging(imaging=imaging, mask=mask)
+
+    print("Batch fit run times for image type " + data_resolution + "\n")
+    print("Number of points = " + str(masked_imaging.grid.sub_shape_1d) + "\n")
+
+    profiler.case = data_resolution
+
+    for _ in profiler.timed(stage="fits"):
+        likelihoods = [
+            al.fit(
+                masked_dataset=masked_imaging,
+                tracer=al.Tracer.from_galaxies(
+                    galaxies=model.instance_from_vector(sample).galaxies
+                ),
+            ).likelihood
+            for sample in samples
+        ]
+
+    for _ in profiler.timed(stage="batch_fit_setup"):
+        fit = batch_fit.BatchFitImaging(
+            masked_imaging=masked_imaging, model=model, batch_size=batch_size
+        )
+
+    for _ in profiler.timed(stage="batch_fit"):
+        batch_likelihoods = fit.likelihoods_from_samples(samples=samples)
+
+    print(
+        "Maximum likelihood fractional difference = "
+        + str(
+            np.max(
+                np.abs(batch_likelihoods - np.asarray(likelihoods))
+                / np.abs(np.asarray(likelihoods))
+            )
+        )
+        + "\n"
+    )
+
+profiler.output()
@@ -1,12 +1,13 @@
 import autolens as al
 
-import time
+from profiling import profiling_util
 
 from profiling.imaging.simulator import simulate_util
 
-repeats = 10
+profiler = profiling_util.Profiler(name="imaging/profile_image_fit", repeats=10)
 
-print("Number of repeats = " + str(repeats))
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
 print()
 
 sub_size = 4
@@ -64,36 +65,26 @@ for data_resolution in ["lsst", "euclid", "hst", "hst_up", "ao"]:
     print("Light profile fit run times for image type " + data_resolution + "\n")
     print("Number of points = " + str(masked_imaging.grid.sub_shape_1d) + "\n")
 
-    start_overall = time.time()
+    profiler.case = data_resolution
 
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="profile_image"):
         tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
         profile_image = tracer.profile_image_from_grid(grid=masked_imaging.grid)
-    diff = time.time() - start
-    print("Time to create profile image = {}".format(diff / repeats))
 
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="blurring_profile_image"):
         blurring_profile_image = tracer.profile_image_from_grid(
             grid=masked_imaging.blurring_grid
         )
-    diff = time.time() - start
-    print("Time to create blurring profile image = {}".format(diff / repeats))
 
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="convolution"):
         blurred_profile_image = masked_imaging.convolver.convolved_image_from_image_and_blurring_image(
             image=profile_image, blurring_image=blurring_profile_image
         )
-    diff = time.time() - start
-    print("Time to perform PSF Convolution = {}".format(diff / repeats))
 
-    start = time.time()
-    for i in range(repeats):
+    for _ in profiler.timed(stage="fit"):
         tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
         al.fit(masked_dataset=masked_imaging, tracer=tracer)
-    diff = time.time() - start
-    print("Time to perform complete fit = {}".format(diff / repeats))
 
     print()
+
+profiler.output()
@@ -0,0 +1,135 @@
+import json
+import os
+import subprocess
+import sys
+
+import autolens as al
+
+from profiling import profiling_util
+from profiling.imaging.simulator import simulate_util
+from tools.phase import shared_dataset
+
+import numpy as np
+
+"""
+Profiles the set up of a masked imaging dataset by a process which loads and masks it, compared with a process which
+attaches to the same dataset published to shared memory by a *SharedDataset* (see 'tools/phase/shared_dataset.py').
+
+The attach is timed in a separately launched Python process, as it would be by a job attaching to a dataset published
+by another job. The publishing process already holds the block, so attaching in it would not time opening the block.
+Every timed attach of the attaching process closes the block it opened for the previous attach, and so opens it again.
+"""
+
+"""The script run by the attaching process, which prints the run-time of every attach (after its warmup attaches)
+and whether the attached image equals the published image as its last line of output."""
+attach_script = """
+import gc
+import json
+import sys
+import time
+
+import numpy as np
+
+from tools.phase import shared_dataset
+
+name, repeats, warmup = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+
+times = []
+
+for index in range(warmup + repeats):
+
+    start = time.perf_counter()
+    attached_masked_imaging = shared_dataset.dataset_from_shared_memory(name=name)
+    times.append(time.perf_counter() - start)
+
+    image = np.array(attached_masked_imaging.image)
+
+    del attached_masked_imaging
+    gc.collect()
+
+    block = shared_dataset.attached_blocks.pop(name)
+
+    try:
+        block.close()
+    except BufferError:
+        pass
+
+print(json.dumps({"times": times[warmup:], "image": image.tolist()}))
+"""
+
+
+def attach_times_and_image_from_new_process(name, repeats, warmup):
+    """Attach to the dataset published to the shared memory block *name* in a new Python process, returning the
+    run-time of every timed attach and the attached image."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, sys.path))
+
+    output = subprocess.check_output(
+        [sys.executable, "-c", attach_script, name, str(repeats), str(warmup)], env=env,
+    )
+
+    result = json.loads(output.decode().strip().splitlines()[-1])
+
+    return result["times"], np.asarray(result["image"])
+
+
+profiler = profiling_util.Profiler(name="imaging/shared_dataset", repeats=10)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+sub_size = 4
+radius = 3.6
+psf_shape_2d = (21, 21)
+
+print("sub grid size = " + str(sub_size))
+print("circular mask radius = " + str(radius) + "\n")
+print("psf shape = " + str(psf_shape_2d) + "\n")
+
+for data_resolution in ["lsst", "euclid", "hst", "hst_up", "ao"]:
+
+    print("Shared dataset run times for image type " + data_resolution + "\n")
+
+    profiler.case = data_resolution
+
+    for _ in profiler.timed(stage="masked_imaging"):
+
+        imaging = simulate_util.load_test_imaging(
+            data_type="lens_sie__source_smooth",
+            data_resolution=data_resolution,
+            psf_shape_2d=psf_shape_2d,
+        )
+
+        mask = al.mask.circular(
+            shape_2d=imaging.shape_2d,
+            pixel_scales=imaging.pixel_scales,
+            sub_size=sub_size,
+            radius=radius,
+        )
+
+        masked_imaging = al.masked.imaging(imaging=imaging, mask=mask)
+
+    for _ in profiler.timed(stage="publish"):
+        shared = shared_dataset.SharedDataset(dataset=masked_imaging)
+        shared.close()
+
+    shared = shared_dataset.SharedDataset(dataset=masked_imaging)
+
+    attach_times, attached_image = attach_times_and_image_from_new_process(
+        name=shared.name, repeats=profiler.repeats, warmup=profiler.warmup
+    )
+
+    profiler.add_stage_times(stage="attach", times=attach_times)
+
+    print("Shared memory block size (MB) = " + str(shared.size / 1.0e6) + "\n")
+
+    print(
+        "Attached image equals image = "
+        + str(np.array_equal(attached_image, np.asarray(masked_imaging.image)))
+        + "\n"
+    )
+
+    shared.close()
+
+profiler.output()
@@ -1,9 +1,11 @@
 import autolens as al
 
+from profiling import profiling_util
+from tools.interferometer import transformer as fused_transformer
+
 import numpy as np
-import time
 
-repeats = 1
+profiler = profiling_util.Profiler(name="interferometer/fourier_transform", repeats=1)
 
 visibilities = 1000
 shape_2d = (100, 100)
@@ -29,34 +31,56 @@ uv_wavelengths = np.ones(shape=(visibilities, 2))
 grid = al.grid.uniform(shape_2d=shape_2d, pixel_scales=0.05)
 image = al.array.ones(shape_2d=shape_2d, pixel_scales=0.05)
 
+mapping_matrix = np.zeros(shape=(image_pixels, source_pixels))
+mapping_matrix[
+    np.arange(image_pixels), np.random.randint(source_pixels, size=image_pixels)
+] = 1.0
+
 transformer = al.transformer(
     uv_wavelengths=uv_wavelengths, grid_radians=grid, preload_transform=False
 )
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="real_visibilities"):
     transformer.real_visibilities_from_image(image=image)
-diff = time.time() - start
-print("Real Visibilities Time = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="imag_visibilities"):
     transformer.imag_visibilities_from_image(image=image)
-diff = time.time() - start
-print("Imaginary Visibilities Time = {}".format(diff / repeats))
 
 transformer = al.transformer(
     uv_wavelengths=uv_wavelengths, grid_radians=grid, preload_transform=True
 )
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="real_visibilities_preload"):
     transformer.real_visibilities_from_image(image=image)
-diff = time.time() - start
-print("Real Visibilities PreLoad Time = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="imag_visibilities_preload"):
     transformer.imag_visibilities_from_image(image=image)
-diff = time.time() - start
-print("Imaginary Visibilities PreLoad Time = {}".format(diff / repeats))
+
+for _ in profiler.timed(stage="transformed_mapping_matrices_preload"):
+    transformer.transformed_mapping_matrices_from_mapping_matrix(
+        mapping_matrix=mapping_matrix
+    )
+
+# The fused transformer computes the real and imaginary visibilities together in one sweep, so is compared with the
+# sum of the real and imaginary stages above.
+
+transformer = fused_transformer.TransformerFused(
+    uv_wavelengths=uv_wavelengths, grid_radians=grid, preload_transform=False
+)
+
+for _ in profiler.timed(stage="visibilities_fused"):
+    transformer.visibilities_from_image(image=image)
+
+transformer = fused_transformer.TransformerFused(
+    uv_wavelengths=uv_wavelengths, grid_radians=grid, preload_transform=True
+)
+
+for _ in profiler.timed(stage="visibilities_fused_preload"):
+    transformer.visibilities_from_image(image=image)
+
+for _ in profiler.timed(stage="transformed_mapping_matrices_fused_preload"):
+    transformer.transformed_mapping_matrices_from_mapping_matrix(
+        mapping_matrix=mapping_matrix
+    )
+
+profiler.output()
@@ -0,0 +1,133 @@
+import autolens as al
+
+from profiling import profiling_util
+from tools.interferometer import transformer
+
+import numpy as np
+
+"""
+Compares the run-time of the direct Fourier transform (DFT) of the autoarray *Transformer* with the non-uniform FFT
+(NUFFT) of the *TransformerNUFFT* (see 'tools/interferometer/transformer.py'), for the visibilities of a profile image
+and the transformed mapping matrix of an inversion, as the number of visibilities increases.
+
+The fractional error of the NUFFT visibilities relative to the DFT is also printed for every tolerance.
+"""
+
+profiler = profiling_util.Profiler(
+    name="interferometer/fourier_transform_nufft", repeats=3
+)
+
+print("Number of repeats = " + str(profiler.repeats))
+print("Number of warmup runs = " + str(profiler.warmup))
+print()
+
+real_space_shape_2d = (151, 151)
+real_space_pixel_scales = 0.05
+real_space_radius = 3.0
+source_pixels = 500
+
+tolerances = [1.0e-4, 1.0e-8]
+
+real_space_mask = al.mask.circular(
+    shape_2d=real_space_shape_2d,
+    pixel_scales=real_space_pixel_scales,
+    radius=real_space_radius,
+)
+
+real_space_grid = al.grid.from_mask(mask=real_space_mask)
+real_space_grid_radians = real_space_grid.in_radians
+
+print("Real space circular mask radius = " + str(real_space_radius) + "\n")
+print("Number of points = " + str(real_space_grid.sub_shape_1d) + "\n")
+print("Source pixels = " + str(source_pixels) + "\n")
+
+lens_galaxy = al.Galaxy(
+    redshift=0.5,
+    mass=al.mp.EllipticalIsothermal(
+        centre=(0.0, 0.0), einstein_radius=1.6, axis_ratio=0.7, phi=45.0
+    ),
+)
+
+source_galaxy = al.Galaxy(
+    redshift=1.0,
+    light=al.lp.EllipticalSersic(
+        centre=(0.0, 0.0),
+        axis_ratio=0.8,
+        phi=60.0,
+        intensity=0.4,
+        effective_radius=0.5,
+        sersic_index=1.0,
+    ),
+)
+
+tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
+
+profile_image = tracer.profile_image_from_grid(grid=real_space_grid)
+
+mapping_matrix = np.zeros(shape=(real_space_grid.sub_shape_1d, source_pixels))
+mapping_matrix[
+    np.arange(real_space_grid.sub_shape_1d),
+    np.random.randint(source_pixels, size=real_space_grid.sub_shape_1d),
+] = 1.0
+
+for total_visibilities in [100, 1000, 5000, 10000, 25000, 50000]:
+
+    print()
+    print("########################")
+    print()
+    print("Number of visibilities = " + str(total_visibilities) + "\n")
+
+    profiler.case = str(total_visibilities)
+
+    uv_wavelengths = np.random.uniform(
+        low=-1.0e5, high=1.0e5, size=(total_visibilities, 2)
+    )
+
+    dft_transformer = al.transformer(
+        uv_wavelengths=uv_wavelengths,
+        grid_radians=real_space_grid_radians,
+        preload_transform=False,
+    )
+
+    for _ in profiler.timed(stage="dft_visibilities"):
+        dft_visibilities = dft_transformer.visibilities_from_image(image=profile_image)
+
+    if total_visibilities <= 5000:
+
+        for _ in profiler.timed(stage="dft_transformed_mapping_matrices"):
+            dft_transformer.transformed_mapping_matrices_from_mapping_matrix(
+                mapping_matrix=mapping_matrix
+            )
+
+    for tolerance in tolerances:
+
+        for _ in profiler.timed(stage="nufft_setup_tol_{}".format(tolerance)):
+            nufft_transformer = transformer.TransformerNUFFT(
+                uv_wavelengths=uv_wavelengths,
+                grid_radians=real_space_grid_radians,
+                tolerance=tolerance,
+            )
+
+        for _ in profiler.timed(stage="nufft_visibilities_tol_{}".format(tolerance)):
+            nufft_visibilities = nufft_transformer.visibilities_from_image(
+                image=profile_image
+            )
+
+        for _ in profiler.timed(
+            stage="nufft_transformed_mapping_matrices_tol_{}".format(tolerance)
+        ):
+            nufft_transformer.transformed_mapping_matrices_from_mapping_matrix(
+                mapping_matrix=mapping_matrix
+            )
+
+        error = np.max(np.abs(nufft_visibilities - dft_visibilities)) / np.max(
+            np.abs(dft_visibilities)
+        )
+
+        print(
+            "NUFFT fractional error (tolerance = {}, kernel width = {}) = {}".format(
+                tolerance, nufft_transformer.kernel_width, error
+            )
+        )
+
+profiler.output()
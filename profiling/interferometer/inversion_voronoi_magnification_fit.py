@@ -1,9 +1,12 @@
 import autolens as al
 
+from profiling import profiling_util
+
 import numpy as np
-import time
 
-repeats = 1
+profiler = profiling_util.Profiler(
+    name="interferometer/inversion_voronoi_magnification_fit", repeats=1
+)
 
 total_visibilities = 1000
 pixelization_shape_2d = (30, 30)
@@ -78,140 +81,89 @@ print(
     + "\n"
 )
 
-start_overall = time.time()
 
 tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="traced_grid"):
     traced_grid = tracer.traced_grids_of_planes_from_grid(
         grid=masked_interferometer.grid
     )[-1]
-diff = time.time() - start
-print("Time to Setup Traced Grid = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="traced_sparse_grid"):
     traced_sparse_grid = tracer.traced_sparse_grids_of_planes_from_grid(
         grid=masked_interferometer.grid
     )[-1]
 
-diff = time.time() - start
-print("Time to Setup Traced Sparse Grid = {}".format(diff / repeats))
-
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="mapper"):
     mapper = pixelization.mapper_from_grid_and_sparse_grid(
         grid=traced_grid, sparse_grid=traced_sparse_grid, inversion_uses_border=True
     )
-diff = time.time() - start
-print("Time to create mapper (Border Relocation) = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="mapping_matrix"):
     mapping_matrix = mapper.mapping_matrix
-diff = time.time() - start
-print("Time to compute mapping matrix = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="transformed_mapping_matrices"):
     transformed_mapping_matrices = masked_interferometer.transformer.transformed_mapping_matrices_from_mapping_matrix(
         mapping_matrix=mapping_matrix
     )
-diff = time.time() - start
-print("Time to compute transformed mapping matrices = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="real_data_vector"):
     real_data_vector = al.util.inversion.data_vector_from_transformed_mapping_matrix_and_data(
         transformed_mapping_matrix=transformed_mapping_matrices[0],
         visibilities=masked_interferometer.visibilities[:, 0],
         noise_map=masked_interferometer.noise_map[:, 0],
     )
-diff = time.time() - start
-print("Time to compute real data vector = {}".format(diff / repeats))
 
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="imag_data_vector"):
     imag_data_vector = al.util.inversion.data_vector_from_transformed_mapping_matrix_and_data(
         transformed_mapping_matrix=transformed_mapping_matrices[1],
         visibilities=masked_interferometer.visibilities[:, 1],
         noise_map=masked_interferometer.noise_map[:, 1],
     )
-diff = time.time() - start
-print("Time to compute imaginary data vector = {}".format(diff / repeats))
 
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="real_curvature_matrix"):
     real_curvature_matrix = al.util.inversion.curvature_matrix_from_transformed_mapping_matrix(
         transformed_mapping_matrix=transformed_mapping_matrices[0],
         noise_map=noise_map[:, 0],
     )
-diff = time.time() - start
-print("Time to compute real curvature matrix = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="imag_curvature_matrix"):
     imag_curvature_matrix = al.util.inversion.curvature_matrix_from_transformed_mapping_matrix(
         transformed_mapping_matrix=transformed_mapping_matrices[1],
         noise_map=noise_map[:, 1],
     )
-diff = time.time() - start
-print("Time to compute imaginary curvature matrix = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="regularization_matrix"):
     regularization_matrix = al.util.regularization.constant_regularization_matrix_from_pixel_neighbors(
         coefficient=1.0,
         pixel_neighbors=mapper.pixelization_grid.pixel_neighbors,
         pixel_neighbors_size=mapper.pixelization_grid.pixel_neighbors_size,
     )
-diff = time.time() - start
-print("Time to compute reguarization matrix = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="curvature_reg_matrix"):
     real_curvature_reg_matrix = np.add(real_curvature_matrix, regularization_matrix)
     imag_curvature_reg_matrix = np.add(imag_curvature_matrix, regularization_matrix)
     data_vector = np.add(real_data_vector, imag_data_vector)
     curvature_reg_matrix = np.add(real_curvature_reg_matrix, imag_curvature_reg_matrix)
-diff = time.time() - start
-print("Time to compute curvature reguarization Matrices = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="reconstruction"):
     reconstruction = np.linalg.solve(curvature_reg_matrix, data_vector)
-diff = time.time() - start
-print("Time to peform reconstruction = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="real_mapped_reconstruction"):
     real_mapped_visibilities = al.util.inversion.mapped_reconstructed_data_from_mapping_matrix_and_reconstruction(
         mapping_matrix=transformed_mapping_matrices[0], reconstruction=reconstruction
     )
-diff = time.time() - start
-print(
-    "Time to compute mapped real visibility reconstruction = {}".format(diff / repeats)
-)
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="imag_mapped_reconstruction"):
     imag_mapped_visibilities = al.util.inversion.mapped_reconstructed_data_from_mapping_matrix_and_reconstruction(
         mapping_matrix=transformed_mapping_matrices[1], reconstruction=reconstruction
     )
-diff = time.time() - start
-print(
-    "Time to compute mapped imaginary visibility reconstruction = {}".format(
-        diff / repeats
-    )
-)
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="fit"):
     al.fit(masked_dataset=masked_interferometer, tracer=tracer)
-diff = time.time() - start
-print("Time to perform complete fit = {}".format(diff / repeats))
 
 print()
+
+profiler.output()
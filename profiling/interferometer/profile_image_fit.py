@@ -1,9 +1,10 @@
 import autolens as al
 
+from profiling import profiling_util
+
 import numpy as np
-import time
 
-repeats = 5
+profiler = profiling_util.Profiler(name="interferometer/profile_image_fit", repeats=5)
 
 total_visibilities = 50000
 
@@ -77,38 +78,27 @@ print(
     + "\n"
 )
 
-start_overall = time.time()
 
 tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="traced_grid"):
     traced_grid = tracer.traced_grids_of_planes_from_grid(
         grid=masked_interferometer.grid
     )[-1]
-diff = time.time() - start
-print("Time to Setup Traced Grid = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="profile_image"):
     tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
     profile_image = tracer.profile_image_from_grid(grid=masked_interferometer.grid)
-diff = time.time() - start
-print("Time to create profile image = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="profile_visibilities"):
     visibilities = tracer.profile_visibilities_from_grid_and_transformer(
         grid=masked_interferometer.grid, transformer=masked_interferometer.transformer
     )
-diff = time.time() - start
-print("Time to create profile visibilities = {}".format(diff / repeats))
 
-start = time.time()
-for i in range(repeats):
+for _ in profiler.timed(stage="fit"):
     tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
     al.fit(masked_dataset=masked_interferometer, tracer=tracer)
-diff = time.time() - start
-print("Time to perform complete fit = {}".format(diff / repeats))
 
 print()
+
+profiler.output()
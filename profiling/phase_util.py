@@ -0,0 +1,433 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from autoarray.operators import convolver, transformer
+from autoarray.operators.inversion import inversions, mappers, pixelizations
+from autoarray.operators.inversion import regularization
+from autoarray.util import inversion_util
+from autolens.lens import ray_tracing
+
+"""
+The profiling scripts in 'profiling/imaging' and 'profiling/interferometer' time each stage of a likelihood evaluation
+for a fixed lens model on simulated data. This module times the same stages during the fit of a real phase, such that
+we can see where the run-time goes for real data, masks, pixelizations and priors.
+
+Profiling a phase is opt-in, and is turned on by passing the phase to *profile_phase* before it is run:
+
+    phase = al.PhaseImaging(...)
+
+    phase_util.profile_phase(phase=phase)
+
+    phase.run(dataset=imaging, mask=mask)
+
+Every likelihood evaluation of the non-linear search then times each stage (e.g. the traced grid, mapper, blurred
+mapping matrix, curvature matrix and solve) and adds its run-time to a histogram of that stage's run-times. The
+histograms are output to the folder 'profiling' in the phase's output folder, as the files:
+
+- 'stage_times.json': the run-time statistics and histogram of every stage.
+- 'stage_times.summary': a readable summary of the mean and percentile run-times of every stage.
+
+These are output every *output_interval* likelihood evaluations and whenever the phase is visualized.
+
+The stages are timed by wrapping the autolens / autoarray methods that perform them, and the wrappers are only in
+place during a likelihood evaluation of a profiled phase, so visualization and other phases are not timed. Stages
+can be nested (e.g. the blurred mapping matrix is computed inside the inversion), and the time of a stage includes
+the time of the stages nested inside it. The 'solve' stage is the time of the inversion excluding its nested stages,
+which is dominated by solving for the reconstruction.
+"""
+
+"""The methods wrapped to time each stage, as (class or module, method name, stage)."""
+stage_methods = [
+    (
+        ray_tracing.AbstractTracerLensing,
+        "traced_grids_of_planes_from_grid",
+        "traced_grid",
+    ),
+    (
+        ray_tracing.AbstractTracerData,
+        "traced_sparse_grids_of_planes_from_grid",
+        "traced_sparse_grid",
+    ),
+    (
+        ray_tracing.AbstractTracerData,
+        "blurred_profile_image_from_grid_and_convolver",
+        "blurred_profile_image",
+    ),
+    (
+        ray_tracing.AbstractTracerData,
+        "profile_visibilities_from_grid_and_transformer",
+        "profile_visibilities",
+    ),
+    (pixelizations.Rectangular, "mapper_from_grid_and_sparse_grid", "mapper"),
+    (pixelizations.Voronoi, "mapper_from_grid_and_sparse_grid", "mapper"),
+    (mappers.Mapper, "mapping_matrix", "mapping_matrix"),
+    (convolver.Convolver, "convolve_mapping_matrix", "blurred_mapping_matrix"),
+    (
+        transformer.Transformer,
+        "transformed_mapping_matrices_from_mapping_matrix",
+        "transformed_mapping_matrices",
+    ),
+    (
+        inversion_util,
+        "data_vector_from_blurred_mapping_matrix_and_data",
+        "data_vector",
+    ),
+    (
+        inversion_util,
+        "data_vector_from_transformed_mapping_matrix_and_data",
+        "data_vector",
+    ),
+    (
+        inversion_util,
+        "curvature_matrix_from_blurred_mapping_matrix",
+        "curvature_matrix",
+    ),
+    (
+        inversion_util,
+        "curvature_matrix_from_transformed_mapping_matrix",
+        "curvature_matrix",
+    ),
+    (
+        regularization.Constant,
+        "regularization_matrix_from_mapper",
+        "regularization_matrix",
+    ),
+    (
+        regularization.AdaptiveBrightness,
+        "regularization_matrix_from_mapper",
+        "regularization_matrix",
+    ),
+    (inversions.InversionImaging, "from_data_mapper_and_regularization", "inversion"),
+    (
+        inversions.InversionInterferometer,
+        "from_data_mapper_and_regularization",
+        "inversion",
+    ),
+    (inversions.Inversion, "log_determinant_of_matrix_cholesky", "log_determinant"),
+]
+
+"""Stages whose run-time excluding their nested stages is also recorded, as a stage of the given name."""
+exclusive_stages = {"inversion": "solve"}
+
+
+class StageHistogram:
+    def __init__(self, stage, min_time=1.0e-7, max_time=1.0e3, bins_per_decade=10):
+        """A histogram of the run-times of a stage, with logarithmically spaced bins.
+
+        Run-times are added to the histogram rather than stored, such that the memory used does not grow with the
+        number of likelihood evaluations of the phase. Run-times outside the histogram's range are added to its first
+        or last bin.
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage.
+        min_time : float
+            The lower edge of the histogram's first bin in seconds.
+        max_time : float
+            The upper edge of the histogram's last bin in seconds.
+        bins_per_decade : int
+            The number of bins per factor of 10 in run-time.
+        """
+        self.stage = stage
+
+        bins = int(round(np.log10(max_time / min_time) * bins_per_decade))
+
+        self.bin_edges = np.logspace(np.log10(min_time), np.log10(max_time), bins + 1)
+        self.counts = np.zeros(bins, dtype="int")
+
+        self.total = 0.0
+        self.total_squared = 0.0
+        self.min = np.inf
+        self.max = 0.0
+
+    @property
+    def count(self):
+        return int(np.sum(self.counts))
+
+    def add(self, time):
+
+        index = np.searchsorted(self.bin_edges, time, side="right") - 1
+        index = min(max(index, 0), self.counts.shape[0] - 1)
+
+        self.counts[index] += 1
+
+        self.total += time
+        self.total_squared += time ** 2
+        self.min = min(self.min, time)
+        self.max = max(self.max, time)
+
+    @property
+    def mean(self):
+        return self.total / self.count
+
+    @property
+    def std(self):
+        return float(
+            np.sqrt(max(self.total_squared / self.count - self.mean ** 2, 0.0))
+        )
+
+    def percentile(self, percentile):
+        """Estimate a percentile of the run-times from the histogram, by interpolating within the bin containing it
+        (in log run-time)."""
+        cumulative = np.cumsum(self.counts) / self.count
+
+        index = int(np.searchsorted(cumulative, percentile / 100.0))
+        index = min(index, self.counts.shape[0] - 1)
+
+        lower = cumulative[index - 1] if index > 0 else 0.0
+        fraction = (percentile / 100.0 - lower) / max(cumulative[index] - lower, 1e-12)
+
+        log_edges = np.log10(self.bin_edges[index : index + 2])
+
+        time = 10.0 ** (log_edges[0] + fraction * (log_edges[1] - log_edges[0]))
+
+        return float(min(max(time, self.min), self.max))
+
+    @property
+    def summary(self):
+        return {
+            "stage": self.stage,
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+            "p5": self.percentile(5),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+        }
+
+
+class StageTimer:
+    def __init__(self):
+        """Times the stages of likelihood evaluations, adding the run-time of every stage to its *StageHistogram*.
+
+        The stages are timed by wrapping the methods in *stage_methods* whilst the timer is entered as a context
+        manager:
+
+            with stage_timer:
+                fit = al.fit(masked_dataset=masked_imaging, tracer=tracer)
+        """
+        self.histograms = {}
+        self.originals = None
+        self.stack = []
+
+    def add(self, stage, time):
+
+        if stage not in self.histograms:
+            self.histograms[stage] = StageHistogram(stage=stage)
+
+        self.histograms[stage].add(time=time)
+
+    def timed_call(self, stage, func, *args, **kwargs):
+        """Call a function, adding its run-time to the stage's histogram.
+
+        Stages nested in a stage of the same name (e.g. a method calling the method it overrides) are not timed
+        separately, so they are not counted twice.
+        """
+        if any(active_stage == stage for active_stage, _ in self.stack):
+            return func(*args, **kwargs)
+
+        nested_times = [0.0]
+
+        self.stack.append((stage, nested_times))
+
+        start = time.perf_counter()
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+
+            stage_time = time.perf_counter() - start
+
+            self.stack.pop()
+
+            if len(self.stack) > 0:
+                self.stack[-1][1][0] += stage_time
+
+            self.add(stage=stage, time=stage_time)
+
+            if stage in exclusive_stages:
+                self.add(
+                    stage=exclusive_stages[stage], time=stage_time - nested_times[0]
+                )
+
+    def wrapper_for(self, attribute, stage):
+        """Wrap a method, static method, class method, property or function such that calls to it are timed."""
+        timer = self
+
+        if isinstance(attribute, property):
+            return property(
+                lambda obj: timer.timed_call(stage, attribute.fget, obj),
+                attribute.fset,
+            )
+
+        if isinstance(attribute, staticmethod):
+            func = attribute.__func__
+            return staticmethod(
+                lambda *args, **kwargs: timer.timed_call(stage, func, *args, **kwargs)
+            )
+
+        if isinstance(attribute, classmethod):
+            func = attribute.__func__
+            return classmethod(
+                lambda cls, *args, **kwargs: timer.timed_call(
+                    stage, func, cls, *args, **kwargs
+                )
+            )
+
+        return lambda *args, **kwargs: timer.timed_call(
+            stage, attribute, *args, **kwargs
+        )
+
+    def __enter__(self):
+
+        self.originals = []
+
+        for owner, name, stage in stage_methods:
+
+            attribute = (
+                owner.__dict__[name]
+                if isinstance(owner, type)
+                else getattr(owner, name)
+            )
+
+            self.originals.append((owner, name, attribute))
+
+            setattr(owner, name, self.wrapper_for(attribute=attribute, stage=stage))
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+
+        for owner, name, attribute in reversed(self.originals):
+            setattr(owner, name, attribute)
+
+        self.originals = None
+        self.stack = []
+
+    @property
+    def summaries(self):
+        return [histogram.summary for histogram in self.histograms.values()]
+
+    def summary_str(self):
+        """A readable summary of the run-time of every stage, including the fraction of the total run-time of the
+        likelihood evaluations spent in each stage."""
+        fit_total = self.histograms["fit"].total if "fit" in self.histograms else np.nan
+
+        lines = [
+            "{:<30}{:>10}{:>14}{:>14}{:>14}{:>10}".format(
+                "stage", "count", "mean", "p50", "p95", "of fit"
+            )
+        ]
+
+        for summary in self.summaries:
+            lines.append(
+                "{:<30}{:>10}{:>14.6f}{:>14.6f}{:>14.6f}{:>9.1f}%".format(
+                    summary["stage"],
+                    summary["count"],
+                    summary["mean"],
+                    summary["p50"],
+                    summary["p95"],
+                    100.0 * summary["total"] / fit_total,
+                )
+            )
+
+        return "\n".join(lines) + "\n"
+
+    def output(self, output_path):
+        """Output the run-time statistics and histograms of every stage to the folder *output_path*."""
+        os.makedirs(output_path, exist_ok=True)
+
+        with open(os.path.join(output_path, "stage_times.json"), "w") as f:
+            json.dump(
+                {
+                    "stages": self.summaries,
+                    "histograms": {
+                        stage: {
+                            "bin_edges": histogram.bin_edges.tolist(),
+                            "counts": histogram.counts.tolist(),
+                        }
+                        for stage, histogram in self.histograms.items()
+                    },
+                },
+                f,
+                indent=4,
+            )
+
+        with open(os.path.join(output_path, "stage_times.summary"), "w") as f:
+            f.write(self.summary_str())
+
+
+def profiled_analysis_class_from(analysis_class, output_path, output_interval=100):
+    """Create a subclass of a phase's *Analysis* class whose likelihood evaluations are timed by a *StageTimer*.
+
+    Parameters
+    ----------
+    analysis_class : type
+        The *Analysis* class of the phase (e.g. *PhaseImaging.Analysis*).
+    output_path : func
+        A function returning the folder the stage times are output to, which is called when they are output such
+        that the phase's output path does not need to be known when the phase is created.
+    output_interval : int
+        The stage times are output every time this many likelihood evaluations are performed.
+    """
+
+    class ProfiledAnalysis(analysis_class):
+        def __init__(self, *args, **kwargs):
+
+            super().__init__(*args, **kwargs)
+
+            self.stage_timer = StageTimer()
+            self.fits = 0
+
+        def fit(self, instance):
+
+            self.fits += 1
+
+            try:
+                with self.stage_timer:
+                    return self.stage_timer.timed_call("fit", super().fit, instance)
+            finally:
+                if self.fits % output_interval == 0:
+                    self.output_stage_times()
+
+        def visualize(self, instance, during_analysis):
+
+            self.output_stage_times()
+
+            return super().visualize(instance=instance, during_analysis=during_analysis)
+
+        def output_stage_times(self):
+            if len(self.stage_timer.histograms) > 0:
+                self.stage_timer.output(output_path=output_path())
+
+    ProfiledAnalysis.__name__ = "Profiled" + analysis_class.__name__
+
+    return ProfiledAnalysis
+
+
+def profile_phase(phase, output_interval=100):
+    """Turn on the timing of every stage of the likelihood evaluations of a phase (see the module docstring).
+
+    Parameters
+    ----------
+    phase : al.PhaseImaging or al.PhaseInterferometer
+        The phase whose likelihood evaluations are profiled.
+    output_interval : int
+        The stage times are output every time this many likelihood evaluations are performed.
+    """
+    phase.Analysis = profiled_analysis_class_from(
+        analysis_class=phase.Analysis,
+        output_path=lambda: os.path.join(
+            phase.optimizer.paths.phase_output_path, "profiling"
+        ),
+        output_interval=output_interval,
+    )
+
+    return phase
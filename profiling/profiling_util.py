@@ -1,37 +1,280 @@
+import csv
+import json
+import os
 import time
 
+import numpy as np
 
-def tick_toc_x1(func):
-    def wrapper():
-        start = time.time()
-        for _ in range(1):
-            func()
+"""
+The profiling scripts time every stage of a calculation via a *Profiler*, which:
 
-        diff = time.time() - start
-        print("{}: {}".format(func.__name__, diff / 1.0))
+- Runs each stage a number of warmup times before timing it, so that numba JIT compilation (which happens the first
+  time a numba function is called) is not included in the timings.
+- Repeats each stage and stores every individual run-time, so that the mean, median, spread and percentiles of the
+  run-time can be computed.
+- Outputs the run-times of every stage in a machine readable .json and .csv format.
 
-    return wrapper
+The number of repeats, warmups and the output file can be overwritten via the following environment variables, which
+are set by the profiling runner (see 'profiling/run.py') when it runs every profiling script:
 
+PROFILING_REPEATS - The number of timed runs of every stage.
+PROFILING_WARMUP - The number of un-timed runs of every stage performed before it is timed.
+PROFILING_OUTPUT_FILE - The .json file the results are output to (a .csv file of the same name is also output).
+PROFILING_GFLOPS - If 1, stages timed with a floating point operation count also report their GFLOP/s.
+"""
 
-def tick_toc_x10(func):
-    def wrapper():
-        start = time.time()
-        for _ in range(10):
-            func()
+percentiles = (5, 50, 95)
 
-        diff = time.time() - start
-        print("{}: {}".format(func.__name__, diff / 10.0))
 
-    return wrapper
+class StageTimes:
+    def __init__(self, stage, times, case=None, flops=None):
+        """The run-times of one stage of a profiling script (e.g. computing the blurred mapping matrix).
 
+        Parameters
+        ----------
+        stage : str
+            The name of the stage that was timed.
+        times : [float]
+            The run-time of every timed (e.g. non-warmup) run of the stage in seconds.
+        case : str or None
+            The case the stage was timed for (e.g. the data resolution 'hst'), such that the same stage can be timed for
+            many different inputs in one script.
+        flops : float or None
+            The number of floating point operations performed by one run of the stage, such that its GFLOP/s is
+            reported.
+        """
+        self.stage = stage
+        self.times = np.asarray(times, dtype="float")
+        self.case = case
+        self.flops = flops
 
-def tick_toc_x20(func):
-    def wrapper():
-        start = time.time()
-        for _ in range(10):
-            func()
+    @property
+    def repeats(self):
+        return self.times.shape[0]
 
-        diff = time.time() - start
-        print("{}: {}".format(func.__name__, diff / 20.0))
+    @property
+    def mean(self):
+        return float(np.mean(self.times))
 
-    return wrapper
+    @property
+    def median(self):
+        return float(np.median(self.times))
+
+    @property
+    def std(self):
+        return float(np.std(self.times))
+
+    @property
+    def min(self):
+        return float(np.min(self.times))
+
+    @property
+    def max(self):
+        return float(np.max(self.times))
+
+    def percentile(self, percentile):
+        return float(np.percentile(self.times, percentile))
+
+    @property
+    def gflops(self):
+        """The GFLOP/s of the stage, computed from its median run-time."""
+        return self.flops * 1.0e-9 / self.median
+
+    @property
+    def summary(self):
+        """A dictionary summarizing the run-time statistics of this stage, used for .json and .csv output."""
+        summary = {
+            "case": self.case,
+            "stage": self.stage,
+            "repeats": self.repeats,
+            "mean": self.mean,
+            "median": self.median,
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+        }
+
+        for percentile in percentiles:
+            summary["p{}".format(percentile)] = self.percentile(percentile)
+
+        if self.flops is not None:
+            summary["gflops"] = self.gflops
+
+        return summary
+
+    def __str__(self):
+
+        string = "{} = {:.6f} (median = {:.6f}, std = {:.6f}, p95 = {:.6f})".format(
+            self.stage, self.mean, self.median, self.std, self.percentile(95)
+        )
+
+        if self.flops is not None:
+            string += " [{:.3f} GFLOP/s]".format(self.gflops)
+
+        return string
+
+
+class Profiler:
+    def __init__(
+        self, name, repeats=10, warmup=1, output_file=None, report_gflops=False
+    ):
+        """Times the stages of a profiling script and outputs their run-time statistics.
+
+        A stage is timed by looping over *Profiler.timed*, which runs the body of the loop *warmup* times without timing
+        it and then *repeats* times timing each individual run:
+
+            for _ in profiler.timed(stage="blurred_mapping_matrix"):
+                blurred_mapping_matrix = convolver.convolve_mapping_matrix(mapping_matrix=mapping_matrix)
+
+        Parameters
+        ----------
+        name : str
+            The name of the profiling script (e.g. 'imaging/inversion_voronoi_magnification_fit').
+        repeats : int
+            The number of timed runs of every stage, which is overwritten by the PROFILING_REPEATS environment variable.
+        warmup : int
+            The number of un-timed runs of every stage performed before timing, such that numba JIT compilation is not
+            timed. This is overwritten by the PROFILING_WARMUP environment variable.
+        output_file : str or None
+            The .json file the results are output to, which if None is set via the PROFILING_OUTPUT_FILE environment
+            variable. If neither is set, results are only printed.
+        report_gflops : bool
+            If *True*, stages timed with a floating point operation count report their GFLOP/s. This is overwritten by
+            the PROFILING_GFLOPS environment variable.
+        """
+        self.name = name
+        self.repeats = int(os.environ.get("PROFILING_REPEATS", repeats))
+        self.warmup = int(os.environ.get("PROFILING_WARMUP", warmup))
+        self.report_gflops = bool(
+            int(os.environ.get("PROFILING_GFLOPS", int(report_gflops)))
+        )
+
+        if output_file is None:
+            output_file = os.environ.get("PROFILING_OUTPUT_FILE")
+
+        self.output_file = output_file
+        self.case = None
+        self.stage_times = []
+
+    def timed(self, stage, flops=None):
+        """Generator used to time the body of a for loop over it (see the class docstring).
+
+        If the number of floating point operations *flops* of the body is input and GFLOP/s are reported, the stage
+        also reports its GFLOP/s."""
+        for _ in range(self.warmup):
+            yield
+
+        times = []
+
+        for _ in range(self.repeats):
+            start = time.perf_counter()
+            yield
+            times.append(time.perf_counter() - start)
+
+        self.add_stage_times(
+            stage=stage, times=times, flops=flops if self.report_gflops else None
+        )
+
+    def time_func(self, stage, func):
+        """Time a function which takes no arguments, returning the result of its final call."""
+        result = None
+
+        for _ in self.timed(stage=stage):
+            result = func()
+
+        return result
+
+    def add_stage_times(self, stage, times, flops=None):
+
+        stage_times = StageTimes(stage=stage, times=times, case=self.case, flops=flops)
+
+        self.stage_times.append(stage_times)
+
+        print(stage_times)
+
+        return stage_times
+
+    def stage_times_of_case(self, case):
+        return [
+            stage_times for stage_times in self.stage_times if stage_times.case == case
+        ]
+
+    @property
+    def summaries(self):
+        return [stage_times.summary for stage_times in self.stage_times]
+
+    @property
+    def info(self):
+        """Information on how the profiling script was run, which is output with its results."""
+        return {
+            "name": self.name,
+            "repeats": self.repeats,
+            "warmup": self.warmup,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+    def output_to_json(self, file_path):
+
+        with open(file_path, "w") as f:
+            json.dump(
+                {
+                    "info": self.info,
+                    "stages": self.summaries,
+                    "times": [
+                        stage_times.times.tolist() for stage_times in self.stage_times
+                    ],
+                },
+                f,
+                indent=4,
+            )
+
+    def output_to_csv(self, file_path):
+        output_summaries_to_csv(summaries=self.summaries, file_path=file_path)
+
+    def output(self):
+        """Output the results to the .json and .csv files specified by *output_file*, if it is set."""
+        if self.output_file is None:
+            return
+
+        output_dir = os.path.dirname(self.output_file)
+
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        self.output_to_json(file_path=self.output_file)
+        self.output_to_csv(file_path=os.path.splitext(self.output_file)[0] + ".csv")
+
+
+def output_summaries_to_csv(summaries, file_path):
+    """Output a list of stage summaries (see *StageTimes.summary*) to a .csv file, with one row per stage."""
+    fieldnames = []
+
+    for summary in summaries:
+        for key in summary:
+            if key not in fieldnames:
+                fieldnames.append(key)
+
+    with open(file_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for summary in summaries:
+            writer.writerow(summary)
+
+
+def tick_toc(repeats, warmup=1):
+    """Decorator which times a function taking no arguments via a *Profiler*, printing its run-time statistics."""
+
+    def decorator(func):
+        def wrapper():
+            profiler = Profiler(name=func.__name__, repeats=repeats, warmup=warmup)
+            profiler.time_func(stage=func.__name__, func=func)
+            return profiler
+
+        return wrapper
+
+    return decorator
+
+
+tick_toc_x1 = tick_toc(repeats=1)
+tick_toc_x10 = tick_toc(repeats=10)
+tick_toc_x20 = tick_toc(repeats=20)
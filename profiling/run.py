@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from profiling import profiling_util
+from profiling import store_util
+
+"""
+Runs every profiling script in the profiling suites (the 'imaging', 'interferometer' and 'funcs' folders), collecting
+the run-time statistics each script outputs via its *Profiler* into one .json and .csv file.
+
+Every script is run in its own Python process, such that numba JIT compilation and memory use of one script does not
+impact another. Scripts which do not use a *Profiler* have their total run-time recorded as a single stage. Scripts
+which fail or time out are recorded with the status 'failed' or 'timeout' and no stages, such that their run-times
+are not compared to those of complete runs.
+
+The results of every run are also stored in the profiling results store (see 'profiling/store_util.py'), keyed by the
+git commit, autolens version, CPU model and thread count, such that runs can be compared with 'profiling/compare.py'.
+
+Before running the profiling scripts, you must generate the profiling datasets (see 'profiling/doc').
+
+Example usage (from the autolens_workspace folder):
+
+    python3 profiling/run.py imaging interferometer --repeats 10 --warmup 1
+
+    python3 profiling/run.py funcs --match f_matrix --output_path output/profiling/f_matrix
+"""
+
+profiling_path = os.path.dirname(os.path.realpath(__file__))
+workspace_path = os.path.dirname(profiling_path)
+
+suites = ["imaging", "interferometer", "funcs"]
+
+
+def script_paths_from_suite(suite, match=None):
+    """Discover every profiling script in a suite, omitting package files and the dataset simulators.
+
+    Parameters
+    ----------
+    suite : str
+        The name of the suite, which is the folder in 'profiling' its scripts are in (e.g. 'imaging').
+    match : str or None
+        If input, only scripts whose path relative to the 'profiling' folder contains this string are returned.
+    """
+    script_paths = []
+
+    for root, dirs, files in os.walk(os.path.join(profiling_path, suite)):
+
+        dirs[:] = sorted(d for d in dirs if d not in ("simulator", "__pycache__"))
+
+        for file in sorted(files):
+
+            if not file.endswith(".py") or file == "__init__.py":
+                continue
+
+            script_path = os.path.join(root, file)
+
+            if match is not None and match not in script_name_from_path(script_path):
+                continue
+
+            script_paths.append(script_path)
+
+    return script_paths
+
+
+def script_name_from_path(script_path):
+    """The name of a script is its path relative to the 'profiling' folder without the extension, e.g.
+    'imaging/inversion_voronoi_magnification_fit'."""
+    name = os.path.relpath(script_path, profiling_path)
+    return os.path.splitext(name)[0].replace(os.sep, "/")
+
+
+def run_script(script_path, output_path, repeats=None, warmup=None, timeout=None):
+    """Run a profiling script in its own Python process, returning a dictionary of its results.
+
+    The results of scripts which use a *Profiler* are loaded from the .json file it outputs. Scripts which do not
+    use a *Profiler* have their total run-time recorded as a single 'script' stage. Scripts which fail or time out
+    have their status ('failed' or 'timeout') recorded and no stages.
+
+    Parameters
+    ----------
+    script_path : str
+        The path to the profiling script.
+    output_path : str
+        The folder the script's .json and .csv output and its stdout / stderr log are written to.
+    repeats : int or None
+        If input, overwrites the number of repeats of every stage timed by the script.
+    warmup : int or None
+        If input, overwrites the number of warmup runs of every stage timed by the script.
+    timeout : float or None
+        The maximum run-time of the script in seconds, after which it is terminated.
+    """
+    name = script_name_from_path(script_path)
+    file_name = name.replace("/", "__")
+
+    output_file = os.path.join(output_path, file_name + ".json")
+    log_file = os.path.join(output_path, file_name + ".log")
+
+    if os.path.exists(output_file):
+        os.remove(output_file)
+
+    env = dict(os.environ)
+    env["PROFILING_OUTPUT_FILE"] = output_file
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [workspace_path, env.get("PYTHONPATH")])
+    )
+
+    if repeats is not None:
+        env["PROFILING_REPEATS"] = str(repeats)
+
+    if warmup is not None:
+        env["PROFILING_WARMUP"] = str(warmup)
+
+    print("Running {}".format(name))
+
+    start = time.perf_counter()
+
+    with open(log_file, "w") as log:
+        try:
+            returncode = subprocess.call(
+                [sys.executable, script_path],
+                cwd=os.path.dirname(script_path),
+                env=env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            returncode = None
+
+    script_time = time.perf_counter() - start
+
+    status = store_util.status_from_returncode(returncode=returncode)
+
+    result = {
+        "name": name,
+        "status": status,
+        "returncode": returncode,
+        "script_time": script_time,
+    }
+
+    if status != "ok":
+        result["stages"] = []
+        print(
+            "{} {} (return code {}), see {}".format(name, status, returncode, log_file)
+        )
+    elif os.path.exists(output_file):
+        with open(output_file) as f:
+            result.update(json.load(f))
+    else:
+        result["stages"] = [
+            {"case": None, "stage": "script", "repeats": 1, "mean": script_time}
+        ]
+
+    return result
+
+
+def summaries_from_results(results):
+    """Flatten the stages of every script's results into one list of summaries, labelled by script name."""
+    summaries = []
+
+    for result in results:
+        for summary in result["stages"]:
+            summaries.append({"script": result["name"], **summary})
+
+    return summaries
+
+
+def run(
+    suites=suites,
+    output_path=None,
+    match=None,
+    repeats=None,
+    warmup=None,
+    timeout=None,
+    store_path=store_util.default_store_path,
+):
+
+    info = store_util.run_info()
+
+    if info["git_dirty"]:
+        print(
+            "Warning: the workspace has uncommitted changes, so git commit {} does not fully describe this run".format(
+                info["git_commit"][:8]
+            )
+        )
+
+    if output_path is None:
+        output_path = os.path.join(
+            workspace_path, "output", "profiling", time.strftime("%Y-%m-%d_%H-%M-%S")
+        )
+
+    os.makedirs(output_path, exist_ok=True)
+
+    results = []
+
+    for suite in suites:
+        for script_path in script_paths_from_suite(suite=suite, match=match):
+            results.append(
+                run_script(
+                    script_path=script_path,
+                    output_path=output_path,
+                    repeats=repeats,
+                    warmup=warmup,
+                    timeout=timeout,
+                )
+            )
+
+    with open(os.path.join(output_path, "results.json"), "w") as f:
+        json.dump(results, f, indent=4)
+
+    profiling_util.output_summaries_to_csv(
+        summaries=summaries_from_results(results=results),
+        file_path=os.path.join(output_path, "results.csv"),
+    )
+
+    print("Results output to {}".format(output_path))
+
+    failed_results = store_util.failed_results_from_run(run={"results": results})
+
+    if len(failed_results) > 0:
+        print(
+            "{} scripts failed or timed out: {}".format(
+                len(failed_results),
+                ", ".join(result["name"] for result in failed_results),
+            )
+        )
+
+    if store_path is not None:
+        file_path = store_util.store_run(
+            info=info, results=results, store_path=store_path
+        )
+        print("Results stored in {}".format(file_path))
+
+    return results
+
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(
+        description="Run the PyAutoLens profiling suites and output their run-times."
+    )
+    parser.add_argument(
+        "suites",
+        nargs="*",
+        default=suites,
+        choices=suites,
+        help="The profiling suites to run (default: all).",
+    )
+    parser.add_argument(
+        "--match",
+        default=None,
+        help="Only run scripts whose name contains this string.",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=None, help="Timed runs of every stage."
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=None, help="Un-timed runs before timing a stage."
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=None, help="Maximum run-time of a script (s)."
+    )
+    parser.add_argument(
+        "--output_path",
+        default=None,
+        help="The folder results are output to (default: output/profiling/<date>).",
+    )
+
+    parser.add_argument(
+        "--store_path",
+        default=store_util.default_store_path,
+        help="The folder of the profiling results store (default: output/profiling/store).",
+    )
+    parser.add_argument(
+        "--no_store",
+        action="store_true",
+        help="Do not store the results in the profiling results store.",
+    )
+
+    args = parser.parse_args(args=args)
+
+    run(
+        suites=args.suites,
+        output_path=args.output_path,
+        match=args.match,
+        repeats=args.repeats,
+        warmup=args.warmup,
+        timeout=args.timeout,
+        store_path=None if args.no_store else args.store_path,
+    )
+
+
+if __name__ == "__main__":
+    main()
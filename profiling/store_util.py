@@ -0,0 +1,360 @@
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+"""
+The profiling results store keeps the results of every run of the profiling runner (see 'profiling/run.py'), such
+that the run-times of PyAutoLens can be tracked over time and compared between two runs (see 'profiling/compare.py').
+
+Every run is stored as a .json file in the store folder, labelled by a key made from:
+
+- The git commit of the autolens_workspace the profiling scripts were run from.
+- The version of autolens that was profiled.
+- The CPU model of the machine the profiling scripts were run on.
+- The number of threads available to numba / numpy.
+
+Run-times are only comparable between runs on the same CPU model with the same number of threads, which is why both
+are part of the key.
+"""
+
+workspace_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+default_store_path = os.path.join(workspace_path, "output", "profiling", "store")
+
+
+def git_commit():
+    """The git commit of the autolens_workspace, or 'unknown' if it is not a git repository."""
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=workspace_path, stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+    return commit.decode().strip()
+
+
+def git_is_dirty():
+    """Whether the autolens_workspace has uncommitted changes, in which case its git commit does not fully describe
+    the profiling scripts that were run."""
+    try:
+        status = subprocess.check_output(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=workspace_path,
+            stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+    return len(status.strip()) > 0
+
+
+def autolens_version():
+    try:
+        import autolens
+
+        return autolens.__version__
+    except ImportError:
+        return "unknown"
+
+
+def cpu_model():
+    """The CPU model name, read from /proc/cpuinfo on Linux and *platform.processor* elsewhere."""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+
+    return platform.processor() or platform.machine() or "unknown"
+
+
+def thread_count():
+    """The number of threads available to numba, which is the number of CPUs unless NUMBA_NUM_THREADS is set."""
+    try:
+        import numba
+
+        return int(numba.config.NUMBA_NUM_THREADS)
+    except (ImportError, AttributeError):
+        return os.cpu_count()
+
+
+def run_info():
+    """Information on the code and machine a run of the profiling scripts used, which keys it in the store."""
+    return {
+        "git_commit": git_commit(),
+        "git_dirty": git_is_dirty(),
+        "autolens_version": autolens_version(),
+        "cpu_model": cpu_model(),
+        "threads": thread_count(),
+        "omp_num_threads": os.environ.get("OMP_NUM_THREADS"),
+        "python_version": platform.python_version(),
+        "numpy_version": np.__version__,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def machine_key_from_info(info):
+    """The part of a run's key describing the machine, which must match for two runs' run-times to be comparable."""
+    cpu = "".join(c if c.isalnum() else "_" for c in info["cpu_model"])
+    cpu = "_".join(filter(None, cpu.split("_")))
+    return "{}__threads_{}".format(cpu, info["threads"])
+
+
+def key_from_info(info):
+    """The key of a run in the store, e.g. '2020-02-01T12-00-00__1a2b3c4d__autolens_0.40.0__Intel_Xeon__threads_8'."""
+    return "{}__{}__autolens_{}__{}".format(
+        info["created"].replace(":", "-"),
+        info["git_commit"][:8],
+        info["autolens_version"],
+        machine_key_from_info(info=info),
+    )
+
+
+def store_run(info, results, store_path=default_store_path):
+    """Store the results of a run of the profiling runner, returning the path of the .json file it is stored in.
+
+    Parameters
+    ----------
+    info : dict
+        The run information (see *run_info*) which keys the run.
+    results : [dict]
+        The results of every profiling script that was run (see *run.run_script*).
+    store_path : str
+        The folder of the store.
+    """
+    os.makedirs(store_path, exist_ok=True)
+
+    file_path = os.path.join(store_path, key_from_info(info=info) + ".json")
+
+    with open(file_path, "w") as f:
+        json.dump({"info": info, "results": results}, f, indent=4)
+
+    return file_path
+
+
+def load_run(file_path):
+    """Load a stored run, or the 'results.json' file output by the profiling runner (which has no run info)."""
+    with open(file_path) as f:
+        run = json.load(f)
+
+    if isinstance(run, list):
+        run = {"info": {}, "results": run}
+
+    return run
+
+
+def stored_run_paths(store_path=default_store_path):
+    """The paths of every run in the store, ordered from oldest to newest."""
+    if not os.path.isdir(store_path):
+        return []
+
+    return [
+        os.path.join(store_path, file)
+        for file in sorted(os.listdir(store_path))
+        if file.endswith(".json")
+    ]
+
+
+def find_run_path(run, store_path=default_store_path, machine_key=None):
+    """Find the path of a run from a description of it, which is one of:
+
+    - The path of a stored run or of a 'results.json' file.
+    - 'latest' or 'previous', the newest or second newest run in the store.
+    - A git commit (or a prefix of one), or any other part of a run's key (e.g. 'autolens_0.40.0'), which selects the
+      newest run in the store whose key contains it.
+
+    Parameters
+    ----------
+    run : str
+        The description of the run.
+    store_path : str
+        The folder of the store.
+    machine_key : str or None
+        If input, only stored runs on this machine (see *machine_key_from_info*) are searched.
+    """
+    if os.path.isfile(run):
+        return run
+
+    paths = stored_run_paths(store_path=store_path)
+
+    if machine_key is not None:
+        paths = [path for path in paths if machine_key in os.path.basename(path)]
+
+    if run in ("latest", "previous"):
+        index = -1 if run == "latest" else -2
+        if len(paths) < -index:
+            raise FileNotFoundError(
+                "The store {} does not contain a {} run".format(store_path, run)
+            )
+        return paths[index]
+
+    matches = [path for path in paths if run in os.path.basename(path)]
+
+    if len(matches) == 0:
+        raise FileNotFoundError(
+            "No run matching {} was found in the store {}".format(run, store_path)
+        )
+
+    return matches[-1]
+
+
+def status_from_returncode(returncode):
+    """The status of a profiling script's run from the return code of its process, which is None if it timed out."""
+    if returncode is None:
+        return "timeout"
+    if returncode != 0:
+        return "failed"
+    return "ok"
+
+
+def status_from_result(result):
+    """The status of a profiling script's run, 'ok', 'failed' or 'timeout'. Runs stored before the status was recorded
+    have it inferred from their return code."""
+    if "status" in result:
+        return result["status"]
+
+    return status_from_returncode(returncode=result.get("returncode", 0))
+
+
+def failed_results_from_run(run):
+    """The results of every profiling script of a run which failed or timed out."""
+    return [result for result in run["results"] if status_from_result(result) != "ok"]
+
+
+def stage_times_from_run(run):
+    """Map every (script, case, stage) of a run to the summary of its run-time statistics and individual times.
+
+    Scripts which failed or timed out are omitted, as their run-times do not describe a complete run of the script."""
+    stage_times = {}
+
+    for result in run["results"]:
+
+        if status_from_result(result) != "ok":
+            continue
+
+        times = result.get("times", [None] * len(result["stages"]))
+
+        for summary, stage_time in zip(result["stages"], times):
+
+            key = (result["name"], summary.get("case"), summary["stage"])
+
+            stage_times[key] = {**summary, "times": stage_time}
+
+    return stage_times
+
+
+def compare_stage(baseline, current, threshold=0.1, sigma=3.0):
+    """Compare the run-time of one stage between a baseline and current run.
+
+    A stage is flagged as a regression (or improvement) only if its median run-time changed by more than the
+    fractional *threshold* and by more than *sigma* times the noise of the two runs, estimated by their combined
+    standard deviation. This means stages whose run-times are noisy are not flagged by chance.
+
+    Parameters
+    ----------
+    baseline : dict
+        The summary of the stage's run-time statistics in the baseline run (see *profiling_util.StageTimes.summary*).
+    current : dict
+        The summary of the stage's run-time statistics in the current run.
+    threshold : float
+        The fractional change in median run-time above which a stage is flagged (e.g. 0.1 is 10%).
+    sigma : float
+        The number of standard deviations of noise the change in median run-time must exceed to be flagged.
+    """
+    baseline_time = baseline.get("median", baseline["mean"])
+    current_time = current.get("median", current["mean"])
+
+    change = current_time - baseline_time
+    ratio = current_time / baseline_time if baseline_time > 0.0 else np.inf
+
+    noise = np.sqrt(baseline.get("std", 0.0) ** 2 + current.get("std", 0.0) ** 2)
+
+    significant = abs(change) > sigma * noise
+
+    if significant and ratio > 1.0 + threshold:
+        status = "regression"
+    elif significant and ratio < 1.0 / (1.0 + threshold):
+        status = "improvement"
+    else:
+        status = "unchanged"
+
+    return {
+        "baseline": baseline_time,
+        "current": current_time,
+        "ratio": float(ratio),
+        "noise": float(noise),
+        "status": status,
+    }
+
+
+def compare_runs(baseline_run, current_run, threshold=0.1, sigma=3.0, stages=None):
+    """Compare every stage that was timed in both a baseline and current run (see *compare_stage*).
+
+    Every script which failed or timed out in the current run is also returned, with its status ('failed' or
+    'timeout') and no run-times, whatever *stages* are compared.
+
+    Parameters
+    ----------
+    baseline_run : dict
+        The baseline run (see *load_run*).
+    current_run : dict
+        The current run.
+    threshold : float
+        The fractional change in median run-time above which a stage is flagged.
+    sigma : float
+        The number of standard deviations of noise the change in median run-time must exceed to be flagged.
+    stages : [str] or None
+        If input, only stages with these names are compared (e.g. ['traced_grid', 'mapper']).
+    """
+    baseline_stage_times = stage_times_from_run(run=baseline_run)
+    current_stage_times = stage_times_from_run(run=current_run)
+
+    comparisons = []
+
+    for key, current in current_stage_times.items():
+
+        script, case, stage = key
+
+        if stages is not None and stage not in stages:
+            continue
+
+        if key not in baseline_stage_times:
+            continue
+
+        comparisons.append(
+            {
+                "script": script,
+                "case": case,
+                "stage": stage,
+                **compare_stage(
+                    baseline=baseline_stage_times[key],
+                    current=current,
+                    threshold=threshold,
+                    sigma=sigma,
+                ),
+            }
+        )
+
+    for result in failed_results_from_run(run=current_run):
+
+        comparisons.append(
+            {
+                "script": result["name"],
+                "case": None,
+                "stage": "script",
+                "baseline": None,
+                "current": None,
+                "ratio": None,
+                "noise": None,
+                "status": status_from_result(result),
+            }
+        )
+
+    return comparisons
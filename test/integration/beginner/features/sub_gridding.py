@@ -41,6 +41,99 @@ mask = al.mask.circular(
 
 aplt.imaging.subplot_imaging(imaging=imaging, mask=mask)
 
+# Before running the pipeline, we benchmark the accuracy and run time of the lens's model image computed using a
+# uniform sub-grid size against an adaptive sub-grid (see 'autolens_workspace/tools/phase/adaptive_sub_grid.py'),
+# which only increases the sub-grid size of the pixels whose intensity is not converged. The model used is the
+# one the dataset was simulated with, and the accuracy is measured relative to a uniform sub-grid of size 32.
+
+import time
+
+import numpy as np
+
+from tools.phase import adaptive_sub_grid
+
+lens_galaxy = al.Galaxy(
+    redshift=0.5,
+    mass=al.mp.EllipticalIsothermal(
+        centre=(0.0, 0.0), einstein_radius=1.6, axis_ratio=0.7, phi=45.0
+    ),
+    shear=al.mp.ExternalShear(magnitude=0.05, phi=90.0),
+)
+
+source_galaxy = al.Galaxy(
+    redshift=1.0,
+    light=al.lp.EllipticalSersic(
+        centre=(0.1, 0.1),
+        axis_ratio=0.8,
+        phi=60.0,
+        intensity=0.3,
+        effective_radius=1.0,
+        sersic_index=2.5,
+    ),
+)
+
+tracer = al.Tracer.from_galaxies(galaxies=[lens_galaxy, source_galaxy])
+
+
+def profile_image_from_sub_size(sub_size):
+    grid = al.grid.from_mask(
+        mask=mask.mapping.mask_new_sub_size_from_mask(mask=mask, sub_size=sub_size)
+    )
+    return np.asarray(tracer.profile_image_from_grid(grid=grid).in_1d_binned)
+
+
+reference_image = profile_image_from_sub_size(sub_size=32)
+
+
+def print_benchmark(label, profile_image, run_time):
+
+    fractional_errors = np.abs(profile_image - reference_image) / np.abs(
+        reference_image
+    )
+
+    print(
+        label
+        + ": run time = {:.4f} s, mean fractional error = {:.2e}, maximum fractional error = {:.2e}".format(
+            run_time, np.mean(fractional_errors), np.max(fractional_errors)
+        )
+    )
+
+
+for sub_size in [1, 2, 4, 8, 16]:
+
+    start = time.time()
+    profile_image = profile_image_from_sub_size(sub_size=sub_size)
+    print_benchmark(
+        label="Uniform sub_size = " + str(sub_size),
+        profile_image=profile_image,
+        run_time=time.time() - start,
+    )
+
+for fractional_accuracy in [0.999, 0.9999, 0.99999]:
+
+    adaptive = adaptive_sub_grid.AdaptiveSubGrid(
+        mask=mask, fractional_accuracy=fractional_accuracy
+    )
+
+    start = time.time()
+    profile_image, sub_sizes = adaptive.profile_image_and_sub_sizes_from_tracer(
+        tracer=tracer
+    )
+    print_benchmark(
+        label="Adaptive fractional_accuracy = " + str(fractional_accuracy),
+        profile_image=profile_image,
+        run_time=time.time() - start,
+    )
+    print(
+        "    Pixels per sub_size = "
+        + str(
+            {
+                sub_size: int(np.sum(sub_sizes == sub_size))
+                for sub_size in adaptive.sub_sizes
+            }
+        )
+    )
+
 # We simply import the sub_gridding pipeline and pass the sub-grid size we want as an input parameter (which
 # for the pipeline below, is only used in phase 2).
 
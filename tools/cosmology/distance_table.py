@@ -0,0 +1,446 @@
+import math
+
+import numpy as np
+from astropy import constants
+
+from autoastro import dimensions as dim
+from autoastro import lensing
+from autoastro.galaxy import galaxy as g
+from autoastro.profiles import light_profiles as lp
+from autoastro.profiles.mass_profiles import dark_mass_profiles as dmp
+from autoastro.profiles.mass_profiles import mass_profiles as mp
+from autoastro.util import cosmology_util
+from autolens.lens import plane as pl
+from autolens.lens import ray_tracing
+
+"""
+Interpolated tables of cosmological distances, which replace the astropy cosmology calculations of PyAutoLens.
+
+Every unit conversion and multi-plane calculation of PyAutoLens computes its distances by calling the functions of
+the autoastro module 'cosmology_util', which call astropy. For example:
+
+ - A tracer's *traced_grids_of_planes_from_grid* computes the scaling factor between every pair of planes, which is
+   four astropy angular diameter distances, every time it traces a grid (e.g. every likelihood evaluation of a
+   multi-plane phase).
+
+ - *einstein_mass_in_units* (see 'tools/einstein_radii_and_mass.py') and *mass_within_circle_in_units* compute the
+   critical surface density, which is three distances and a unit conversion, every time they are called (e.g. for
+   every sample of a phase in the aggregator).
+
+Every call takes ~0.1-1 ms, as astropy integrates the Hubble function and converts units for every redshift. A
+*DistanceTable* instead integrates it once, for a cosmology, on a fine grid of redshifts, after which every distance
+is an interpolation of the table. Their fractional difference from astropy is below 1e-8 for the default redshift
+step of 1e-4.
+
+The tables are used by every tracer, plane, galaxy and profile (for every cosmology, with a table created the first
+time a cosmology is used) after calling:
+
+    distance_table.use_distance_tables()
+
+Redshifts above the maximum redshift of the tables, and unit conversions the tables do not support, use astropy as
+before. The run times of both are compared in 'profiling/funcs/cosmology/distance_table.py'.
+"""
+
+arcsec_per_radian = 180.0 * 3600.0 / math.pi
+
+
+class DistanceTable:
+    def __init__(self, cosmology, redshift_max=10.0, redshift_step=1.0e-4):
+        """A table of the comoving distance and Hubble function of a cosmology on a grid of redshifts, from which
+        the angular diameter distances, scaling factors and critical densities of *cosmology_util* are interpolated.
+
+        The comoving distance is integrated from the Hubble function using Simpson's rule on every redshift step and
+        interpolated linearly, such that the fractional error of the distances is of order *redshift_step* squared.
+
+        Parameters
+        ----------
+        cosmology : astropy.cosmology.FLRW
+            The cosmology whose distances are tabulated.
+        redshift_max : float
+            The maximum redshift of the table.
+        redshift_step : float
+            The step between the redshifts of the table.
+        """
+        self.cosmology = cosmology
+        self.redshift_max = redshift_max
+
+        total_redshifts = int(math.ceil(redshift_max / redshift_step)) + 1
+
+        self.redshifts = np.linspace(0.0, redshift_max, total_redshifts)
+
+        step = self.redshifts[1] - self.redshifts[0]
+
+        inverse_efuncs = cosmology.inv_efunc(self.redshifts)
+        inverse_efuncs_midpoints = cosmology.inv_efunc(self.redshifts[:-1] + step / 2.0)
+
+        self.hubble_distance = cosmology.hubble_distance.to("kpc").value
+
+        self.comoving_distances = np.zeros(total_redshifts)
+        self.comoving_distances[1:] = self.hubble_distance * np.cumsum(
+            step
+            / 6.0
+            * (
+                inverse_efuncs[:-1]
+                + 4.0 * inverse_efuncs_midpoints
+                + inverse_efuncs[1:]
+            )
+        )
+
+        self.efuncs_squared = cosmology.efunc(self.redshifts) ** 2.0
+
+        self.curvature = cosmology.Ok0
+
+        self.critical_densities_0_of_unit_masses = {}
+        self.critical_surface_density_constants_of_unit_masses = {}
+
+    def contains(self, *redshifts):
+        return all(0.0 <= redshift <= self.redshift_max for redshift in redshifts)
+
+    def transverse_comoving_distance_from_comoving_distance(self, comoving_distance):
+        """The transverse comoving distance of a (line-of-sight) comoving distance, which accounts for the curvature
+        of the cosmology."""
+        if self.curvature == 0.0:
+            return comoving_distance
+
+        sqrt_curvature = math.sqrt(abs(self.curvature))
+
+        if self.curvature > 0.0:
+            return (
+                self.hubble_distance
+                / sqrt_curvature
+                * math.sinh(sqrt_curvature * comoving_distance / self.hubble_distance)
+            )
+
+        return (
+            self.hubble_distance
+            / sqrt_curvature
+            * math.sin(sqrt_curvature * comoving_distance / self.hubble_distance)
+        )
+
+    def comoving_distance_from_redshift(self, redshift):
+        return float(np.interp(redshift, self.redshifts, self.comoving_distances))
+
+    def angular_diameter_distance_from_redshift(self, redshift):
+        """The angular diameter distance in kpc from Earth to a redshift."""
+        return self.transverse_comoving_distance_from_comoving_distance(
+            comoving_distance=self.comoving_distance_from_redshift(redshift=redshift)
+        ) / (1.0 + redshift)
+
+    def angular_diameter_distance_between_redshifts(self, redshift_0, redshift_1):
+        """The angular diameter distance in kpc between two redshifts."""
+        return self.transverse_comoving_distance_from_comoving_distance(
+            comoving_distance=self.comoving_distance_from_redshift(redshift=redshift_1)
+            - self.comoving_distance_from_redshift(redshift=redshift_0)
+        ) / (1.0 + redshift_1)
+
+    def arcsec_per_kpc_from_redshift(self, redshift):
+        return arcsec_per_radian / self.angular_diameter_distance_from_redshift(
+            redshift=redshift
+        )
+
+    def critical_density_from_redshift(self, redshift, unit_mass):
+        """The critical density of the Universe at a redshift in *unit_mass* per kpc^3."""
+        if unit_mass not in self.critical_densities_0_of_unit_masses:
+            self.critical_densities_0_of_unit_masses[
+                unit_mass
+            ] = self.cosmology.critical_density0.to(unit_mass + " / kpc^3").value
+
+        return self.critical_densities_0_of_unit_masses[unit_mass] * float(
+            np.interp(redshift, self.redshifts, self.efuncs_squared)
+        )
+
+    def critical_surface_density_between_redshifts(
+        self, redshift_0, redshift_1, unit_mass
+    ):
+        """The critical surface density in *unit_mass* per kpc^2 of a lens at *redshift_0* and source at
+        *redshift_1*."""
+        if unit_mass not in self.critical_surface_density_constants_of_unit_masses:
+            self.critical_surface_density_constants_of_unit_masses[unit_mass] = (
+                constants.c.to("kpc / s") ** 2.0
+                / (4 * math.pi * constants.G.to("kpc3 / (" + unit_mass + " s2)"))
+            ).value
+
+        return (
+            self.critical_surface_density_constants_of_unit_masses[unit_mass]
+            * self.angular_diameter_distance_from_redshift(redshift=redshift_1)
+            / (
+                self.angular_diameter_distance_between_redshifts(
+                    redshift_0=redshift_0, redshift_1=redshift_1
+                )
+                * self.angular_diameter_distance_from_redshift(redshift=redshift_0)
+            )
+        )
+
+    def scaling_factor_between_redshifts(self, redshift_0, redshift_1, redshift_final):
+        """The factor the deflection angles of a plane at *redshift_0* are scaled by when tracing a grid to a plane
+        at *redshift_1*, for a final plane at *redshift_final*."""
+        return (
+            self.angular_diameter_distance_between_redshifts(
+                redshift_0=redshift_0, redshift_1=redshift_1
+            )
+            * self.angular_diameter_distance_from_redshift(redshift=redshift_final)
+        ) / (
+            self.angular_diameter_distance_from_redshift(redshift=redshift_1)
+            * self.angular_diameter_distance_between_redshifts(
+                redshift_0=redshift_0, redshift_1=redshift_final
+            )
+        )
+
+    def fractional_error_from_redshifts(self, redshifts):
+        """The maximum fractional difference of the angular diameter distances of the table at the input redshifts
+        from those computed by astropy."""
+        return max(
+            abs(
+                self.angular_diameter_distance_from_redshift(redshift=redshift)
+                / self.cosmology.angular_diameter_distance(z=redshift).to("kpc").value
+                - 1.0
+            )
+            for redshift in redshifts
+        )
+
+
+class TabulatedCosmologyUtil:
+    def __init__(self, redshift_max=10.0, redshift_step=1.0e-4):
+        """A replacement of the autoastro module *cosmology_util*, whose functions have the same names, inputs and
+        outputs but interpolate a *DistanceTable* of the input cosmology.
+
+        The table of every cosmology is created the first time it is used, and is used by every later call for the
+        same cosmology (including copies of it, e.g. the cosmology of an unpickled tracer). Calls for cosmologies
+        without a Hubble function (which are not FLRW cosmologies), redshifts outside the table and units of length
+        other than kpc and arcsec use *cosmology_util*.
+
+        Parameters
+        ----------
+        redshift_max : float
+            The maximum redshift of the tables.
+        redshift_step : float
+            The step between the redshifts of the tables.
+        """
+        self.redshift_max = redshift_max
+        self.redshift_step = redshift_step
+
+        self.distance_tables = {}
+        self.distance_tables_of_ids = {}
+
+    def __getattr__(self, item):
+        return getattr(cosmology_util, item)
+
+    def distance_table_from_cosmology(self, cosmology, *redshifts):
+        """The *DistanceTable* of a cosmology, or None if the cosmology cannot be tabulated or any of the redshifts
+        is outside its table."""
+        if id(cosmology) in self.distance_tables_of_ids:
+            cosmology_of_id, distance_table = self.distance_tables_of_ids[id(cosmology)]
+            if cosmology_of_id is not cosmology:
+                distance_table = None
+        else:
+            distance_table = None
+
+        if distance_table is None:
+
+            if not hasattr(cosmology, "inv_efunc"):
+                return None
+
+            key = repr(cosmology)
+
+            if key not in self.distance_tables:
+                self.distance_tables[key] = DistanceTable(
+                    cosmology=cosmology,
+                    redshift_max=self.redshift_max,
+                    redshift_step=self.redshift_step,
+                )
+
+            distance_table = self.distance_tables[key]
+            self.distance_tables_of_ids[id(cosmology)] = (cosmology, distance_table)
+
+        if not distance_table.contains(*redshifts):
+            return None
+
+        return distance_table
+
+    def arcsec_per_kpc_from_redshift_and_cosmology(self, redshift, cosmology):
+
+        distance_table = self.distance_table_from_cosmology(cosmology, redshift)
+
+        if distance_table is None:
+            return cosmology_util.arcsec_per_kpc_from_redshift_and_cosmology(
+                redshift=redshift, cosmology=cosmology
+            )
+
+        return distance_table.arcsec_per_kpc_from_redshift(redshift=redshift)
+
+    def kpc_per_arcsec_from_redshift_and_cosmology(self, redshift, cosmology):
+        return 1.0 / self.arcsec_per_kpc_from_redshift_and_cosmology(
+            redshift=redshift, cosmology=cosmology
+        )
+
+    def angular_diameter_distance_to_earth_from_redshift_and_cosmology(
+        self, redshift, cosmology, unit_length="kpc"
+    ):
+
+        distance_table = self.distance_table_from_cosmology(cosmology, redshift)
+
+        if distance_table is None or unit_length not in ("kpc", "arcsec"):
+            return cosmology_util.angular_diameter_distance_to_earth_from_redshift_and_cosmology(
+                redshift=redshift, cosmology=cosmology, unit_length=unit_length
+            )
+
+        angular_diameter_distance = distance_table.angular_diameter_distance_from_redshift(
+            redshift=redshift
+        )
+
+        if unit_length == "arcsec":
+            angular_diameter_distance *= distance_table.arcsec_per_kpc_from_redshift(
+                redshift=redshift
+            )
+
+        return dim.Length(angular_diameter_distance, unit_length)
+
+    def angular_diameter_distance_between_redshifts_from_redshifts_and_cosmlology(
+        self, redshift_0, redshift_1, cosmology, unit_length="kpc"
+    ):
+
+        distance_table = self.distance_table_from_cosmology(
+            cosmology, redshift_0, redshift_1
+        )
+
+        if distance_table is None or unit_length != "kpc":
+            return cosmology_util.angular_diameter_distance_between_redshifts_from_redshifts_and_cosmlology(
+                redshift_0=redshift_0,
+                redshift_1=redshift_1,
+                cosmology=cosmology,
+                unit_length=unit_length,
+            )
+
+        return dim.Length(
+            distance_table.angular_diameter_distance_between_redshifts(
+                redshift_0=redshift_0, redshift_1=redshift_1
+            ),
+            unit_length,
+        )
+
+    def cosmic_average_density_from_redshift_and_cosmology(
+        self, redshift, cosmology, unit_length="arcsec", unit_mass="solMass"
+    ):
+
+        distance_table = self.distance_table_from_cosmology(cosmology, redshift)
+
+        if distance_table is None or unit_length not in ("kpc", "arcsec"):
+            return cosmology_util.cosmic_average_density_from_redshift_and_cosmology(
+                redshift=redshift,
+                cosmology=cosmology,
+                unit_length=unit_length,
+                unit_mass=unit_mass,
+            )
+
+        cosmic_average_density_kpc = dim.MassOverLength3(
+            value=distance_table.critical_density_from_redshift(
+                redshift=redshift, unit_mass=unit_mass
+            ),
+            unit_length="kpc",
+            unit_mass=unit_mass,
+        )
+
+        if unit_length == "kpc":
+            return cosmic_average_density_kpc.convert(
+                unit_length=unit_length, unit_mass=unit_mass
+            )
+
+        return cosmic_average_density_kpc.convert(
+            unit_length=unit_length,
+            unit_mass=unit_mass,
+            kpc_per_arcsec=1.0
+            / distance_table.arcsec_per_kpc_from_redshift(redshift=redshift),
+        )
+
+    def critical_surface_density_between_redshifts_from_redshifts_and_cosmology(
+        self,
+        redshift_0,
+        redshift_1,
+        cosmology,
+        unit_length="arcsec",
+        unit_mass="solMass",
+    ):
+
+        distance_table = self.distance_table_from_cosmology(
+            cosmology, redshift_0, redshift_1
+        )
+
+        if (
+            unit_mass == "angular"
+            or distance_table is None
+            or unit_length not in ("kpc", "arcsec")
+        ):
+            return cosmology_util.critical_surface_density_between_redshifts_from_redshifts_and_cosmology(
+                redshift_0=redshift_0,
+                redshift_1=redshift_1,
+                cosmology=cosmology,
+                unit_length=unit_length,
+                unit_mass=unit_mass,
+            )
+
+        critical_surface_density_kpc = dim.MassOverLength2(
+            value=distance_table.critical_surface_density_between_redshifts(
+                redshift_0=redshift_0, redshift_1=redshift_1, unit_mass=unit_mass
+            ),
+            unit_mass=unit_mass,
+            unit_length="kpc",
+        )
+
+        if unit_length == "kpc":
+            return critical_surface_density_kpc.convert(
+                unit_length=unit_length, unit_mass=unit_mass
+            )
+
+        return critical_surface_density_kpc.convert(
+            unit_mass=unit_mass,
+            unit_length=unit_length,
+            kpc_per_arcsec=1.0
+            / distance_table.arcsec_per_kpc_from_redshift(redshift=redshift_0),
+        )
+
+    def scaling_factor_between_redshifts_from_redshifts_and_cosmology(
+        self, redshift_0, redshift_1, redshift_final, cosmology
+    ):
+
+        distance_table = self.distance_table_from_cosmology(
+            cosmology, redshift_0, redshift_1, redshift_final
+        )
+
+        if distance_table is None:
+            return cosmology_util.scaling_factor_between_redshifts_from_redshifts_and_cosmology(
+                redshift_0=redshift_0,
+                redshift_1=redshift_1,
+                redshift_final=redshift_final,
+                cosmology=cosmology,
+            )
+
+        return distance_table.scaling_factor_between_redshifts(
+            redshift_0=redshift_0, redshift_1=redshift_1, redshift_final=redshift_final
+        )
+
+
+modules_using_cosmology_util = [lensing, g, lp, dmp, mp, pl, ray_tracing]
+
+
+def use_distance_tables(use=True, redshift_max=10.0, redshift_step=1.0e-4):
+    """Make every tracer, plane, galaxy and profile compute its cosmological distances by interpolating the
+    *DistanceTable* of its cosmology (see the module docstring).
+
+    Parameters
+    ----------
+    use : bool
+        If False, the astropy calculations of *cosmology_util* are restored.
+    redshift_max : float
+        The maximum redshift of the tables.
+    redshift_step : float
+        The step between the redshifts of the tables.
+    """
+    if use:
+        tabulated_cosmology_util = TabulatedCosmologyUtil(
+            redshift_max=redshift_max, redshift_step=redshift_step
+        )
+    else:
+        tabulated_cosmology_util = cosmology_util
+
+    for module in modules_using_cosmology_util:
+        module.cosmology_util = tabulated_cosmology_util
@@ -0,0 +1,379 @@
+import functools
+import types
+
+import numpy as np
+
+from autoarray.masked import masked_dataset
+from autoarray.operators import convolver
+
+from tools.imaging import convolver_util
+
+"""
+Alternative convolvers to the autoarray *Convolver*, which blur the model images and mapping matrices of a masked
+imaging dataset with its PSF.
+
+The autoarray *Convolver* performs the convolution in real space, where every unmasked image pixel is blurred into
+the pixels of its PSF-sized 'frame'. Its run time is the number of unmasked pixels multiplied by the size of the PSF,
+which is fast for small PSFs but scales with the square of the PSF width. There are two alternatives for larger PSFs:
+
+ - *ConvolverSeparable*: The PSF is decomposed into a sum of a few separable (outer product) kernels using its
+   singular value decomposition, where each is applied as two 1D convolutions along the rows and columns. A Gaussian
+   PSF is exactly separable, so this scales with (rather than the square of) the PSF width. An HST PSF, with its
+   diffraction spikes, typically needs too many separable kernels to be faster.
+
+ - *ConvolverFFT*: The image is convolved in Fourier space, whose run time depends only on the size of the (padded)
+   bounding box of the mask, not the PSF.
+
+Both convolve every image in the bounding box of the mask, so they are slower than real-space convolution when the
+mask fills only a small fraction of it (e.g. an annular mask), as the real-space convolution only blurs unmasked
+pixels. Every column of a mapping matrix is convolved as its own image, whereas the real-space convolution only blurs
+its non-zero entries, which usually makes real-space convolution fastest for mapping matrices unless the PSF is large.
+
+A *ConvolverAuto* estimates the run time of each method from the PSF size, the mask's fill fraction of its bounding
+box and, for a mapping matrix, its number of non-zero entries, and uses the fastest for each convolution. Its model
+images and mapping matrices agree with the autoarray *Convolver* to numerical precision (or, if the separable method
+is used, to the tolerance of the PSF's separable decomposition).
+
+A convolver can be used to fit a masked imaging dataset by replacing its convolver:
+
+    masked_imaging = al.masked.imaging(...)
+    masked_imaging.convolver = convolver.ConvolverAuto(mask=masked_imaging.mask, kernel=masked_imaging.psf)
+
+A phase (or any other code) can be made to create every masked imaging dataset with an alternative convolver using
+*use_convolver*:
+
+    convolver.use_convolver(convolver_class=convolver.ConvolverAuto)
+
+    convolver.use_convolver(convolver_class=convolver.ConvolverFFT)
+
+All convolvers are subclasses of the autoarray *Convolver* and keep its frames, so code which uses them directly
+(e.g. the w-tilde inversion in 'tools/inversion/inversions.py') is unaffected.
+"""
+
+
+methods = ("real_space", "separable", "fft")
+
+
+class ConvolverArrays(convolver.Convolver):
+    def __init__(
+        self, mask, kernel, method, separable_tolerance=1.0e-8, chunk_size=100
+    ):
+        """A convolver which blurs model images and mapping matrices by convolving them as 2D arrays of the bounding
+        box of the mask, using either separable or FFT convolution, or the real-space convolution of the autoarray
+        *Convolver*.
+
+        Parameters
+        ----------
+        mask : al.mask
+            The mask of the images which are convolved.
+        kernel : al.kernel
+            The PSF the images are convolved with.
+        method : str or None
+            The method ('real_space', 'separable' or 'fft') every model image and mapping matrix is convolved with,
+            or None for a subclass which sets the method before every convolution (e.g. *ConvolverAuto*).
+        separable_tolerance : float
+            The fractional tolerance of the separable decomposition of the PSF (see
+            *convolver_util.separable_kernels_from*).
+        chunk_size : int
+            The number of mapping matrix columns which are convolved together as one stack of 2D arrays.
+        """
+        if method is not None and method not in methods:
+            raise ValueError(
+                "The convolution method must be one of {}, not {}".format(
+                    methods, method
+                )
+            )
+
+        super(ConvolverArrays, self).__init__(mask=mask, kernel=kernel)
+
+        self.separable_tolerance = separable_tolerance
+        self.chunk_size = chunk_size
+
+        mask_2d = np.asarray(mask, dtype="bool")
+        blurring_mask_2d = np.asarray(self.blurring_mask, dtype="bool")
+
+        self.kernel_shape_2d = self.kernel.in_2d.shape
+
+        self.image_region = convolver_util.region_from_mask_2d(
+            mask_2d=mask_2d & blurring_mask_2d
+        )
+        self.image_indexes = convolver_util.region_indexes_from_mask_2d_and_region(
+            mask_2d=mask_2d, region=self.image_region
+        )
+        self.blurring_indexes = convolver_util.region_indexes_from_mask_2d_and_region(
+            mask_2d=blurring_mask_2d, region=self.image_region
+        )
+
+        self.mapping_matrix_region = convolver_util.region_from_mask_2d(mask_2d=mask_2d)
+        self.mapping_matrix_indexes = convolver_util.region_indexes_from_mask_2d_and_region(
+            mask_2d=mask_2d, region=self.mapping_matrix_region
+        )
+
+        self.column_kernels, self.row_kernels = convolver_util.separable_kernels_from(
+            kernel_2d=np.asarray(self.kernel.in_2d), tolerance=separable_tolerance,
+        )
+
+        self.kernel_ffts = {}
+
+        # The methods the model image and mapping matrix are convolved with, which a *ConvolverAuto* sets before
+        # every convolution.
+
+        self.image_method = method
+        self.mapping_matrix_method = method
+
+    @property
+    def separable_ranks(self):
+        return self.column_kernels.shape[0]
+
+    def kernel_fft_from(self, padded_shape):
+
+        if padded_shape not in self.kernel_ffts:
+            self.kernel_ffts[padded_shape] = np.fft.rfft2(
+                np.asarray(self.kernel.in_2d), s=padded_shape
+            )
+
+        return self.kernel_ffts[padded_shape]
+
+    def convolved_arrays_from(self, arrays, method):
+        """Convolve a stack of 2D arrays of shape (total_arrays, y, x) with the PSF using the separable or FFT
+        method."""
+        if method == "separable":
+            return convolver_util.convolved_arrays_via_separable_from(
+                arrays=arrays,
+                column_kernels=self.column_kernels,
+                row_kernels=self.row_kernels,
+            )
+
+        padded_shape = convolver_util.padded_shape_from(
+            shape_2d=arrays.shape[1:], kernel_shape_2d=self.kernel_shape_2d
+        )
+
+        return convolver_util.convolved_arrays_via_fft_from(
+            arrays=arrays,
+            kernel_fft=self.kernel_fft_from(padded_shape=padded_shape),
+            padded_shape=padded_shape,
+            kernel_shape_2d=self.kernel_shape_2d,
+        )
+
+    def convolved_image_from_image_and_blurring_image(self, image, blurring_image):
+
+        if self.image_method == "real_space":
+            return super(
+                ConvolverArrays, self
+            ).convolved_image_from_image_and_blurring_image(
+                image=image, blurring_image=blurring_image
+            )
+
+        arrays = np.zeros(
+            (1,) + convolver_util.region_shape_from(region=self.image_region)
+        )
+
+        arrays[0][self.image_indexes] = image.in_1d_binned
+        arrays[0][self.blurring_indexes] = blurring_image.in_1d_binned
+
+        convolved_arrays = self.convolved_arrays_from(
+            arrays=arrays, method=self.image_method
+        )
+
+        return self.mask.mapping.array_stored_1d_from_array_1d(
+            array_1d=convolved_arrays[0][self.image_indexes]
+        )
+
+    def convolve_mapping_matrix(self, mapping_matrix):
+
+        if self.mapping_matrix_method == "real_space":
+            return super(ConvolverArrays, self).convolve_mapping_matrix(
+                mapping_matrix=mapping_matrix
+            )
+
+        region_shape = convolver_util.region_shape_from(
+            region=self.mapping_matrix_region
+        )
+
+        blurred_mapping_matrix = np.zeros(mapping_matrix.shape)
+
+        for pixel_start in range(0, mapping_matrix.shape[1], self.chunk_size):
+
+            pixel_end = min(pixel_start + self.chunk_size, mapping_matrix.shape[1])
+
+            arrays = np.zeros((pixel_end - pixel_start,) + region_shape)
+
+            # The real-space convolution only blurs the positive entries of a mapping matrix, which (as the entries
+            # of a mapping matrix are never negative) is matched by clipping them to zero.
+
+            arrays[
+                :, self.mapping_matrix_indexes[0], self.mapping_matrix_indexes[1]
+            ] = np.maximum(mapping_matrix[:, pixel_start:pixel_end], 0.0).T
+
+            convolved_arrays = self.convolved_arrays_from(
+                arrays=arrays, method=self.mapping_matrix_method
+            )
+
+            blurred_mapping_matrix[:, pixel_start:pixel_end] = convolved_arrays[
+                :, self.mapping_matrix_indexes[0], self.mapping_matrix_indexes[1]
+            ].T
+
+        return blurred_mapping_matrix
+
+
+class ConvolverSeparable(ConvolverArrays):
+    def __init__(self, mask, kernel, separable_tolerance=1.0e-8, chunk_size=100):
+        """A convolver which convolves model images and mapping matrices with the separable decomposition of the PSF
+        (see the module docstring)."""
+        super(ConvolverSeparable, self).__init__(
+            mask=mask,
+            kernel=kernel,
+            method="separable",
+            separable_tolerance=separable_tolerance,
+            chunk_size=chunk_size,
+        )
+
+
+class ConvolverFFT(ConvolverArrays):
+    def __init__(self, mask, kernel, separable_tolerance=1.0e-8, chunk_size=100):
+        """A convolver which convolves model images and mapping matrices using FFTs (see the module docstring)."""
+        super(ConvolverFFT, self).__init__(
+            mask=mask,
+            kernel=kernel,
+            method="fft",
+            separable_tolerance=separable_tolerance,
+            chunk_size=chunk_size,
+        )
+
+
+class ConvolverAuto(ConvolverArrays):
+
+    # The approximate run time in seconds of one operation of each method, where an operation is one multiplication
+    # of a pixel by a PSF value for real-space and separable convolution and, for FFT convolution, N log2(N) for a
+    # padded array of N pixels. The real-space convolution of a mapping matrix also checks every one of its entries,
+    # which takes *real_space_entry_time*, whereas the separable and FFT methods take *chunk_time* to set up every stack of 2D
+    # arrays they convolve, which dominates for small images. These were calibrated using 'profiling/imaging/convolver_psf_sweep.py'.
+
+    real_space_time = 2.2e-9
+    real_space_entry_time = 1.0e-8
+    separable_time = 2.5e-9
+    fft_time = 2.5e-9
+    chunk_time = 5.0e-5
+
+    def __init__(
+        self,
+        mask,
+        kernel,
+        methods=("real_space", "separable", "fft"),
+        separable_tolerance=1.0e-8,
+        chunk_size=100,
+    ):
+        """A convolver which convolves every model image and mapping matrix using whichever of the real-space,
+        separable and FFT methods is estimated to be fastest (see the module docstring).
+
+        Parameters
+        ----------
+        mask : al.mask
+            The mask of the images which are convolved.
+        kernel : al.kernel
+            The PSF the images are convolved with.
+        methods : (str,)
+            The methods which can be used.
+        separable_tolerance : float
+            The fractional tolerance of the separable decomposition of the PSF (see
+            *convolver_util.separable_kernels_from*).
+        chunk_size : int
+            The number of mapping matrix columns which are convolved together as one stack of 2D arrays.
+        """
+        super(ConvolverAuto, self).__init__(
+            mask=mask,
+            kernel=kernel,
+            method=None,
+            separable_tolerance=separable_tolerance,
+            chunk_size=chunk_size,
+        )
+
+        self.methods = tuple(methods)
+
+        self.image_run_times = self.run_times_from(
+            real_space_operations=np.sum(self.image_frame_1d_lengths)
+            + np.sum(self.blurring_frame_1d_lengths),
+            region=self.image_region,
+            total_arrays=1,
+        )
+
+    def run_times_from(self, real_space_operations, region, total_arrays):
+        """The estimated run time of every method for a convolution with *real_space_operations* real-space
+        operations, or of *total_arrays* arrays of a region for the separable and FFT methods."""
+        region_shape = convolver_util.region_shape_from(region=region)
+        padded_shape = convolver_util.padded_shape_from(
+            shape_2d=region_shape, kernel_shape_2d=self.kernel_shape_2d
+        )
+
+        padded_pixels = padded_shape[0] * padded_shape[1]
+
+        chunk_time = self.chunk_time * np.ceil(total_arrays / self.chunk_size)
+
+        run_times = {
+            "real_space": self.real_space_time * real_space_operations,
+            "separable": chunk_time
+            + self.separable_time
+            * total_arrays
+            * self.separable_ranks
+            * region_shape[0]
+            * region_shape[1]
+            * (self.kernel_shape_2d[0] + self.kernel_shape_2d[1]),
+            "fft": chunk_time
+            + self.fft_time * total_arrays * padded_pixels * np.log2(padded_pixels),
+        }
+
+        return {method: run_times[method] for method in self.methods}
+
+    def convolved_image_from_image_and_blurring_image(self, image, blurring_image):
+
+        self.image_method = min(self.image_run_times, key=self.image_run_times.get)
+
+        return super(ConvolverAuto, self).convolved_image_from_image_and_blurring_image(
+            image=image, blurring_image=blurring_image
+        )
+
+    def convolve_mapping_matrix(self, mapping_matrix):
+
+        self.mapping_matrix_method = self.mapping_matrix_method_from(
+            mapping_matrix=mapping_matrix
+        )
+
+        return super(ConvolverAuto, self).convolve_mapping_matrix(
+            mapping_matrix=mapping_matrix
+        )
+
+    def mapping_matrix_method_from(self, mapping_matrix):
+        """The method estimated to convolve a mapping matrix fastest."""
+        run_times = self.run_times_from(
+            real_space_operations=np.dot(
+                np.count_nonzero(mapping_matrix > 0.0, axis=1),
+                self.image_frame_1d_lengths,
+            )
+            + mapping_matrix.size * self.real_space_entry_time / self.real_space_time,
+            region=self.mapping_matrix_region,
+            total_arrays=mapping_matrix.shape[1],
+        )
+
+        return min(run_times, key=run_times.get)
+
+
+def use_convolver(convolver_class=None, **kwargs):
+    """Make every masked imaging dataset created from now on use an alternative convolver, which is created with the
+    dataset's mask and PSF and the input keyword arguments.
+
+    This includes the masked imaging datasets created by phases, so is used to fit an imaging dataset with a large
+    PSF:
+
+        convolver.use_convolver(convolver_class=convolver.ConvolverAuto)
+
+    Parameters
+    ----------
+    convolver_class : type or None
+        The convolver class, or None to restore the default autoarray *Convolver*.
+    """
+    if convolver_class is None:
+        masked_dataset.convolver = convolver
+    else:
+        masked_dataset.convolver = types.SimpleNamespace(
+            Convolver=functools.partial(convolver_class, **kwargs)
+        )
@@ -0,0 +1,133 @@
+import numpy as np
+
+from tools.interferometer import transformer_util
+
+
+def region_from_mask_2d(mask_2d):
+    """The (y_min, y_max, x_min, x_max) bounding box, with exclusive maximums, of the unmasked (False) entries of a
+    2D mask."""
+    y_indexes, x_indexes = np.nonzero(~mask_2d)
+
+    return (
+        int(np.min(y_indexes)),
+        int(np.max(y_indexes)) + 1,
+        int(np.min(x_indexes)),
+        int(np.max(x_indexes)) + 1,
+    )
+
+
+def region_indexes_from_mask_2d_and_region(mask_2d, region):
+    """The 2D (y,x) indexes of the unmasked entries of a 2D mask relative to the corner of a region containing them,
+    in the same (row-major) order as the 1D arrays of the mask."""
+    y_indexes, x_indexes = np.nonzero(~mask_2d)
+
+    return y_indexes - region[0], x_indexes - region[2]
+
+
+def region_shape_from(region):
+    return region[1] - region[0], region[3] - region[2]
+
+
+def separable_kernels_from(kernel_2d, tolerance):
+    """The separable (low-rank) decomposition of a 2D kernel, given by its singular value decomposition truncated to
+    the lowest rank whose discarded singular values have a total (root sum squared) below *tolerance* times that of
+    all singular values, such that:
+
+        kernel_2d ~= sum(np.outer(column_kernels[rank], row_kernels[rank]) for rank in range(ranks))
+
+    A Gaussian PSF is exactly separable, so has a rank of 1.
+
+    Returns
+    -------
+    (ndarray, ndarray)
+        The (ranks, kernel_shape_2d[0]) kernels convolved along the columns (y) and (ranks, kernel_shape_2d[1])
+        kernels convolved along the rows (x).
+    """
+    u, singular_values, vt = np.linalg.svd(kernel_2d)
+
+    discarded = np.sqrt(np.cumsum(singular_values[::-1] ** 2))[::-1]
+
+    ranks = max(
+        int(np.sum(discarded > tolerance * np.sqrt(np.sum(singular_values ** 2)))), 1
+    )
+
+    return (
+        (u[:, :ranks] * singular_values[:ranks]).T,
+        vt[:ranks, :],
+    )
+
+
+def padded_shape_from(shape_2d, kernel_shape_2d):
+    """The shape arrays of *shape_2d* are padded to before their FFT convolution with a kernel, which is large enough
+    that the convolution does not wrap around its edges and has sizes for which FFTs are fast."""
+    return (
+        transformer_util.fft_size_from(
+            minimum_size=shape_2d[0] + kernel_shape_2d[0] - 1
+        ),
+        transformer_util.fft_size_from(
+            minimum_size=shape_2d[1] + kernel_shape_2d[1] - 1
+        ),
+    )
+
+
+def convolved_arrays_via_fft_from(arrays, kernel_fft, padded_shape, kernel_shape_2d):
+    """Convolve a stack of 2D arrays of shape (total_arrays, y, x) with a kernel, whose real FFT at the padded shape
+    is *kernel_fft*, using FFTs.
+
+    Each convolved array has the same shape as its array, where the light of every entry is blurred into the entries
+    around it as in the autoarray *Convolver*, and the light blurred outside the array is discarded.
+    """
+    convolved_arrays = np.fft.irfft2(
+        np.fft.rfft2(arrays, s=padded_shape) * kernel_fft, s=padded_shape
+    )
+
+    half_y = kernel_shape_2d[0] // 2
+    half_x = kernel_shape_2d[1] // 2
+
+    return convolved_arrays[
+        :, half_y : half_y + arrays.shape[1], half_x : half_x + arrays.shape[2]
+    ]
+
+
+def convolved_arrays_along_axis_from(arrays, kernel_1d, axis):
+    """Convolve a stack of 2D arrays of shape (total_arrays, y, x) with a 1D kernel along one axis, where the light of
+    every entry is blurred into the entries around it as in the autoarray *Convolver*."""
+    half = kernel_1d.shape[0] // 2
+    size = arrays.shape[axis]
+
+    convolved_arrays = np.zeros(arrays.shape)
+
+    for index, kernel_value in enumerate(kernel_1d):
+
+        shift = index - half
+
+        if abs(shift) >= size:
+            continue
+
+        source = [slice(None)] * 3
+        target = [slice(None)] * 3
+
+        source[axis] = slice(max(-shift, 0), min(size - shift, size))
+        target[axis] = slice(max(shift, 0), min(size + shift, size))
+
+        convolved_arrays[tuple(target)] += kernel_value * arrays[tuple(source)]
+
+    return convolved_arrays
+
+
+def convolved_arrays_via_separable_from(arrays, column_kernels, row_kernels):
+    """Convolve a stack of 2D arrays of shape (total_arrays, y, x) with the separable decomposition of a kernel (see
+    *separable_kernels_from*), by convolving them with the row (x) and then column (y) kernel of every rank."""
+    convolved_arrays = np.zeros(arrays.shape)
+
+    for column_kernel, row_kernel in zip(column_kernels, row_kernels):
+
+        convolved_arrays += convolved_arrays_along_axis_from(
+            arrays=convolved_arrays_along_axis_from(
+                arrays=arrays, kernel_1d=row_kernel, axis=2
+            ),
+            kernel_1d=column_kernel,
+            axis=1,
+        )
+
+    return convolved_arrays
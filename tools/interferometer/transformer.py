@@ -0,0 +1,725 @@
+import functools
+import os
+import types
+
+import numpy as np
+
+from autoconf import conf
+from autoarray.masked import masked_dataset
+from autoarray.operators import transformer
+from autoarray.structures import visibilities as vis
+from autoarray.util import transformer_util as aa_transformer_util
+
+from tools.interferometer import transformer_util
+
+"""
+Alternative transformers to the autoarray *Transformer*, which perform the Fourier transforms of images and mapping
+matrices to visibilities when fitting interferometer data.
+
+A transformer can be used to fit a masked interferometer dataset by replacing its transformer:
+
+    masked_interferometer = al.masked.interferometer(...)
+    masked_interferometer.transformer = transformer.TransformerChunked(
+        uv_wavelengths=interferometer.uv_wavelengths,
+        grid_radians=masked_interferometer.grid.in_1d_binned.in_radians,
+        memory_budget=8.0,
+    )
+
+Every masked interferometer dataset creates the default *Transformer* when it is created, which for large datasets
+may not fit in memory. A phase (or any other code) can be made to create every masked interferometer dataset with an
+alternative transformer instead using *use_transformer*:
+
+    transformer.use_transformer(transformer_class=transformer.TransformerChunked, memory_budget=8.0)
+
+    transformer.use_transformer(transformer_class=transformer.TransformerFused)
+
+    transformer.use_transformer(transformer_class=transformer.TransformerNUFFT, tolerance=1.0e-6)
+
+    transformer.use_transformer(transformer_class=transformer.TransformerCached)
+"""
+
+
+class TransformerChunked(transformer.Transformer):
+    def __init__(
+        self,
+        uv_wavelengths,
+        grid_radians,
+        memory_budget=4.0,
+        chunk_size=None,
+        preload_transform=True,
+    ):
+        """A transformer which preloads the real and imaginary transforms of the visibilities (see the autoarray
+        *Transformer*) in chunks, only preloading as many chunks as fit in a memory budget.
+
+        The visibilities of the chunks which are not preloaded are computed directly every time a transform is
+        performed, which is slower but uses memory proportional to the number of visibilities (as opposed to the
+        number of visibilities multiplied by the number of image pixels). Every visibility is computed using the same
+        arithmetic as the autoarray *Transformer*, so the visibilities are identical whichever chunks are preloaded.
+
+        Parameters
+        ----------
+        uv_wavelengths : ndarray
+            The (u,v) coordinates of every visibility in wavelengths.
+        grid_radians : grids.Grid
+            The grid of (y,x) image-pixel coordinates in radians the Fourier transform is performed over.
+        memory_budget : float
+            The maximum memory in GB used to store the preloaded real and imaginary transforms.
+        chunk_size : int or None
+            The number of visibilities in each chunk. If None, this is the number of visibilities whose transforms fit
+            in the memory budget, such that all visibilities are preloaded if they fit in the budget, and one chunk is
+            preloaded otherwise.
+        preload_transform : bool
+            If *False*, no transforms are preloaded and every visibility is computed directly.
+        """
+        self.uv_wavelengths = uv_wavelengths.astype("float")
+        self.grid_radians = grid_radians.in_1d_binned
+
+        self.total_visibilities = uv_wavelengths.shape[0]
+        self.total_image_pixels = grid_radians.shape_1d
+
+        self.preload_transform = preload_transform
+        self.memory_budget = memory_budget
+
+        if chunk_size is None:
+            chunk_size = transformer_util.chunk_size_from_memory_budget(
+                total_image_pixels=self.total_image_pixels, memory_budget=memory_budget
+            )
+
+        self.chunk_size = min(chunk_size, self.total_visibilities)
+
+        self.chunks = transformer_util.visibility_chunks_from_chunk_size(
+            total_visibilities=self.total_visibilities, chunk_size=self.chunk_size
+        )
+
+        self.preload_real_transforms_of_chunks = []
+        self.preload_imag_transforms_of_chunks = []
+
+        if not preload_transform:
+            return
+
+        for vis_start, vis_end in self.chunks:
+
+            if vis_end * 2 * 8 * self.total_image_pixels * 1.0e-9 > memory_budget:
+                break
+
+            self.preload_real_transforms_of_chunks.append(
+                transformer_util.preload_real_transforms_of_chunk(
+                    grid_radians=self.grid_radians,
+                    uv_wavelengths=self.uv_wavelengths,
+                    vis_start=vis_start,
+                    vis_end=vis_end,
+                )
+            )
+
+            self.preload_imag_transforms_of_chunks.append(
+                transformer_util.preload_imag_transforms_of_chunk(
+                    grid_radians=self.grid_radians,
+                    uv_wavelengths=self.uv_wavelengths,
+                    vis_start=vis_start,
+                    vis_end=vis_end,
+                )
+            )
+
+    @property
+    def total_preloaded_chunks(self):
+        return len(self.preload_real_transforms_of_chunks)
+
+    @property
+    def preload_memory(self):
+        """The memory in GB used by the preloaded real and imaginary transforms."""
+        return sum(
+            preload.nbytes * 1.0e-9
+            for preload in self.preload_real_transforms_of_chunks
+            + self.preload_imag_transforms_of_chunks
+        )
+
+    def real_visibilities_from_image(self, image):
+
+        image_1d = image.in_1d_binned
+
+        real_visibilities = np.zeros(shape=(self.total_visibilities,))
+
+        for chunk_index, (vis_start, vis_end) in enumerate(self.chunks):
+
+            if chunk_index < self.total_preloaded_chunks:
+
+                real_visibilities[
+                    vis_start:vis_end
+                ] = aa_transformer_util.real_visibilities_from_image_via_preload_jit(
+                    image_1d=image_1d,
+                    preloaded_reals=self.preload_real_transforms_of_chunks[chunk_index],
+                )
+
+            else:
+
+                real_visibilities[
+                    vis_start:vis_end
+                ] = aa_transformer_util.real_visibilities_jit(
+                    image_1d=image_1d,
+                    grid_radians=self.grid_radians,
+                    uv_wavelengths=self.uv_wavelengths[vis_start:vis_end],
+                )
+
+        return real_visibilities
+
+    def imag_visibilities_from_image(self, image):
+
+        image_1d = image.in_1d_binned
+
+        imag_visibilities = np.zeros(shape=(self.total_visibilities,))
+
+        for chunk_index, (vis_start, vis_end) in enumerate(self.chunks):
+
+            if chunk_index < self.total_preloaded_chunks:
+
+                imag_visibilities[
+                    vis_start:vis_end
+                ] = aa_transformer_util.imag_visibilities_from_image_via_preload_jit(
+                    image_1d=image_1d,
+                    preloaded_imags=self.preload_imag_transforms_of_chunks[chunk_index],
+                )
+
+            else:
+
+                imag_visibilities[
+                    vis_start:vis_end
+                ] = aa_transformer_util.imag_visibilities_jit(
+                    image_1d=image_1d,
+                    grid_radians=self.grid_radians,
+                    uv_wavelengths=self.uv_wavelengths[vis_start:vis_end],
+                )
+
+        return imag_visibilities
+
+    def visibilities_from_image(self, image):
+
+        real_visibilities = self.real_visibilities_from_image(image=image)
+        imag_visibilities = self.imag_visibilities_from_image(image=image)
+
+        return vis.Visibilities(
+            visibilities_1d=np.stack((real_visibilities, imag_visibilities), axis=-1)
+        )
+
+    def real_transformed_mapping_matrix_from_mapping_matrix(self, mapping_matrix):
+
+        transformed_mapping_matrix = np.zeros(
+            shape=(self.total_visibilities, mapping_matrix.shape[1])
+        )
+
+        for chunk_index, (vis_start, vis_end) in enumerate(self.chunks):
+
+            if chunk_index < self.total_preloaded_chunks:
+
+                transformed_mapping_matrix[
+                    vis_start:vis_end
+                ] = aa_transformer_util.real_transformed_mapping_matrix_via_preload_jit(
+                    mapping_matrix=mapping_matrix,
+                    preloaded_reals=self.preload_real_transforms_of_chunks[chunk_index],
+                )
+
+            else:
+
+                transformed_mapping_matrix[
+                    vis_start:vis_end
+                ] = aa_transformer_util.real_transformed_mapping_matrix_jit(
+                    mapping_matrix=mapping_matrix,
+                    grid_radians=self.grid_radians,
+                    uv_wavelengths=self.uv_wavelengths[vis_start:vis_end],
+                )
+
+        return transformed_mapping_matrix
+
+    def imag_transformed_mapping_matrix_from_mapping_matrix(self, mapping_matrix):
+
+        transformed_mapping_matrix = np.zeros(
+            shape=(self.total_visibilities, mapping_matrix.shape[1])
+        )
+
+        for chunk_index, (vis_start, vis_end) in enumerate(self.chunks):
+
+            if chunk_index < self.total_preloaded_chunks:
+
+                transformed_mapping_matrix[
+                    vis_start:vis_end
+                ] = aa_transformer_util.imag_transformed_mapping_matrix_via_preload_jit(
+                    mapping_matrix=mapping_matrix,
+                    preloaded_imags=self.preload_imag_transforms_of_chunks[chunk_index],
+                )
+
+            else:
+
+                transformed_mapping_matrix[
+                    vis_start:vis_end
+                ] = aa_transformer_util.imag_transformed_mapping_matrix_jit(
+                    mapping_matrix=mapping_matrix,
+                    grid_radians=self.grid_radians,
+                    uv_wavelengths=self.uv_wavelengths[vis_start:vis_end],
+                )
+
+        return transformed_mapping_matrix
+
+
+class TransformerFused(transformer.Transformer):
+    def __init__(self, uv_wavelengths, grid_radians, preload_transform=True):
+        """A transformer which computes the real and imaginary visibilities of an image (and the real and imaginary
+        transformed mapping matrices) together in one sweep, as opposed to the autoarray *Transformer* which computes
+        them in two.
+
+        The phase of every (pixel, visibility) pair is computed once and used for both the cosine and sine, which
+        halves the phase computations and, when the transforms are preloaded, reads the real and imaginary transforms
+        of an image pixel from adjacent memory (see *transformer_util.preload_transforms*).
+
+        The real and imaginary visibilities are only ever needed together when fitting, so *real_visibilities_from_image*
+        and *imag_visibilities_from_image* compute both and return one of them.
+
+        Parameters
+        ----------
+        uv_wavelengths : ndarray
+            The (u,v) coordinates of every visibility in wavelengths.
+        grid_radians : grids.Grid
+            The grid of (y,x) image-pixel coordinates in radians the Fourier transform is performed over.
+        preload_transform : bool
+            If *True*, the real and imaginary transforms of every (pixel, visibility) pair are computed once and stored
+            in memory.
+        """
+        self.uv_wavelengths = uv_wavelengths.astype("float")
+        self.grid_radians = grid_radians.in_1d_binned
+
+        self.total_visibilities = uv_wavelengths.shape[0]
+        self.total_image_pixels = grid_radians.shape_1d
+
+        self.preload_transform = preload_transform
+
+        if preload_transform:
+
+            self.preload_transforms = transformer_util.preload_transforms(
+                grid_radians=self.grid_radians, uv_wavelengths=self.uv_wavelengths
+            )
+
+    def real_visibilities_from_image(self, image):
+        return self.real_and_imag_visibilities_from_image(image=image)[0]
+
+    def imag_visibilities_from_image(self, image):
+        return self.real_and_imag_visibilities_from_image(image=image)[1]
+
+    def real_and_imag_visibilities_from_image(self, image):
+
+        if self.preload_transform:
+
+            return transformer_util.visibilities_from_image_via_preload_jit(
+                image_1d=image.in_1d_binned,
+                preloaded_transforms=self.preload_transforms,
+            )
+
+        else:
+
+            return transformer_util.visibilities_jit(
+                image_1d=image.in_1d_binned,
+                grid_radians=self.grid_radians,
+                uv_wavelengths=self.uv_wavelengths,
+            )
+
+    def visibilities_from_image(self, image):
+
+        (
+            real_visibilities,
+            imag_visibilities,
+        ) = self.real_and_imag_visibilities_from_image(image=image)
+
+        return vis.Visibilities(
+            visibilities_1d=np.stack((real_visibilities, imag_visibilities), axis=-1)
+        )
+
+    def real_transformed_mapping_matrix_from_mapping_matrix(self, mapping_matrix):
+        return self.transformed_mapping_matrices_from_mapping_matrix(
+            mapping_matrix=mapping_matrix
+        )[0]
+
+    def imag_transformed_mapping_matrix_from_mapping_matrix(self, mapping_matrix):
+        return self.transformed_mapping_matrices_from_mapping_matrix(
+            mapping_matrix=mapping_matrix
+        )[1]
+
+    def transformed_mapping_matrices_from_mapping_matrix(self, mapping_matrix):
+
+        if self.preload_transform:
+
+            transformed_mapping_matrices = transformer_util.transformed_mapping_matrices_via_preload_jit(
+                mapping_matrix=mapping_matrix,
+                preloaded_transforms=self.preload_transforms,
+            )
+
+        else:
+
+            transformed_mapping_matrices = transformer_util.transformed_mapping_matrices_jit(
+                mapping_matrix=mapping_matrix,
+                grid_radians=self.grid_radians,
+                uv_wavelengths=self.uv_wavelengths,
+            )
+
+        return [
+            np.ascontiguousarray(transformed_mapping_matrices[0].T),
+            np.ascontiguousarray(transformed_mapping_matrices[1].T),
+        ]
+
+    def transformed_mapping_matrices_from_mapper(self, mapper):
+        """The real and imaginary transformed mapping matrices of a mapper, which if the transforms are preloaded are
+        computed from the mapper's sub-pixel to source-pixel mappings (see *transformer_util.sparse_mapping_from*)
+        without computing its dense mapping matrix, such that only its non-zero entries are transformed."""
+        if not self.preload_transform:
+            return self.transformed_mapping_matrices_from_mapping_matrix(
+                mapping_matrix=mapper.mapping_matrix
+            )
+
+        pixel_pointers, mask_1d_indexes, values = transformer_util.sparse_mapping_from(
+            pixelization_1d_index_for_sub_mask_1d_index=mapper.pixelization_1d_index_for_sub_mask_1d_index,
+            mask_1d_index_for_sub_mask_1d_index=mapper._mask_1d_index_for_sub_mask_1d_index,
+            sub_fraction=mapper.grid.mask.sub_fraction,
+            pixels=mapper.pixels,
+        )
+
+        transformed_mapping_matrices = transformer_util.transformed_mapping_matrices_via_preload_sparse_jit(
+            pixel_pointers=pixel_pointers,
+            mask_1d_indexes=mask_1d_indexes,
+            values=values,
+            preloaded_transforms=self.preload_transforms,
+        )
+
+        return [
+            np.ascontiguousarray(transformed_mapping_matrices[0].T),
+            np.ascontiguousarray(transformed_mapping_matrices[1].T),
+        ]
+
+
+class TransformerNUFFT(transformer.Transformer):
+    def __init__(
+        self,
+        uv_wavelengths,
+        grid_radians,
+        tolerance=1.0e-6,
+        oversampling_factor=2,
+        kernel_width=None,
+        memory_budget=0.5,
+    ):
+        """A transformer which computes visibilities using a non-uniform fast Fourier transform (NUFFT), as opposed
+        to the direct Fourier transform (DFT) of the autoarray *Transformer*.
+
+        The image is Fourier transformed on a uniform grid oversampled by *oversampling_factor* using an FFT, and the
+        visibility at every (u,v) coordinate is interpolated from this grid using a Kaiser-Bessel kernel, whose
+        effect on the image is divided out before the FFT. This takes O(N_pix log N_pix + N_vis W^2) operations, as
+        opposed to the O(N_pix N_vis) operations of the DFT, where W is the width of the kernel, which sets the
+        accuracy of the visibilities.
+
+        The image must be defined on the uniform grid of a mask, which is the case for the grid of a masked
+        interferometer dataset.
+
+        Parameters
+        ----------
+        uv_wavelengths : ndarray
+            The (u,v) coordinates of every visibility in wavelengths.
+        grid_radians : grids.Grid
+            The grid of (y,x) image-pixel coordinates in radians the Fourier transform is performed over, which must
+            be the (binned) grid of a mask.
+        tolerance : float
+            The fractional accuracy of the visibilities relative to the DFT, which sets the width of the kernel.
+        oversampling_factor : int
+            The factor by which the FFT grid is larger than the mask in each dimension, which is rounded up to a size
+            for which the FFT is fast.
+        kernel_width : int or None
+            The width of the Kaiser-Bessel kernel in oversampled grid pixels, which if input overrides the width set
+            by the tolerance.
+        memory_budget : float
+            The maximum memory in GB used to store the oversampled images and FFTs of the columns of a mapping
+            matrix, which are transformed in batches of columns that fit in this budget.
+        """
+        self.uv_wavelengths = uv_wavelengths.astype("float")
+        self.grid_radians = grid_radians.in_1d_binned
+
+        self.total_visibilities = uv_wavelengths.shape[0]
+        self.total_image_pixels = grid_radians.shape_1d
+
+        self.preload_transform = False
+
+        self.tolerance = tolerance
+        self.oversampling_factor = oversampling_factor
+        self.memory_budget = memory_budget
+
+        if kernel_width is None:
+            kernel_width = transformer_util.kernel_width_from_tolerance(
+                tolerance=tolerance
+            )
+
+        self.kernel_width = kernel_width
+
+        beta = transformer_util.kaiser_bessel_beta_from_kernel_width(
+            kernel_width=kernel_width, oversampling_factor=oversampling_factor
+        )
+
+        mask = grid_radians.mask
+
+        pixel_scales = np.asarray(mask.pixel_scales) * np.pi / 648000.0
+
+        self.grid_shape = tuple(
+            transformer_util.fft_size_from(minimum_size=oversampling_factor * shape)
+            for shape in mask.shape_2d
+        )
+
+        pixel_indexes = mask.regions._mask_2d_index_for_mask_1d_index
+
+        # Indexes of every image pixel relative to the centre of the mask, which are negative for pixels left of and
+        # above the centre, wrapped to their index on the periodic oversampled FFT grid.
+
+        pixel_offsets_y = pixel_indexes[:, 0] - mask.shape_2d[0] // 2
+        pixel_offsets_x = pixel_indexes[:, 1] - mask.shape_2d[1] // 2
+
+        self.pixel_grid_indexes_y = np.mod(pixel_offsets_y, self.grid_shape[0])
+        self.pixel_grid_indexes_x = np.mod(pixel_offsets_x, self.grid_shape[1])
+
+        # The y coordinates of the grid decrease with row index, so frequencies in cycles per pixel are (-v dy, u dx).
+
+        frequencies_y = -self.uv_wavelengths[:, 1] * pixel_scales[0]
+        frequencies_x = self.uv_wavelengths[:, 0] * pixel_scales[1]
+
+        self.deapodization = 1.0 / (
+            transformer_util.kaiser_bessel_fourier_from(
+                frequencies=pixel_offsets_y / self.grid_shape[0],
+                kernel_width=kernel_width,
+                beta=beta,
+            )
+            * transformer_util.kaiser_bessel_fourier_from(
+                frequencies=pixel_offsets_x / self.grid_shape[1],
+                kernel_width=kernel_width,
+                beta=beta,
+            )
+        )
+
+        (
+            self.indexes_y,
+            self.weights_y,
+        ) = transformer_util.interpolation_indexes_and_weights_from(
+            frequencies=frequencies_y,
+            grid_size=self.grid_shape[0],
+            kernel_width=kernel_width,
+            beta=beta,
+        )
+
+        (
+            self.indexes_x,
+            self.weights_x,
+        ) = transformer_util.interpolation_indexes_and_weights_from(
+            frequencies=frequencies_x,
+            grid_size=self.grid_shape[1],
+            kernel_width=kernel_width,
+            beta=beta,
+        )
+
+        # The phase of every visibility due to the offset of the first image pixel from the centre of the mask.
+
+        reference_offset_y = (
+            self.grid_radians[0, 0] + pixel_offsets_y[0] * pixel_scales[0]
+        )
+        reference_offset_x = (
+            self.grid_radians[0, 1] - pixel_offsets_x[0] * pixel_scales[1]
+        )
+
+        self.reference_phases = np.exp(
+            -2.0j
+            * np.pi
+            * (
+                reference_offset_x * self.uv_wavelengths[:, 0]
+                + reference_offset_y * self.uv_wavelengths[:, 1]
+            )
+        )
+
+    def visibilities_from_images(self, images):
+        """The complex visibilities of a stack of images of shape (image_pixels, images), returned as an array of shape
+        (visibilities, images)."""
+        oversampled_images = np.zeros(shape=(images.shape[1],) + self.grid_shape)
+
+        oversampled_images[:, self.pixel_grid_indexes_y, self.pixel_grid_indexes_x] = (
+            images * self.deapodization[:, None]
+        ).T
+
+        oversampled_rfft = np.ascontiguousarray(
+            np.fft.rfft2(oversampled_images).transpose(1, 2, 0)
+        )
+
+        visibilities = transformer_util.visibilities_from_oversampled_rfft_jit(
+            oversampled_rfft=oversampled_rfft,
+            grid_size_x=self.grid_shape[1],
+            indexes_y=self.indexes_y,
+            weights_y=self.weights_y,
+            indexes_x=self.indexes_x,
+            weights_x=self.weights_x,
+        )
+
+        return visibilities * self.reference_phases[:, None]
+
+    def complex_visibilities_from_image(self, image):
+        return self.visibilities_from_images(images=image.in_1d_binned[:, None])[:, 0]
+
+    def real_visibilities_from_image(self, image):
+        return self.complex_visibilities_from_image(image=image).real
+
+    def imag_visibilities_from_image(self, image):
+        return self.complex_visibilities_from_image(image=image).imag
+
+    def visibilities_from_image(self, image):
+
+        visibilities = self.complex_visibilities_from_image(image=image)
+
+        return vis.Visibilities(
+            visibilities_1d=np.stack((visibilities.real, visibilities.imag), axis=-1)
+        )
+
+    def transformed_mapping_matrix_from_mapping_matrix(self, mapping_matrix):
+        """The complex transformed mapping matrix, computed by transforming the columns of the mapping matrix in
+        batches whose oversampled FFTs fit in the memory budget."""
+        batch_size = max(
+            int(
+                self.memory_budget
+                * 1.0e9
+                / (16 * self.grid_shape[0] * self.grid_shape[1])
+            ),
+            1,
+        )
+
+        transformed_mapping_matrix = np.zeros(
+            shape=(self.total_visibilities, mapping_matrix.shape[1]), dtype="complex"
+        )
+
+        for pixel_start in range(0, mapping_matrix.shape[1], batch_size):
+
+            pixel_end = min(pixel_start + batch_size, mapping_matrix.shape[1])
+
+            transformed_mapping_matrix[
+                :, pixel_start:pixel_end
+            ] = self.visibilities_from_images(
+                images=mapping_matrix[:, pixel_start:pixel_end]
+            )
+
+        return transformed_mapping_matrix
+
+    def real_transformed_mapping_matrix_from_mapping_matrix(self, mapping_matrix):
+        return self.transformed_mapping_matrix_from_mapping_matrix(
+            mapping_matrix=mapping_matrix
+        ).real
+
+    def imag_transformed_mapping_matrix_from_mapping_matrix(self, mapping_matrix):
+        return self.transformed_mapping_matrix_from_mapping_matrix(
+            mapping_matrix=mapping_matrix
+        ).imag
+
+    def transformed_mapping_matrices_from_mapping_matrix(self, mapping_matrix):
+
+        transformed_mapping_matrix = self.transformed_mapping_matrix_from_mapping_matrix(
+            mapping_matrix=mapping_matrix
+        )
+
+        return [
+            np.ascontiguousarray(transformed_mapping_matrix.real),
+            np.ascontiguousarray(transformed_mapping_matrix.imag),
+        ]
+
+
+class TransformerCached(transformer.Transformer):
+    def __init__(
+        self, uv_wavelengths, grid_radians, cache_path=None, memory_budget=1.0
+    ):
+        """A transformer whose preloaded real and imaginary transforms (see the autoarray *Transformer*) are stored in
+        an on-disk cache and opened as read-only memory maps.
+
+        The cache is content-addressed: the transforms are stored in a folder named by a hash of the real-space mask,
+        its pixel scales and the uv-wavelengths (see *transformer_util.preload_cache_key_from*). The first transformer
+        created for a dataset computes and stores the transforms, and every later transformer (e.g. of the next phase
+        of a pipeline or of another process on the same node) opens the stored files instead of computing them.
+
+        Because the transforms are memory mapped, every process using them shares one read-only copy through the
+        operating system's page cache, as opposed to each holding its own copy in memory.
+
+        Parameters
+        ----------
+        uv_wavelengths : ndarray
+            The (u,v) coordinates of every visibility in wavelengths.
+        grid_radians : grids.Grid
+            The grid of (y,x) image-pixel coordinates in radians the Fourier transform is performed over, which must
+            be the (binned) grid of a mask.
+        cache_path : str or None
+            The folder of the cache, which if None is the folder 'transformer_cache' in the output path.
+        memory_budget : float
+            The maximum memory in GB used when computing transforms which are not in the cache, which are computed in
+            chunks of visibilities and written to the cache chunk by chunk.
+        """
+        self.uv_wavelengths = uv_wavelengths.astype("float")
+        self.grid_radians = grid_radians.in_1d_binned
+
+        self.total_visibilities = uv_wavelengths.shape[0]
+        self.total_image_pixels = grid_radians.shape_1d
+
+        self.preload_transform = True
+        self.memory_budget = memory_budget
+
+        if cache_path is None:
+            cache_path = os.path.join(conf.instance.output_path, "transformer_cache")
+
+        self.cache_key = transformer_util.preload_cache_key_from(
+            mask=grid_radians.mask, uv_wavelengths=self.uv_wavelengths
+        )
+
+        self.cache_path = os.path.join(cache_path, self.cache_key)
+
+        self.preload_real_transforms = self.cached_preload_transforms_from(
+            file_name="preload_real_transforms.npy",
+            preload_transforms_of_chunk_func=transformer_util.preload_real_transforms_of_chunk,
+        )
+
+        self.preload_imag_transforms = self.cached_preload_transforms_from(
+            file_name="preload_imag_transforms.npy",
+            preload_transforms_of_chunk_func=transformer_util.preload_imag_transforms_of_chunk,
+        )
+
+    def cached_preload_transforms_from(
+        self, file_name, preload_transforms_of_chunk_func
+    ):
+        """Open the preloaded transforms stored in the cache as a read-only memory map, computing and storing them
+        first (in chunks of visibilities which fit in the memory budget) if they are not in the cache."""
+        file_path = os.path.join(self.cache_path, file_name)
+
+        if not os.path.exists(file_path):
+
+            os.makedirs(self.cache_path, exist_ok=True)
+
+            transformer_util.save_preload_transforms_in_chunks(
+                file_path=file_path,
+                preload_transforms_of_chunk_func=preload_transforms_of_chunk_func,
+                grid_radians=self.grid_radians,
+                uv_wavelengths=self.uv_wavelengths,
+                chunk_size=transformer_util.chunk_size_from_memory_budget(
+                    total_image_pixels=self.total_image_pixels,
+                    memory_budget=self.memory_budget,
+                ),
+            )
+
+        return np.load(file_path, mmap_mode="r")
+
+
+def use_transformer(transformer_class=None, **kwargs):
+    """Make every masked interferometer dataset created from now on use an alternative transformer, which is created
+    with the dataset's uv-wavelengths and grid in radians and the input keyword arguments.
+
+    This includes the masked interferometer datasets created by phases, so is used to fit an interferometer dataset
+    whose default transformer does not fit in memory:
+
+        transformer.use_transformer(transformer_class=transformer.TransformerChunked, memory_budget=8.0)
+
+    Parameters
+    ----------
+    transformer_class : type or None
+        The transformer class, or None to restore the default autoarray *Transformer*.
+    """
+    if transformer_class is None:
+        masked_dataset.transformer = transformer
+    else:
+        masked_dataset.transformer = types.SimpleNamespace(
+            Transformer=functools.partial(transformer_class, **kwargs)
+        )
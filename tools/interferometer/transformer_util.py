@@ -0,0 +1,536 @@
+from autoarray import decorator_util
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+
+def visibility_chunks_from_chunk_size(total_visibilities, chunk_size):
+    """Split the visibilities into consecutive chunks of (at most) *chunk_size* visibilities, returning the (start, end)
+    index of every chunk."""
+    return [
+        (vis_start, min(vis_start + chunk_size, total_visibilities))
+        for vis_start in range(0, total_visibilities, chunk_size)
+    ]
+
+
+def chunk_size_from_memory_budget(total_image_pixels, memory_budget):
+    """The number of visibilities whose real and imaginary preloaded transforms fit in a memory budget.
+
+    The preloaded real and imaginary transforms of every visibility are each an array of *total_image_pixels*
+    double precision floats (8 bytes).
+
+    Parameters
+    ----------
+    total_image_pixels : int
+        The number of (binned) image pixels the Fourier transform is performed over.
+    memory_budget : float
+        The memory budget in GB.
+    """
+    return max(int(memory_budget * 1.0e9 / (2 * 8 * total_image_pixels)), 1)
+
+
+@decorator_util.jit()
+def preload_real_transforms_of_chunk(grid_radians, uv_wavelengths, vis_start, vis_end):
+    """The preloaded real transforms (see *autoarray.util.transformer_util.preload_real_transforms*) of only the chunk
+    of visibilities from index *vis_start* to *vis_end*."""
+    preloaded_real_transforms = np.zeros(
+        shape=(grid_radians.shape[0], vis_end - vis_start)
+    )
+
+    for image_1d_index in range(grid_radians.shape[0]):
+        for vis_1d_index in range(vis_start, vis_end):
+            preloaded_real_transforms[
+                image_1d_index, vis_1d_index - vis_start
+            ] += np.cos(
+                -2.0
+                * np.pi
+                * (
+                    grid_radians[image_1d_index, 1] * uv_wavelengths[vis_1d_index, 0]
+                    + grid_radians[image_1d_index, 0] * uv_wavelengths[vis_1d_index, 1]
+                )
+            )
+
+    return preloaded_real_transforms
+
+
+@decorator_util.jit()
+def preload_imag_transforms_of_chunk(grid_radians, uv_wavelengths, vis_start, vis_end):
+    """The preloaded imaginary transforms (see *autoarray.util.transformer_util.preload_imag_transforms*) of only the
+    chunk of visibilities from index *vis_start* to *vis_end*."""
+    preloaded_imag_transforms = np.zeros(
+        shape=(grid_radians.shape[0], vis_end - vis_start)
+    )
+
+    for image_1d_index in range(grid_radians.shape[0]):
+        for vis_1d_index in range(vis_start, vis_end):
+            preloaded_imag_transforms[
+                image_1d_index, vis_1d_index - vis_start
+            ] += np.sin(
+                -2.0
+                * np.pi
+                * (
+                    grid_radians[image_1d_index, 1] * uv_wavelengths[vis_1d_index, 0]
+                    + grid_radians[image_1d_index, 0] * uv_wavelengths[vis_1d_index, 1]
+                )
+            )
+
+    return preloaded_imag_transforms
+
+
+@decorator_util.jit()
+def preload_transforms(grid_radians, uv_wavelengths):
+    """The preloaded real and imaginary transforms of every image pixel and visibility in one array of shape
+    (image_pixels, 2, visibilities), where [:, 0] are the real (cosine) and [:, 1] the imaginary (sine) transforms.
+
+    The phase of every (pixel, visibility) pair is computed once for both transforms, and the real and imaginary
+    transforms of an image pixel are adjacent in memory, such that a fused transform reads them in one sweep."""
+    preloaded_transforms = np.zeros(
+        shape=(grid_radians.shape[0], 2, uv_wavelengths.shape[0])
+    )
+
+    for image_1d_index in range(grid_radians.shape[0]):
+        for vis_1d_index in range(uv_wavelengths.shape[0]):
+
+            phase = (
+                -2.0
+                * np.pi
+                * (
+                    grid_radians[image_1d_index, 1] * uv_wavelengths[vis_1d_index, 0]
+                    + grid_radians[image_1d_index, 0] * uv_wavelengths[vis_1d_index, 1]
+                )
+            )
+
+            preloaded_transforms[image_1d_index, 0, vis_1d_index] = np.cos(phase)
+            preloaded_transforms[image_1d_index, 1, vis_1d_index] = np.sin(phase)
+
+    return preloaded_transforms
+
+
+@decorator_util.jit()
+def visibilities_from_image_via_preload_jit(image_1d, preloaded_transforms):
+    """The real and imaginary visibilities of an image, of shape (2, visibilities), computed in one sweep over the
+    fused preloaded transforms (see *preload_transforms*)."""
+    visibilities = np.zeros(shape=(2, preloaded_transforms.shape[2]))
+
+    for image_1d_index in range(image_1d.shape[0]):
+
+        value = image_1d[image_1d_index]
+
+        for vis_1d_index in range(preloaded_transforms.shape[2]):
+            visibilities[0, vis_1d_index] += (
+                value * preloaded_transforms[image_1d_index, 0, vis_1d_index]
+            )
+
+        for vis_1d_index in range(preloaded_transforms.shape[2]):
+            visibilities[1, vis_1d_index] += (
+                value * preloaded_transforms[image_1d_index, 1, vis_1d_index]
+            )
+
+    return visibilities
+
+
+@decorator_util.jit()
+def visibilities_jit(image_1d, grid_radians, uv_wavelengths):
+    """The real and imaginary visibilities of an image, of shape (2, visibilities), computing the phase of every
+    (pixel, visibility) pair once for both."""
+    visibilities = np.zeros(shape=(2, uv_wavelengths.shape[0]))
+
+    for image_1d_index in range(image_1d.shape[0]):
+
+        value = image_1d[image_1d_index]
+
+        for vis_1d_index in range(uv_wavelengths.shape[0]):
+
+            phase = (
+                -2.0
+                * np.pi
+                * (
+                    grid_radians[image_1d_index, 1] * uv_wavelengths[vis_1d_index, 0]
+                    + grid_radians[image_1d_index, 0] * uv_wavelengths[vis_1d_index, 1]
+                )
+            )
+
+            visibilities[0, vis_1d_index] += value * np.cos(phase)
+            visibilities[1, vis_1d_index] += value * np.sin(phase)
+
+    return visibilities
+
+
+@decorator_util.jit()
+def transformed_mapping_matrices_via_preload_jit(mapping_matrix, preloaded_transforms):
+    """The real and imaginary transformed mapping matrices, computed in one sweep over the mapping matrix and the fused
+    preloaded transforms (see *preload_transforms*).
+
+    The matrices are returned transposed, of shape (2, source_pixels, visibilities), such that the transformed
+    visibilities of every source pixel are accumulated into contiguous memory."""
+    transformed_mapping_matrices = np.zeros(
+        (2, mapping_matrix.shape[1], preloaded_transforms.shape[2])
+    )
+
+    for pixel_1d_index in range(mapping_matrix.shape[1]):
+        for image_1d_index in range(mapping_matrix.shape[0]):
+
+            value = mapping_matrix[image_1d_index, pixel_1d_index]
+
+            if value > 0:
+
+                for vis_1d_index in range(preloaded_transforms.shape[2]):
+                    transformed_mapping_matrices[0, pixel_1d_index, vis_1d_index] += (
+                        value * preloaded_transforms[image_1d_index, 0, vis_1d_index]
+                    )
+
+                for vis_1d_index in range(preloaded_transforms.shape[2]):
+                    transformed_mapping_matrices[1, pixel_1d_index, vis_1d_index] += (
+                        value * preloaded_transforms[image_1d_index, 1, vis_1d_index]
+                    )
+
+    return transformed_mapping_matrices
+
+
+@decorator_util.jit()
+def transformed_mapping_matrices_jit(mapping_matrix, grid_radians, uv_wavelengths):
+    """The real and imaginary transformed mapping matrices, computing the phase of every (pixel, visibility) pair once
+    for both and for all of the source pixels the image pixel maps to.
+
+    The matrices are returned transposed, of shape (2, source_pixels, visibilities) (see
+    *transformed_mapping_matrices_via_preload_jit*)."""
+    transformed_mapping_matrices = np.zeros(
+        (2, mapping_matrix.shape[1], uv_wavelengths.shape[0])
+    )
+
+    real_transforms = np.zeros(uv_wavelengths.shape[0])
+    imag_transforms = np.zeros(uv_wavelengths.shape[0])
+
+    for image_1d_index in range(mapping_matrix.shape[0]):
+
+        transforms_computed = False
+
+        for pixel_1d_index in range(mapping_matrix.shape[1]):
+
+            value = mapping_matrix[image_1d_index, pixel_1d_index]
+
+            if value > 0:
+
+                if not transforms_computed:
+
+                    for vis_1d_index in range(uv_wavelengths.shape[0]):
+
+                        phase = (
+                            -2.0
+                            * np.pi
+                            * (
+                                grid_radians[image_1d_index, 1]
+                                * uv_wavelengths[vis_1d_index, 0]
+                                + grid_radians[image_1d_index, 0]
+                                * uv_wavelengths[vis_1d_index, 1]
+                            )
+                        )
+
+                        real_transforms[vis_1d_index] = np.cos(phase)
+                        imag_transforms[vis_1d_index] = np.sin(phase)
+
+                    transforms_computed = True
+
+                for vis_1d_index in range(uv_wavelengths.shape[0]):
+                    transformed_mapping_matrices[0, pixel_1d_index, vis_1d_index] += (
+                        value * real_transforms[vis_1d_index]
+                    )
+
+                for vis_1d_index in range(uv_wavelengths.shape[0]):
+                    transformed_mapping_matrices[1, pixel_1d_index, vis_1d_index] += (
+                        value * imag_transforms[vis_1d_index]
+                    )
+
+    return transformed_mapping_matrices
+
+
+def sparse_mapping_from(
+    pixelization_1d_index_for_sub_mask_1d_index,
+    mask_1d_index_for_sub_mask_1d_index,
+    sub_fraction,
+    pixels,
+):
+    """The non-zero entries of the mapping matrix of a mapper in compressed sparse column form, computed from the
+    mapper's sub-pixel index arrays without computing the (image_pixels, source_pixels) mapping matrix.
+
+    The image pixels that source pixel i maps to are *mask_1d_indexes[pixel_pointers[i]:pixel_pointers[i + 1]]* and
+    their mapping matrix values are *values[pixel_pointers[i]:pixel_pointers[i + 1]]*.
+
+    Parameters
+    ----------
+    pixelization_1d_index_for_sub_mask_1d_index : ndarray
+        The source pixel every sub-pixel maps to.
+    mask_1d_index_for_sub_mask_1d_index : ndarray
+        The image pixel every sub-pixel is in.
+    sub_fraction : float
+        The fractional area each sub-pixel takes up in an image pixel.
+    pixels : int
+        The number of pixels in the pixelization.
+    """
+    total_mask_pixels = np.max(mask_1d_index_for_sub_mask_1d_index) + 1
+
+    keys, counts = np.unique(
+        pixelization_1d_index_for_sub_mask_1d_index.astype("int") * total_mask_pixels
+        + mask_1d_index_for_sub_mask_1d_index.astype("int"),
+        return_counts=True,
+    )
+
+    pixel_pointers = np.searchsorted(keys // total_mask_pixels, np.arange(pixels + 1))
+
+    return pixel_pointers, keys % total_mask_pixels, counts * sub_fraction
+
+
+@decorator_util.jit()
+def transformed_mapping_matrices_via_preload_sparse_jit(
+    pixel_pointers, mask_1d_indexes, values, preloaded_transforms
+):
+    """The real and imaginary transformed mapping matrices, computed from the non-zero entries of the mapping matrix in
+    compressed sparse column form (see *sparse_mapping_from*) and the fused preloaded transforms (see
+    *preload_transforms*).
+
+    The transformed visibilities of every source pixel are the sum of the preloaded transforms of only the image
+    pixels it maps to, so no time is spent on the zero entries of the mapping matrix. The matrices are returned
+    transposed, of shape (2, source_pixels, visibilities) (see *transformed_mapping_matrices_via_preload_jit*)."""
+    transformed_mapping_matrices = np.zeros(
+        (2, pixel_pointers.shape[0] - 1, preloaded_transforms.shape[2])
+    )
+
+    for pixel_1d_index in range(pixel_pointers.shape[0] - 1):
+        for index in range(
+            pixel_pointers[pixel_1d_index], pixel_pointers[pixel_1d_index + 1]
+        ):
+
+            image_1d_index = mask_1d_indexes[index]
+            value = values[index]
+
+            for vis_1d_index in range(preloaded_transforms.shape[2]):
+                transformed_mapping_matrices[0, pixel_1d_index, vis_1d_index] += (
+                    value * preloaded_transforms[image_1d_index, 0, vis_1d_index]
+                )
+
+            for vis_1d_index in range(preloaded_transforms.shape[2]):
+                transformed_mapping_matrices[1, pixel_1d_index, vis_1d_index] += (
+                    value * preloaded_transforms[image_1d_index, 1, vis_1d_index]
+                )
+
+    return transformed_mapping_matrices
+
+
+def kaiser_bessel_beta_from_kernel_width(kernel_width, oversampling_factor):
+    """The shape parameter beta of the Kaiser-Bessel interpolation kernel which minimizes the aliasing error of a
+    non-uniform FFT for a kernel width and grid oversampling factor (Beatty, Nishimura & Pauly 2005)."""
+    return np.pi * np.sqrt(
+        (kernel_width / oversampling_factor) ** 2 * (oversampling_factor - 0.5) ** 2
+        - 0.8
+    )
+
+
+def kaiser_bessel_kernel_from(offsets, kernel_width, beta):
+    """The Kaiser-Bessel kernel evaluated at offsets (in oversampled grid pixels) from its centre, which is zero for
+    offsets further than half of the kernel width."""
+    argument = 1.0 - (2.0 * offsets / kernel_width) ** 2
+    return np.where(
+        argument > 0.0, np.i0(beta * np.sqrt(np.maximum(argument, 0.0))), 0.0
+    )
+
+
+def kaiser_bessel_fourier_from(frequencies, kernel_width, beta, quadrature_points=128):
+    """The Fourier transform of the Kaiser-Bessel kernel at frequencies (in cycles per oversampled grid pixel).
+
+    This is computed by Gauss-Legendre quadrature over the kernel, such that it is consistent with the kernel that
+    is evaluated by *kaiser_bessel_kernel_from* to the precision of the quadrature.
+    """
+    nodes, weights = np.polynomial.legendre.leggauss(quadrature_points)
+
+    offsets = 0.5 * kernel_width * nodes
+    weights = 0.5 * kernel_width * weights
+
+    kernel = kaiser_bessel_kernel_from(
+        offsets=offsets, kernel_width=kernel_width, beta=beta
+    )
+
+    return np.sum(
+        weights * kernel * np.cos(2.0 * np.pi * np.outer(frequencies, offsets)), axis=1,
+    )
+
+
+def fft_size_from(minimum_size):
+    """The smallest size greater than or equal to *minimum_size* whose only prime factors are 2, 3 and 5, for which
+    FFTs are fast (an FFT of a size with a large prime factor can be many times slower)."""
+    size = minimum_size
+
+    while True:
+
+        remainder = size
+
+        for factor in (2, 3, 5):
+            while remainder % factor == 0:
+                remainder //= factor
+
+        if remainder == 1:
+            return size
+
+        size += 1
+
+
+def kernel_width_from_tolerance(tolerance):
+    """The width (in oversampled grid pixels) of the Kaiser-Bessel kernel which gives visibilities with a fractional
+    error below *tolerance* for a grid oversampling factor of 2, which was calibrated against the direct Fourier
+    transform (see 'profiling/interferometer/fourier_transform_nufft.py')."""
+    return int(min(max(np.ceil(-np.log10(tolerance)) + 1, 3), 16))
+
+
+def interpolation_indexes_and_weights_from(frequencies, grid_size, kernel_width, beta):
+    """The indexes of the oversampled grid pixels a non-uniform FFT interpolates every frequency from, and the
+    Kaiser-Bessel kernel weights of every pixel, in one dimension.
+
+    Parameters
+    ----------
+    frequencies : ndarray
+        The frequency of every visibility in cycles per image pixel, which is periodic with period one.
+    grid_size : int
+        The number of pixels of the oversampled grid in this dimension.
+    kernel_width : int
+        The width of the Kaiser-Bessel kernel in oversampled grid pixels.
+    beta : float
+        The shape parameter of the Kaiser-Bessel kernel.
+    """
+    frequencies = frequencies - np.round(frequencies)
+
+    grid_positions = frequencies * grid_size
+
+    first_index = np.floor(grid_positions - 0.5 * kernel_width).astype("int") + 1
+
+    indexes = first_index[:, None] + np.arange(kernel_width)[None, :]
+
+    weights = kaiser_bessel_kernel_from(
+        offsets=grid_positions[:, None] - indexes, kernel_width=kernel_width, beta=beta
+    )
+
+    return np.mod(indexes, grid_size), weights
+
+
+@decorator_util.jit()
+def visibilities_from_oversampled_rfft_jit(
+    oversampled_rfft, grid_size_x, indexes_y, weights_y, indexes_x, weights_x
+):
+    """Interpolate the visibilities of every image in a stack of real FFTs of oversampled images, of shape
+    (y, grid_size_x // 2 + 1, images), using the interpolation indexes and kernel weights of every visibility in y
+    and x (see *interpolation_indexes_and_weights_from*).
+
+    The real FFT only stores the non-negative x frequencies, so the FFT at negative x frequencies is computed from
+    its Hermitian symmetry, F(-y, -x) = F(y, x)*.
+
+    Returns the complex visibilities of shape (visibilities, images)."""
+    visibilities = np.zeros(
+        (indexes_y.shape[0], oversampled_rfft.shape[2]), dtype=np.complex128
+    )
+
+    grid_size_y = oversampled_rfft.shape[0]
+
+    for vis_1d_index in range(indexes_y.shape[0]):
+        for kernel_y_index in range(indexes_y.shape[1]):
+
+            y = indexes_y[vis_1d_index, kernel_y_index]
+            weight_y = weights_y[vis_1d_index, kernel_y_index]
+
+            for kernel_x_index in range(indexes_x.shape[1]):
+
+                x = indexes_x[vis_1d_index, kernel_x_index]
+                weight = weight_y * weights_x[vis_1d_index, kernel_x_index]
+
+                if x < oversampled_rfft.shape[1]:
+                    for image_index in range(oversampled_rfft.shape[2]):
+                        visibilities[vis_1d_index, image_index] += (
+                            weight * oversampled_rfft[y, x, image_index]
+                        )
+                else:
+                    y_conj = (grid_size_y - y) % grid_size_y
+                    x_conj = grid_size_x - x
+                    for image_index in range(oversampled_rfft.shape[2]):
+                        visibilities[vis_1d_index, image_index] += weight * np.conj(
+                            oversampled_rfft[y_conj, x_conj, image_index]
+                        )
+
+    return visibilities
+
+
+def preload_cache_key_from(mask, uv_wavelengths):
+    """A key which uniquely identifies the preloaded transforms of a real-space mask and uv-wavelengths, computed as
+    a hash of the mask's unmasked pixels, pixel scales and origin and of the uv-wavelengths.
+
+    The preloaded transforms only depend on these quantities, so two datasets with the same key (e.g. the same
+    dataset fitted by different phases of a pipeline) have the same preloaded transforms."""
+    key = hashlib.sha256()
+
+    key.update(np.asarray(mask.shape_2d, dtype="int64").tobytes())
+    key.update(np.ascontiguousarray(mask, dtype="bool").tobytes())
+    key.update(np.asarray(mask.pixel_scales, dtype="float64").tobytes())
+    key.update(np.asarray(mask.origin, dtype="float64").tobytes())
+    key.update(np.ascontiguousarray(uv_wavelengths, dtype="float64").tobytes())
+
+    return key.hexdigest()
+
+
+def save_preload_transforms_in_chunks(
+    file_path,
+    preload_transforms_of_chunk_func,
+    grid_radians,
+    uv_wavelengths,
+    chunk_size,
+):
+    """Compute preloaded transforms and save them to a .npy file, computing them in chunks of visibilities which are
+    written straight to the file, such that the transforms of all visibilities are never held in memory.
+
+    The transforms are written to a temporary file in the same folder which is renamed once complete, such that
+    other processes reading the file never see partially written transforms.
+
+    Parameters
+    ----------
+    file_path : str
+        The .npy file the preloaded transforms are saved to.
+    preload_transforms_of_chunk_func : func
+        The function computing the preloaded transforms of a chunk (e.g. *preload_real_transforms_of_chunk*).
+    grid_radians : ndarray
+        The grid of (y,x) image-pixel coordinates in radians the Fourier transform is performed over.
+    uv_wavelengths : ndarray
+        The (u,v) coordinates of every visibility in wavelengths.
+    chunk_size : int
+        The number of visibilities whose transforms are computed at once.
+    """
+    file_descriptor, temporary_path = tempfile.mkstemp(
+        dir=os.path.dirname(file_path), suffix=".npy.tmp"
+    )
+    os.close(file_descriptor)
+
+    try:
+
+        preload_transforms = np.lib.format.open_memmap(
+            temporary_path,
+            mode="w+",
+            dtype="float64",
+            shape=(grid_radians.shape[0], uv_wavelengths.shape[0]),
+        )
+
+        for vis_start, vis_end in visibility_chunks_from_chunk_size(
+            total_visibilities=uv_wavelengths.shape[0], chunk_size=chunk_size
+        ):
+            preload_transforms[:, vis_start:vis_end] = preload_transforms_of_chunk_func(
+                grid_radians=grid_radians,
+                uv_wavelengths=uv_wavelengths,
+                vis_start=vis_start,
+                vis_end=vis_end,
+            )
+
+        preload_transforms.flush()
+        del preload_transforms
+
+        os.replace(temporary_path, file_path)
+
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
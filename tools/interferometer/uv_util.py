@@ -0,0 +1,162 @@
+import numpy as np
+
+import autoarray as aa
+
+"""
+The uv-coverage of a real interferometer dataset contains many redundant visibilities: every baseline is typically
+observed at many times and frequencies that sample (nearly) the same (u,v) coordinate, and some datasets store both a
+visibility and its Hermitian conjugate at (-u,-v).
+
+The sky brightness is real, so the visibility at (-u,-v) is the complex conjugate of the visibility at (u,v). This
+module uses that to move every visibility to the same half of the uv-plane (conjugating the visibilities that are
+moved), and then merges the visibilities which sample the same (u,v) coordinate (to within a tolerance) into one
+visibility, by taking their inverse-variance weighted mean. The noise-map of the merged visibilities is propagated
+accordingly.
+
+For visibilities at exactly the same (u,v) coordinate, the chi-squared of any model fitted to the merged
+visibilities differs from the chi-squared of the original visibilities only by a constant that does not depend on
+the model, so fits to the reduced dataset give the same best-fit model and errors. For a non-zero tolerance the
+merging is an approximation, which is accurate if the tolerance is small compared to the inverse of the size of the
+image in radians.
+
+The reduced dataset has fewer visibilities, so every Fourier transform and the curvature matrix of an inversion are
+computed over fewer visibilities:
+
+    reduced_interferometer, reduced_indexes, conjugates = uv_util.reduced_interferometer_from(
+        interferometer=interferometer, uv_tolerance=0.0
+    )
+"""
+
+
+def conjugates_from_uv_wavelengths(uv_wavelengths):
+    """Returns a boolean array which is *True* for every (u,v) coordinate in the lower half of the uv-plane (v < 0, or
+    v = 0 and u < 0), whose visibilities are conjugated to move them to the upper half of the uv-plane."""
+    return (uv_wavelengths[:, 1] < 0.0) | (
+        (uv_wavelengths[:, 1] == 0.0) & (uv_wavelengths[:, 0] < 0.0)
+    )
+
+
+def reduced_indexes_from_uv_wavelengths(uv_wavelengths, uv_tolerance=0.0):
+    """For every visibility, the index of the merged visibility in the reduced dataset it is merged into.
+
+    Visibilities are merged if their (u,v) coordinates in the upper half of the uv-plane are identical (if
+    *uv_tolerance* is 0.0) or fall in the same cell of a grid of uv-cells of size *uv_tolerance* (otherwise).
+
+    Parameters
+    ----------
+    uv_wavelengths : ndarray
+        The (u,v) coordinates of every visibility in wavelengths.
+    uv_tolerance : float
+        The size in wavelengths of the uv-cells visibilities are merged within.
+    """
+    conjugates = conjugates_from_uv_wavelengths(uv_wavelengths=uv_wavelengths)
+
+    uv_wavelengths = np.where(conjugates[:, None], -uv_wavelengths, uv_wavelengths)
+
+    if uv_tolerance > 0.0:
+        uv_wavelengths = np.round(uv_wavelengths / uv_tolerance)
+
+    _, reduced_indexes = np.unique(uv_wavelengths, axis=0, return_inverse=True)
+
+    return reduced_indexes.reshape(-1)
+
+
+def reduced_values_and_noise_from(values, noise, reduced_indexes, total_reduced):
+    """The inverse-variance weighted mean of every group of values merged into the same reduced index, and the noise
+    of the weighted mean, 1 / sqrt(sum of the inverse variances)."""
+    weights = 1.0 / noise ** 2
+
+    reduced_weights = np.bincount(
+        reduced_indexes, weights=weights, minlength=total_reduced
+    )
+
+    reduced_values = (
+        np.bincount(reduced_indexes, weights=weights * values, minlength=total_reduced)
+        / reduced_weights
+    )
+
+    return reduced_values, 1.0 / np.sqrt(reduced_weights)
+
+
+def reduced_interferometer_from(interferometer, uv_tolerance=0.0):
+    """Reduce an interferometer dataset by moving every visibility to the upper half of the uv-plane and merging the
+    visibilities at the same (u,v) coordinate (see the module docstring).
+
+    Returns the reduced interferometer dataset, the index of the reduced visibility every original visibility is
+    merged into, and whether every original visibility was conjugated. These can be used to map reduced
+    visibilities back to the original visibilities (see *visibilities_from_reduced_visibilities*).
+
+    Parameters
+    ----------
+    interferometer : aa.interferometer
+        The interferometer dataset which is reduced.
+    uv_tolerance : float
+        The size in wavelengths of the uv-cells visibilities are merged within. If 0.0, only visibilities at exactly
+        the same (or exactly conjugate) (u,v) coordinates are merged.
+    """
+    uv_wavelengths = np.asarray(interferometer.uv_wavelengths)
+    visibilities = np.asarray(interferometer.visibilities)
+    noise_map = np.asarray(interferometer.noise_map)
+
+    conjugates = conjugates_from_uv_wavelengths(uv_wavelengths=uv_wavelengths)
+    signs = np.where(conjugates, -1.0, 1.0)
+
+    reduced_indexes = reduced_indexes_from_uv_wavelengths(
+        uv_wavelengths=uv_wavelengths, uv_tolerance=uv_tolerance
+    )
+
+    total_reduced = np.max(reduced_indexes) + 1
+
+    real_visibilities, real_noise = reduced_values_and_noise_from(
+        values=visibilities[:, 0],
+        noise=noise_map[:, 0],
+        reduced_indexes=reduced_indexes,
+        total_reduced=total_reduced,
+    )
+
+    imag_visibilities, imag_noise = reduced_values_and_noise_from(
+        values=signs * visibilities[:, 1],
+        noise=noise_map[:, 1],
+        reduced_indexes=reduced_indexes,
+        total_reduced=total_reduced,
+    )
+
+    uv_weights = 1.0 / noise_map[:, 0] ** 2 + 1.0 / noise_map[:, 1] ** 2
+
+    reduced_uv_wavelengths = np.stack(
+        [
+            np.bincount(
+                reduced_indexes,
+                weights=uv_weights * signs * uv_wavelengths[:, index],
+                minlength=total_reduced,
+            )
+            / np.bincount(reduced_indexes, weights=uv_weights, minlength=total_reduced)
+            for index in range(2)
+        ],
+        axis=-1,
+    )
+
+    reduced_interferometer = aa.interferometer.manual(
+        visibilities=aa.visibilities.manual_1d(
+            visibilities=np.stack((real_visibilities, imag_visibilities), axis=-1)
+        ),
+        noise_map=aa.visibilities.manual_1d(
+            visibilities=np.stack((real_noise, imag_noise), axis=-1)
+        ),
+        uv_wavelengths=reduced_uv_wavelengths,
+        primary_beam=interferometer.primary_beam,
+    )
+
+    return reduced_interferometer, reduced_indexes, conjugates
+
+
+def visibilities_from_reduced_visibilities(
+    reduced_visibilities, reduced_indexes, conjugates
+):
+    """Map visibilities of a reduced dataset (e.g. the model visibilities of a fit to it) back to the visibilities of
+    the original dataset, conjugating those which were conjugated when the dataset was reduced."""
+    visibilities = np.array(np.asarray(reduced_visibilities)[reduced_indexes])
+
+    visibilities[conjugates, 1] *= -1.0
+
+    return aa.visibilities.manual_1d(visibilities=visibilities)
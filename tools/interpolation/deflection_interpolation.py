@@ -0,0 +1,688 @@
+import os
+import time
+import warnings
+
+import autofit as af
+import autolens as al
+from autoarray.structures import grids
+import numpy as np
+
+"""
+Interpolation of the deflection angles of a mass profile from an interpolation grid whose spacing is chosen to meet
+a maximum deflection angle error, instead of a spacing set by hand.
+
+A masked dataset's 'pixel_scale_interpolation_grid' computes the deflection angles of every mass profile which
+supports it on one uniform interpolation grid, and interpolates them to the sub-grid. The error this introduces (see
+'tools/interpolation/precision.py') depends on the mass profile, and is largest near its centre where its deflection
+angles change most rapidly, so one spacing is either too coarse near the centre or finer than needed everywhere else.
+
+A *DeflectionInterpolator* of a mass profile tries interpolation grids from the coarsest spacing to the finest. For
+each spacing, it adds finer interpolation points in a circle around the profile's centre, which encloses every
+sub-grid coordinate whose deflection angle error is above the maximum, halving their spacing until the error is met
+or the spacing is below that of the sub-grid. The interpolation grid with the fewest points which meets the error is
+used, and the speedup of computing the deflection angles from it over computing them directly is measured:
+
+    interpolator = deflection_interpolation.DeflectionInterpolator.from_mass_profile_and_grid(
+        mass_profile=al.mp.EllipticalNFW(...), grid=masked_imaging.grid, max_deflection_error=1.0e-4
+    )
+
+    print(interpolator.speedup)
+
+    deflections = interpolator.deflections_from_mass_profile(mass_profile=mass_profile)
+
+The speedup is largest for a mass profile whose deflection angles are expensive to compute (e.g. an NFW, broken power
+law or the stellar profiles of a mass-to-light decomposition, whose deflection angles are numerical integrals). The
+deflection angles of a mass profile whose interpolation is not faster than computing them directly are not
+interpolated by a phase.
+
+Interpolating the deflection angles of a phase is opt-in, and is performed by passing the phase to
+*interpolate_deflections_phase* before it is run:
+
+    phase = al.PhaseImaging(...)
+
+    deflection_interpolation.interpolate_deflections_phase(phase=phase, max_deflection_error=1.0e-4)
+
+    phase.run(dataset=imaging, mask=mask)
+
+An interpolator is chosen for every mass profile of the phase's model when the phase's analysis is set up, using the
+median of its priors. Its interpolation points are refined until the interpolated deflection angles of the median and
+of random draws from the priors (e.g. with different centres) are all within the maximum error, as the interpolation
+grid is used for every instance the non-linear search samples. The error is then tested on other random draws, and
+a warning is raised if it is above the maximum (e.g. as a draw's centre is outside the region refined for the
+others), in which case more draws should be used.
+
+The interpolated deflection angles are used for the mass profiles of the lens plane on the masked dataset's grid, and
+the chosen spacing and speedup of every mass profile is output to the file 'deflection_interpolation.summary' in the
+phase's output folder.
+"""
+
+
+def interp_grid_from_mask_and_pixel_scale(mask, pixel_scale):
+    """The uniform interpolation grid of spacing *pixel_scale* which covers a mask, as used by the interpolator of a
+    masked dataset's 'pixel_scale_interpolation_grid'."""
+    mask = mask.mapping.mask_sub_1
+
+    interp_mask = mask.mapping.rescaled_mask_from_rescale_factor(
+        rescale_factor=mask.pixel_scale / pixel_scale
+    ).mapping.edge_buffed_mask
+
+    return al.util.grid.grid_1d_via_mask_2d(
+        mask_2d=interp_mask,
+        pixel_scales=(pixel_scale, pixel_scale),
+        sub_size=1,
+        origin=mask.origin,
+    )
+
+
+def refinement_grid_from(centre, origin, pixel_scale, radius):
+    """The coordinates within a circle of *radius* around *centre* of a uniform grid of spacing *pixel_scale* which
+    passes through *origin*, such that the refinement grids of every spacing (and the interpolation grid they refine)
+    share their coordinates."""
+    lattice_centre = np.asarray(origin) + pixel_scale * np.round(
+        (np.asarray(centre) - np.asarray(origin)) / pixel_scale
+    )
+
+    offsets = pixel_scale * np.arange(
+        -np.ceil(radius / pixel_scale) - 1, np.ceil(radius / pixel_scale) + 2
+    )
+
+    y, x = np.meshgrid(
+        lattice_centre[0] + offsets, lattice_centre[1] + offsets, indexing="ij"
+    )
+
+    within_radius = (y - centre[0]) ** 2 + (x - centre[1]) ** 2 <= radius ** 2
+
+    return np.stack((y[within_radius], x[within_radius]), axis=-1)
+
+
+def exact_deflections_from_mass_profile_and_grid(mass_profile, grid):
+    """The deflection angles of a mass profile computed on every coordinate of a grid, not using the grid's
+    interpolator (or the profile's cache of previously computed deflection angles)."""
+    grid = grid.copy()
+    grid.interpolator = None
+
+    mass_profile.__dict__.pop("cache", None)
+
+    return np.asarray(mass_profile.deflections_from_grid(grid=grid))
+
+
+class DeflectionInterpolator(grids.Interpolator):
+    def __init__(self, grid, interp_grid, pixel_scale_interpolation_grid):
+        """An interpolator of deflection angles from an interpolation grid (which may have finer interpolation points
+        around a mass profile's centre) to a grid (see the module docstring).
+
+        Parameters
+        ----------
+        grid : al.grid
+            The grid the deflection angles are interpolated to.
+        interp_grid : ndarray
+            The (y,x) coordinates the deflection angles are computed at.
+        pixel_scale_interpolation_grid : float
+            The spacing of the coarsest interpolation points.
+        """
+        super().__init__(
+            grid=grid,
+            interp_grid=interp_grid,
+            pixel_scale_interpolation_grid=pixel_scale_interpolation_grid,
+        )
+
+        self.max_deflection_error = None
+        self.test_deflection_error = None
+        self.speedup = None
+
+    @property
+    def interp_points(self):
+        return self.interp_grid.shape[0]
+
+    def deflections_from_mass_profile(self, mass_profile):
+        """The deflection angles of a mass profile on the grid, interpolated from the interpolation grid."""
+        mass_profile.__dict__.pop("cache", None)
+
+        interp_deflections = np.asarray(
+            mass_profile.deflections_from_grid(
+                grid=grids.GridIrregular(grid=self.interp_grid)
+            )
+        )
+
+        # An interpolation point at the centre of a singular mass profile (e.g. an NFW whose centre is fixed to (0.0,
+        # 0.0)) has an infinite deflection angle, which is set to zero so the interpolated deflection angles around it
+        # stay finite.
+
+        interp_deflections[~np.isfinite(interp_deflections)] = 0.0
+
+        return np.stack(
+            (
+                self.interpolated_values_from_values(values=interp_deflections[:, 0]),
+                self.interpolated_values_from_values(values=interp_deflections[:, 1]),
+            ),
+            axis=-1,
+        )
+
+    @classmethod
+    def from_mass_profile_and_grid(
+        cls,
+        mass_profile,
+        grid,
+        max_deflection_error,
+        pixel_scales_interpolation_grid=None,
+        minimum_pixel_scale=None,
+        validation_mass_profiles=None,
+    ):
+        """Choose the interpolation grid with the fewest points whose interpolated deflection angles of a mass
+        profile are within *max_deflection_error* (arc-seconds) of the deflection angles computed at every coordinate
+        of the grid, or None if no interpolation grid meets the error (see the module docstring).
+
+        Parameters
+        ----------
+        mass_profile : al.mp.MassProfile
+            The mass profile whose deflection angles are interpolated.
+        grid : al.grid
+            The grid the deflection angles are interpolated to, e.g. the grid of a masked dataset.
+        max_deflection_error : float
+            The maximum error of an interpolated deflection angle on the grid, in arc-seconds.
+        pixel_scales_interpolation_grid : [float] or None
+            The spacings of the coarsest interpolation points that are tried, which default to 4, 2, 1 and 0.5 times
+            the pixel scale of the grid's mask.
+        minimum_pixel_scale : float or None
+            The spacing the interpolation points around the profile's centre are not refined below, which defaults
+            to the spacing of the grid's sub-grid.
+        validation_mass_profiles : [al.mp.MassProfile] or None
+            Other mass profiles the interpolation grid is used for (e.g. the mass profile of random draws from a
+            phase's priors), whose interpolated deflection angles must also be within the maximum error. The
+            interpolation points are refined around the centre of every mass profile, so an interpolation grid chosen
+            for a mass profile whose centre is free meets the error over the region its centre is drawn from.
+        """
+        pixel_scale = grid.mask.pixel_scale
+
+        if pixel_scales_interpolation_grid is None:
+            pixel_scales_interpolation_grid = [
+                4.0 * pixel_scale,
+                2.0 * pixel_scale,
+                pixel_scale,
+                0.5 * pixel_scale,
+            ]
+
+        if minimum_pixel_scale is None:
+            minimum_pixel_scale = pixel_scale / grid.mask.sub_size
+
+        mass_profiles = [mass_profile] + list(validation_mass_profiles or [])
+
+        centres = [
+            np.asarray(getattr(profile, "centre", (0.0, 0.0)))
+            for profile in mass_profiles
+        ]
+
+        deflections_of_profiles = [
+            exact_deflections_from_mass_profile_and_grid(
+                mass_profile=profile, grid=grid
+            )
+            for profile in mass_profiles
+        ]
+
+        interpolator = None
+
+        for pixel_scale_interpolation_grid in pixel_scales_interpolation_grid:
+
+            interp_grid = interp_grid_from_mask_and_pixel_scale(
+                mask=grid.mask, pixel_scale=pixel_scale_interpolation_grid
+            )
+
+            origin = interp_grid[0]
+
+            refinement_pixel_scale = pixel_scale_interpolation_grid
+
+            # An interpolation grid with as many points as the grid, or the best interpolation grid so far, is not
+            # refined further.
+
+            while interp_grid.shape[0] < (
+                grid.shape[0] if interpolator is None else interpolator.interp_points
+            ):
+
+                trial_interpolator = cls(
+                    grid=grid,
+                    interp_grid=interp_grid,
+                    pixel_scale_interpolation_grid=pixel_scale_interpolation_grid,
+                )
+
+                deflection_errors_of_profiles = [
+                    np.sqrt(
+                        np.sum(
+                            (
+                                trial_interpolator.deflections_from_mass_profile(
+                                    mass_profile=profile
+                                )
+                                - deflections
+                            )
+                            ** 2,
+                            axis=1,
+                        )
+                    )
+                    for profile, deflections in zip(
+                        mass_profiles, deflections_of_profiles
+                    )
+                ]
+
+                unconverged_of_profiles = [
+                    ~(deflection_errors <= max_deflection_error)
+                    for deflection_errors in deflection_errors_of_profiles
+                ]
+
+                if not np.any(unconverged_of_profiles):
+
+                    trial_interpolator.max_deflection_error = np.max(
+                        deflection_errors_of_profiles
+                    )
+
+                    interpolator = trial_interpolator
+
+                    break
+
+                refinement_pixel_scale /= 2.0
+
+                refinement_grids = []
+
+                for centre, unconverged in zip(centres, unconverged_of_profiles):
+
+                    if not np.any(unconverged):
+                        continue
+
+                    unconverged_grid = np.asarray(grid)[unconverged]
+
+                    # The refinement encloses every coordinate whose error is above the maximum, which for a mass
+                    # profile whose deflection angles are steepest at its centre shrinks as the spacing is halved.
+
+                    radius = np.max(
+                        np.sqrt(np.sum((unconverged_grid - centre) ** 2, axis=1))
+                    ) + 2.0 * max(refinement_pixel_scale, minimum_pixel_scale)
+
+                    if refinement_pixel_scale >= minimum_pixel_scale:
+
+                        refinement_grids.append(
+                            refinement_grid_from(
+                                centre=centre,
+                                origin=origin,
+                                pixel_scale=refinement_pixel_scale,
+                                radius=radius,
+                            )
+                        )
+
+                    else:
+
+                        # Below the spacing of the sub-grid, the coordinates of the grid within the refinement (e.g.
+                        # around the cusp of a singular profile) are added to the interpolation grid, and so have
+                        # their deflection angles computed directly. They include the coordinates around the cusp of
+                        # a mass profile whose centre is near (but not at) this centre.
+
+                        refinement_grids.append(
+                            np.asarray(grid)[
+                                np.sum((np.asarray(grid) - centre) ** 2, axis=1)
+                                <= radius ** 2
+                            ]
+                        )
+
+                refined_interp_grid = np.unique(
+                    np.round(
+                        np.concatenate([interp_grid] + refinement_grids), decimals=10
+                    ),
+                    axis=0,
+                )
+
+                if refined_interp_grid.shape[0] == interp_grid.shape[0]:
+                    break
+
+                interp_grid = refined_interp_grid
+
+        if interpolator is not None:
+            interpolator.speedup = speedup_from_interpolator_mass_profile_and_grid(
+                interpolator=interpolator, mass_profile=mass_profile, grid=grid
+            )
+
+        return interpolator
+
+
+def speedup_from_interpolator_mass_profile_and_grid(
+    interpolator, mass_profile, grid, repeats=3
+):
+    """The ratio of the run time of computing the deflection angles of a mass profile on every coordinate of a grid
+    to the run time of interpolating them, using the fastest of *repeats* runs of each."""
+
+    def run_time_of(func):
+        run_times = []
+
+        for _ in range(repeats):
+            start = time.time()
+            func()
+            run_times.append(time.time() - start)
+
+        return min(run_times)
+
+    exact_time = run_time_of(
+        lambda: exact_deflections_from_mass_profile_and_grid(
+            mass_profile=mass_profile, grid=grid
+        )
+    )
+
+    interpolated_time = run_time_of(
+        lambda: interpolator.deflections_from_mass_profile(mass_profile=mass_profile)
+    )
+
+    return exact_time / interpolated_time
+
+
+class DeflectionInterpolators:
+    def __init__(self, grid, max_deflection_error, **kwargs):
+        """The deflection interpolators of the mass profiles of a model (e.g. a phase's model), which are chosen for
+        the mass profiles of an instance of the model and used for the mass profiles at the same paths of every
+        other instance, if they are faster than computing the deflection angles directly.
+
+        Parameters
+        ----------
+        grid : al.grid
+            The grid the deflection angles are interpolated to, e.g. the grid of a masked dataset.
+        max_deflection_error : float
+            The maximum error of an interpolated deflection angle on the grid, in arc-seconds.
+        kwargs
+            The inputs of *DeflectionInterpolator.from_mass_profile_and_grid* other than the mass profile and grid.
+        """
+        self.grid = grid
+        self.max_deflection_error = max_deflection_error
+        self.kwargs = kwargs
+
+        self.interpolators = {}
+        self.summaries = {}
+
+    def choose_for_instance(
+        self, instance, validation_instances=None, test_instances=None
+    ):
+        """Choose the interpolator of every mass profile of an instance, whose interpolated deflection angles must
+        also be within the maximum error for the mass profiles at the same paths of the validation instances (e.g.
+        random draws from the model's priors).
+
+        The error of every interpolator is then measured for the mass profiles of the test instances (e.g. other
+        random draws), which were not used to choose it, and a warning is raised if it is above the maximum."""
+        validation_mass_profiles_of_paths = mass_profiles_of_paths_from_instances(
+            instances=validation_instances or []
+        )
+        test_mass_profiles_of_paths = mass_profiles_of_paths_from_instances(
+            instances=test_instances or []
+        )
+
+        for path, mass_profile in instance.path_instance_tuples_for_class(
+            al.mp.MassProfile
+        ):
+
+            interpolator = DeflectionInterpolator.from_mass_profile_and_grid(
+                mass_profile=mass_profile,
+                grid=self.grid,
+                max_deflection_error=self.max_deflection_error,
+                validation_mass_profiles=validation_mass_profiles_of_paths.get(path),
+                **self.kwargs
+            )
+
+            if interpolator is not None and path in test_mass_profiles_of_paths:
+
+                interpolator.test_deflection_error = max_deflection_error_from_interpolator_mass_profiles_and_grid(
+                    interpolator=interpolator,
+                    mass_profiles=test_mass_profiles_of_paths[path],
+                    grid=self.grid,
+                )
+
+                if interpolator.test_deflection_error > self.max_deflection_error:
+                    warnings.warn(
+                        "The interpolated deflection angles of the {} at {} have an error of {:.3e} for random draws "
+                        "from the priors not used to choose its interpolation grid, above the maximum deflection "
+                        "error of {:.3e}. Increase the number of prior draws.".format(
+                            type(mass_profile).__name__,
+                            ".".join(path),
+                            interpolator.test_deflection_error,
+                            self.max_deflection_error,
+                        )
+                    )
+
+            if interpolator is not None and interpolator.speedup > 1.0:
+                self.interpolators[path] = interpolator
+
+            self.summaries[path] = summary_from_interpolator(
+                interpolator=interpolator, mass_profile=mass_profile
+            )
+
+    def interpolators_of_instance(self, instance):
+        """The interpolators of the mass profiles of an instance, mapped by the mass profile's id."""
+        return {
+            id(mass_profile): self.interpolators[path]
+            for path, mass_profile in instance.path_instance_tuples_for_class(
+                al.mp.MassProfile
+            )
+            if path in self.interpolators
+        }
+
+    def tracer_with_interpolators(self, tracer, instance):
+        """Make a tracer interpolate the deflection angles of the mass profiles of its lens plane on the grid (the
+        deflection angles of other grids and other planes are computed directly)."""
+        interpolators = self.interpolators_of_instance(instance=instance)
+
+        if len(interpolators) == 0:
+            return tracer
+
+        lens_plane = tracer.planes[0]
+
+        def interpolated_deflections_from_grid(grid):
+
+            deflections = np.zeros((grid.sub_shape_1d, 2))
+
+            for galaxy in lens_plane.galaxies:
+                for mass_profile in galaxy.mass_profiles:
+
+                    if id(mass_profile) in interpolators:
+                        deflections += interpolators[
+                            id(mass_profile)
+                        ].deflections_from_mass_profile(mass_profile=mass_profile)
+                    else:
+                        deflections += np.asarray(
+                            mass_profile.deflections_from_grid(grid=grid)
+                        )
+
+            return grid.mapping.grid_stored_1d_from_sub_grid_1d(sub_grid_1d=deflections)
+
+        traced_grids_of_planes_from_grid = tracer.traced_grids_of_planes_from_grid
+
+        def traced_grids_of_planes_from(grid, plane_index_limit=None):
+
+            if grid is not self.grid:
+                return traced_grids_of_planes_from_grid(
+                    grid=grid, plane_index_limit=plane_index_limit
+                )
+
+            # The lens plane's deflection angles are computed on a copy of the grid, so they are interpolated for the
+            # duration of the ray-tracing of this grid only.
+
+            lens_plane.deflections_from_grid = interpolated_deflections_from_grid
+
+            try:
+                return traced_grids_of_planes_from_grid(
+                    grid=grid, plane_index_limit=plane_index_limit
+                )
+            finally:
+                del lens_plane.deflections_from_grid
+
+        tracer.traced_grids_of_planes_from_grid = traced_grids_of_planes_from
+
+        return tracer
+
+    def summary_str(self):
+        return "\n".join(self.summaries.values()) + "\n"
+
+
+def mass_profiles_of_paths_from_instances(instances):
+    """The mass profiles of instances of a model, mapped by their path in the model."""
+    mass_profiles_of_paths = {}
+
+    for instance in instances:
+        for path, mass_profile in instance.path_instance_tuples_for_class(
+            al.mp.MassProfile
+        ):
+            mass_profiles_of_paths.setdefault(path, []).append(mass_profile)
+
+    return mass_profiles_of_paths
+
+
+def max_deflection_error_from_interpolator_mass_profiles_and_grid(
+    interpolator, mass_profiles, grid
+):
+    """The maximum error of the interpolated deflection angles of mass profiles on a grid, in arc-seconds."""
+    return max(
+        np.max(
+            np.sqrt(
+                np.sum(
+                    (
+                        interpolator.deflections_from_mass_profile(
+                            mass_profile=mass_profile
+                        )
+                        - exact_deflections_from_mass_profile_and_grid(
+                            mass_profile=mass_profile, grid=grid
+                        )
+                    )
+                    ** 2,
+                    axis=1,
+                )
+            )
+        )
+        for mass_profile in mass_profiles
+    )
+
+
+def summary_from_interpolator(interpolator, mass_profile):
+
+    if interpolator is None:
+        return "{}: not interpolated, as no interpolation grid meets the maximum deflection error".format(
+            type(mass_profile).__name__
+        )
+
+    return "{}: interpolation points = {}, pixel_scale_interpolation_grid = {}, max deflection error = {:.3e}, speedup = {:.2f}".format(
+        type(mass_profile).__name__,
+        interpolator.interp_points,
+        interpolator.pixel_scale_interpolation_grid,
+        interpolator.max_deflection_error,
+        interpolator.speedup,
+    ) + (
+        ""
+        if interpolator.test_deflection_error is None
+        else ", max deflection error of test prior draws = {:.3e}".format(
+            interpolator.test_deflection_error
+        )
+    )
+
+
+def random_instances_from_model(model, total_instances, seed=1):
+    """Random instances of a model drawn from its priors, skipping draws outside the limits of its priors."""
+    random_state = np.random.RandomState(seed=seed)
+
+    instances = []
+
+    while len(instances) < total_instances:
+        try:
+            instances.append(
+                model.instance_from_unit_vector(
+                    unit_vector=list(random_state.random_sample(model.prior_count))
+                )
+            )
+        except af.exc.FitException:
+            pass
+
+    return instances
+
+
+def interpolated_deflections_analysis_class_from(
+    analysis_class,
+    model,
+    output_path,
+    max_deflection_error,
+    total_prior_draws=30,
+    **kwargs
+):
+    """Create a subclass of a phase's *Analysis* class whose tracers interpolate the deflection angles of their lens
+    plane's mass profiles (see the module docstring).
+
+    Parameters
+    ----------
+    analysis_class : type
+        The *Analysis* class of the phase.
+    model : func
+        A function returning the model of the phase, whose interpolators are chosen for the median of its priors and
+        validated on random draws from its priors.
+    output_path : func
+        A function returning the folder the summary of the chosen interpolators is output to.
+    total_prior_draws : int
+        The number of random draws from the model's priors whose interpolated deflection angles must also be within
+        the maximum error, and the number of other random draws the error is then tested on.
+    """
+
+    class InterpolatedDeflectionsAnalysis(analysis_class):
+        def __init__(self, *args, **kwargs_analysis):
+
+            super().__init__(*args, **kwargs_analysis)
+
+            self.deflection_interpolators = DeflectionInterpolators(
+                grid=self.masked_dataset.grid,
+                max_deflection_error=max_deflection_error,
+                **kwargs
+            )
+
+            prior_draws = random_instances_from_model(
+                model=model(), total_instances=2 * total_prior_draws
+            )
+
+            self.deflection_interpolators.choose_for_instance(
+                instance=model().instance_from_prior_medians(),
+                validation_instances=prior_draws[:total_prior_draws],
+                test_instances=prior_draws[total_prior_draws:],
+            )
+
+            os.makedirs(output_path(), exist_ok=True)
+
+            with open(
+                os.path.join(output_path(), "deflection_interpolation.summary"), "w"
+            ) as f:
+                f.write(self.deflection_interpolators.summary_str())
+
+        def tracer_for_instance(self, instance):
+            return self.deflection_interpolators.tracer_with_interpolators(
+                tracer=super().tracer_for_instance(instance=instance),
+                instance=instance,
+            )
+
+    InterpolatedDeflectionsAnalysis.__name__ = (
+        "InterpolatedDeflections" + analysis_class.__name__
+    )
+
+    return InterpolatedDeflectionsAnalysis
+
+
+def interpolate_deflections_phase(
+    phase, max_deflection_error, total_prior_draws=30, **kwargs
+):
+    """Interpolate the deflection angles of a phase's mass profiles from interpolation grids chosen to meet a maximum
+    deflection angle error (see the module docstring).
+
+    Parameters
+    ----------
+    phase : al.PhaseImaging or al.PhaseInterferometer
+        The phase whose deflection angles are interpolated.
+    max_deflection_error : float
+        The maximum error of an interpolated deflection angle on the masked dataset's grid, in arc-seconds.
+    total_prior_draws : int
+        The number of random draws from the phase's priors whose interpolated deflection angles must also be within
+        the maximum error, and the number of other random draws the error is then tested on.
+    kwargs
+        The inputs of *DeflectionInterpolator.from_mass_profile_and_grid* other than the mass profile and grid.
+    """
+    phase.Analysis = interpolated_deflections_analysis_class_from(
+        analysis_class=phase.Analysis,
+        model=lambda: phase.model,
+        output_path=lambda: phase.optimizer.paths.phase_output_path,
+        max_deflection_error=max_deflection_error,
+        total_prior_draws=total_prior_draws,
+        **kwargs
+    )
+
+    return phase
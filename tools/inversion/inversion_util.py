@@ -0,0 +1,393 @@
+from autoarray import decorator_util
+from autoarray import exc
+
+import numpy as np
+from scipy import linalg
+from scipy.linalg import blas
+
+
+def block_size_from_memory_budget(pixels, memory_budget):
+    """The number of rows (e.g. visibilities) of a matrix with *pixels* double precision columns which fit in a
+    memory budget in GB."""
+    return max(int(memory_budget * 1.0e9 / (8 * pixels)), 1)
+
+
+def curvature_matrix_via_blocked_gram_from(
+    transformed_mapping_matrices, noise_maps, memory_budget=0.05
+):
+    """Compute the curvature matrix *F* = sum_i T_i^T N_i^-1 T_i of one or more transformed mapping matrices *T_i* and
+    their 1D noise-maps (e.g. the real and imaginary transformed mapping matrices of an interferometer inversion, see
+    Warren & Dye 2003).
+
+    *F* is computed as a sum of BLAS symmetric rank-k updates (syrk) of blocks of rows of the transformed mapping
+    matrices, each divided by its noise-map. Only one block of the noise-weighted matrix is held in memory at once, as
+    opposed to a noise-weighted copy of the full transformed mapping matrix, and syrk computes only one triangle of
+    the symmetric curvature matrix, half of the floating point operations of a general matrix product.
+
+    Parameters
+    -----------
+    transformed_mapping_matrices : [ndarray]
+        The transformed mapping matrices, of shape (visibilities, pixels).
+    noise_maps : [ndarray]
+        The 1D noise-map of every transformed mapping matrix.
+    memory_budget : float
+        The maximum memory in GB of the noise-weighted block of rows.
+    """
+    pixels = transformed_mapping_matrices[0].shape[1]
+
+    block_size = block_size_from_memory_budget(
+        pixels=pixels, memory_budget=memory_budget
+    )
+
+    curvature_matrix = np.zeros((pixels, pixels), order="F")
+
+    for transformed_mapping_matrix, noise_map in zip(
+        transformed_mapping_matrices, noise_maps
+    ):
+
+        for row_start in range(0, transformed_mapping_matrix.shape[0], block_size):
+
+            row_end = min(row_start + block_size, transformed_mapping_matrix.shape[0])
+
+            weighted_block = (
+                transformed_mapping_matrix[row_start:row_end]
+                / np.asarray(noise_map[row_start:row_end])[:, None]
+            )
+
+            # The C-ordered block is the Fortran-ordered transpose, so syrk without transposing computes
+            # weighted_block^T weighted_block without copying the block.
+
+            curvature_matrix = blas.dsyrk(
+                alpha=1.0,
+                a=weighted_block.T,
+                beta=1.0,
+                c=curvature_matrix,
+                trans=0,
+                lower=0,
+                overwrite_c=1,
+            )
+
+    return np.triu(curvature_matrix) + np.triu(curvature_matrix, k=1).T
+
+
+def cholesky_factor_from(matrix):
+    """The lower triangular Cholesky factor of a positive-definite matrix (e.g. the curvature regularization matrix
+    F + H), which is computed once and used to solve for the reconstruction (see *solution_from_cholesky_factor*) and
+    to compute the log determinant of the matrix (see *log_determinant_from_cholesky_factor*).
+
+    Raises an *InversionException* if the matrix is not positive-definite, as the autoarray *Inversion* does.
+    """
+    try:
+        return linalg.cho_factor(matrix, lower=True, check_finite=False)
+    except linalg.LinAlgError:
+        raise exc.InversionException()
+
+
+def solution_from_cholesky_factor(cholesky_factor, vector):
+    """Solve the linear system of a matrix for a vector from the matrix's Cholesky factor."""
+    return linalg.cho_solve(cholesky_factor, vector, check_finite=False)
+
+
+def log_determinant_from_cholesky_factor(cholesky_factor):
+    """The log determinant of a matrix from its Cholesky factor L, ln[det(L L^T)] = 2 * sum(ln[diag(L)])."""
+    return 2.0 * np.sum(np.log(np.diag(cholesky_factor[0])))
+
+
+def data_vector_from_transformed_mapping_matrices_and_data(
+    transformed_mapping_matrices, visibilities, noise_maps
+):
+    """Compute the data vector *D* = sum_i T_i^T N_i^-1 d_i of one or more transformed mapping matrices *T_i*, their
+    1D data *d_i* (e.g. the real and imaginary visibilities) and 1D noise-maps (see Warren & Dye 2003), as a BLAS
+    matrix-vector product of every transformed mapping matrix."""
+    return sum(
+        np.dot(
+            transformed_mapping_matrix.T,
+            np.asarray(data) / np.asarray(noise_map) ** 2.0,
+        )
+        for transformed_mapping_matrix, data, noise_map in zip(
+            transformed_mapping_matrices, visibilities, noise_maps
+        )
+    )
+
+
+def mapping_rows_from(
+    pixelization_1d_index_for_sub_mask_1d_index,
+    mask_1d_index_for_sub_mask_1d_index,
+    sub_fraction,
+    pixels,
+    total_mask_pixels,
+):
+    """The non-zero entries of the mapping matrix of a mapper in compressed sparse row form, computed from the mapper's
+    sub-pixel index arrays without computing the (image_pixels, source_pixels) mapping matrix.
+
+    The source pixels that image pixel i maps to are *pixel_indexes[image_pointers[i]:image_pointers[i + 1]]* and their
+    mapping matrix values are *values[image_pointers[i]:image_pointers[i + 1]]*.
+
+    Parameters
+    ----------
+    pixelization_1d_index_for_sub_mask_1d_index : ndarray
+        The source pixel every sub-pixel maps to.
+    mask_1d_index_for_sub_mask_1d_index : ndarray
+        The image pixel every sub-pixel is in.
+    sub_fraction : float
+        The fractional area each sub-pixel takes up in an image pixel.
+    pixels : int
+        The number of pixels in the pixelization.
+    total_mask_pixels : int
+        The number of unmasked image pixels.
+    """
+    keys, counts = np.unique(
+        mask_1d_index_for_sub_mask_1d_index.astype("int") * pixels
+        + pixelization_1d_index_for_sub_mask_1d_index.astype("int"),
+        return_counts=True,
+    )
+
+    image_pointers = np.searchsorted(keys // pixels, np.arange(total_mask_pixels + 1))
+
+    return image_pointers, keys % pixels, counts * sub_fraction
+
+
+@decorator_util.jit()
+def w_tilde_curvature_frames_from(
+    noise_map, kernel_2d, mask_index_array, mask_rows, mask_columns
+):
+    """The frames of the w-tilde matrix W = K^T N^-1 K of an imaging dataset, where K is the (image_pixels,
+    image_pixels) matrix of the PSF convolution of the masked image (see the autoarray *Convolver*) and N^-1 the
+    diagonal matrix of the inverse noise-map squared.
+
+    W[i, i'] is only non-zero for image pixels i' within twice the PSF size of i, so it is computed for every image
+    pixel i in a window of these offsets. W is symmetric, so only its entries with i' >= i are returned.
+
+    Returns the frame indexes, values and lengths of every row of W, analogous to the image frames of the *Convolver*.
+
+    Parameters
+    ----------
+    noise_map : ndarray
+        The 1D noise-map of the masked image.
+    kernel_2d : ndarray
+        The 2D PSF kernel.
+    mask_index_array : ndarray
+        The 2D array of the 1D index of every unmasked pixel, which is -1 for masked pixels.
+    mask_rows : ndarray
+        The row of every unmasked pixel in the 2D mask.
+    mask_columns : ndarray
+        The column of every unmasked pixel in the 2D mask.
+    """
+    kernel_rows = kernel_2d.shape[0]
+    kernel_columns = kernel_2d.shape[1]
+
+    half_rows = kernel_rows // 2
+    half_columns = kernel_columns // 2
+
+    window_rows = 2 * kernel_rows - 1
+    window_columns = 2 * kernel_columns - 1
+
+    frame_indexes = np.zeros(
+        (noise_map.shape[0], window_rows * window_columns), np.int64
+    )
+    frame_values = np.zeros((noise_map.shape[0], window_rows * window_columns))
+    frame_lengths = np.zeros(noise_map.shape[0], np.int64)
+
+    window = np.zeros((window_rows, window_columns))
+
+    for mask_1d_index in range(noise_map.shape[0]):
+
+        window[:, :] = 0.0
+
+        row = mask_rows[mask_1d_index]
+        column = mask_columns[mask_1d_index]
+
+        for kernel_row in range(kernel_rows):
+            for kernel_column in range(kernel_columns):
+
+                blurred_row = row + kernel_row - half_rows
+                blurred_column = column + kernel_column - half_columns
+
+                if (
+                    0 <= blurred_row < mask_index_array.shape[0]
+                    and 0 <= blurred_column < mask_index_array.shape[1]
+                ):
+
+                    blurred_1d_index = mask_index_array[blurred_row, blurred_column]
+
+                    if blurred_1d_index >= 0:
+
+                        weight = (
+                            kernel_2d[kernel_row, kernel_column]
+                            / noise_map[blurred_1d_index] ** 2
+                        )
+
+                        for kernel_row_1 in range(kernel_rows):
+                            for kernel_column_1 in range(kernel_columns):
+                                window[
+                                    kernel_row - kernel_row_1 + kernel_rows - 1,
+                                    kernel_column
+                                    - kernel_column_1
+                                    + kernel_columns
+                                    - 1,
+                                ] += (weight * kernel_2d[kernel_row_1, kernel_column_1])
+
+        for window_row in range(window_rows):
+            for window_column in range(window_columns):
+
+                if window[window_row, window_column] != 0.0:
+
+                    row_1 = row + window_row - kernel_rows + 1
+                    column_1 = column + window_column - kernel_columns + 1
+
+                    if (
+                        0 <= row_1 < mask_index_array.shape[0]
+                        and 0 <= column_1 < mask_index_array.shape[1]
+                    ):
+
+                        mask_1d_index_1 = mask_index_array[row_1, column_1]
+
+                        if mask_1d_index_1 >= mask_1d_index:
+
+                            frame_length = frame_lengths[mask_1d_index]
+
+                            frame_indexes[mask_1d_index, frame_length] = mask_1d_index_1
+                            frame_values[mask_1d_index, frame_length] = window[
+                                window_row, window_column
+                            ]
+                            frame_lengths[mask_1d_index] += 1
+
+    return frame_indexes, frame_values, frame_lengths
+
+
+def w_tilde_curvature_from(noise_map, convolver):
+    """The w-tilde matrix W = K^T N^-1 K of a masked imaging dataset (see *w_tilde_curvature_frames_from*) in
+    compressed sparse row form (pointers, indexes, values), storing only its entries with i' >= i.
+
+    W only depends on the mask, PSF and noise-map, so is computed once per dataset, after which the curvature matrix of
+    every inversion is computed from W and the mapper without computing the blurred mapping matrix (see
+    *curvature_matrix_via_w_tilde_from*).
+    """
+    mask_rows, mask_columns = np.nonzero(convolver.mask_index_array >= 0)
+
+    frame_indexes, frame_values, frame_lengths = w_tilde_curvature_frames_from(
+        noise_map=np.asarray(noise_map),
+        kernel_2d=np.asarray(convolver.kernel.in_2d),
+        mask_index_array=convolver.mask_index_array,
+        mask_rows=mask_rows,
+        mask_columns=mask_columns,
+    )
+
+    in_frame = np.arange(frame_indexes.shape[1])[None, :] < frame_lengths[:, None]
+
+    pointers = np.zeros(frame_lengths.shape[0] + 1, dtype="int")
+    pointers[1:] = np.cumsum(frame_lengths)
+
+    return pointers, frame_indexes[in_frame], frame_values[in_frame]
+
+
+@decorator_util.jit()
+def curvature_matrix_via_w_tilde_from(
+    w_tilde_pointers,
+    w_tilde_indexes,
+    w_tilde_values,
+    image_pointers,
+    pixel_indexes,
+    mapping_values,
+    pixels,
+):
+    """Compute the curvature matrix *F* = M^T W M of an imaging inversion from the w-tilde matrix *W* (see
+    *w_tilde_curvature_from*) and the mapping matrix *M* in compressed sparse row form (see *mapping_rows_from*).
+
+    This equals the curvature matrix computed from the blurred mapping matrix B = K M, as B^T N^-1 B = M^T K^T N^-1 K M,
+    but loops only over the non-zero entries of *W* and *M*, such that its cost does not grow with the square of the
+    number of source pixels.
+    """
+    curvature_matrix = np.zeros((pixels, pixels))
+
+    for mask_1d_index in range(image_pointers.shape[0] - 1):
+        for w_tilde_index in range(
+            w_tilde_pointers[mask_1d_index], w_tilde_pointers[mask_1d_index + 1]
+        ):
+
+            mask_1d_index_1 = w_tilde_indexes[w_tilde_index]
+            w_tilde_value = w_tilde_values[w_tilde_index]
+
+            for index in range(
+                image_pointers[mask_1d_index], image_pointers[mask_1d_index + 1]
+            ):
+
+                pixel_1d_index = pixel_indexes[index]
+                value = w_tilde_value * mapping_values[index]
+
+                for index_1 in range(
+                    image_pointers[mask_1d_index_1], image_pointers[mask_1d_index_1 + 1]
+                ):
+
+                    pixel_1d_index_1 = pixel_indexes[index_1]
+                    value_1 = value * mapping_values[index_1]
+
+                    curvature_matrix[pixel_1d_index, pixel_1d_index_1] += value_1
+
+                    if mask_1d_index_1 != mask_1d_index:
+                        curvature_matrix[pixel_1d_index_1, pixel_1d_index] += value_1
+
+    return curvature_matrix
+
+
+@decorator_util.jit()
+def w_tilde_data_from(
+    image,
+    noise_map,
+    image_frame_1d_indexes,
+    image_frame_1d_kernels,
+    image_frame_1d_lengths,
+):
+    """The noise-weighted image K^T N^-1 d blurred by the transpose of the PSF convolution K, using the image frames of
+    the *Convolver*. The data vector of an imaging inversion is M^T K^T N^-1 d (see
+    *data_vector_via_w_tilde_data_from*)."""
+    w_tilde_data = np.zeros(image.shape[0])
+
+    for mask_1d_index in range(image.shape[0]):
+        for kernel_1d_index in range(image_frame_1d_lengths[mask_1d_index]):
+
+            blurred_1d_index = image_frame_1d_indexes[mask_1d_index, kernel_1d_index]
+
+            w_tilde_data[mask_1d_index] += (
+                image_frame_1d_kernels[mask_1d_index, kernel_1d_index]
+                * image[blurred_1d_index]
+                / noise_map[blurred_1d_index] ** 2
+            )
+
+    return w_tilde_data
+
+
+def data_vector_via_w_tilde_data_from(
+    w_tilde_data, image_pointers, pixel_indexes, mapping_values, pixels
+):
+    """Compute the data vector *D* = M^T K^T N^-1 d of an imaging inversion from the blurred noise-weighted image (see
+    *w_tilde_data_from*) and the mapping matrix in compressed sparse row form (see *mapping_rows_from*)."""
+    mask_1d_indexes = np.repeat(
+        np.arange(image_pointers.shape[0] - 1), np.diff(image_pointers)
+    )
+
+    return np.bincount(
+        pixel_indexes,
+        weights=mapping_values * w_tilde_data[mask_1d_indexes],
+        minlength=pixels,
+    )
+
+
+@decorator_util.jit()
+def blurred_image_via_frames_from(
+    image, image_frame_1d_indexes, image_frame_1d_kernels, image_frame_1d_lengths
+):
+    """Convolve a masked 1D image with the PSF using the image frames of the *Convolver*, ignoring light outside the
+    mask, which is how the blurred mapping matrix of an inversion is convolved.
+
+    Unlike *Convolver.convolve_mapping_matrix*, negative image values are also convolved."""
+    blurred_image = np.zeros(image.shape[0])
+
+    for mask_1d_index in range(image.shape[0]):
+        for kernel_1d_index in range(image_frame_1d_lengths[mask_1d_index]):
+            blurred_image[image_frame_1d_indexes[mask_1d_index, kernel_1d_index]] += (
+                image_frame_1d_kernels[mask_1d_index, kernel_1d_index]
+                * image[mask_1d_index]
+            )
+
+    return blurred_image
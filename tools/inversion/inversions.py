@@ -0,0 +1,508 @@
+import collections
+import types
+
+import numpy as np
+from scipy import sparse
+
+from autoarray.operators.inversion import inversions as inv
+from autolens.lens import ray_tracing
+
+from tools.inversion import inversion_util
+from tools.inversion import sparse_util
+
+"""
+Alternative inversions to the autoarray *InversionImaging* and *InversionInterferometer*, which reconstruct the
+source of a lens with a pixelization when fitting a dataset.
+
+Every tracer performs its inversions with the autoarray inversions. A phase (or any other code) can be made to
+perform every inversion with the inversions of this module instead using *use_inversions*:
+
+    inversions.use_inversions(
+        inversion_imaging_class=inversions.InversionImagingWTilde,
+        inversion_interferometer_class=inversions.InversionInterferometer,
+    )
+
+For inversions with thousands of source pixels, the *InversionImagingSparse* also keeps the curvature and
+regularization matrices sparse, and solves for the reconstruction and computes the log determinant terms of the
+Bayesian evidence with a sparse factorization.
+
+Every inversion of this module factorizes its curvature regularization matrix F + H once, and uses the factorization
+both to solve for the reconstruction and for the log determinant ln[det(F + H)] of the Bayesian evidence. The log
+determinant ln[det(H)] of the regularization matrix is cached for every regularization and pixel-neighbor structure
+(see *regularization_log_determinant_from*).
+"""
+
+
+def regularization_log_determinant_from(regularization, mapper, regularization_matrix):
+    """The log determinant ln[det(H)] of the regularization matrix of a regularization scheme and mapper.
+
+    H only depends on the regularization weights of the pixels (e.g. the coefficient of the *Constant* scheme) and the
+    pixel-neighbors of the pixelization, so ln[det(H)] is cached for both. For a fixed pixelization grid (e.g. the
+    *Rectangular* pixelization, or any pixelization when the mass model is fixed) it is computed once for every
+    coefficient, as opposed to for every inversion.
+
+    Parameters
+    ----------
+    regularization_matrix : ndarray or scipy.sparse.spmatrix
+        The dense or sparse regularization matrix, which is factorized if its log determinant is not cached.
+    """
+    if not hasattr(regularization, "regularization_weights_from_mapper"):
+        return log_determinant_from_matrix(matrix=regularization_matrix)
+
+    key = (
+        type(regularization),
+        regularization.regularization_weights_from_mapper(mapper=mapper).tobytes(),
+        mapper.pixelization_grid.pixel_neighbors.tobytes(),
+        mapper.pixelization_grid.pixel_neighbors_size.tobytes(),
+    )
+
+    cache = regularization_log_determinant_from.cache
+
+    if key not in cache:
+
+        cache[key] = log_determinant_from_matrix(matrix=regularization_matrix)
+
+        if len(cache) > regularization_log_determinant_from.cache_size:
+            cache.popitem(last=False)
+
+    return cache[key]
+
+
+regularization_log_determinant_from.cache = collections.OrderedDict()
+regularization_log_determinant_from.cache_size = 100
+
+
+def log_determinant_from_matrix(matrix):
+    """The log determinant of a dense or sparse positive-definite matrix."""
+    if sparse.issparse(matrix):
+        return sparse_util.SparseCholesky(matrix=matrix).log_determinant
+
+    return inversion_util.log_determinant_from_cholesky_factor(
+        cholesky_factor=inversion_util.cholesky_factor_from(matrix=matrix)
+    )
+
+
+class InversionImagingWTilde(inv.InversionImaging):
+
+    w_tilde_cache = None
+
+    def __init__(
+        self,
+        image,
+        noise_map,
+        convolver,
+        mapper,
+        regularization,
+        mapping_rows,
+        regularization_matrix,
+        curvature_reg_matrix,
+        reconstruction,
+        curvature_reg_factor,
+    ):
+        """An imaging inversion whose curvature matrix and data vector are computed via the w-tilde formulation, as
+        opposed to from the blurred mapping matrix, which is never computed (so *blurred_mapping_matrix* is None).
+
+        The curvature matrix F = B^T N^-1 B of the blurred mapping matrix B = K M, where K is the PSF convolution and M
+        the mapping matrix, is equal to M^T W M, where the w-tilde matrix W = K^T N^-1 K only depends on the mask, PSF
+        and noise-map. W is computed once and cached (see *w_tilde_curvature_from*), after which the curvature matrix
+        of every inversion is computed from W and the mapper's sub-pixel to source-pixel mappings (see
+        *inversion_util.curvature_matrix_via_w_tilde_from*). Its cost does not grow with the square of the number of
+        source pixels, which dominates the cost of the autoarray *InversionImaging* for thousands of source pixels.
+
+        Parameters
+        ----------
+        convolver : Convolver
+            The convolver of the masked imaging, used to blur the reconstructed image.
+        mapping_rows : (ndarray, ndarray, ndarray)
+            The mapping matrix in compressed sparse row form (see *inversion_util.mapping_rows_from*).
+        curvature_reg_factor : (ndarray, bool)
+            The Cholesky factor of the curvature regularization matrix F + H (see
+            *inversion_util.cholesky_factor_from*).
+        """
+        super(InversionImagingWTilde, self).__init__(
+            image=image,
+            noise_map=noise_map,
+            mapper=mapper,
+            regularization=regularization,
+            blurred_mapping_matrix=None,
+            regularization_matrix=regularization_matrix,
+            curvature_reg_matrix=curvature_reg_matrix,
+            reconstruction=reconstruction,
+        )
+
+        self.convolver = convolver
+        self.mapping_rows = mapping_rows
+        self.curvature_reg_factor = curvature_reg_factor
+
+    @classmethod
+    def w_tilde_curvature_from(cls, noise_map, convolver):
+        """The w-tilde matrix of a mask, PSF and noise-map (see *inversion_util.w_tilde_curvature_from*), which is
+        cached for the last convolver and noise-map it was computed for, such that it is computed once per dataset
+        when fitting it. It is recomputed if the noise-map changes (e.g. when it is scaled by hyper galaxies)."""
+        noise_map = np.asarray(noise_map)
+
+        if cls.w_tilde_cache is not None:
+
+            cached_convolver, cached_noise_map, w_tilde = cls.w_tilde_cache
+
+            if cached_convolver is convolver and np.array_equal(
+                cached_noise_map, noise_map
+            ):
+                return w_tilde
+
+        w_tilde = inversion_util.w_tilde_curvature_from(
+            noise_map=noise_map, convolver=convolver
+        )
+
+        cls.w_tilde_cache = (convolver, noise_map.copy(), w_tilde)
+
+        return w_tilde
+
+    @classmethod
+    def from_data_mapper_and_regularization(
+        cls, image, noise_map, convolver, mapper, regularization
+    ):
+
+        w_tilde_pointers, w_tilde_indexes, w_tilde_values = cls.w_tilde_curvature_from(
+            noise_map=noise_map, convolver=convolver
+        )
+
+        (
+            image_pointers,
+            pixel_indexes,
+            mapping_values,
+        ) = inversion_util.mapping_rows_from(
+            pixelization_1d_index_for_sub_mask_1d_index=mapper.pixelization_1d_index_for_sub_mask_1d_index,
+            mask_1d_index_for_sub_mask_1d_index=mapper._mask_1d_index_for_sub_mask_1d_index,
+            sub_fraction=mapper.grid.mask.sub_fraction,
+            pixels=mapper.pixels,
+            total_mask_pixels=mapper.grid.mask.pixels_in_mask,
+        )
+
+        w_tilde_data = inversion_util.w_tilde_data_from(
+            image=np.asarray(image),
+            noise_map=np.asarray(noise_map),
+            image_frame_1d_indexes=convolver.image_frame_1d_indexes,
+            image_frame_1d_kernels=convolver.image_frame_1d_kernels,
+            image_frame_1d_lengths=convolver.image_frame_1d_lengths,
+        )
+
+        data_vector = inversion_util.data_vector_via_w_tilde_data_from(
+            w_tilde_data=w_tilde_data,
+            image_pointers=image_pointers,
+            pixel_indexes=pixel_indexes,
+            mapping_values=mapping_values,
+            pixels=mapper.pixels,
+        )
+
+        curvature_matrix = inversion_util.curvature_matrix_via_w_tilde_from(
+            w_tilde_pointers=w_tilde_pointers,
+            w_tilde_indexes=w_tilde_indexes,
+            w_tilde_values=w_tilde_values,
+            image_pointers=image_pointers,
+            pixel_indexes=pixel_indexes,
+            mapping_values=mapping_values,
+            pixels=mapper.pixels,
+        )
+
+        regularization_matrix = regularization.regularization_matrix_from_mapper(
+            mapper=mapper
+        )
+
+        curvature_reg_matrix = np.add(curvature_matrix, regularization_matrix)
+
+        curvature_reg_factor = inversion_util.cholesky_factor_from(
+            matrix=curvature_reg_matrix
+        )
+
+        return cls(
+            image=image,
+            noise_map=noise_map,
+            convolver=convolver,
+            mapper=mapper,
+            regularization=regularization,
+            mapping_rows=(image_pointers, pixel_indexes, mapping_values),
+            regularization_matrix=regularization_matrix,
+            curvature_reg_matrix=curvature_reg_matrix,
+            reconstruction=inversion_util.solution_from_cholesky_factor(
+                cholesky_factor=curvature_reg_factor, vector=data_vector
+            ),
+            curvature_reg_factor=curvature_reg_factor,
+        )
+
+    @property
+    def log_det_curvature_reg_matrix_term(self):
+        return inversion_util.log_determinant_from_cholesky_factor(
+            cholesky_factor=self.curvature_reg_factor
+        )
+
+    @property
+    def log_det_regularization_matrix_term(self):
+        return regularization_log_determinant_from(
+            regularization=self.regularization,
+            mapper=self.mapper,
+            regularization_matrix=self.regularization_matrix,
+        )
+
+    @property
+    def mapped_reconstructed_image(self):
+
+        image_pointers, pixel_indexes, mapping_values = self.mapping_rows
+
+        reconstructed_image = np.bincount(
+            np.repeat(np.arange(image_pointers.shape[0] - 1), np.diff(image_pointers)),
+            weights=mapping_values * self.reconstruction[pixel_indexes],
+            minlength=image_pointers.shape[0] - 1,
+        )
+
+        reconstructed_image = inversion_util.blurred_image_via_frames_from(
+            image=reconstructed_image,
+            image_frame_1d_indexes=self.convolver.image_frame_1d_indexes,
+            image_frame_1d_kernels=self.convolver.image_frame_1d_kernels,
+            image_frame_1d_lengths=self.convolver.image_frame_1d_lengths,
+        )
+
+        return self.mapper.grid.mapping.array_stored_1d_from_array_1d(
+            array_1d=reconstructed_image
+        )
+
+
+class InversionImagingSparse(InversionImagingWTilde):
+
+    w_tilde_sparse_cache = None
+
+    @classmethod
+    def from_data_mapper_and_regularization(
+        cls, image, noise_map, convolver, mapper, regularization
+    ):
+        """An imaging inversion whose curvature matrix is computed via the w-tilde formulation (see
+        *InversionImagingWTilde*), and whose curvature and regularization matrices are scipy sparse matrices (see
+        'tools/inversion/sparse_util.py').
+
+        The reconstruction is solved for using the sparse factorization of F + H (its *curvature_reg_factor* is a
+        *sparse_util.SparseCholesky*), which also gives the log determinant ln[det(F + H)] of the Bayesian evidence,
+        and ln[det(H)] is given by the sparse factorization of H. Neither requires the O(pixels^3) dense Cholesky
+        factorization of the autoarray *Inversion*.
+
+        The *curvature_reg_matrix* and *regularization_matrix* are sparse, so code which uses them as dense matrices
+        must convert them first (e.g. using their *toarray* method).
+        """
+        w_tilde_pointers, w_tilde_indexes, w_tilde_values = cls.w_tilde_curvature_from(
+            noise_map=noise_map, convolver=convolver
+        )
+
+        (
+            image_pointers,
+            pixel_indexes,
+            mapping_values,
+        ) = inversion_util.mapping_rows_from(
+            pixelization_1d_index_for_sub_mask_1d_index=mapper.pixelization_1d_index_for_sub_mask_1d_index,
+            mask_1d_index_for_sub_mask_1d_index=mapper._mask_1d_index_for_sub_mask_1d_index,
+            sub_fraction=mapper.grid.mask.sub_fraction,
+            pixels=mapper.pixels,
+            total_mask_pixels=mapper.grid.mask.pixels_in_mask,
+        )
+
+        mapping_matrix = sparse_util.mapping_matrix_sparse_from(
+            image_pointers=image_pointers,
+            pixel_indexes=pixel_indexes,
+            mapping_values=mapping_values,
+            pixels=mapper.pixels,
+        )
+
+        w_tilde_data = inversion_util.w_tilde_data_from(
+            image=np.asarray(image),
+            noise_map=np.asarray(noise_map),
+            image_frame_1d_indexes=convolver.image_frame_1d_indexes,
+            image_frame_1d_kernels=convolver.image_frame_1d_kernels,
+            image_frame_1d_lengths=convolver.image_frame_1d_lengths,
+        )
+
+        data_vector = mapping_matrix.T @ w_tilde_data
+
+        curvature_matrix = sparse_util.curvature_matrix_sparse_from(
+            w_tilde=cls.w_tilde_sparse_from(
+                w_tilde_pointers=w_tilde_pointers,
+                w_tilde_indexes=w_tilde_indexes,
+                w_tilde_values=w_tilde_values,
+            ),
+            mapping_matrix=mapping_matrix,
+        )
+
+        regularization_matrix = sparse_util.regularization_matrix_sparse_from_mapper(
+            regularization=regularization, mapper=mapper
+        )
+
+        curvature_reg_matrix = (curvature_matrix + regularization_matrix).tocsc()
+
+        curvature_reg_factor = sparse_util.SparseCholesky(matrix=curvature_reg_matrix)
+
+        return cls(
+            image=image,
+            noise_map=noise_map,
+            convolver=convolver,
+            mapper=mapper,
+            regularization=regularization,
+            mapping_rows=(image_pointers, pixel_indexes, mapping_values),
+            regularization_matrix=regularization_matrix,
+            curvature_reg_matrix=curvature_reg_matrix,
+            reconstruction=curvature_reg_factor.solve(data_vector),
+            curvature_reg_factor=curvature_reg_factor,
+        )
+
+    @classmethod
+    def w_tilde_sparse_from(cls, w_tilde_pointers, w_tilde_indexes, w_tilde_values):
+        """The symmetric sparse w-tilde matrix, which is cached alongside the w-tilde matrix it is computed from."""
+        if cls.w_tilde_sparse_cache is not None:
+
+            cached_w_tilde_values, w_tilde = cls.w_tilde_sparse_cache
+
+            if cached_w_tilde_values is w_tilde_values:
+                return w_tilde
+
+        w_tilde = sparse_util.w_tilde_sparse_from(
+            w_tilde_pointers=w_tilde_pointers,
+            w_tilde_indexes=w_tilde_indexes,
+            w_tilde_values=w_tilde_values,
+        )
+
+        cls.w_tilde_sparse_cache = (w_tilde_values, w_tilde)
+
+        return w_tilde
+
+    @property
+    def errors_with_covariance(self):
+        return np.linalg.inv(self.curvature_reg_matrix.toarray())
+
+    @property
+    def regularization_term(self):
+        return np.dot(
+            self.reconstruction, self.regularization_matrix @ self.reconstruction
+        )
+
+    @property
+    def log_det_curvature_reg_matrix_term(self):
+        return self.curvature_reg_factor.log_determinant
+
+
+class InversionInterferometer(inv.InversionInterferometer):
+    def __init__(
+        self,
+        visibilities,
+        noise_map,
+        mapper,
+        regularization,
+        transformed_mapping_matrices,
+        regularization_matrix,
+        curvature_reg_matrix,
+        reconstruction,
+        curvature_reg_factor,
+    ):
+
+        super(InversionInterferometer, self).__init__(
+            visibilities=visibilities,
+            noise_map=noise_map,
+            mapper=mapper,
+            regularization=regularization,
+            transformed_mapping_matrices=transformed_mapping_matrices,
+            regularization_matrix=regularization_matrix,
+            curvature_reg_matrix=curvature_reg_matrix,
+            reconstruction=reconstruction,
+        )
+
+        self.curvature_reg_factor = curvature_reg_factor
+
+    @classmethod
+    def from_data_mapper_and_regularization(
+        cls, visibilities, noise_map, transformer, mapper, regularization
+    ):
+        """An interferometer inversion which gives the same reconstruction as the autoarray *InversionInterferometer*
+        but computes it faster:
+
+        - The transformed mapping matrices are computed from the mapper's sub-pixel to source-pixel mappings if the
+          transformer supports it (e.g. the *TransformerFused* in 'tools/interferometer/transformer.py'), as opposed
+          to from its dense mapping matrix, which is almost entirely zeros.
+
+        - The curvature matrix of the real and imaginary visibilities is computed as one noise-weighted BLAS gram
+          product blocked over visibilities (see *inversion_util.curvature_matrix_via_blocked_gram_from*), and the
+          data vector as BLAS matrix-vector products.
+        """
+        if hasattr(transformer, "transformed_mapping_matrices_from_mapper"):
+            transformed_mapping_matrices = transformer.transformed_mapping_matrices_from_mapper(
+                mapper=mapper
+            )
+        else:
+            transformed_mapping_matrices = transformer.transformed_mapping_matrices_from_mapping_matrix(
+                mapping_matrix=mapper.mapping_matrix
+            )
+
+        noise_maps = [noise_map[:, 0], noise_map[:, 1]]
+
+        data_vector = inversion_util.data_vector_from_transformed_mapping_matrices_and_data(
+            transformed_mapping_matrices=transformed_mapping_matrices,
+            visibilities=[visibilities[:, 0], visibilities[:, 1]],
+            noise_maps=noise_maps,
+        )
+
+        curvature_matrix = inversion_util.curvature_matrix_via_blocked_gram_from(
+            transformed_mapping_matrices=transformed_mapping_matrices,
+            noise_maps=noise_maps,
+        )
+
+        regularization_matrix = regularization.regularization_matrix_from_mapper(
+            mapper=mapper
+        )
+
+        # The autoarray inversion adds the regularization matrix to both the real and imaginary curvature matrices.
+
+        curvature_reg_matrix = np.add(curvature_matrix, 2.0 * regularization_matrix)
+
+        curvature_reg_factor = inversion_util.cholesky_factor_from(
+            matrix=curvature_reg_matrix
+        )
+
+        return cls(
+            visibilities=visibilities,
+            noise_map=noise_map,
+            mapper=mapper,
+            regularization=regularization,
+            transformed_mapping_matrices=transformed_mapping_matrices,
+            regularization_matrix=regularization_matrix,
+            curvature_reg_matrix=curvature_reg_matrix,
+            reconstruction=inversion_util.solution_from_cholesky_factor(
+                cholesky_factor=curvature_reg_factor, vector=data_vector
+            ),
+            curvature_reg_factor=curvature_reg_factor,
+        )
+
+    @property
+    def log_det_curvature_reg_matrix_term(self):
+        return inversion_util.log_determinant_from_cholesky_factor(
+            cholesky_factor=self.curvature_reg_factor
+        )
+
+    @property
+    def log_det_regularization_matrix_term(self):
+        return regularization_log_determinant_from(
+            regularization=self.regularization,
+            mapper=self.mapper,
+            regularization_matrix=self.regularization_matrix,
+        )
+
+
+def use_inversions(inversion_imaging_class=None, inversion_interferometer_class=None):
+    """Make every tracer perform its inversions with alternative inversion classes, whose classmethod
+    *from_data_mapper_and_regularization* has the same signature as the autoarray inversion it replaces.
+
+    Parameters
+    ----------
+    inversion_imaging_class : type or None
+        The imaging inversion class, or None for the default autoarray *InversionImaging*.
+    inversion_interferometer_class : type or None
+        The interferometer inversion class, or None for the default autoarray *InversionInterferometer*.
+    """
+    ray_tracing.inv = types.SimpleNamespace(
+        InversionImaging=inversion_imaging_class or inv.InversionImaging,
+        InversionInterferometer=inversion_interferometer_class
+        or inv.InversionInterferometer,
+    )
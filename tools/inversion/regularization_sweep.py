@@ -0,0 +1,487 @@
+import collections
+import os
+
+import autofit as af
+import numpy as np
+from scipy import linalg
+
+from autoarray import exc
+from autoarray.operators.inversion import regularization as reg
+from autoarray.util import fit_util
+from autoarray.util import inversion_util as aa_inversion_util
+from autoarray.util import regularization_util
+from autolens.fit import fit as lens_fit
+
+from tools.inversion import inversion_util
+
+"""
+The Bayesian evidence of an imaging inversion with a *Constant* regularization, computed for many regularization
+coefficients for a fixed lens model (and so a fixed mapper, data vector and curvature matrix), such as when the
+regularization coefficient is chosen in tutorial 4 of chapter 4 of the HowToLens lectures, or fitted in the inversion
+hyper phases of a pipeline.
+
+The regularization matrix of the *Constant* scheme is H = c^2 L + e I, where c is the coefficient, L the matrix of the
+pixel-neighbors for a coefficient of 1 and e = 1e-8. The generalized eigen-decomposition L V = A V diag(l), with
+A = F + e I + L (the curvature-regularization matrix for a coefficient of 1) and V^T A V = I, gives
+F + H = V^-T (I + (c^2 - 1) diag(l)) V^-1 for every coefficient. Every term of the evidence then follows from the
+eigenvalues l, the eigenvalues m of L and the projected data vector y = V^T D:
+
+    chi_squared + s^T H s = sum(data ** 2 / noise ** 2) - sum(y^2 / (1 + (c^2 - 1) l))
+    ln[det(F + H)]        = ln[det(A)] + sum(ln[1 + (c^2 - 1) l])
+    ln[det(H)]            = sum(ln[c^2 m + e])
+
+The matrix A includes L as F + e I alone is close to singular for source pixels with little or no data (e.g. those
+of a rectangular pixelization outside the traced mask), which makes the eigenvalues l inaccurate.
+
+The decompositions are computed once, after which the evidence of every coefficient costs O(pixels):
+
+    sweep = regularization_sweep.RegularizationSweep.from_masked_imaging_and_tracer(
+        masked_imaging=masked_imaging, tracer=tracer
+    )
+
+    evidences = sweep.evidences_from_coefficients(coefficients=[0.1, 1.0, 10.0])
+
+A phase which fits the regularization coefficient of an imaging inversion (e.g. the inversion hyper phases added by
+*extend_with_multiple_hyper_phases(inversion=True)*, which fix the lens model and fit the pixelization and
+regularization) can compute its evidences from sweeps, which is opt-in and is turned on by passing the phase to
+*regularization_sweep_phase* before it is extended with hyper phases (which are copies of it) and run:
+
+    phase = al.PhaseImaging(...)
+
+    phase = regularization_sweep.regularization_sweep_phase(phase=phase)
+
+    phase = phase.extend_with_multiple_hyper_phases(inversion=True)
+
+The analysis keys every model instance by all of its parameters other than the regularization coefficient. The first
+time a key is seen the instance is fitted as usual, as the decompositions of a sweep cost more than one fit. When it
+is seen again (e.g. a pixelization whose integer shape has been sampled before, with another coefficient), a sweep is
+computed and stored, and the evidence of that instance and of every later instance with the same key is computed from
+it for almost nothing. A phase whose other parameters never repeat (e.g. one fitting the lens model) therefore fits
+every instance as usual. The evidences of a sweep match those of a fit to about 1e-9 relative.
+"""
+
+
+class RegularizationSweep:
+    def __init__(
+        self,
+        curvature_matrix,
+        data_vector,
+        laplacian_matrix,
+        data_term,
+        noise_normalization,
+    ):
+        """The decompositions of the curvature matrix and regularization matrix of an imaging inversion, from which
+        the Bayesian evidence of the inversion is computed for any coefficient of a *Constant* regularization (see the
+        module docstring).
+
+        Parameters
+        ----------
+        curvature_matrix : ndarray
+            The curvature matrix F of the inversion.
+        data_vector : ndarray
+            The data vector D of the inversion.
+        laplacian_matrix : ndarray
+            The regularization matrix of the *Constant* regularization for a coefficient of 1, without the 1e-8 added
+            to its diagonal (see *laplacian_matrix_from_pixel_neighbors*).
+        data_term : float
+            The chi-squared of the image the inversion fits, sum(data ** 2 / noise ** 2).
+        noise_normalization : float
+            The noise normalization of the fit, sum(log(2 * pi * noise ** 2)).
+        """
+        curvature_reg_matrix = (
+            curvature_matrix
+            + laplacian_matrix
+            + 1.0e-8 * np.eye(curvature_matrix.shape[0])
+        )
+
+        self.log_det_curvature_reg_matrix_term = inversion_util.log_determinant_from_cholesky_factor(
+            cholesky_factor=inversion_util.cholesky_factor_from(
+                matrix=curvature_reg_matrix
+            )
+        )
+
+        try:
+            self.eigenvalues, self.eigenvectors = linalg.eigh(
+                laplacian_matrix, curvature_reg_matrix, check_finite=False
+            )
+        except linalg.LinAlgError:
+            raise exc.InversionException()
+
+        self.eigenvalues = np.clip(self.eigenvalues, 0.0, 1.0)
+
+        self.regularization_eigenvalues = np.maximum(
+            linalg.eigvalsh(laplacian_matrix, check_finite=False), 0.0
+        )
+
+        self.projected_data_vector = self.eigenvectors.T @ data_vector
+
+        self.data_term = data_term
+        self.noise_normalization = noise_normalization
+
+    @classmethod
+    def from_masked_imaging_and_tracer(
+        cls, masked_imaging, tracer, hyper_image_sky=None, hyper_background_noise=None
+    ):
+        """Setup the sweep for the fit of a tracer, whose last plane has a pixelization and *Constant* regularization
+        (whose coefficient is not used), to a masked imaging dataset.
+
+        The evidences of the sweep are the evidences of *al.fit* for the same masked imaging, tracer, hyper image sky
+        and hyper background noise, with the coefficient of the tracer's regularization changed.
+        """
+        if not isinstance(tracer.regularizations_of_planes[-1], reg.Constant):
+            raise exc.InversionException(
+                "A regularization sweep requires the tracer to use a Constant regularization"
+            )
+
+        image = lens_fit.hyper_image_from_image_and_hyper_image_sky(
+            image=masked_imaging.image, hyper_image_sky=hyper_image_sky
+        )
+
+        noise_map = lens_fit.hyper_noise_map_from_noise_map_tracer_and_hyper_backkground_noise(
+            noise_map=masked_imaging.noise_map,
+            tracer=tracer,
+            hyper_background_noise=hyper_background_noise,
+        )
+
+        profile_subtracted_image = (
+            image
+            - tracer.blurred_profile_image_from_grid_and_convolver(
+                grid=masked_imaging.grid,
+                convolver=masked_imaging.convolver,
+                blurring_grid=masked_imaging.blurring_grid,
+            )
+        )
+
+        mapper = tracer.mappers_of_planes_from_grid(
+            grid=masked_imaging.grid,
+            inversion_uses_border=masked_imaging.inversion_uses_border,
+            preload_sparse_grids_of_planes=masked_imaging.preload_sparse_grids_of_planes,
+        )[-1]
+
+        blurred_mapping_matrix = masked_imaging.convolver.convolve_mapping_matrix(
+            mapping_matrix=mapper.mapping_matrix
+        )
+
+        return cls(
+            curvature_matrix=aa_inversion_util.curvature_matrix_from_blurred_mapping_matrix(
+                blurred_mapping_matrix=blurred_mapping_matrix, noise_map=noise_map
+            ),
+            data_vector=aa_inversion_util.data_vector_from_blurred_mapping_matrix_and_data(
+                blurred_mapping_matrix=blurred_mapping_matrix,
+                image=profile_subtracted_image,
+                noise_map=noise_map,
+            ),
+            laplacian_matrix=laplacian_matrix_from_pixel_neighbors(
+                pixel_neighbors=mapper.pixelization_grid.pixel_neighbors,
+                pixel_neighbors_size=mapper.pixelization_grid.pixel_neighbors_size,
+            ),
+            data_term=np.sum((profile_subtracted_image / noise_map) ** 2.0),
+            noise_normalization=fit_util.noise_normalization_from_noise_map(
+                noise_map=noise_map
+            ),
+        )
+
+    def evidences_from_coefficients(self, coefficients):
+        """The Bayesian evidence of the inversion for every regularization coefficient, at a cost of O(pixels) per
+        coefficient."""
+        coefficients_squared = np.asarray(coefficients, dtype="float")[:, None] ** 2.0
+
+        curvature_terms = 1.0 + (coefficients_squared - 1.0) * self.eigenvalues
+
+        chi_squared_and_regularization_term = self.data_term - np.sum(
+            self.projected_data_vector ** 2.0 / curvature_terms, axis=1
+        )
+
+        log_det_curvature_reg_matrix_term = (
+            self.log_det_curvature_reg_matrix_term
+            + np.sum(np.log(curvature_terms), axis=1)
+        )
+
+        log_det_regularization_matrix_term = np.sum(
+            np.log(coefficients_squared * self.regularization_eigenvalues + 1.0e-8),
+            axis=1,
+        )
+
+        return -0.5 * (
+            chi_squared_and_regularization_term
+            + log_det_curvature_reg_matrix_term
+            - log_det_regularization_matrix_term
+            + self.noise_normalization
+        )
+
+    def evidence_from_coefficient(self, coefficient):
+        return self.evidences_from_coefficients(coefficients=[coefficient])[0]
+
+    def regularization_condition_number_from_coefficient(self, coefficient):
+        """The condition number of the regularization matrix H = c^2 L + e I of a coefficient, whose Cholesky
+        factorization by the autoarray inversion fails as it approaches the inverse of the machine precision."""
+        return (
+            coefficient ** 2.0 * np.max(self.regularization_eigenvalues) + 1.0e-8
+        ) / 1.0e-8
+
+    def reconstruction_from_coefficient(self, coefficient):
+        """The reconstruction of the inversion for a regularization coefficient, s = V (I + (c^2 - 1) diag(l))^-1 y."""
+        return self.eigenvectors @ (
+            self.projected_data_vector
+            / (1.0 + (coefficient ** 2.0 - 1.0) * self.eigenvalues)
+        )
+
+
+def laplacian_matrix_from_pixel_neighbors(pixel_neighbors, pixel_neighbors_size):
+    """The regularization matrix of the *Constant* regularization for a coefficient of 1, without the 1e-8 which
+    is added to its diagonal to make it positive-definite."""
+    laplacian_matrix = regularization_util.constant_regularization_matrix_from_pixel_neighbors(
+        coefficient=1.0,
+        pixel_neighbors=pixel_neighbors,
+        pixel_neighbors_size=pixel_neighbors_size,
+    )
+
+    return laplacian_matrix - 1.0e-8 * np.eye(laplacian_matrix.shape[0])
+
+
+def sweep_key_from_instance(instance):
+    """A hashable key of every parameter of a model instance other than the coefficients of its *Constant*
+    regularizations, such that instances which only differ in their regularization coefficient have the same key, or
+    None if the instance has no *Constant* regularization or has parameters that cannot be compared.
+
+    The 'id' autofit gives every object of an instance differs between instances of the same model, and so is not part
+    of the key."""
+    coefficient_paths = {
+        path + ("coefficient",)
+        for path, _ in instance.path_instance_tuples_for_class(reg.Constant)
+    }
+
+    if len(coefficient_paths) == 0:
+        return None
+
+    try:
+        key = tuple(
+            (path, value)
+            for path, value in instance.path_instance_tuples_for_class(
+                (float, int, tuple), ignore_class=np.ndarray
+            )
+            if path not in coefficient_paths and path[-1] != "id"
+        )
+        hash(key)
+    except TypeError:
+        return None
+
+    return key
+
+
+class RegularizationSweeps:
+    def __init__(self, max_sweeps=10, max_keys=10000, max_condition_number=1.0e10):
+        """The regularization sweeps of the model instances of a phase whose parameters other than the
+        regularization coefficient repeat (see the module docstring).
+
+        Parameters
+        ----------
+        max_sweeps : int
+            The maximum number of sweeps which are stored, where the least recently used are removed first.
+        max_keys : int
+            The maximum number of keys of instances that were fitted as usual which are stored, such that a sweep is
+            computed if they are seen again.
+        max_condition_number : float
+            The evidence of a coefficient whose regularization matrix has a condition number above this is not
+            computed from a sweep, so that an instance whose fit fails to factorize it fails in the same way.
+        """
+        self.max_sweeps = max_sweeps
+        self.max_keys = max_keys
+        self.max_condition_number = max_condition_number
+
+        self.sweeps = collections.OrderedDict()
+        self.keys = collections.OrderedDict()
+
+        self.fits = 0
+        self.sweeps_computed = 0
+        self.evidences_from_sweeps = 0
+
+    def use_sweep_for_key(self, key):
+        """Whether the evidence of an instance with a key is computed from a sweep, which is the case if the key has
+        been seen before. Otherwise, the key is stored and the instance is fitted as usual."""
+        if key is None:
+            self.fits += 1
+            return False
+
+        if key in self.sweeps or key in self.keys:
+            return True
+
+        self.keys[key] = None
+
+        while len(self.keys) > self.max_keys:
+            self.keys.popitem(last=False)
+
+        self.fits += 1
+
+        return False
+
+    def evidence_from(
+        self, key, masked_imaging, tracer, hyper_image_sky, hyper_background_noise
+    ):
+        """The evidence of the fit of a tracer to a masked imaging dataset, computed from the stored sweep of its
+        key, which is computed if it is not stored, or None if the regularization matrix of the tracer's coefficient
+        is too ill-conditioned for the evidence of the sweep to match that of a fit."""
+        sweep = self.sweeps.get(key)
+
+        if sweep is None:
+
+            sweep = RegularizationSweep.from_masked_imaging_and_tracer(
+                masked_imaging=masked_imaging,
+                tracer=tracer,
+                hyper_image_sky=hyper_image_sky,
+                hyper_background_noise=hyper_background_noise,
+            )
+
+            self.sweeps[key] = sweep
+            self.keys.pop(key, None)
+            self.sweeps_computed += 1
+
+            while len(self.sweeps) > self.max_sweeps:
+                self.sweeps.popitem(last=False)
+
+        else:
+
+            self.sweeps.move_to_end(key)
+
+        coefficient = tracer.regularizations_of_planes[-1].coefficient
+
+        if (
+            sweep.regularization_condition_number_from_coefficient(
+                coefficient=coefficient
+            )
+            > self.max_condition_number
+        ):
+            self.fits += 1
+            return None
+
+        self.evidences_from_sweeps += 1
+
+        return sweep.evidence_from_coefficient(coefficient=coefficient)
+
+    def summary_str(self):
+        return (
+            "fits = {}\n"
+            "sweeps_computed = {}\n"
+            "evidences_from_sweeps = {}\n".format(
+                self.fits, self.sweeps_computed, self.evidences_from_sweeps
+            )
+        )
+
+
+def regularization_sweep_analysis_class_from(
+    analysis_class,
+    output_path,
+    max_sweeps=10,
+    max_keys=10000,
+    max_condition_number=1.0e10,
+):
+    """Create a subclass of a phase's imaging *Analysis* class which computes the evidence of instances whose
+    parameters other than the regularization coefficient repeat from a regularization sweep (see the module
+    docstring).
+
+    Parameters
+    ----------
+    analysis_class : type
+        The *Analysis* class of the phase.
+    output_path : func
+        A function returning the folder the number of fits and sweeps is output to.
+    """
+
+    class RegularizationSweepAnalysis(analysis_class):
+        def __init__(self, *args, **kwargs):
+
+            super().__init__(*args, **kwargs)
+
+            self.regularization_sweeps = RegularizationSweeps(
+                max_sweeps=max_sweeps,
+                max_keys=max_keys,
+                max_condition_number=max_condition_number,
+            )
+
+        def fit(self, instance):
+
+            key = sweep_key_from_instance(instance=instance)
+
+            if not self.regularization_sweeps.use_sweep_for_key(key=key):
+                return super().fit(instance=instance)
+
+            self.associate_hyper_images(instance=instance)
+            tracer = self.tracer_for_instance(instance=instance)
+
+            if not isinstance(tracer.regularizations_of_planes[-1], reg.Constant):
+                return super().fit(instance=instance)
+
+            self.masked_dataset.check_positions_trace_within_threshold_via_tracer(
+                tracer=tracer
+            )
+
+            self.masked_dataset.check_inversion_pixels_are_below_limit_via_tracer(
+                tracer=tracer
+            )
+
+            try:
+                evidence = self.regularization_sweeps.evidence_from(
+                    key=key,
+                    masked_imaging=self.masked_dataset,
+                    tracer=tracer,
+                    hyper_image_sky=self.hyper_image_sky_for_instance(
+                        instance=instance
+                    ),
+                    hyper_background_noise=self.hyper_background_noise_for_instance(
+                        instance=instance
+                    ),
+                )
+            except exc.InversionException as e:
+                raise af.exc.FitException from e
+
+            if evidence is None:
+                return super().fit(instance=instance)
+
+            return evidence
+
+        def visualize(self, instance, during_analysis):
+
+            os.makedirs(output_path(), exist_ok=True)
+
+            with open(
+                os.path.join(output_path(), "regularization_sweep.summary"), "w"
+            ) as f:
+                f.write(self.regularization_sweeps.summary_str())
+
+            return super().visualize(instance=instance, during_analysis=during_analysis)
+
+    RegularizationSweepAnalysis.__name__ = (
+        "RegularizationSweep" + analysis_class.__name__
+    )
+
+    return RegularizationSweepAnalysis
+
+
+def regularization_sweep_phase(
+    phase, max_sweeps=10, max_keys=10000, max_condition_number=1.0e10
+):
+    """Compute the evidences of an imaging phase's instances whose parameters other than the regularization
+    coefficient repeat from regularization sweeps (see the module docstring).
+
+    Parameters
+    ----------
+    phase : al.PhaseImaging
+        The phase whose evidences are computed from regularization sweeps.
+    max_sweeps : int
+        The maximum number of sweeps which are stored, where the least recently used are removed first.
+    max_keys : int
+        The maximum number of keys of instances that were fitted as usual which are stored, such that a sweep is
+        computed if they are seen again.
+    max_condition_number : float
+        The evidence of a coefficient whose regularization matrix has a condition number above this is computed by a
+        fit, as the autoarray inversion may fail to factorize it.
+    """
+    phase.Analysis = regularization_sweep_analysis_class_from(
+        analysis_class=phase.Analysis,
+        output_path=lambda: phase.optimizer.paths.phase_output_path,
+        max_sweeps=max_sweeps,
+        max_keys=max_keys,
+        max_condition_number=max_condition_number,
+    )
+
+    return phase
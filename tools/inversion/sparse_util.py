@@ -0,0 +1,185 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse import linalg as sparse_linalg
+
+from autoarray import exc
+from autoarray.operators.inversion import regularization as reg
+
+try:
+    from sksparse import cholmod
+except ImportError:
+    cholmod = None
+
+"""
+Sparse matrix versions of the matrices of an imaging inversion, and the sparse factorization of the curvature
+regularization matrix F + H used to compute the reconstruction and the log determinant terms of the Bayesian evidence.
+
+Every source pixel only has a handful of neighbors, so the regularization matrix H has a few non-zero entries per row.
+For a PSF that is compact compared to the image-plane footprint of the source pixels, every source pixel only overlaps
+(after blurring) with nearby source pixels, so the curvature matrix F is also sparse. A sparse Cholesky (or LDL^T)
+factorization of F + H then costs far less than the O(pixels^3) dense factorization.
+
+If scikit-sparse is installed its CHOLMOD Cholesky factorization is used, otherwise the SuperLU factorization of
+scipy in symmetric mode (a LDL^T factorization with a fill-reducing symmetric ordering, whose diagonal D gives the
+log determinant).
+"""
+
+
+def regularization_matrix_sparse_from_pixel_neighbors(
+    regularization_weights, pixel_neighbors, pixel_neighbors_size
+):
+    """From the pixel-neighbors, setup the regularization matrix of the weighted regularization scheme in compressed
+    sparse column form (see *regularization_util.weighted_regularization_matrix_from_pixel_neighbors*).
+
+    Parameters
+    ----------
+    regularization_weights : ndarray
+        The regularization weight of each pixel, which governs how much smoothing is applied to that individual pixel.
+    pixel_neighbors : ndarray
+        An array of length (total_pixels) which provides the index of all neighbors of every pixel (entries of -1
+        correspond to no neighbor).
+    pixel_neighbors_size : ndarray
+        An array of length (total_pixels) which gives the number of neighbors of every pixel.
+    """
+    pixels = pixel_neighbors.shape[0]
+
+    in_neighbors = (
+        np.arange(pixel_neighbors.shape[1])[None, :] < pixel_neighbors_size[:, None]
+    )
+
+    pixel_indexes = np.nonzero(in_neighbors)[0]
+    neighbor_indexes = pixel_neighbors[in_neighbors].astype("int")
+
+    neighbor_weights = regularization_weights[neighbor_indexes] ** 2.0
+
+    diagonal = (
+        1e-8
+        + np.bincount(pixel_indexes, weights=neighbor_weights, minlength=pixels)
+        + np.bincount(neighbor_indexes, weights=neighbor_weights, minlength=pixels)
+    )
+
+    rows = np.concatenate((np.arange(pixels), pixel_indexes, neighbor_indexes))
+    columns = np.concatenate((np.arange(pixels), neighbor_indexes, pixel_indexes))
+    values = np.concatenate((diagonal, -neighbor_weights, -neighbor_weights))
+
+    return sparse.csc_matrix((values, (rows, columns)), shape=(pixels, pixels))
+
+
+def regularization_matrix_sparse_from_mapper(regularization, mapper):
+    """The regularization matrix of a regularization scheme and mapper in compressed sparse column form.
+
+    The *Constant* scheme is the weighted scheme with the same weight for every pixel, divided by two because the
+    weighted scheme regularizes every pair of neighbors from both pixels. For other schemes the dense regularization
+    matrix is computed and converted.
+    """
+    pixelization_grid = mapper.pixelization_grid
+
+    if isinstance(regularization, reg.Constant):
+
+        regularization_weights = np.full(
+            mapper.pixels, regularization.coefficient / np.sqrt(2.0)
+        )
+
+    elif isinstance(regularization, reg.AdaptiveBrightness):
+
+        regularization_weights = regularization.regularization_weights_from_mapper(
+            mapper=mapper
+        )
+
+    else:
+
+        return sparse.csc_matrix(
+            regularization.regularization_matrix_from_mapper(mapper=mapper)
+        )
+
+    return regularization_matrix_sparse_from_pixel_neighbors(
+        regularization_weights=regularization_weights,
+        pixel_neighbors=pixelization_grid.pixel_neighbors,
+        pixel_neighbors_size=pixelization_grid.pixel_neighbors_size,
+    )
+
+
+def mapping_matrix_sparse_from(image_pointers, pixel_indexes, mapping_values, pixels):
+    """The (image_pixels, source_pixels) mapping matrix in compressed sparse row form from its rows (see
+    *inversion_util.mapping_rows_from*)."""
+    return sparse.csr_matrix(
+        (mapping_values, pixel_indexes, image_pointers),
+        shape=(image_pointers.shape[0] - 1, pixels),
+    )
+
+
+def w_tilde_sparse_from(w_tilde_pointers, w_tilde_indexes, w_tilde_values):
+    """The symmetric w-tilde matrix in compressed sparse row form, from its entries with i' >= i (see
+    *inversion_util.w_tilde_curvature_from*)."""
+    total_mask_pixels = w_tilde_pointers.shape[0] - 1
+
+    w_tilde_upper = sparse.csr_matrix(
+        (w_tilde_values, w_tilde_indexes, w_tilde_pointers),
+        shape=(total_mask_pixels, total_mask_pixels),
+    )
+
+    return (
+        w_tilde_upper
+        + w_tilde_upper.T
+        - sparse.diags(w_tilde_upper.diagonal(), format="csr")
+    ).tocsr()
+
+
+def curvature_matrix_sparse_from(w_tilde, mapping_matrix):
+    """The curvature matrix F = M^T W M in compressed sparse column form from the sparse w-tilde matrix W and the
+    sparse mapping matrix M."""
+    return (mapping_matrix.T @ (w_tilde @ mapping_matrix)).tocsc()
+
+
+class SparseCholesky:
+    def __init__(self, matrix):
+        """The factorization of a sparse symmetric positive-definite matrix, which is computed once and then used to
+        solve linear systems and compute the log determinant of the matrix.
+
+        Raises an *InversionException* if the matrix is not positive-definite, as the dense Cholesky factorization of
+        the autoarray *Inversion* does.
+
+        Parameters
+        ----------
+        matrix : scipy.sparse.spmatrix
+            The sparse symmetric positive-definite matrix which is factorized.
+        """
+        matrix = sparse.csc_matrix(matrix)
+
+        if cholmod is not None:
+
+            try:
+                self.factor = cholmod.cholesky(matrix)
+            except cholmod.CholmodNotPositiveDefiniteError:
+                raise exc.InversionException()
+
+            self.log_determinant = self.factor.logdet()
+
+        else:
+
+            try:
+                self.factor = sparse_linalg.splu(
+                    matrix,
+                    permc_spec="MMD_AT_PLUS_A",
+                    diag_pivot_thresh=0.0,
+                    options=dict(SymmetricMode=True),
+                )
+            except RuntimeError:
+                raise exc.InversionException()
+
+            # Without row pivoting U = D L^T, so the diagonal of U is the diagonal D of the LDL^T factorization, which
+            # is positive if and only if the matrix is positive-definite.
+
+            diagonal = self.factor.U.diagonal()
+
+            if np.any(diagonal <= 0.0):
+                raise exc.InversionException()
+
+            self.log_determinant = np.sum(np.log(diagonal))
+
+    def solve(self, vector):
+        """Solve the linear system of the factorized matrix for a vector."""
+        if cholmod is not None:
+            return self.factor(vector)
+
+        return self.factor.solve(vector)
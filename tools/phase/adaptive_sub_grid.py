@@ -0,0 +1,244 @@
+import autofit as af
+import autolens as al
+import numpy as np
+from autolens import exc
+
+"""
+Adaptive sub-gridding of the light profile images of a fit, which increases the sub-grid size of each image pixel
+until its intensity is converged, rather than using one sub-grid size for every pixel.
+
+A masked imaging dataset's 'sub_size' sets how finely every pixel's light profile intensities (and the deflection
+angles of the grid which is ray-traced to compute them) are oversampled. The sub-grid size needed for a precise image
+is only high in the few pixels where the intensity varies rapidly within the pixel (e.g. the centre of a steep light
+profile, or the lensed source near the critical curve), so a uniform sub-grid size is either too low for them or
+wastes most of its calculations on pixels which do not need it.
+
+An *AdaptiveSubGrid* computes the image of every pixel at each of its *sub_sizes* in turn (e.g. 2, 4, 8, 16), where
+after each sub-grid size only the pixels whose intensity changed by more than the fractional accuracy from the
+previous sub-grid size are computed again at the next:
+
+    adaptive_sub_grid = adaptive_sub_grid.AdaptiveSubGrid(mask=masked_imaging.mask)
+
+    profile_image, sub_sizes = adaptive_sub_grid.profile_image_and_sub_sizes_from_tracer(tracer=tracer)
+
+A pixel is converged when the ratio of its intensities at two successive sub-grid sizes, min / max, is above the
+fractional accuracy, which is set by the '[adaptive_sub_grid] fractional_accuracy' entry of 'config/general.ini'
+(as the '[calculation_grid] convergence_threshold' sets the calculation grid of a mass profile). Pixels which reach
+the highest sub-grid size use it, whether or not they are converged.
+
+Convergence needs a pair of sub-grid sizes, so every pixel is computed at both the first and second sub-grid sizes
+and no pixel uses the first, whose image is only the reference the second is compared to. Starting from a sub-grid
+size of 1 makes this first pass cheaper, but the intensities at sizes 1 and 2 of a pixel often agree by chance
+before they are converged, and for the 'lens_sie__source_sersic' model it gave a maximum fractional error of 7e-3,
+against 8e-4 for the default sub-grid sizes.
+
+The intensity difference between two sub-grid sizes overestimates the error of the image at the higher of them,
+which is why the default fractional accuracy of 0.999 gives the same maximum fractional error as a uniform sub-grid
+size of 16. A fractional accuracy of 0.9999 computes most pixels at sizes 8 and 16, which is slower than a uniform
+sub-grid size of 8.
+
+Using an adaptive sub-grid for the light profile images of a phase's fits is opt-in, and is performed by passing the
+phase to *adaptive_sub_grid_phase* before it is run:
+
+    phase = al.PhaseImaging(..., sub_size=1)
+
+    adaptive_sub_grid.adaptive_sub_grid_phase(phase=phase)
+
+    phase.run(dataset=imaging, mask=mask)
+
+Only the light profile images of the phase use the adaptive sub-grid. An inversion still uses the grid of the masked
+dataset, which is set by the phase's 'sub_size'.
+"""
+
+
+def fractional_accuracy_from_config():
+    return af.conf.instance.general.get(
+        "adaptive_sub_grid", "fractional_accuracy", float
+    )
+
+
+class AdaptiveSubGrid:
+    def __init__(self, mask, sub_sizes=(2, 4, 8, 16), fractional_accuracy=None):
+        """Compute light profile images of the unmasked pixels of a mask with a sub-grid size that is increased in
+        every pixel whose intensity is not converged (see the module docstring).
+
+        Parameters
+        ----------
+        mask : al.mask
+            The mask whose unmasked pixels the images are computed in (its sub-grid size is not used).
+        sub_sizes : (int,)
+            The sub-grid sizes each pixel is computed at in turn, until its intensity is converged. Every pixel is
+            computed at the first two sizes, as the first is only the reference the convergence of the second is
+            measured against.
+        fractional_accuracy : float or None
+            The fractional accuracy a pixel's intensity is converged to, which is read from the config if None.
+        """
+        if fractional_accuracy is None:
+            fractional_accuracy = fractional_accuracy_from_config()
+
+        self.mask = mask
+        self.sub_sizes = tuple(sub_sizes)
+        self.fractional_accuracy = fractional_accuracy
+
+        self.pixel_indexes_2d = np.argwhere(~np.asarray(mask, dtype="bool"))
+
+    @property
+    def pixels(self):
+        return self.pixel_indexes_2d.shape[0]
+
+    def grid_from_sub_size_and_pixels(self, sub_size, pixels):
+        """The sub-grid of size *sub_size* of the pixels of the mask whose 1D indexes are *pixels*."""
+        mask_2d = np.full(shape=self.mask.shape, fill_value=True)
+        mask_2d[
+            self.pixel_indexes_2d[pixels, 0], self.pixel_indexes_2d[pixels, 1]
+        ] = False
+
+        return al.grid.from_mask(
+            mask=al.mask.manual(
+                mask_2d=mask_2d,
+                pixel_scales=self.mask.pixel_scales,
+                sub_size=sub_size,
+                origin=self.mask.origin,
+            )
+        )
+
+    def profile_image_and_sub_sizes_from_function(self, profile_image_from_grid):
+        """The image of every unmasked pixel computed by a function of a grid which returns its sub-gridded image
+        (e.g. the *profile_image_from_grid* method of a tracer), and the sub-grid size each pixel was computed at.
+
+        Returns
+        -------
+        (al.array, ndarray)
+            The image of the unmasked pixels, binned up from their sub-grids, and their 1D sub-grid sizes.
+        """
+        profile_image = np.zeros(self.pixels)
+        sub_sizes = np.zeros(self.pixels, dtype="int")
+
+        pixels = np.arange(self.pixels)
+
+        for sub_size in self.sub_sizes:
+
+            grid = self.grid_from_sub_size_and_pixels(sub_size=sub_size, pixels=pixels)
+
+            image = np.asarray(profile_image_from_grid(grid).in_1d_binned)
+
+            # The first sub-grid size has no previous image to be converged against, so every pixel is computed again
+            # at the second.
+            if sub_size == self.sub_sizes[0]:
+                unconverged = np.full(pixels.shape[0], True)
+            else:
+                unconverged = self.unconverged_from_images(
+                    image=image, previous_image=profile_image[pixels]
+                )
+
+            profile_image[pixels] = image
+            sub_sizes[pixels] = sub_size
+
+            pixels = pixels[unconverged]
+
+            if pixels.shape[0] == 0:
+                break
+
+        return (
+            self.mask.mapping.array_stored_1d_from_array_1d(array_1d=profile_image),
+            sub_sizes,
+        )
+
+    def unconverged_from_images(self, image, previous_image):
+        """Whether the intensity of each pixel at a sub-grid size is not converged to the fractional accuracy of
+        its intensity at the previous sub-grid size."""
+        image = np.abs(image)
+        previous_image = np.abs(previous_image)
+
+        maximum = np.maximum(image, previous_image)
+
+        fractional_accuracy = np.divide(
+            np.minimum(image, previous_image),
+            maximum,
+            out=np.ones_like(maximum),
+            where=maximum > 0.0,
+        )
+
+        return fractional_accuracy < self.fractional_accuracy
+
+    def profile_image_and_sub_sizes_from_tracer(self, tracer):
+        """The profile image of a tracer (see *profile_image_and_sub_sizes_from_function*)."""
+        return self.profile_image_and_sub_sizes_from_function(
+            profile_image_from_grid=lambda grid: tracer.profile_image_from_grid(
+                grid=grid
+            )
+        )
+
+    def blurred_profile_image_from_tracer_and_convolver(
+        self, tracer, convolver, blurring_grid
+    ):
+        """The profile image of a tracer blurred with a convolver, as computed by the tracer's
+        *blurred_profile_image_from_grid_and_convolver* method, but with its image computed on the adaptive sub-grid
+        (the blurring image, outside the mask, is computed on the blurring grid)."""
+        profile_image, sub_sizes = self.profile_image_and_sub_sizes_from_tracer(
+            tracer=tracer
+        )
+
+        blurring_image = tracer.profile_image_from_grid(grid=blurring_grid)
+
+        return convolver.convolved_image_from_image_and_blurring_image(
+            image=profile_image, blurring_image=blurring_image.in_1d_binned
+        )
+
+
+def adaptive_sub_grid_analysis_class_from(
+    analysis_class, sub_sizes=(2, 4, 8, 16), fractional_accuracy=None
+):
+    """Create a subclass of a phase's *Analysis* class whose fits compute their light profile images on an adaptive
+    sub-grid (see the module docstring)."""
+
+    class AdaptiveSubGridAnalysis(analysis_class):
+        def __init__(self, *args, **kwargs):
+
+            super().__init__(*args, **kwargs)
+
+            self.adaptive_sub_grid = AdaptiveSubGrid(
+                mask=self.masked_dataset.mask,
+                sub_sizes=sub_sizes,
+                fractional_accuracy=fractional_accuracy,
+            )
+
+        def tracer_for_instance(self, instance):
+
+            tracer = super().tracer_for_instance(instance=instance)
+
+            tracer.blurred_profile_image_from_grid_and_convolver = lambda grid, convolver, blurring_grid: self.adaptive_sub_grid.blurred_profile_image_from_tracer_and_convolver(
+                tracer=tracer, convolver=convolver, blurring_grid=blurring_grid
+            )
+
+            return tracer
+
+    AdaptiveSubGridAnalysis.__name__ = "AdaptiveSubGrid" + analysis_class.__name__
+
+    return AdaptiveSubGridAnalysis
+
+
+def adaptive_sub_grid_phase(phase, sub_sizes=(2, 4, 8, 16), fractional_accuracy=None):
+    """Compute the light profile images of a phase's fits on an adaptive sub-grid (see the module docstring).
+
+    Parameters
+    ----------
+    phase : al.PhaseImaging
+        The phase whose light profile images are computed on an adaptive sub-grid.
+    sub_sizes : (int,)
+        The sub-grid sizes each pixel is computed at in turn, until its intensity is converged.
+    fractional_accuracy : float or None
+        The fractional accuracy a pixel's intensity is converged to, which is read from the config if None.
+    """
+    if not isinstance(phase, al.PhaseImaging):
+        raise exc.PhaseException(
+            "Only an imaging phase can compute its light profile images on an adaptive sub-grid"
+        )
+
+    phase.Analysis = adaptive_sub_grid_analysis_class_from(
+        analysis_class=phase.Analysis,
+        sub_sizes=sub_sizes,
+        fractional_accuracy=fractional_accuracy,
+    )
+
+    return phase
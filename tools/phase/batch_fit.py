@@ -0,0 +1,682 @@
+import inspect
+
+import numpy as np
+from astropy import cosmology as cosmo
+from scipy import sparse
+
+import autoconf.named
+import autofit as af
+import autolens as al
+from autoarray.util import fit_util
+from autoastro.util import cosmology_util
+from autolens import exc
+from autolens.util import lens_util
+
+"""
+The likelihoods of a parametric (e.g. non-inversion) lens model fitted to a masked imaging dataset, for a batch of
+samples of the model's parameters at once.
+
+A non-linear search like MultiNest fits a phase one sample at a time, creating a model instance, a tracer and a fit for
+every sample, and so pays the Python overhead of these objects (and of the decorators of every light and mass profile)
+for every likelihood evaluation. For models whose likelihood evaluation is fast (e.g. a lens model with an
+*EllipticalIsothermal* mass and *EllipticalSersic* source, or a model fitted to low resolution imaging) this overhead
+can dominate the run time.
+
+A *BatchFitImaging* takes an array of shape (total_samples, total_parameters) of physical parameter vectors, ordered
+as they are by the phase's non-linear search (e.g. the vectors passed to *model.instance_from_vector*), and returns the
+likelihood of every sample. The parameters of every light and mass profile are read from the columns of the samples
+without creating a model instance, and the deflection angles and images of the light and mass profiles listed in
+*light_kernels* and *mass_kernels* are computed for all samples at once, broadcasting over a stacked grid of shape
+(2, total_samples, total_pixels) of the (y,x) coordinates of every sample. The images are then binned up from the sub-grid and blurred with the PSF by a sparse
+matrix product for all samples at once.
+
+Light and mass profiles without a kernel are supported, but are created for every sample and evaluated one sample at a
+time by their own methods.
+
+    batch_fit = batch_fit.BatchFitImaging(masked_imaging=masked_imaging, model=phase.model)
+
+    likelihoods = batch_fit.likelihoods_from_samples(samples=samples)
+
+The likelihoods are those of *al.fit(...).likelihood* for the tracer of each sample's instance, and if the masked
+imaging has positions and a positions threshold a sample whose positions do not trace within the threshold has a
+likelihood of -np.inf (which a non-linear search gives a sample which raises a *FitException*). Models with hyper
+galaxies, a hyper image sky or hyper background noise, a pixelization or a redshift which is a free parameter are not
+supported, and nor are the assertions of a model (e.g. those added by *model.add_assertion*).
+"""
+
+
+def radial_minimum_from_profile_class(profile_class):
+    """The radial minimum a profile's coordinates are moved to before its profile functions are computed, as read
+    from the 'radial_minimum.ini' config by the *move_grid_to_radial_minimum* decorator."""
+    radial_minimum_config = autoconf.named.NamedConfig(
+        f"{af.conf.instance.config_path}/radial_minimum.ini"
+    )
+
+    return radial_minimum_config.get("radial_minimum", profile_class.__name__, float)
+
+
+def is_spherical(profile_class):
+    """Whether a profile is transformed to its reference frame by a translation only (and not a rotation), which the
+    profiles do based on their class name."""
+    return profile_class.__name__.startswith("Spherical")
+
+
+def transformed_grid_from(grid, profile_class, parameters, radial_minimum):
+    """Transform a stacked grid of shape (2, total_samples, total_pixels) to the reference frame of every sample's
+    profile and move coordinates within the radial minimum to it, as the *transform_grid* and
+    *move_grid_to_radial_minimum* decorators do for a single profile.
+
+    The profiles rotate a grid by converting it to polar coordinates, whereas this rotates it by the sine and cosine
+    of every profile's angle, which gives the same coordinates (to numerical precision) without evaluating an arctan,
+    sine and cosine for every coordinate."""
+    shifted_grid = grid - parameters["centre"].T[:, :, None]
+
+    if is_spherical(profile_class=profile_class):
+        transformed_grid = shifted_grid
+    else:
+        phi_radians = np.radians(parameters["phi"])[:, None]
+
+        cos_phi = np.cos(phi_radians)
+        sin_phi = np.sin(phi_radians)
+
+        transformed_grid = np.stack(
+            (
+                shifted_grid[0] * cos_phi - shifted_grid[1] * sin_phi,
+                shifted_grid[1] * cos_phi + shifted_grid[0] * sin_phi,
+            ),
+            axis=0,
+        )
+
+    grid_radii_squared = np.add(
+        np.square(transformed_grid[0]), np.square(transformed_grid[1])
+    )
+
+    within_radial_minimum = grid_radii_squared < radial_minimum ** 2.0
+
+    if np.any(within_radial_minimum):
+
+        with np.errstate(all="ignore"):
+            transformed_grid[:, within_radial_minimum] *= radial_minimum / np.sqrt(
+                grid_radii_squared[within_radial_minimum]
+            )
+
+        transformed_grid[np.isnan(transformed_grid)] = radial_minimum
+
+    return transformed_grid
+
+
+def rotated_grid_from_profile(grid, phi):
+    """Rotate a stacked grid of deflection angles from the reference frame of every sample's profile back to the
+    original reference frame."""
+    phi_radians = np.radians(phi)[:, None]
+
+    cos_phi = np.cos(phi_radians)
+    sin_phi = np.sin(phi_radians)
+
+    return np.stack(
+        (
+            np.add(np.multiply(grid[1], sin_phi), np.multiply(grid[0], cos_phi),),
+            np.add(np.multiply(grid[1], cos_phi), -np.multiply(grid[0], sin_phi),),
+        ),
+        axis=0,
+    )
+
+
+def sersic_image_from(grid, profile_class, parameters, radial_minimum):
+    """The images of the *EllipticalSersic* light profile (and the profiles which only fix its parameters) of every
+    sample on a stacked grid."""
+    grid = transformed_grid_from(
+        grid=grid,
+        profile_class=profile_class,
+        parameters=parameters,
+        radial_minimum=radial_minimum,
+    )
+
+    axis_ratio = parameters["axis_ratio"][:, None]
+    sersic_index = parameters["sersic_index"][:, None]
+
+    sersic_constant = (
+        (2 * sersic_index)
+        - (1.0 / 3.0)
+        + (4.0 / (405.0 * sersic_index))
+        + (46.0 / (25515.0 * sersic_index ** 2))
+        + (131.0 / (1148175.0 * sersic_index ** 3))
+        - (2194697.0 / (30690717750.0 * sersic_index ** 4))
+    )
+
+    grid_radii = np.multiply(
+        np.sqrt(axis_ratio),
+        np.sqrt(np.add(np.square(grid[1]), np.square(np.divide(grid[0], axis_ratio)))),
+    )
+
+    with np.errstate(all="ignore"):
+        return np.multiply(
+            parameters["intensity"][:, None],
+            np.exp(
+                np.multiply(
+                    -sersic_constant,
+                    np.add(
+                        np.power(
+                            np.divide(
+                                grid_radii, parameters["effective_radius"][:, None]
+                            ),
+                            1.0 / sersic_index,
+                        ),
+                        -1,
+                    ),
+                )
+            ),
+        )
+
+
+def isothermal_deflections_from(grid, profile_class, parameters, radial_minimum):
+    """The deflection angles of the *EllipticalIsothermal* and *SphericalIsothermal* mass profiles of every sample on
+    a stacked grid."""
+    grid = transformed_grid_from(
+        grid=grid,
+        profile_class=profile_class,
+        parameters=parameters,
+        radial_minimum=radial_minimum,
+    )
+
+    einstein_radius = parameters["einstein_radius"][:, None]
+
+    if is_spherical(profile_class=profile_class):
+
+        return np.multiply(
+            einstein_radius / np.sqrt(np.add(np.square(grid[0]), np.square(grid[1]))),
+            grid,
+        )
+
+    axis_ratio = np.minimum(parameters["axis_ratio"], 0.99999)[:, None]
+
+    factor = (
+        2.0
+        * (einstein_radius / (1 + axis_ratio))
+        * axis_ratio
+        / np.sqrt(1 - axis_ratio ** 2)
+    )
+
+    psi = np.sqrt(
+        np.add(np.multiply(axis_ratio ** 2, np.square(grid[1])), np.square(grid[0]),)
+    )
+
+    deflection_y = np.arctanh(
+        np.divide(np.multiply(np.sqrt(1 - axis_ratio ** 2), grid[0]), psi)
+    )
+    deflection_x = np.arctan(
+        np.divide(np.multiply(np.sqrt(1 - axis_ratio ** 2), grid[1]), psi)
+    )
+
+    return rotated_grid_from_profile(
+        grid=np.multiply(factor, np.stack((deflection_y, deflection_x), axis=0)),
+        phi=parameters["phi"],
+    )
+
+
+def spherical_nfw_deflections_from(grid, profile_class, parameters, radial_minimum):
+    """The deflection angles of the *SphericalNFW* mass profile of every sample on a stacked grid."""
+    grid = transformed_grid_from(
+        grid=grid,
+        profile_class=profile_class,
+        parameters=parameters,
+        radial_minimum=radial_minimum,
+    )
+
+    scale_radius = parameters["scale_radius"][:, None]
+
+    grid_radii = np.sqrt(np.add(np.square(grid[0]), np.square(grid[1])))
+
+    deflection_r = np.multiply(
+        4.0 * parameters["kappa_s"][:, None] * scale_radius,
+        al.mp.SphericalNFW.deflection_func_sph(np.divide(grid_radii, scale_radius)),
+    )
+
+    return np.multiply(np.divide(deflection_r, grid_radii), grid)
+
+
+def external_shear_deflections_from(grid, profile_class, parameters, radial_minimum):
+    """The deflection angles of the *ExternalShear* of every sample on a stacked grid."""
+    grid = transformed_grid_from(
+        grid=grid,
+        profile_class=profile_class,
+        parameters=parameters,
+        radial_minimum=radial_minimum,
+    )
+
+    magnitude = parameters["magnitude"][:, None]
+
+    return rotated_grid_from_profile(
+        grid=np.stack(
+            (-np.multiply(magnitude, grid[0]), np.multiply(magnitude, grid[1]),),
+            axis=0,
+        ),
+        phi=parameters["phi"],
+    )
+
+
+light_kernels = {
+    al.lp.EllipticalSersic: sersic_image_from,
+    al.lp.SphericalSersic: sersic_image_from,
+    al.lp.EllipticalExponential: sersic_image_from,
+    al.lp.SphericalExponential: sersic_image_from,
+    al.lp.EllipticalDevVaucouleurs: sersic_image_from,
+    al.lp.SphericalDevVaucouleurs: sersic_image_from,
+}
+
+mass_kernels = {
+    al.mp.EllipticalIsothermal: isothermal_deflections_from,
+    al.mp.SphericalIsothermal: isothermal_deflections_from,
+    al.mp.SphericalNFW: spherical_nfw_deflections_from,
+    al.mp.ExternalShear: external_shear_deflections_from,
+}
+
+
+class BatchProfile:
+    def __init__(self, profile, plane_index):
+        """A light or mass profile of a model, whose parameters for a batch of samples are the columns of the
+        samples which are its free parameters and the parameters of *profile* which are fixed.
+
+        Parameters
+        ----------
+        profile : LightProfile or MassProfile
+            The profile of an instance of the model, whose values are used for the parameters which are fixed.
+        plane_index : int
+            The index of the plane of the profile's galaxy.
+        """
+        self.profile_class = type(profile)
+        self.plane_index = plane_index
+
+        self.constants = {
+            name: value
+            for name, value in profile.__dict__.items()
+            if isinstance(value, (float, tuple))
+        }
+        self.columns = {}
+
+        self.radial_minimum = radial_minimum_from_profile_class(
+            profile_class=self.profile_class
+        )
+
+    def add_column(self, name, column, component=None):
+        """Read the parameter *name* (or the component of the tuple parameter *name*) from a column of the
+        samples."""
+        self.columns[(name, component)] = column
+
+    def parameters_from_samples(self, samples):
+        """The parameters of the profile of every sample, as a dictionary of arrays of shape (total_samples,) (or
+        (total_samples, 2) for a centre)."""
+        total_samples = samples.shape[0]
+
+        parameters = {
+            name: np.full((total_samples,) + np.shape(value), value, dtype="float")
+            for name, value in self.constants.items()
+        }
+
+        for (name, component), column in self.columns.items():
+            if component is None:
+                parameters[name] = samples[:, column].copy()
+            else:
+                parameters[name][:, component] = samples[:, column]
+
+        return parameters
+
+    def profiles_from_parameters(self, parameters):
+        """Create the profile of every sample, for profiles which do not have a kernel."""
+        argument_names = list(inspect.signature(self.profile_class).parameters)
+
+        total_samples = len(next(iter(parameters.values())))
+
+        return [
+            self.profile_class(
+                **{
+                    name: tuple(parameters[name][index])
+                    if parameters[name].ndim > 1
+                    else parameters[name][index]
+                    for name in argument_names
+                    if name in parameters
+                }
+            )
+            for index in range(total_samples)
+        ]
+
+
+class BatchFitImaging:
+    def __init__(self, masked_imaging, model, cosmology=cosmo.Planck15, batch_size=20):
+        """The likelihoods of a parametric lens model fitted to a masked imaging dataset for batches of samples of
+        its parameters (see the module docstring).
+
+        Parameters
+        ----------
+        masked_imaging : al.MaskedImaging
+            The masked imaging dataset that is fitted.
+        model : af.ModelMapper
+            The model fitted, e.g. the *model* of a phase.
+        cosmology : astropy.cosmology
+            The cosmology of the ray-tracing.
+        batch_size : int
+            The number of samples whose likelihoods are computed at once, which sets the memory used by the stacked
+            grids.
+        """
+        self.masked_imaging = masked_imaging
+        self.model = model
+        self.batch_size = batch_size
+
+        instance = model.instance_from_prior_medians()
+
+        if (
+            getattr(instance, "hyper_image_sky", None) is not None
+            or getattr(instance, "hyper_background_noise", None) is not None
+        ):
+            raise exc.PhaseException(
+                "A batch fit does not support a hyper image sky or hyper background noise"
+            )
+
+        galaxies = list(instance.galaxies)
+
+        for galaxy in galaxies:
+            if galaxy.has_pixelization or galaxy.has_hyper_galaxy:
+                raise exc.PhaseException(
+                    "A batch fit does not support galaxies with a pixelization or hyper galaxy"
+                )
+
+        self.plane_redshifts = lens_util.ordered_plane_redshifts_from_galaxies(
+            galaxies=galaxies
+        )
+
+        self.scaling_factors = [
+            [
+                cosmology_util.scaling_factor_between_redshifts_from_redshifts_and_cosmology(
+                    redshift_0=self.plane_redshifts[previous_plane_index],
+                    redshift_1=self.plane_redshifts[plane_index],
+                    redshift_final=self.plane_redshifts[-1],
+                    cosmology=cosmology,
+                )
+                for previous_plane_index in range(plane_index)
+            ]
+            for plane_index in range(len(self.plane_redshifts))
+        ]
+
+        batch_profiles = {}
+
+        self.light_profiles = []
+        self.mass_profiles = []
+
+        for galaxy in galaxies:
+
+            plane_index = int(
+                np.abs(np.asarray(self.plane_redshifts) - galaxy.redshift).argmin()
+            )
+
+            for profile in galaxy.light_profiles:
+                batch_profiles[id(profile)] = BatchProfile(
+                    profile=profile, plane_index=plane_index
+                )
+                self.light_profiles.append(batch_profiles[id(profile)])
+
+            for profile in galaxy.mass_profiles:
+                batch_profiles[id(profile)] = BatchProfile(
+                    profile=profile, plane_index=plane_index
+                )
+                self.mass_profiles.append(batch_profiles[id(profile)])
+
+        columns = {
+            prior_tuple.prior.id: column
+            for column, prior_tuple in enumerate(model.prior_tuples_ordered_by_id)
+        }
+
+        for path, prior in model.path_priors_tuples:
+
+            owners = [instance]
+
+            for name in path[:-1]:
+                owners.append(getattr(owners[-1], name))
+
+            # The priors of a tuple parameter (e.g. a centre) have paths ending with the name of the tuple and of
+            # its component, e.g. ('galaxies', 'lens', 'mass', 'centre', 'centre_0').
+
+            if isinstance(owners[-1], tuple):
+                owner = owners[-2]
+                name = path[-2]
+                component = int(path[-1].split("_")[-1])
+            else:
+                owner = owners[-1]
+                name = path[-1]
+                component = None
+
+            if id(owner) not in batch_profiles:
+                raise exc.PhaseException(
+                    "A batch fit only supports free parameters of light and mass profiles, not "
+                    + ".".join(path)
+                )
+
+            batch_profiles[id(owner)].add_column(
+                name=name, column=columns[prior.id], component=component
+            )
+
+        self.grids = [masked_imaging.grid, masked_imaging.blurring_grid]
+
+        if (
+            masked_imaging.positions is not None
+            and masked_imaging.positions_threshold is not None
+        ):
+            self.grids.append(masked_imaging.positions.in_1d)
+            self.positions_sizes = [
+                len(coordinate_set) for coordinate_set in masked_imaging.positions
+            ]
+        else:
+            self.positions_sizes = None
+
+        self.grid = np.concatenate([np.asarray(grid) for grid in self.grids]).T.copy()
+        self.grid_slices = []
+
+        start = 0
+
+        for grid in self.grids:
+            self.grid_slices.append(slice(start, start + grid.shape[0]))
+            start += grid.shape[0]
+
+        convolver = masked_imaging.convolver
+
+        self.image_convolution_matrix = convolution_matrix_from_frames(
+            frame_1d_indexes=convolver.image_frame_1d_indexes,
+            frame_1d_kernels=convolver.image_frame_1d_kernels,
+            frame_1d_lengths=convolver.image_frame_1d_lengths,
+            pixels=masked_imaging.mask.pixels_in_mask,
+        )
+        self.blurring_convolution_matrix = convolution_matrix_from_frames(
+            frame_1d_indexes=convolver.blurring_frame_1d_indexes,
+            frame_1d_kernels=convolver.blurring_frame_1d_kernels,
+            frame_1d_lengths=convolver.blurring_frame_1d_lengths,
+            pixels=masked_imaging.mask.pixels_in_mask,
+        )
+
+        self.image = np.asarray(masked_imaging.image)
+        self.noise_map = np.asarray(masked_imaging.noise_map)
+        self.noise_normalization = fit_util.noise_normalization_from_noise_map(
+            noise_map=self.noise_map
+        )
+
+    def values_from_profile(self, batch_profile, grid, parameters, kernels, function):
+        """The images or deflection angles of a profile for every sample on a stacked grid, computed by its kernel or,
+        if it does not have one, by the *function* of the profile of every sample."""
+        kernel = kernels.get(batch_profile.profile_class)
+
+        if kernel is not None:
+            return kernel(
+                grid=grid,
+                profile_class=batch_profile.profile_class,
+                parameters=parameters,
+                radial_minimum=batch_profile.radial_minimum,
+            )
+
+        values = []
+
+        for sample_index, profile in enumerate(
+            batch_profile.profiles_from_parameters(parameters=parameters)
+        ):
+
+            sample_values = []
+
+            for grid_of_sample, grid_slice in zip(self.grids, self.grid_slices):
+                grid_of_sample = grid_of_sample.copy()
+                grid_of_sample[:] = grid[:, sample_index, grid_slice].T
+
+                sample_values.append(
+                    np.asarray(getattr(profile, function)(grid=grid_of_sample)).T
+                )
+
+            values.append(np.concatenate(sample_values, axis=-1))
+
+        return np.stack(values, axis=-2)
+
+    def traced_grids_of_planes_from(self, grid, parameters_of_profiles):
+        """Trace a stacked grid of every sample to every plane, as *Tracer.traced_grids_of_planes_from_grid* does
+        for one sample."""
+        traced_grids = []
+        traced_deflections = []
+
+        for plane_index in range(len(self.plane_redshifts)):
+
+            scaled_grid = grid.copy()
+
+            for previous_plane_index in range(plane_index):
+                scaled_grid -= (
+                    self.scaling_factors[plane_index][previous_plane_index]
+                    * traced_deflections[previous_plane_index]
+                )
+
+            traced_grids.append(scaled_grid)
+
+            if plane_index == len(self.plane_redshifts) - 1:
+                break
+
+            deflections = np.zeros(scaled_grid.shape)
+
+            for batch_profile in self.mass_profiles:
+                if batch_profile.plane_index == plane_index:
+                    deflections += self.values_from_profile(
+                        batch_profile=batch_profile,
+                        grid=scaled_grid,
+                        parameters=parameters_of_profiles[id(batch_profile)],
+                        kernels=mass_kernels,
+                        function="deflections_from_grid",
+                    )
+
+            traced_deflections.append(deflections)
+
+        return traced_grids
+
+    def likelihoods_from_samples(self, samples):
+        """The likelihood of every sample of an array of shape (total_samples, total_parameters) of physical
+        parameter vectors, computed *batch_size* samples at once."""
+        samples = np.asarray(samples, dtype="float")
+
+        return np.concatenate(
+            [
+                self.likelihoods_from_batch(
+                    samples=samples[index : index + self.batch_size]
+                )
+                for index in range(0, samples.shape[0], self.batch_size)
+            ]
+        )
+
+    def likelihoods_from_batch(self, samples):
+
+        parameters_of_profiles = {
+            id(batch_profile): batch_profile.parameters_from_samples(samples=samples)
+            for batch_profile in self.light_profiles + self.mass_profiles
+        }
+
+        traced_grids = self.traced_grids_of_planes_from(
+            grid=np.repeat(self.grid[:, None, :], samples.shape[0], axis=1),
+            parameters_of_profiles=parameters_of_profiles,
+        )
+
+        profile_image = np.zeros(traced_grids[0].shape[1:])
+
+        for batch_profile in self.light_profiles:
+            profile_image += self.values_from_profile(
+                batch_profile=batch_profile,
+                grid=traced_grids[batch_profile.plane_index],
+                parameters=parameters_of_profiles[id(batch_profile)],
+                kernels=light_kernels,
+                function="profile_image_from_grid",
+            )
+
+        mask = self.masked_imaging.mask
+
+        image = mask.sub_fraction * profile_image[:, self.grid_slices[0]].reshape(
+            samples.shape[0], -1, mask.sub_length
+        ).sum(axis=2)
+
+        blurring_image = profile_image[:, self.grid_slices[1]]
+
+        blurred_image = (
+            self.image_convolution_matrix @ image.T
+            + self.blurring_convolution_matrix @ blurring_image.T
+        ).T
+
+        chi_squared = np.sum(
+            np.square((self.image - blurred_image) / self.noise_map), axis=1
+        )
+
+        likelihoods = -0.5 * (chi_squared + self.noise_normalization)
+
+        if self.positions_sizes is not None:
+            likelihoods[
+                self.maximum_separations_from_grid(
+                    grid=traced_grids[-1][:, :, self.grid_slices[2]]
+                )
+                > self.masked_imaging.positions_threshold
+            ] = -np.inf
+
+        return likelihoods
+
+    def maximum_separations_from_grid(self, grid):
+        """The maximum separation of the traced positions of every sample, as computed by *al.PositionsFit*."""
+        maximum_separations = []
+
+        start = 0
+
+        for positions_size in self.positions_sizes:
+
+            positions = grid[:, :, start : start + positions_size]
+
+            maximum_separations.append(
+                np.sqrt(
+                    np.max(
+                        np.sum(
+                            np.square(
+                                positions[:, :, :, None] - positions[:, :, None, :]
+                            ),
+                            axis=0,
+                        ),
+                        axis=(1, 2),
+                    )
+                )
+            )
+
+            start += positions_size
+
+        return np.max(maximum_separations, axis=0)
+
+
+def convolution_matrix_from_frames(
+    frame_1d_indexes, frame_1d_kernels, frame_1d_lengths, pixels
+):
+    """The sparse matrix of a convolver's frames, which blurs the images of many samples at once as the convolver
+    blurs one image."""
+    rows = []
+    columns = []
+    values = []
+
+    for index, length in enumerate(frame_1d_lengths):
+        rows.append(frame_1d_indexes[index, :length])
+        columns.append(np.full(length, index))
+        values.append(frame_1d_kernels[index, :length])
+
+    return sparse.csr_matrix(
+        (np.concatenate(values), (np.concatenate(rows), np.concatenate(columns))),
+        shape=(pixels, len(frame_1d_lengths)),
+    )
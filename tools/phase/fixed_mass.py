@@ -0,0 +1,360 @@
+import collections
+import hashlib
+import os
+
+import numpy as np
+
+"""
+Reuse of the ray-tracing of a phase whose mass model is fixed, or whose mass parameters repeat.
+
+Phases whose mass profiles are fixed to the result of a previous phase (e.g. the inversion hyper phases added by
+*extend_with_multiple_hyper_phases(inversion=True)*, which only fit the pixelization and regularization) create a new
+tracer with the same mass profiles for every likelihood evaluation, and so ray-trace the same grids every time. These
+grids (the traced grid, the traced sparse grid of the pixelization and the blurring grid) and their relocation to the
+border of the source-plane grid are the same for every likelihood evaluation, and only need to be computed once. The
+same is true of phases whose mass parameters repeat exactly, for example when only the source light or pixelization
+parameters of a sample change (e.g. 'phase_1__source_inversion_magnification_initialization' of the interferometer
+inversion pipeline), or when a non-linear search revisits the same mass parameters.
+
+Reusing them is opt-in, and is turned on by passing the phase to *preload_fixed_mass* before it is extended with
+hyper phases (which are copies of it) and run:
+
+    phase = al.PhaseImaging(...)
+
+    fixed_mass.preload_fixed_mass(phase=phase)
+
+    phase = phase.extend_with_multiple_hyper_phases(inversion=True)
+
+The analysis stores the traced grids of every tracer it creates in a least-recently-used *TracedGridCache*, keyed by
+the mass profiles and redshifts of every plane and the grid that was traced, whose size is bounded by a number of
+traced grids and a memory budget. A tracer whose mass model has been traced before reuses them (and the deflection
+angles between its planes, which are computed from them), otherwise its grids are traced and stored. The hits, misses
+and hit rate of the cache are output to the file 'traced_grid_cache.summary' in the phase's output path.
+"""
+
+
+def mass_key_from_tracer(tracer):
+    """A hashable key of everything that the ray-tracing of a tracer depends on, which are the redshifts of its
+    planes and the mass profiles of every galaxy (including their classes and parameters), or None if a mass profile
+    has parameters that cannot be compared (in which case its grids are never reused)."""
+    try:
+        key = (
+            tuple(tracer.plane_redshifts),
+            tuple(
+                (
+                    galaxy.redshift,
+                    tuple(
+                        (
+                            type(mass_profile),
+                            tuple(sorted(mass_profile.__dict__.items())),
+                        )
+                        for mass_profile in galaxy.mass_profiles
+                    ),
+                )
+                for galaxy in tracer.galaxies
+            ),
+        )
+        hash(key)
+    except TypeError:
+        return None
+
+    return key
+
+
+def grid_key_from_grid(grid):
+    """A key of the coordinates of a grid, such that a grid that is recomputed every likelihood evaluation (e.g. the
+    sparse grid of a pixelization) is matched to the same grid of a previous likelihood evaluation."""
+    grid = np.ascontiguousarray(grid)
+
+    return grid.shape, hashlib.sha1(grid.view(np.uint8)).digest()
+
+
+class TracedGridCache:
+    def __init__(self, max_grids=100, memory_budget=0.5):
+        """The traced grids of planes of the grids traced by tracers, stored for the mass models they were traced
+        with, such that a tracer whose mass model has been traced before reuses them.
+
+        The traced grids of the grids of the masked dataset, which are the same objects every likelihood evaluation,
+        are found by the grid's identity. Other grids (e.g. sparse grids) are found by their coordinates. The
+        traced grids of the most recently used *max_grids* grids and mass models are stored, using at most
+        *memory_budget* GB, where the least recently used are removed first.
+
+        Parameters
+        ----------
+        max_grids : int
+            The maximum number of traced grids of planes which are stored.
+        memory_budget : float
+            The maximum memory in GB used to store the traced grids of planes.
+        """
+        self.max_grids = max_grids
+        self.memory_budget = memory_budget
+
+        self.traced_grids = collections.OrderedDict()
+        self.grids_of_mass_keys = collections.Counter()
+        self.memory = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.uncached_tracers = 0
+
+    @property
+    def hit_rate(self):
+        if self.hits + self.misses == 0:
+            return 0.0
+
+        return self.hits / (self.hits + self.misses)
+
+    def entry_for_mass_key_and_grid(self, mass_key, grid):
+        """The stored entry [grid, traced grids of planes, grid key, memory] of a grid traced with a mass model, or
+        None if it has not been traced.
+
+        The grid keys of the stored grids are only computed when a grid is not found by its identity and the mass
+        model has been traced before, so a tracer whose mass model changes every likelihood evaluation computes
+        none."""
+        entry = self.traced_grids.get((mass_key, id(grid)))
+
+        if entry is not None and entry[0] is grid:
+            return entry
+
+        if self.grids_of_mass_keys[mass_key] == 0:
+            return None
+
+        grid_key = grid_key_from_grid(grid=grid)
+
+        for key, entry in self.traced_grids.items():
+
+            if key[0] != mass_key:
+                continue
+
+            if entry[2] is None:
+                entry[2] = grid_key_from_grid(grid=entry[0])
+
+            if entry[2] == grid_key:
+
+                del self.traced_grids[key]
+
+                entry[0] = grid
+                self.traced_grids[(mass_key, id(grid))] = entry
+
+                return entry
+
+        return None
+
+    def remove_least_recently_used(self):
+
+        key, entry = self.traced_grids.popitem(last=False)
+
+        self.grids_of_mass_keys[key[0]] -= 1
+
+        if self.grids_of_mass_keys[key[0]] == 0:
+            del self.grids_of_mass_keys[key[0]]
+
+        self.memory -= entry[3]
+
+    def traced_grids_of_planes_from(
+        self, tracer, mass_key, grid, plane_index_limit=None
+    ):
+
+        entry = self.entry_for_mass_key_and_grid(mass_key=mass_key, grid=grid)
+
+        if entry is not None:
+
+            self.hits += 1
+            self.traced_grids.move_to_end((mass_key, id(grid)))
+
+        else:
+
+            self.misses += 1
+
+            traced_grids = type(tracer).traced_grids_of_planes_from_grid(
+                tracer, grid=grid
+            )
+
+            for traced_grid in traced_grids:
+                relocations_cached_for_grid(grid=traced_grid)
+
+            entry = [
+                grid,
+                traced_grids,
+                None,
+                sum(np.asarray(traced_grid).nbytes for traced_grid in traced_grids)
+                * 1.0e-9,
+            ]
+
+            self.traced_grids[(mass_key, id(grid))] = entry
+            self.grids_of_mass_keys[mass_key] += 1
+            self.memory += entry[3]
+
+            while len(self.traced_grids) > 1 and (
+                len(self.traced_grids) > self.max_grids
+                or self.memory > self.memory_budget
+            ):
+                self.remove_least_recently_used()
+
+        if plane_index_limit is not None:
+            return entry[1][: plane_index_limit + 1]
+
+        return list(entry[1])
+
+    def tracer_with_cache(self, tracer):
+        """Make a tracer reuse the traced grids of the cache which were traced with its mass model, and store those
+        it traces. The deflection angles between its planes, which are computed from its traced grids, are also
+        reused.
+
+        A tracer whose mass profiles have parameters that cannot be compared (see *mass_key_from_tracer*) traces its
+        grids as usual."""
+        mass_key = mass_key_from_tracer(tracer=tracer)
+
+        if mass_key is None:
+            self.uncached_tracers += 1
+            return tracer
+
+        tracer.traced_grids_of_planes_from_grid = lambda grid, plane_index_limit=None: self.traced_grids_of_planes_from(
+            tracer=tracer,
+            mass_key=mass_key,
+            grid=grid,
+            plane_index_limit=plane_index_limit,
+        )
+
+        return tracer
+
+    def summary_str(self):
+        return (
+            "hits = {}\n"
+            "misses = {}\n"
+            "hit_rate = {:.4f}\n"
+            "uncached_tracers = {}\n"
+            "stored_grids = {}\n"
+            "stored_mass_models = {}\n"
+            "memory (GB) = {:.6f}\n".format(
+                self.hits,
+                self.misses,
+                self.hit_rate,
+                self.uncached_tracers,
+                len(self.traced_grids),
+                len(self.grids_of_mass_keys),
+                self.memory,
+            )
+        )
+
+
+def relocations_cached_for_grid(grid):
+    """Make a traced grid store the last grid and last pixelization grid it relocated to its border, such that a
+    pixelization relocating the same grids to the border of a reused traced grid does so once.
+
+    The autoarray relocation moves the coordinates of the grid it relocates in place, so a copy is relocated such
+    that a stored traced grid (and the deflection angles computed from it) is not changed by its relocation."""
+    if not hasattr(grid, "relocated_grid_from_grid"):
+        return
+
+    relocated_grid_from_grid = grid.relocated_grid_from_grid
+    relocated_pixelization_grid_from_pixelization_grid = (
+        grid.relocated_pixelization_grid_from_pixelization_grid
+    )
+
+    relocations = {}
+
+    def cached_relocation(relocation, input_grid, **kwargs):
+
+        key = relocation.__name__
+
+        if key not in relocations or relocations[key][0] is not input_grid:
+            relocations[key] = (
+                input_grid,
+                relocation(**{name: value.copy() for name, value in kwargs.items()}),
+            )
+
+        return relocations[key][1]
+
+    grid.relocated_grid_from_grid = lambda grid: cached_relocation(
+        relocated_grid_from_grid, grid, grid=grid
+    )
+    grid.relocated_pixelization_grid_from_pixelization_grid = lambda pixelization_grid: cached_relocation(
+        relocated_pixelization_grid_from_pixelization_grid,
+        pixelization_grid,
+        pixelization_grid=pixelization_grid,
+    )
+
+
+def fixed_mass_analysis_class_from(
+    analysis_class, output_path, max_grids=100, memory_budget=0.5, output_interval=100
+):
+    """Create a subclass of a phase's *Analysis* class which reuses the traced grids of its tracers whose mass model
+    has been traced before (see the module docstring).
+
+    Parameters
+    ----------
+    analysis_class : type
+        The *Analysis* class of the phase.
+    output_path : func
+        A function returning the folder the hits and misses of the traced grid cache are output to.
+    output_interval : int
+        The hits and misses are output every time this many tracers are created.
+    """
+
+    class FixedMassAnalysis(analysis_class):
+        def __init__(self, *args, **kwargs):
+
+            super().__init__(*args, **kwargs)
+
+            self.traced_grid_cache = TracedGridCache(
+                max_grids=max_grids, memory_budget=memory_budget
+            )
+            self.tracers = 0
+
+        def tracer_for_instance(self, instance):
+
+            self.tracers += 1
+
+            if self.tracers % output_interval == 0:
+                self.output_traced_grid_cache_summary()
+
+            return self.traced_grid_cache.tracer_with_cache(
+                tracer=super().tracer_for_instance(instance=instance)
+            )
+
+        def visualize(self, instance, during_analysis):
+
+            self.output_traced_grid_cache_summary()
+
+            return super().visualize(instance=instance, during_analysis=during_analysis)
+
+        def output_traced_grid_cache_summary(self):
+
+            os.makedirs(output_path(), exist_ok=True)
+
+            with open(
+                os.path.join(output_path(), "traced_grid_cache.summary"), "w"
+            ) as f:
+                f.write(self.traced_grid_cache.summary_str())
+
+    FixedMassAnalysis.__name__ = "FixedMass" + analysis_class.__name__
+
+    return FixedMassAnalysis
+
+
+def preload_fixed_mass(phase, max_grids=100, memory_budget=0.5, output_interval=100):
+    """Turn on the reuse of the traced grids of a phase whose mass model is fixed or repeats (see the module
+    docstring).
+
+    Parameters
+    ----------
+    phase : al.PhaseImaging or al.PhaseInterferometer
+        The phase whose traced grids are reused.
+    max_grids : int
+        The maximum number of traced grids of planes which are stored.
+    memory_budget : float
+        The maximum memory in GB used to store the traced grids of planes.
+    output_interval : int
+        The hits and misses of the traced grid cache are output to the phase's output path every time this many
+        tracers are created (and whenever the phase is visualized).
+    """
+    phase.Analysis = fixed_mass_analysis_class_from(
+        analysis_class=phase.Analysis,
+        output_path=lambda: phase.optimizer.paths.phase_output_path,
+        max_grids=max_grids,
+        memory_budget=memory_budget,
+        output_interval=output_interval,
+    )
+
+    return phase
@@ -0,0 +1,472 @@
+import collections
+import functools
+import math
+
+import autolens as al
+import numpy as np
+from scipy import special
+
+from tools.phase import batch_fit
+
+"""
+Culling of light profiles to the grid coordinates inside a bounding radius, for images with many compact light
+profiles (e.g. the 'intervene_0', 'intervene_1', ... galaxies of
+'simulators/imaging/lens_sie__source_sersic__intervening_objects.py', or fields of faint foreground objects).
+
+A galaxy's *profile_image_from_grid* evaluates every one of its light profiles at every coordinate of the grid, even
+though a compact light profile's intensity is negligible beyond a few effective radii. Every light profile instead
+has a bounding radius, outside of which is a fraction *flux_tolerance* of its total flux:
+
+ - For a *Sersic* (and *Exponential* and *DevVaucouleurs*) profile, this is computed from the incomplete gamma
+   function, as the flux of a Sersic profile within a radius R is gamma(2n, b_n (R / R_e)^(1/n)).
+
+ - For a *Gaussian* profile, this is sigma * sqrt(-2 ln(flux_tolerance)).
+
+ - For any other light profile (e.g. a *CoreSersic*), this is computed by integrating its intensity on a logarithmic
+   grid of radii.
+
+These are radii in the radial coordinate the light profile's intensity is a function of. A *Gaussian* uses the
+elliptical radius sqrt(x'^2 + (y'/q)^2), whose contour reaches the bounding radius R along its major axis, so the
+circle of radius R around its centre contains it. The *Sersic* profiles (including the *CoreSersic*) use the
+eccentric radius sqrt(q) * sqrt(x'^2 + (y'/q)^2), whose contour reaches R / sqrt(q) along its major axis, so they are
+culled to the circle of radius R / sqrt(q) (as is any other light profile, for which this circle is the larger of the
+two). A *GridIndex* sorts the coordinates of a grid into square cells, such that the coordinates inside a
+circle are found by checking only those of the cells which overlap it. Each light profile is then evaluated only at
+these coordinates, and is zero elsewhere. Light profiles with a kernel in 'tools/phase/batch_fit.py' are evaluated by
+it, without the overhead of their decorators.
+
+A *LightProfileCulling* stores the *GridIndex* of every grid it is used with, so the cells of a masked dataset's grid
+and blurring grid are computed once. A traced source-plane grid is different for every tracer, and its cells are only
+computed if it has many light profiles (as sorting the coordinates into cells costs about as much as evaluating a
+light profile on the grid), with the few light profiles of a typical source plane culled by checking the distance of
+every coordinate instead.
+
+A tracer is made to cull its light profiles by:
+
+    tracer = light_profile_culling.tracer_with_light_profile_culling(tracer=tracer, flux_tolerance=1.0e-4)
+
+and a phase by passing it to *light_profile_culling_phase* before it is run:
+
+    light_profile_culling.light_profile_culling_phase(phase=phase, flux_tolerance=1.0e-4)
+
+The run times with and without culling, and the difference in the images, are profiled in
+'profiling/imaging/light_profile_culling.py'.
+"""
+
+
+def bounding_radius_via_integration_from(light_profile, flux_tolerance):
+    """The radius outside of which is a fraction *flux_tolerance* of the total flux of a light profile, in the
+    radial coordinate of its *profile_image_from_grid_radii*, computed by integrating its intensity on a logarithmic grid of radii between 1e-5" and 1e5"."""
+    radii = np.logspace(-5.0, 5.0, 2001)
+
+    with np.errstate(all="ignore"):
+        fluxes = np.nan_to_num(
+            light_profile.profile_image_from_grid_radii(grid_radii=radii) * radii ** 2
+        )
+
+    cumulative_fluxes = np.concatenate(
+        ([0.0], np.cumsum(0.5 * (fluxes[1:] + fluxes[:-1]) * np.diff(np.log(radii))),)
+    )
+
+    if cumulative_fluxes[-1] <= 0.0:
+        return 0.0
+
+    return float(
+        radii[
+            min(
+                np.searchsorted(
+                    cumulative_fluxes, (1.0 - flux_tolerance) * cumulative_fluxes[-1]
+                ),
+                radii.shape[0] - 1,
+            )
+        ]
+    )
+
+
+def bounding_radius_from_light_profile(light_profile, flux_tolerance):
+    """The radius outside of which is a fraction *flux_tolerance* of the total flux of a light profile, in the
+    radial coordinate of its *profile_image_from_grid_radii* (see the module docstring)."""
+    if isinstance(light_profile, al.lp.EllipticalGaussian):
+        return light_profile.sigma * math.sqrt(-2.0 * math.log(flux_tolerance))
+
+    if isinstance(light_profile, al.lp.EllipticalSersic) and not isinstance(
+        light_profile, al.lp.EllipticalCoreSersic
+    ):
+        return (
+            light_profile.effective_radius
+            * (
+                special.gammaincinv(
+                    2.0 * light_profile.sersic_index, 1.0 - flux_tolerance
+                )
+                / light_profile.sersic_constant
+            )
+            ** light_profile.sersic_index
+        )
+
+    return bounding_radius_via_integration_from(
+        light_profile=light_profile, flux_tolerance=flux_tolerance
+    )
+
+
+def circular_bounding_radius_from_light_profile(light_profile, flux_tolerance):
+    """The radius of the circle around a light profile's centre which contains the contour of its bounding radius
+    (see the module docstring)."""
+    bounding_radius = bounding_radius_from_light_profile(
+        light_profile=light_profile, flux_tolerance=flux_tolerance
+    )
+
+    if isinstance(light_profile, al.lp.EllipticalGaussian):
+        return bounding_radius
+
+    return bounding_radius / math.sqrt(getattr(light_profile, "axis_ratio", 1.0))
+
+
+class GridIndex:
+    def __init__(self, grid, points_per_cell=64, queries_before_cells=8):
+        """A spatial index of the (y,x) coordinates of a grid, which sorts them into square cells such that the
+        coordinates inside a circle are found by checking only the coordinates of the cells that overlap it.
+
+        Sorting the coordinates into cells costs about as much as evaluating a light profile on the grid, so it is
+        only worth it for a grid which is queried many times (e.g. the image-plane grid of a tracer with many light
+        profiles, or a dataset's grid which is used by every tracer of a phase). The first *queries_before_cells*
+        queries therefore check the distance of every coordinate from the circle, after which the cells are
+        computed and used by every later query.
+
+        Parameters
+        ----------
+        grid : al.grid
+            The grid whose coordinates are indexed.
+        points_per_cell : int
+            The average number of coordinates in a cell of the bounding box of the grid, which sets the cell size.
+        queries_before_cells : int
+            The number of queries of the grid before its coordinates are sorted into cells.
+        """
+        self.coordinates = np.asarray(grid)
+        self.points_per_cell = points_per_cell
+        self.queries_before_cells = queries_before_cells
+
+        self.minimum = np.min(self.coordinates, axis=0)
+        self.maximum = np.max(self.coordinates, axis=0)
+
+        self.queries = 0
+
+        self.cell_size = None
+        self.cells_shape = None
+        self.sorted_indexes = None
+        self.cell_starts = None
+
+    def sort_coordinates_into_cells(self):
+
+        total_points = self.coordinates.shape[0]
+
+        extent = np.maximum(self.maximum - self.minimum, 1.0e-8)
+
+        self.cell_size = math.sqrt(
+            extent[0] * extent[1] * self.points_per_cell / max(total_points, 1)
+        )
+
+        self.cells_shape = tuple(
+            int(cells) for cells in np.floor(extent / self.cell_size) + 1
+        )
+
+        cell_indexes = self.cell_indexes_from_coordinates(coordinates=self.coordinates)
+
+        cell_ids = cell_indexes[:, 0] * self.cells_shape[1] + cell_indexes[:, 1]
+
+        self.sorted_indexes = np.argsort(cell_ids, kind="stable")
+
+        self.cell_starts = np.concatenate(
+            (
+                [0],
+                np.cumsum(
+                    np.bincount(
+                        cell_ids, minlength=self.cells_shape[0] * self.cells_shape[1]
+                    )
+                ),
+            )
+        )
+
+    def cell_indexes_from_coordinates(self, coordinates):
+        return np.clip(
+            np.floor((coordinates - self.minimum) / self.cell_size).astype("int"),
+            0,
+            np.array(self.cells_shape) - 1,
+        )
+
+    def indexes_within_circle(self, centre, radius):
+        """The indexes of the grid coordinates within a circle, or None if the circle contains the bounding box of
+        the grid (such that every coordinate is within it)."""
+        centre = np.asarray(centre, dtype="float")
+
+        corners_distance = np.max(
+            np.abs(np.array([self.minimum, self.maximum]) - centre), axis=0
+        )
+
+        if np.sum(corners_distance ** 2) <= radius ** 2:
+            return None
+
+        if np.any(centre + radius < self.minimum) or np.any(
+            centre - radius > self.maximum
+        ):
+            return np.zeros(0, dtype="int")
+
+        self.queries += 1
+
+        if self.queries <= self.queries_before_cells:
+            return np.nonzero(
+                np.sum((self.coordinates - centre) ** 2, axis=1) <= radius ** 2
+            )[0]
+
+        if self.sorted_indexes is None:
+            self.sort_coordinates_into_cells()
+
+        y_min, x_min = self.cell_indexes_from_coordinates(coordinates=centre - radius)
+        y_max, x_max = self.cell_indexes_from_coordinates(coordinates=centre + radius)
+
+        indexes = np.concatenate(
+            [
+                self.sorted_indexes[
+                    self.cell_starts[
+                        y * self.cells_shape[1] + x_min
+                    ] : self.cell_starts[y * self.cells_shape[1] + x_max + 1]
+                ]
+                for y in range(y_min, y_max + 1)
+            ]
+        )
+
+        return indexes[
+            np.sum((self.coordinates[indexes] - centre) ** 2, axis=1) <= radius ** 2
+        ]
+
+
+class LightProfileCulling:
+    def __init__(
+        self,
+        flux_tolerance=1.0e-4,
+        max_grids=4,
+        points_per_cell=64,
+        queries_before_cells=8,
+    ):
+        """Compute the light profile images of galaxies and planes by evaluating every light profile only at the
+        grid coordinates within its bounding radius (see the module docstring).
+
+        Parameters
+        ----------
+        flux_tolerance : float
+            The fraction of every light profile's total flux outside its bounding radius, which is not evaluated.
+        max_grids : int
+            The maximum number of grids whose *GridIndex* is stored, which are the most recently used grids.
+        points_per_cell : int
+            The average number of coordinates in a cell of every *GridIndex*.
+        queries_before_cells : int
+            The number of queries of every *GridIndex* before its coordinates are sorted into cells.
+        """
+        self.flux_tolerance = flux_tolerance
+        self.max_grids = max_grids
+        self.points_per_cell = points_per_cell
+        self.queries_before_cells = queries_before_cells
+
+        self.grids_and_indexes = collections.OrderedDict()
+        self.radial_minimums_of_classes = {}
+
+        self.evaluated_points = 0
+        self.total_points = 0
+
+    @property
+    def evaluated_fraction(self):
+        """The fraction of the grid coordinates of every light profile image computed so far that were evaluated."""
+        if self.total_points == 0:
+            return 1.0
+
+        return self.evaluated_points / self.total_points
+
+    def grid_index_from_grid(self, grid):
+
+        key = id(grid)
+
+        if key in self.grids_and_indexes and self.grids_and_indexes[key][0] is grid:
+            self.grids_and_indexes.move_to_end(key)
+            return self.grids_and_indexes[key][1]
+
+        grid_index = GridIndex(
+            grid=grid,
+            points_per_cell=self.points_per_cell,
+            queries_before_cells=self.queries_before_cells,
+        )
+
+        self.grids_and_indexes[key] = (grid, grid_index)
+
+        while len(self.grids_and_indexes) > self.max_grids:
+            self.grids_and_indexes.popitem(last=False)
+
+        return grid_index
+
+    def profile_image_from_light_profile_and_coordinates(
+        self, light_profile, coordinates
+    ):
+        """The image of a light profile at an array of (y,x) coordinates of shape (total_coordinates, 2).
+
+        A light profile with a kernel in *batch_fit.light_kernels* is computed by it, as the decorators of a light
+        profile's *profile_image_from_grid* read the radial minimum config every time it is called, which takes
+        longer than computing a compact light profile's image at the few coordinates inside its bounding radius."""
+        profile_class = type(light_profile)
+
+        if profile_class not in batch_fit.light_kernels:
+            return light_profile.profile_image_from_grid(
+                grid=al.grid_irregular.manual_1d(grid=coordinates)
+            )
+
+        if profile_class not in self.radial_minimums_of_classes:
+            self.radial_minimums_of_classes[
+                profile_class
+            ] = batch_fit.radial_minimum_from_profile_class(profile_class=profile_class)
+
+        return batch_fit.light_kernels[profile_class](
+            grid=coordinates.T[:, None, :],
+            profile_class=profile_class,
+            parameters={
+                name: np.asarray([value])
+                for name, value in light_profile.__dict__.items()
+                if isinstance(value, (float, tuple))
+            },
+            radial_minimum=self.radial_minimums_of_classes[profile_class],
+        )[0]
+
+    def sub_profile_image_from_galaxy_and_grid(self, galaxy, grid):
+        """The summed image of a galaxy's light profiles on a grid, without binning its sub-grid."""
+        sub_profile_image = np.zeros(grid.shape[0])
+
+        if not galaxy.has_light_profile:
+            return sub_profile_image
+
+        grid_index = self.grid_index_from_grid(grid=grid)
+
+        for light_profile in galaxy.light_profiles:
+
+            indexes = grid_index.indexes_within_circle(
+                centre=light_profile.centre,
+                radius=circular_bounding_radius_from_light_profile(
+                    light_profile=light_profile, flux_tolerance=self.flux_tolerance
+                ),
+            )
+
+            self.total_points += grid.shape[0]
+
+            if indexes is None:
+                self.evaluated_points += grid.shape[0]
+                sub_profile_image += self.profile_image_from_light_profile_and_coordinates(
+                    light_profile=light_profile, coordinates=grid_index.coordinates
+                )
+            elif indexes.shape[0] > 0:
+                self.evaluated_points += indexes.shape[0]
+                sub_profile_image[
+                    indexes
+                ] += self.profile_image_from_light_profile_and_coordinates(
+                    light_profile=light_profile,
+                    coordinates=grid_index.coordinates[indexes],
+                )
+
+        return sub_profile_image
+
+    def profile_image_from_galaxy_and_grid(self, galaxy, grid):
+        """Compute a galaxy's *profile_image_from_grid* by culling its light profiles."""
+        return grid.mapping.array_stored_1d_from_sub_array_1d(
+            sub_array_1d=self.sub_profile_image_from_galaxy_and_grid(
+                galaxy=galaxy, grid=grid
+            )
+        )
+
+    def profile_image_from_plane_and_grid(self, plane, grid):
+        """Compute a plane's *profile_image_from_grid* by culling the light profiles of its galaxies.
+
+        Coordinates (e.g. the positions of a *PositionsFit*), which are lists of coordinate sets rather than grids,
+        are computed by the plane itself."""
+        if not isinstance(grid, np.ndarray):
+            return type(plane).profile_image_from_grid(plane, grid=grid)
+
+        sub_profile_image = np.zeros(grid.shape[0])
+
+        for galaxy in plane.galaxies:
+            sub_profile_image += self.sub_profile_image_from_galaxy_and_grid(
+                galaxy=galaxy, grid=grid
+            )
+
+        return grid.mapping.array_stored_1d_from_sub_array_1d(
+            sub_array_1d=sub_profile_image
+        )
+
+    def profile_images_of_galaxies_from_plane_and_grid(self, plane, grid):
+        """Compute a plane's *profile_images_of_galaxies_from_grid* by culling the light profiles of its galaxies."""
+        return [
+            self.profile_image_from_galaxy_and_grid(galaxy=galaxy, grid=grid)
+            for galaxy in plane.galaxies
+        ]
+
+
+def tracer_with_light_profile_culling(
+    tracer, flux_tolerance=1.0e-4, light_profile_culling=None
+):
+    """Make a tracer compute the light profile images of its planes by culling their light profiles (see the module
+    docstring).
+
+    Parameters
+    ----------
+    tracer : al.Tracer
+        The tracer whose light profiles are culled.
+    flux_tolerance : float
+        The fraction of every light profile's total flux outside its bounding radius, which is not evaluated.
+    light_profile_culling : LightProfileCulling or None
+        The *LightProfileCulling* used (e.g. to share its grid indexes between tracers), which is created with
+        *flux_tolerance* if None.
+    """
+    if light_profile_culling is None:
+        light_profile_culling = LightProfileCulling(flux_tolerance=flux_tolerance)
+
+    for plane in tracer.planes:
+
+        plane.profile_image_from_grid = functools.partial(
+            light_profile_culling.profile_image_from_plane_and_grid, plane
+        )
+        plane.profile_images_of_galaxies_from_grid = functools.partial(
+            light_profile_culling.profile_images_of_galaxies_from_plane_and_grid, plane
+        )
+
+    return tracer
+
+
+def light_profile_culling_analysis_class_from(analysis_class, flux_tolerance=1.0e-4):
+    """Create a subclass of a phase's *Analysis* class whose tracers cull their light profiles (see the module
+    docstring), sharing one *LightProfileCulling* such that the indexes of the dataset's grids are computed once."""
+
+    light_profile_culling = LightProfileCulling(flux_tolerance=flux_tolerance)
+
+    class LightProfileCullingAnalysis(analysis_class):
+        def tracer_for_instance(self, instance):
+            return tracer_with_light_profile_culling(
+                tracer=super().tracer_for_instance(instance=instance),
+                light_profile_culling=light_profile_culling,
+            )
+
+    LightProfileCullingAnalysis.__name__ = (
+        "LightProfileCulling" + analysis_class.__name__
+    )
+
+    return LightProfileCullingAnalysis
+
+
+def light_profile_culling_phase(phase, flux_tolerance=1.0e-4):
+    """Make the tracers of a phase compute their light profile images by culling their light profiles (see the
+    module docstring).
+
+    Parameters
+    ----------
+    phase : al.PhaseImaging or al.PhaseInterferometer
+        The phase whose light profiles are culled.
+    flux_tolerance : float
+        The fraction of every light profile's total flux outside its bounding radius, which is not evaluated.
+    """
+    phase.Analysis = light_profile_culling_analysis_class_from(
+        analysis_class=phase.Analysis, flux_tolerance=flux_tolerance
+    )
+
+    return phase
@@ -0,0 +1,411 @@
+import collections
+
+import numpy as np
+
+from tools.phase import batch_fit
+
+"""
+Vectorised multi-plane ray-tracing, for tracers with many line-of-sight galaxies (e.g. the 'los_0', 'los_1', ...
+galaxies of 'simulators/imaging/lens_multi_plane.py', or populations of hundreds of line-of-sight halos).
+
+A tracer's *traced_grids_of_planes_from_grid* loops over its planes, and in every plane over its galaxies and their
+mass profiles, computing the deflection angles of every mass profile with its own methods (and paying the overhead of
+their decorators). The grid of every plane is the image-plane grid minus the deflection angles of every previous
+plane, scaled by a scaling factor which is computed from the cosmology for every pair of planes every time the grids
+are traced. For N planes this is N^2 / 2 scaling factors and grid subtractions.
+
+A *VectorisedRayTracing* traces the same grids, but:
+
+ - Groups the mass profiles of every plane by their class into a *MassProfileBlock*, which stores the parameters of
+   its profiles as arrays (a 'struct of arrays'). The deflection angles of all profiles of a block are computed by one
+   call of the vectorised kernels of 'tools/phase/batch_fit.py' (which broadcast over the profiles rather than the
+   samples of a batch fit) and summed. Mass profiles without a kernel are computed by their own methods.
+
+ - Computes the scaling factors between every pair of planes once for every set of plane redshifts, using vectorised
+   cosmology calculations, and stores them for every tracer with the same redshifts.
+
+ - For a flat cosmology, the scaling factor between planes i and j is c_i * (1 - chi_i / chi_j), where chi is the
+   comoving distance and c_i = chi_s / (chi_s - chi_i) for the final plane s. The grid of every plane is then the
+   image-plane grid minus two running sums of the deflection angles of the previous planes, so tracing N planes
+   takes N grid updates rather than N^2 / 2.
+
+A tracer is made to use vectorised ray-tracing by:
+
+    tracer = multi_plane.tracer_with_vectorised_ray_tracing(tracer=tracer)
+
+and a phase, whose tracers are created for every likelihood evaluation, by passing it to
+*vectorised_ray_tracing_phase* before it is run:
+
+    multi_plane.vectorised_ray_tracing_phase(phase=phase)
+
+The traced grids agree with those of the tracer to numerical precision, as measured by
+'profiling/imaging/multi_plane_line_of_sight.py'.
+"""
+
+scaling_factors_of_redshifts = collections.OrderedDict()
+
+
+def scaling_factors_from_redshifts_and_cosmology(plane_redshifts, cosmology):
+    """The scaling factors between every pair of planes, as an array of shape (total_planes, total_planes) whose
+    entry [i, j] for i < j is the factor the deflection angles of plane i are scaled by when they are subtracted from
+    the grid of plane j (as computed by *cosmology_util.scaling_factor_between_redshifts_from_redshifts_and_cosmology*).
+
+    The scaling factors of the last 100 sets of plane redshifts and cosmologies are stored."""
+    key = (tuple(plane_redshifts), repr(cosmology))
+
+    if key in scaling_factors_of_redshifts:
+        scaling_factors_of_redshifts.move_to_end(key)
+        return scaling_factors_of_redshifts[key]
+
+    redshifts = np.asarray(plane_redshifts, dtype="float")
+    total_planes = redshifts.shape[0]
+
+    scaling_factors = np.zeros((total_planes, total_planes))
+
+    if total_planes > 1:
+
+        indexes_0, indexes_1 = np.triu_indices(total_planes, k=1)
+
+        distance_between_planes = (
+            cosmology.angular_diameter_distance_z1z2(
+                redshifts[indexes_0], redshifts[indexes_1]
+            )
+            .to("kpc")
+            .value
+        )
+        distance_to_final = (
+            cosmology.angular_diameter_distance(redshifts[-1]).to("kpc").value
+        )
+        distance_to_plane_1 = (
+            cosmology.angular_diameter_distance(redshifts[indexes_1]).to("kpc").value
+        )
+        distance_from_plane_0_to_final = (
+            cosmology.angular_diameter_distance_z1z2(
+                redshifts[indexes_0], np.full(indexes_0.shape, redshifts[-1])
+            )
+            .to("kpc")
+            .value
+        )
+
+        scaling_factors[indexes_0, indexes_1] = (
+            distance_between_planes * distance_to_final
+        ) / (distance_to_plane_1 * distance_from_plane_0_to_final)
+
+    scaling_factors_of_redshifts[key] = scaling_factors
+
+    while len(scaling_factors_of_redshifts) > 100:
+        scaling_factors_of_redshifts.popitem(last=False)
+
+    return scaling_factors
+
+
+def comoving_factors_from_redshifts_and_cosmology(
+    plane_redshifts, cosmology, scaling_factors
+):
+    """The factors (c_i, 1 / chi_i) of a flat cosmology, such that scaling_factors[i, j] = c_i * (1 - chi_i / chi_j)
+    (see the module docstring), or None if the scaling factors are not given by them (e.g. for a curved cosmology).
+    """
+    total_planes = len(plane_redshifts)
+
+    if total_planes < 2 or getattr(cosmology, "Ok0", None) != 0.0:
+        return None
+
+    comoving_distances = (
+        cosmology.comoving_distance(np.asarray(plane_redshifts, dtype="float"))
+        .to("kpc")
+        .value
+    )
+
+    if comoving_distances[0] <= 0.0:
+        return None
+
+    factors = np.zeros(total_planes)
+    factors[:-1] = comoving_distances[-1] / (
+        comoving_distances[-1] - comoving_distances[:-1]
+    )
+
+    inverse_distances = 1.0 / comoving_distances
+
+    indexes_0, indexes_1 = np.triu_indices(total_planes, k=1)
+
+    if not np.allclose(
+        factors[indexes_0]
+        * (1.0 - comoving_distances[indexes_0] * inverse_distances[indexes_1]),
+        scaling_factors[indexes_0, indexes_1],
+        rtol=1.0e-8,
+        atol=1.0e-12,
+    ):
+        return None
+
+    return factors, inverse_distances
+
+
+class MassProfileBlock:
+    def __init__(self, profile_class, profiles, memory_budget=0.25):
+        """The mass profiles of one class in a plane, whose parameters are stored as arrays of shape
+        (total_profiles,) (or (total_profiles, 2) for a centre), such that their deflection angles are computed
+        together by the profile class's kernel in *batch_fit.mass_kernels*.
+
+        Parameters
+        ----------
+        profile_class : type
+            The class of the mass profiles, which must have a kernel.
+        profiles : [MassProfile]
+            The mass profiles.
+        memory_budget : float
+            The maximum memory in GB of the (y,x) grids of the profiles which are computed at once.
+        """
+        self.profile_class = profile_class
+        self.kernel = batch_fit.mass_kernels[profile_class]
+        self.memory_budget = memory_budget
+
+        self.parameters = {
+            name: np.asarray([profile.__dict__[name] for profile in profiles])
+            for name, value in profiles[0].__dict__.items()
+            if isinstance(value, (float, tuple))
+        }
+
+        self.radial_minimum = batch_fit.radial_minimum_from_profile_class(
+            profile_class=profile_class
+        )
+
+    @property
+    def total_profiles(self):
+        return next(iter(self.parameters.values())).shape[0]
+
+    def chunk_size_from_total_pixels(self, total_pixels):
+        """The number of profiles whose deflection angles are computed at once, such that their (y,x) grids (and the
+        few temporary arrays of the same shape of the kernel) fit in the memory budget."""
+        return max(int(self.memory_budget * 1.0e9 / (8 * 2 * 8 * total_pixels)), 1)
+
+    def deflections_from_grid(self, grid):
+        """The summed deflection angles of every profile on a grid of shape (2, total_pixels)."""
+        chunk_size = self.chunk_size_from_total_pixels(total_pixels=grid.shape[1])
+
+        deflections = np.zeros(grid.shape)
+
+        for start in range(0, self.total_profiles, chunk_size):
+
+            deflections += np.sum(
+                self.kernel(
+                    grid=grid[:, None, :],
+                    profile_class=self.profile_class,
+                    parameters={
+                        name: value[start : start + chunk_size]
+                        for name, value in self.parameters.items()
+                    },
+                    radial_minimum=self.radial_minimum,
+                ),
+                axis=1,
+            )
+
+        return deflections
+
+
+def blocks_and_profiles_from_plane(plane, memory_budget=0.25):
+    """Group the mass profiles of a plane whose class has a kernel into a *MassProfileBlock* for every class,
+    returning the blocks and the mass profiles without a kernel."""
+    profiles_of_classes = collections.OrderedDict()
+    profiles = []
+
+    for galaxy in plane.galaxies:
+        for mass_profile in galaxy.mass_profiles:
+            if type(mass_profile) in batch_fit.mass_kernels:
+                profiles_of_classes.setdefault(type(mass_profile), []).append(
+                    mass_profile
+                )
+            else:
+                profiles.append(mass_profile)
+
+    return (
+        [
+            MassProfileBlock(
+                profile_class=profile_class,
+                profiles=profiles_of_class,
+                memory_budget=memory_budget,
+            )
+            for profile_class, profiles_of_class in profiles_of_classes.items()
+        ],
+        profiles,
+    )
+
+
+class VectorisedRayTracing:
+    def __init__(self, tracer, memory_budget=0.25):
+        """Trace grids through the planes of a tracer using vectorised deflection angle calculations and precomputed
+        scaling factors (see the module docstring).
+
+        Parameters
+        ----------
+        tracer : al.Tracer
+            The tracer whose grids are traced.
+        memory_budget : float
+            The maximum memory in GB of the (y,x) grids of the profiles of a block which are computed at once.
+        """
+        self.tracer = tracer
+
+        self.blocks_and_profiles_of_planes = [
+            blocks_and_profiles_from_plane(plane=plane, memory_budget=memory_budget)
+            for plane in tracer.planes
+        ]
+
+        self.scaling_factors = scaling_factors_from_redshifts_and_cosmology(
+            plane_redshifts=tracer.plane_redshifts, cosmology=tracer.cosmology
+        )
+
+        self.comoving_factors = comoving_factors_from_redshifts_and_cosmology(
+            plane_redshifts=tracer.plane_redshifts,
+            cosmology=tracer.cosmology,
+            scaling_factors=self.scaling_factors,
+        )
+
+    def deflections_of_plane_from_grid(self, plane_index, grid, traced_grid):
+        """The deflection angles of a plane's mass profiles on its traced grid, of shape (2, total_pixels).
+
+        Parameters
+        ----------
+        grid : grids.Grid
+            The image-plane grid, which is used as the type of the traced grid passed to the mass profiles without a
+            kernel.
+        traced_grid : ndarray
+            The traced grid of the plane, of shape (2, total_pixels).
+        """
+        blocks, profiles = self.blocks_and_profiles_of_planes[plane_index]
+
+        deflections = np.zeros(traced_grid.shape)
+
+        for block in blocks:
+            deflections += block.deflections_from_grid(grid=traced_grid)
+
+        if len(profiles) > 0:
+
+            grid_of_plane = grid.copy()
+            grid_of_plane[:] = traced_grid.T
+
+            for profile in profiles:
+                deflections += np.asarray(
+                    profile.deflections_from_grid(grid=grid_of_plane)
+                ).T
+
+        return deflections
+
+    def traced_grids_of_planes_from_grid(self, grid, plane_index_limit=None):
+        """Trace a grid to every plane, as *Tracer.traced_grids_of_planes_from_grid* does.
+
+        Coordinates (e.g. the positions of a *PositionsFit*), which are lists of coordinate sets rather than grids,
+        are traced by the tracer itself."""
+        if not isinstance(grid, np.ndarray):
+            return type(self.tracer).traced_grids_of_planes_from_grid(
+                self.tracer, grid=grid, plane_index_limit=plane_index_limit
+            )
+
+        total_planes = len(self.blocks_and_profiles_of_planes)
+
+        if plane_index_limit is None:
+            plane_index_limit = total_planes - 1
+
+        image_plane_grid = np.asarray(grid).T
+
+        traced_grids = []
+        deflections_of_planes = []
+
+        if self.comoving_factors is not None:
+            factors, inverse_distances = self.comoving_factors
+            summed_deflections = np.zeros(image_plane_grid.shape)
+            summed_weighted_deflections = np.zeros(image_plane_grid.shape)
+
+        for plane_index in range(plane_index_limit + 1):
+
+            if plane_index == 0:
+                traced_grid = image_plane_grid.copy()
+            elif self.comoving_factors is not None:
+                traced_grid = (
+                    image_plane_grid
+                    - summed_deflections
+                    + inverse_distances[plane_index] * summed_weighted_deflections
+                )
+            else:
+                traced_grid = image_plane_grid.copy()
+
+                for previous_plane_index in range(plane_index):
+                    traced_grid -= (
+                        self.scaling_factors[previous_plane_index, plane_index]
+                        * deflections_of_planes[previous_plane_index]
+                    )
+
+            traced_grid_of_plane = grid.copy()
+            traced_grid_of_plane[:] = traced_grid.T
+            traced_grids.append(traced_grid_of_plane)
+
+            if plane_index == plane_index_limit or plane_index == total_planes - 1:
+                break
+
+            deflections = self.deflections_of_plane_from_grid(
+                plane_index=plane_index, grid=grid, traced_grid=traced_grid
+            )
+
+            if self.comoving_factors is not None:
+                summed_deflections += factors[plane_index] * deflections
+                summed_weighted_deflections += (
+                    factors[plane_index] / inverse_distances[plane_index] * deflections
+                )
+            else:
+                deflections_of_planes.append(deflections)
+
+        return traced_grids
+
+
+def tracer_with_vectorised_ray_tracing(tracer, memory_budget=0.25):
+    """Make a tracer trace its grids using vectorised ray-tracing (see the module docstring).
+
+    Parameters
+    ----------
+    tracer : al.Tracer
+        The tracer whose grids are traced.
+    memory_budget : float
+        The maximum memory in GB of the (y,x) grids of the profiles of a block which are computed at once.
+    """
+    vectorised_ray_tracing = VectorisedRayTracing(
+        tracer=tracer, memory_budget=memory_budget
+    )
+
+    tracer.traced_grids_of_planes_from_grid = (
+        vectorised_ray_tracing.traced_grids_of_planes_from_grid
+    )
+
+    return tracer
+
+
+def vectorised_ray_tracing_analysis_class_from(analysis_class, memory_budget=0.25):
+    """Create a subclass of a phase's *Analysis* class whose tracers use vectorised ray-tracing (see the module
+    docstring)."""
+
+    class VectorisedRayTracingAnalysis(analysis_class):
+        def tracer_for_instance(self, instance):
+            return tracer_with_vectorised_ray_tracing(
+                tracer=super().tracer_for_instance(instance=instance),
+                memory_budget=memory_budget,
+            )
+
+    VectorisedRayTracingAnalysis.__name__ = (
+        "VectorisedRayTracing" + analysis_class.__name__
+    )
+
+    return VectorisedRayTracingAnalysis
+
+
+def vectorised_ray_tracing_phase(phase, memory_budget=0.25):
+    """Make the tracers of a phase trace their grids using vectorised ray-tracing (see the module docstring).
+
+    Parameters
+    ----------
+    phase : al.PhaseImaging or al.PhaseInterferometer
+        The phase whose tracers use vectorised ray-tracing.
+    memory_budget : float
+        The maximum memory in GB of the (y,x) grids of the profiles of a block which are computed at once.
+    """
+    phase.Analysis = vectorised_ray_tracing_analysis_class_from(
+        analysis_class=phase.Analysis, memory_budget=memory_budget
+    )
+
+    return phase
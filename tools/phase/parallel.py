@@ -0,0 +1,165 @@
+import multiprocessing
+
+import autofit as af
+import emcee
+import numpy as np
+from autolens import exc
+
+"""
+Parallel likelihood evaluation of a phase over the cores of a node, using a local pool of processes.
+
+A *LikelihoodPool* forks a pool of worker processes once the phase's analysis (its masked dataset, convolver, grids
+and preloads) has been set up. The forked workers share the analysis's memory with the process that created them
+(which is only copied if a worker writes to it), so no dataset is pickled or set up again per worker, and each
+likelihood evaluation only sends a parameter vector to a worker and a likelihood back.
+
+Turning this on for a phase is opt-in, and is performed by passing the phase to *parallel_phase* before it is run:
+
+    phase = al.PhaseImaging(..., optimizer_class=af.Emcee)
+
+    parallel.parallel_phase(phase=phase, processes=16)
+
+    phase.run(dataset=imaging, mask=mask)
+
+The phase's non-linear search must propose many points at once for them to be evaluated concurrently, which *Emcee*
+does for every walker of every step, so the parallel mode is supported for phases using *Emcee*. MultiNest calls the
+likelihood of one live point at a time from its Fortran sampler (and is parallelized over MPI, not local processes),
+and the *DownhillSimplex* search is sequential, so their likelihood evaluations cannot be spread over a pool. The
+likelihoods of any set of parameter vectors can also be computed with a pool directly:
+
+    with parallel.LikelihoodPool(analysis=analysis, model=phase.model, processes=16) as pool:
+        likelihoods = pool.likelihoods_from_vectors(vectors=vectors)
+
+The pool uses the 'fork' start method, so the analysis (which need not be picklable, e.g. the analysis of a phase
+passed to *profile_phase* or *preload_fixed_mass*) is inherited by the workers rather than sent to them, and it is
+only available on Unix systems.
+"""
+
+"""The analysis and model of a worker process, which are inherited from the process which created the pool."""
+worker_analysis = None
+worker_model = None
+
+
+def initialize_worker(analysis, model):
+    global worker_analysis, worker_model
+
+    worker_analysis = analysis
+    worker_model = model
+
+
+def likelihood_from_vector(vector):
+    """The likelihood of a physical parameter vector evaluated by a worker, which is -np.inf if the fit raises a
+    *FitException* (e.g. the positions do not trace within the threshold), as it is for the non-linear searches."""
+    try:
+        return float(worker_analysis.fit(worker_model.instance_from_vector(vector)))
+    except af.exc.FitException:
+        return -np.inf
+
+
+class LikelihoodPool:
+    def __init__(self, analysis, model, processes=None):
+        """A pool of worker processes which evaluate the likelihoods of an analysis, for the physical parameter
+        vectors of a model (see the module docstring).
+
+        Parameters
+        ----------
+        analysis : af.Analysis
+            The analysis of the phase, whose *fit* method gives the likelihood of a model instance.
+        model : af.ModelMapper
+            The model of the phase, which creates the instance of every parameter vector.
+        processes : int or None
+            The number of worker processes, which defaults to the number of cores of the node.
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+
+        self.pool = multiprocessing.get_context("fork").Pool(
+            processes=self.processes,
+            initializer=initialize_worker,
+            initargs=(analysis, model),
+        )
+
+        self.max_likelihood = -np.inf
+
+    def likelihoods_from_vectors(self, vectors):
+        """The likelihoods of a list of physical parameter vectors, evaluated concurrently by the workers."""
+        vectors = list(vectors)
+
+        return self.pool.map(
+            likelihood_from_vector,
+            vectors,
+            chunksize=max(1, len(vectors) // (4 * self.processes)),
+        )
+
+    def map(self, function, vectors):
+        """The *map* method used by the *Emcee* sampler to evaluate the likelihoods of its walkers.
+
+        The likelihoods are evaluated by the workers, and the fitness function of the non-linear search, *function*,
+        is only called (in this process) for a vector whose likelihood is the highest found so far, which updates the
+        phase's most likely result and performs its visualization and backups as it would in serial."""
+        vectors = list(vectors)
+
+        likelihoods = self.likelihoods_from_vectors(vectors=vectors)
+
+        for vector, likelihood in zip(vectors, likelihoods):
+
+            if likelihood > self.max_likelihood:
+
+                self.max_likelihood = likelihood
+                function(vector)
+
+        return likelihoods
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ParallelEmcee(af.Emcee):
+    """An *Emcee* optimizer which evaluates the likelihoods of its walkers over a *LikelihoodPool*, which a phase's
+    optimizer is converted to by *parallel_phase* (such that it can still be pickled with the phase)."""
+
+    processes = None
+
+    def fit(self, analysis, model):
+
+        ensemble_sampler_class = emcee.EnsembleSampler
+
+        with LikelihoodPool(
+            analysis=analysis, model=model, processes=self.processes
+        ) as pool:
+
+            emcee.EnsembleSampler = lambda **kwargs: ensemble_sampler_class(
+                pool=pool, **kwargs
+            )
+
+            try:
+                return super().fit(analysis=analysis, model=model)
+            finally:
+                emcee.EnsembleSampler = ensemble_sampler_class
+
+
+def parallel_phase(phase, processes=None):
+    """Evaluate the likelihoods of a phase concurrently over a pool of processes (see the module docstring).
+
+    Parameters
+    ----------
+    phase : al.PhaseImaging or al.PhaseInterferometer
+        The phase which is run in parallel, whose optimizer must be an *Emcee*.
+    processes : int or None
+        The number of worker processes, which defaults to the number of cores of the node.
+    """
+    if not isinstance(phase.optimizer, af.Emcee):
+        raise exc.PhaseException(
+            "Only a phase whose optimizer is Emcee can evaluate its likelihoods in parallel"
+        )
+
+    phase.optimizer.__class__ = ParallelEmcee
+    phase.optimizer.processes = processes
+
+    return phase
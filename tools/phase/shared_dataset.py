@@ -0,0 +1,205 @@
+import io
+import json
+import pickle
+import secrets
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+"""
+A dataset (e.g. a masked imaging dataset, including its image, noise-map, grids, PSF, convolver frames and preloads)
+published to a block of shared memory by one process, which other processes on the same node attach to without
+loading, setting up or copying it.
+
+Every process which fits the same dataset (e.g. the workers of a parallel phase, or the processes of a batch job
+fitting different models to one lens) otherwise loads the dataset's .fits files and sets up its masked dataset, and so
+holds its own copy of every array. Publishing the dataset puts each of its NumPy arrays in one shared memory block,
+and the processes which attach to it get the same dataset object whose arrays are read-only views of that block.
+
+    shared = shared_dataset.SharedDataset(dataset=masked_imaging, name="lens_1")
+
+    # In every other process on the node:
+
+    masked_imaging = shared_dataset.dataset_from_shared_memory(name="lens_1")
+
+    # Once every process has attached (or finished), in the publishing process:
+
+    shared.close()
+
+The dataset is stored with pickle, where every array (including the autoarray *Array*, *Grid*, *Mask* and *Kernel*
+subclasses, whose attributes are kept) of at least *minimum_bytes* bytes is replaced by a reference to its location
+in the block, so only the small pickle of the dataset's other attributes is unpickled by each attaching process.
+
+The workers of a *LikelihoodPool* (see 'tools/phase/parallel.py') are forked, and so already share the dataset of the
+process which forked them without copying its arrays. A shared dataset is for processes which are not forked from
+the process that set up the dataset, such as separately launched jobs on a node.
+"""
+
+"""The shared memory blocks this process has attached to, which must be kept open whilst their arrays are used."""
+attached_blocks = {}
+
+"""The size of the header of a block, which stores the offset and size of the dataset's pickle within the block."""
+header_bytes = 64
+
+"""The alignment of every array in a block, in bytes."""
+alignment_bytes = 64
+
+
+def array_from_shared_memory(name, offset, shape, dtype, array_class, attributes):
+    """Rebuild an array published to a shared memory block as a read-only view of the block, with the class and
+    attributes of the published array."""
+    block = attached_block_from_name(name=name)
+
+    array = np.ndarray(shape=shape, dtype=dtype, buffer=block.buf, offset=offset)
+    array.flags.writeable = False
+
+    if array_class is not np.ndarray:
+        array = array.view(array_class)
+        array.__dict__.update(attributes)
+
+    return array
+
+
+def attached_block_from_name(name):
+
+    if name not in attached_blocks:
+
+        block = shared_memory.SharedMemory(name=name)
+
+        # A process that attaches to a block registers it with its resource tracker, which would remove the block
+        # when the process exits even though the publishing process owns it.
+
+        resource_tracker.unregister(block._name, "shared_memory")
+
+        attached_blocks[name] = block
+
+    return attached_blocks[name]
+
+
+class SharedMemoryPickler(pickle.Pickler):
+    def __init__(self, file, name, minimum_bytes):
+        """Pickle an object, replacing every array of at least *minimum_bytes* bytes with a reference to the offset
+        it is copied to in the shared memory block *name* (see *SharedDataset*)."""
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.name = name
+        self.minimum_bytes = minimum_bytes
+
+        self.arrays = []
+        self.total_bytes = header_bytes
+
+    def reducer_override(self, obj):
+
+        if (
+            not isinstance(obj, np.ndarray)
+            or obj.dtype.hasobject
+            or obj.nbytes < self.minimum_bytes
+        ):
+            return NotImplemented
+
+        array = np.ascontiguousarray(obj)
+
+        offset = -(-self.total_bytes // alignment_bytes) * alignment_bytes
+
+        self.arrays.append((offset, array))
+        self.total_bytes = offset + array.nbytes
+
+        return (
+            array_from_shared_memory,
+            (
+                self.name,
+                offset,
+                array.shape,
+                array.dtype.str,
+                type(obj),
+                dict(getattr(obj, "__dict__", {})),
+            ),
+        )
+
+
+class SharedDataset:
+    def __init__(self, dataset, name=None, minimum_bytes=1024):
+        """Publish a dataset to a shared memory block, which other processes attach to with
+        *dataset_from_shared_memory* (see the module docstring).
+
+        Parameters
+        ----------
+        dataset : object
+            The dataset that is published, e.g. a masked imaging or interferometer dataset (any picklable object
+            can be published).
+        name : str or None
+            The name of the shared memory block, which the attaching processes use. A unique name is created if
+            this is None.
+        minimum_bytes : int
+            Arrays smaller than this are stored in the dataset's pickle instead of as views of the block.
+        """
+        self.name = name or "autolens_" + secrets.token_hex(8)
+
+        file = io.BytesIO()
+
+        pickler = SharedMemoryPickler(
+            file=file, name=self.name, minimum_bytes=minimum_bytes
+        )
+        pickler.dump(dataset)
+
+        dataset_pickle = file.getvalue()
+
+        self.block = shared_memory.SharedMemory(
+            name=self.name, create=True, size=pickler.total_bytes + len(dataset_pickle),
+        )
+
+        for offset, array in pickler.arrays:
+            np.ndarray(
+                shape=array.shape,
+                dtype=array.dtype,
+                buffer=self.block.buf,
+                offset=offset,
+            )[...] = array
+
+        self.block.buf[
+            pickler.total_bytes : pickler.total_bytes + len(dataset_pickle)
+        ] = dataset_pickle
+
+        header = json.dumps(
+            {"offset": pickler.total_bytes, "size": len(dataset_pickle)}
+        ).encode()
+
+        self.block.buf[: len(header)] = header
+
+        attached_blocks[self.name] = self.block
+
+    @property
+    def size(self):
+        """The size of the shared memory block in bytes."""
+        return self.block.size
+
+    def close(self):
+        """Remove the shared memory block, after which no more processes can attach to it (processes which have
+        attached keep their views of it)."""
+        attached_blocks.pop(self.name, None)
+
+        self.block.unlink()
+
+        # The block cannot be closed whilst this process still uses arrays which are views of it, in which case it
+        # is closed when the process exits.
+
+        try:
+            self.block.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def dataset_from_shared_memory(name):
+    """Attach to a dataset published to the shared memory block *name* by a *SharedDataset*, whose arrays are
+    read-only views of the block."""
+    block = attached_block_from_name(name=name)
+
+    header = json.loads(bytes(block.buf[:header_bytes]).rstrip(b"\x00").decode())
+
+    return pickle.loads(block.buf[header["offset"] : header["offset"] + header["size"]])